@@ -1,14 +1,15 @@
 from django.contrib import admin
+from .db_router import ReadReplicaAdminMixin
 from .models import (
     BingoCard, BingoGame, DrawnBall,
     Operator, Player, BingoSession, PlayerSession,
-    BingoCardExtended, BingoGameExtended, APIKey, WinningPattern,
+    BingoCardExtended, BingoGameExtended, GameStage, APIKey, WinningPattern,
     CardPack, PlayerCard, SessionCard
 )
 
 
 @admin.register(BingoCard)
-class BingoCardAdmin(admin.ModelAdmin):
+class BingoCardAdmin(ReadReplicaAdminMixin, admin.ModelAdmin):
     list_display = ['id', 'bingo_type', 'user_id', 'created_at']
     list_filter = ['bingo_type', 'created_at']
     search_fields = ['user_id']
@@ -25,15 +26,17 @@ class BingoCardAdmin(admin.ModelAdmin):
 
 
 @admin.register(BingoGame)
-class BingoGameAdmin(admin.ModelAdmin):
+class BingoGameAdmin(ReadReplicaAdminMixin, admin.ModelAdmin):
     list_display = ['id', 'game_type', 'name', 'is_active', 'created_at']
     list_filter = ['game_type', 'is_active', 'created_at']
     search_fields = ['name', 'id']
-    readonly_fields = ['id', 'created_at']
+    readonly_fields = ['id', 'created_at', 'seed_hash', 'seed_revealed_at']
+    # La semilla no se muestra: se publica por la API al terminar la partida
+    exclude = ['server_seed']
 
 
 @admin.register(DrawnBall)
-class DrawnBallAdmin(admin.ModelAdmin):
+class DrawnBallAdmin(ReadReplicaAdminMixin, admin.ModelAdmin):
     list_display = ['number', 'game', 'drawn_at']
     list_filter = ['game__game_type', 'drawn_at']
     search_fields = ['number', 'game__name']
@@ -43,7 +46,7 @@ class DrawnBallAdmin(admin.ModelAdmin):
 # === ADMIN PARA SISTEMA MULTI-TENANT ===
 
 @admin.register(Operator)
-class OperatorAdmin(admin.ModelAdmin):
+class OperatorAdmin(ReadReplicaAdminMixin, admin.ModelAdmin):
     list_display = ['name', 'code', 'is_active', 'created_at']
     list_filter = ['is_active', 'created_at']
     search_fields = ['name', 'code', 'domain']
@@ -66,7 +69,7 @@ class OperatorAdmin(admin.ModelAdmin):
 
 
 @admin.register(Player)
-class PlayerAdmin(admin.ModelAdmin):
+class PlayerAdmin(ReadReplicaAdminMixin, admin.ModelAdmin):
     list_display = ['username', 'operator', 'email', 'is_active', 'is_verified', 'created_at']
     list_filter = ['operator', 'is_active', 'is_verified', 'created_at']
     search_fields = ['username', 'email', 'phone', 'whatsapp_id', 'telegram_id']
@@ -89,7 +92,7 @@ class PlayerAdmin(admin.ModelAdmin):
 
 
 @admin.register(BingoSession)
-class BingoSessionAdmin(admin.ModelAdmin):
+class BingoSessionAdmin(ReadReplicaAdminMixin, admin.ModelAdmin):
     list_display = ['name', 'operator', 'bingo_type', 'status', 'scheduled_start', 'created_at']
     list_filter = ['operator', 'bingo_type', 'status', 'scheduled_start', 'created_at']
     search_fields = ['name', 'description', 'created_by']
@@ -115,7 +118,7 @@ class BingoSessionAdmin(admin.ModelAdmin):
 
 
 @admin.register(PlayerSession)
-class PlayerSessionAdmin(admin.ModelAdmin):
+class PlayerSessionAdmin(ReadReplicaAdminMixin, admin.ModelAdmin):
     list_display = ['player', 'session', 'joined_at', 'cards_count', 'has_won', 'is_active']
     list_filter = ['session__operator', 'session__bingo_type', 'has_won', 'is_active', 'joined_at']
     search_fields = ['player__username', 'session__name']
@@ -138,7 +141,7 @@ class PlayerSessionAdmin(admin.ModelAdmin):
 
 
 @admin.register(BingoCardExtended)
-class BingoCardExtendedAdmin(admin.ModelAdmin):
+class BingoCardExtendedAdmin(ReadReplicaAdminMixin, admin.ModelAdmin):
     list_display = ['id', 'bingo_type', 'player', 'session', 'is_winner', 'created_at']
     list_filter = ['bingo_type', 'player__operator', 'session', 'is_winner', 'created_at']
     search_fields = ['player__username', 'session__name']
@@ -166,12 +169,20 @@ class BingoCardExtendedAdmin(admin.ModelAdmin):
         return False  # Los cartones se crean via API
 
 
+class GameStageInline(admin.TabularInline):
+    model = GameStage
+    extra = 0
+    fields = ['order', 'pattern', 'status', 'won_at_ball', 'winning_number', 'completed_at']
+    readonly_fields = ['status', 'won_at_ball', 'winning_number', 'completed_at']
+
+
 @admin.register(BingoGameExtended)
-class BingoGameExtendedAdmin(admin.ModelAdmin):
+class BingoGameExtendedAdmin(ReadReplicaAdminMixin, admin.ModelAdmin):
     list_display = ['name', 'operator', 'session', 'game_type', 'is_active', 'created_at']
     list_filter = ['operator', 'session', 'game_type', 'is_active', 'created_at']
     search_fields = ['name']
-    readonly_fields = ['id', 'created_at']
+    readonly_fields = ['id', 'created_at', 'seed_hash', 'seed_revealed_at']
+    inlines = [GameStageInline]
     fieldsets = (
         ('Información Básica', {
             'fields': ('operator', 'session', 'name')
@@ -182,6 +193,9 @@ class BingoGameExtendedAdmin(admin.ModelAdmin):
         ('Configuración Avanzada', {
             'fields': ('auto_draw', 'draw_interval', 'max_balls')
         }),
+        ('Extracción Justa', {
+            'fields': ('seed_hash', 'seed_revealed_at')
+        }),
         ('Metadatos', {
             'fields': ('id', 'created_at'),
             'classes': ('collapse',)
@@ -190,7 +204,7 @@ class BingoGameExtendedAdmin(admin.ModelAdmin):
 
 
 @admin.register(APIKey)
-class APIKeyAdmin(admin.ModelAdmin):
+class APIKeyAdmin(ReadReplicaAdminMixin, admin.ModelAdmin):
     list_display = ['name', 'operator', 'key_preview', 'permission_level', 'is_active', 'last_used', 'created_at']
     list_filter = ['operator', 'permission_level', 'is_active', 'created_at']
     search_fields = ['name', 'key']
@@ -222,7 +236,7 @@ class APIKeyAdmin(admin.ModelAdmin):
 
 
 @admin.register(WinningPattern)
-class WinningPatternAdmin(admin.ModelAdmin):
+class WinningPatternAdmin(ReadReplicaAdminMixin, admin.ModelAdmin):
     list_display = ['name', 'code', 'category', 'compatible_with', 'prize_multiplier', 'has_jackpot', 'is_active', 'is_system']
     list_filter = ['category', 'compatible_with', 'is_active', 'is_system', 'has_jackpot']
     search_fields = ['name', 'code', 'description']
@@ -257,17 +271,17 @@ class WinningPatternAdmin(admin.ModelAdmin):
 # === ADMIN PARA SISTEMA DE REUTILIZACIÓN DE CARTAS ===
 
 @admin.register(CardPack)
-class CardPackAdmin(admin.ModelAdmin):
+class CardPackAdmin(ReadReplicaAdminMixin, admin.ModelAdmin):
     list_display = ['name', 'operator', 'bingo_type', 'category', 'total_cards', 'cards_generated', 'is_active', 'created_at']
     list_filter = ['operator', 'bingo_type', 'category', 'is_active', 'cards_generated', 'is_public', 'created_at']
     search_fields = ['name', 'description']
-    readonly_fields = ['id', 'cards_generated', 'created_at', 'updated_at', 'cards_count_display']
+    readonly_fields = ['id', 'cards_generated', 'allocation_cursor', 'created_at', 'updated_at', 'cards_count_display']
     fieldsets = (
         ('Información Básica', {
             'fields': ('operator', 'name', 'description', 'bingo_type')
         }),
         ('Configuración', {
-            'fields': ('total_cards', 'cards_generated', 'cards_count_display', 'category')
+            'fields': ('total_cards', 'cards_generated', 'cards_count_display', 'allocation_cursor', 'category')
         }),
         ('Precio y Disponibilidad', {
             'fields': ('price_per_card', 'is_active', 'is_public')
@@ -299,7 +313,7 @@ class CardPackAdmin(admin.ModelAdmin):
 
 
 @admin.register(PlayerCard)
-class PlayerCardAdmin(admin.ModelAdmin):
+class PlayerCardAdmin(ReadReplicaAdminMixin, admin.ModelAdmin):
     list_display = ['player', 'card_serial', 'pack', 'acquisition_type', 'times_used', 'times_won', 'is_favorite', 'acquired_at']
     list_filter = ['player__operator', 'pack', 'acquisition_type', 'is_favorite', 'acquired_at']
     search_fields = ['player__username', 'card__serial_number', 'nickname']
@@ -330,7 +344,7 @@ class PlayerCardAdmin(admin.ModelAdmin):
 
 
 @admin.register(SessionCard)
-class SessionCardAdmin(admin.ModelAdmin):
+class SessionCardAdmin(ReadReplicaAdminMixin, admin.ModelAdmin):
     list_display = ['session', 'player', 'card_serial', 'status', 'is_winner', 'prize_amount', 'joined_at']
     list_filter = ['session__operator', 'status', 'is_winner', 'joined_at']
     search_fields = ['session__name', 'player__username', 'card__serial_number']
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class BingoConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'bingo'
+
+    def ready(self):
+        from .middleware import install_serializer_timing
+        from .pattern_registry import install_invalidation
+
+        install_serializer_timing()
+        install_invalidation()
@@ -3,6 +3,7 @@ Sistema de autenticación con API Key + Secret
 """
 
 from rest_framework import authentication, exceptions
+from .metrics import observe_auth
 from .models import APIKey
 
 
@@ -16,6 +17,13 @@ class APIKeyAuthentication(authentication.BaseAuthentication):
     """
     
     def authenticate(self, request):
+        with observe_auth('api_key') as outcome:
+            result = self._authenticate(request)
+            if result is not None:
+                outcome['result'] = 'success'
+            return result
+    
+    def _authenticate(self, request):
         api_key = request.META.get('HTTP_X_API_KEY')
         api_secret = request.META.get('HTTP_X_API_SECRET')
         
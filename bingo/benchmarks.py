@@ -0,0 +1,293 @@
+"""
+Micro-benchmarks de las rutas calientes del servicio
+
+Cubre generación y validación de cartones, BingoCard.check_winner,
+WinningPattern.check_pattern para cada pattern_type del sistema, el
+serializer BingoCardExtendedSerializer y la repetición en memoria de partidas
+(replay.GameReplay). Ningún benchmark toca la base de datos: los modelos se
+instancian sin guardar.
+
+Los resultados se guardan como línea base JSON y se comparan con
+compare_results(); el comando `python manage.py benchmark` falla si alguno
+empeora más que el umbral.
+
+    python manage.py benchmark --save benchmarks/baseline.json
+    python manage.py benchmark --compare benchmarks/baseline.json --threshold 0.15
+
+Las líneas base dependen de la máquina, así que no se versionan
+(benchmarks/baseline.json está en .gitignore): se generan en la misma máquina
+o job de CI donde se comparan, midiendo primero el commit base con --save.
+"""
+
+import platform
+import random
+import statistics
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+
+# Semilla fija: todas las corridas miden los mismos cartones y bolas
+SEED = 20241022
+
+# Repeticiones por benchmark; se compara el mínimo por llamada (como timeit:
+# el ruido de la máquina solo suma tiempo, nunca lo resta)
+REPEATS = 7
+
+# Tiempo mínimo de cada repetición (segundos)
+MIN_REPEAT_SECONDS = 0.1
+
+DEFAULT_THRESHOLD = 0.15
+
+_registry: "OrderedDict[str, Callable[[], Callable[[], object]]]" = OrderedDict()
+
+
+def benchmark(name: str):
+    """
+    Registra un benchmark
+
+    La función decorada hace la preparación y devuelve el callable a medir.
+    """
+    def decorator(setup: Callable[[], Callable[[], object]]):
+        _registry[name] = setup
+        return setup
+    return decorator
+
+
+def _card_generators():
+    from .models import BingoCard
+
+    return {
+        '75': BingoCard.generate_75_ball_card,
+        '85': BingoCard.generate_85_ball_card,
+        '90': BingoCard.generate_90_ball_card,
+    }
+
+
+def _sample_card(bingo_type: str):
+    from .models import BingoCard
+
+    return BingoCard(bingo_type=bingo_type, numbers=_card_generators()[bingo_type](random.Random(SEED)))
+
+
+def _drawn_numbers(bingo_type: str, count: int) -> List[int]:
+    rng = random.Random(SEED)
+    return rng.sample(range(1, {'75': 75, '85': 85, '90': 90}[bingo_type] + 1), count)
+
+
+def _register_card_benchmarks():
+    for bingo_type in ('75', '85', '90'):
+
+        @benchmark(f'card.generate_{bingo_type}')
+        def generate(bingo_type=bingo_type):
+            generator = _card_generators()[bingo_type]
+            rng = random.Random(SEED)
+            return lambda: generator(rng)
+
+        @benchmark(f'card.validate_{bingo_type}')
+        def validate(bingo_type=bingo_type):
+            return _sample_card(bingo_type).validate_card
+
+        @benchmark(f'card.check_winner_{bingo_type}')
+        def check_winner(bingo_type=bingo_type):
+            card = _sample_card(bingo_type)
+            drawn = set(_drawn_numbers(bingo_type, 40))
+            return lambda: card.check_winner(drawn)
+
+
+def _register_pattern_benchmarks():
+    from .pattern_compiler import BUILTIN_SPECS
+
+    for pattern_type in BUILTIN_SPECS:
+        # Los patrones 5x5 se miden en 75 bolas; los de filas también en 90
+        bingo_types = ['90'] if pattern_type == 'two_lines' else ['75']
+        if pattern_type in ('horizontal_line', 'full_card'):
+            bingo_types.append('90')
+
+        for bingo_type in bingo_types:
+
+            @benchmark(f'pattern.check_pattern.{pattern_type}_{bingo_type}')
+            def check_pattern(pattern_type=pattern_type, bingo_type=bingo_type):
+                from .models import WinningPattern
+
+                pattern = WinningPattern(code=pattern_type, name=pattern_type, pattern_type=pattern_type)
+                card = _sample_card(bingo_type)
+                marked = _drawn_numbers(bingo_type, 45)
+                return lambda: pattern.check_pattern(marked, card.numbers, bingo_type, len(marked))
+
+    @benchmark('pattern.check_pattern.custom_two_any_lines_75')
+    def check_custom_pattern():
+        from .models import WinningPattern
+
+        pattern = WinningPattern(
+            code='bench_custom', name='bench_custom', pattern_type='custom',
+            pattern_data={'any': 'line', 'count': 2}
+        )
+        card = _sample_card('75')
+        marked = _drawn_numbers('75', 45)
+        return lambda: pattern.check_pattern(marked, card.numbers, '75', len(marked))
+
+
+def _register_serializer_benchmarks():
+
+    @benchmark('serializer.bingo_card_extended_x100')
+    def serialize_cards():
+        from .models import BingoCardExtended, BingoSession, Operator, Player
+        from .serializers_multi_tenant import BingoCardExtendedSerializer
+
+        rng = random.Random(SEED)
+        operator = Operator(name='Bench', code='bench')
+        player = Player(operator=operator, username='bench')
+        session = BingoSession(operator=operator, name='Bench', bingo_type='75')
+        generate = _card_generators()['75']
+        cards = [
+            BingoCardExtended(
+                bingo_type='75', numbers=generate(rng), card_number=number,
+                session=session, player=player, status='sold'
+            )
+            for number in range(1, 101)
+        ]
+        return lambda: BingoCardExtendedSerializer(cards, many=True).data
+
+
+def _register_replay_benchmarks():
+    for bingo_type, cards_count in (('75', 500), ('90', 500)):
+
+        @benchmark(f'replay.game_{bingo_type}_{cards_count}_cards')
+        def replay(bingo_type=bingo_type, cards_count=cards_count):
+            from .replay import GameReplay, generate_snapshot
+
+            snapshot = generate_snapshot(bingo_type, cards_count, seed=SEED)
+            return lambda: GameReplay(snapshot).run(collect_events=False)
+
+
+def _ensure_registered():
+    if not _registry:
+        _register_card_benchmarks()
+        _register_pattern_benchmarks()
+        _register_serializer_benchmarks()
+        _register_replay_benchmarks()
+
+
+def available_benchmarks() -> List[str]:
+    _ensure_registered()
+    return list(_registry)
+
+
+def _measure(func: Callable[[], object], repeats: int, min_repeat_seconds: float) -> Dict:
+    # Calibrar cuántas llamadas entran en una repetición (también calienta cachés)
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_repeat_seconds or loops >= 1_000_000:
+            break
+        loops *= 10 if elapsed < min_repeat_seconds / 10 else 2
+
+    per_call = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for _ in range(loops):
+            func()
+        per_call.append((time.perf_counter() - started) / loops)
+
+    return {
+        'median_us': round(statistics.median(per_call) * 1e6, 3),
+        'min_us': round(min(per_call) * 1e6, 3),
+        'max_us': round(max(per_call) * 1e6, 3),
+        'loops': loops,
+        'repeats': repeats,
+    }
+
+
+def run_benchmarks(names: Optional[List[str]] = None, repeats: int = REPEATS,
+                   min_repeat_seconds: float = MIN_REPEAT_SECONDS, progress=None) -> Dict:
+    """
+    Ejecuta los benchmarks (todos, o los indicados)
+
+    Returns:
+        dict con metadatos de la máquina y resultados por benchmark
+    """
+    _ensure_registered()
+    names = names or list(_registry)
+    unknown = [name for name in names if name not in _registry]
+    if unknown:
+        raise ValueError(f"Benchmarks desconocidos: {', '.join(unknown)}")
+
+    results = OrderedDict()
+    for name in names:
+        func = _registry[name]()
+        results[name] = _measure(func, repeats, min_repeat_seconds)
+        if progress:
+            progress(name, results[name])
+
+    return {
+        'meta': {
+            'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'machine': platform.machine(),
+            'system': platform.system(),
+        },
+        'results': results,
+    }
+
+
+def confirm_regressions(baseline: Dict, current: Dict, threshold: float = DEFAULT_THRESHOLD,
+                        attempts: int = 2, **run_options) -> Dict:
+    """
+    Vuelve a medir los benchmarks que parecen haber empeorado y se queda con el mejor mínimo
+
+    Una sola corrida en una máquina con ruido (CI compartido) da falsos
+    positivos; una regresión real se mantiene en todas las mediciones.
+    """
+    for _ in range(attempts):
+        suspects = [row['name'] for row in compare_results(baseline, current, threshold) if row['status'] == 'regression']
+        if not suspects:
+            break
+        rerun = run_benchmarks(suspects, **run_options)['results']
+        for name, result in rerun.items():
+            if result['min_us'] < current['results'][name]['min_us']:
+                current['results'][name] = result
+    return current
+
+
+def compare_results(baseline: Dict, current: Dict, threshold: float = DEFAULT_THRESHOLD) -> List[Dict]:
+    """
+    Compara el mínimo por llamada contra la línea base
+
+    Returns:
+        una fila por benchmark con status 'regression', 'improved', 'ok', 'new' o 'missing'
+    """
+    base_results = baseline.get('results', {})
+    current_results = current.get('results', {})
+    rows = []
+
+    for name, result in current_results.items():
+        base = base_results.get(name)
+        if base is None:
+            rows.append({'name': name, 'baseline_us': None, 'current_us': result['min_us'], 'change': None, 'status': 'new'})
+            continue
+        change = (result['min_us'] - base['min_us']) / base['min_us'] if base['min_us'] else 0.0
+        if change > threshold:
+            row_status = 'regression'
+        elif change < -threshold:
+            row_status = 'improved'
+        else:
+            row_status = 'ok'
+        rows.append({
+            'name': name,
+            'baseline_us': base['min_us'],
+            'current_us': result['min_us'],
+            'change': round(change, 4),
+            'status': row_status,
+        })
+
+    for name in base_results:
+        if name not in current_results:
+            rows.append({'name': name, 'baseline_us': base_results[name]['min_us'], 'current_us': None, 'change': None, 'status': 'missing'})
+
+    return rows
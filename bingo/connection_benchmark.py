@@ -0,0 +1,232 @@
+"""
+Latencia por petición con y sin reutilización de conexiones
+
+Cada modo de DB_CONNECTION_MODE (per-request, persistent, pool) se mide en un
+proceso aparte, porque la configuración de DATABASES se lee al arrancar. Las
+peticiones pasan por el WSGIHandler real: request_started y request_finished
+cierran o devuelven la conexión igual que bajo gunicorn, pero sin HTTP de por
+medio, así que la diferencia entre modos es el coste de abrir conexiones.
+
+Solo PostgreSQL da cifras representativas: abrir una conexión SQLite es casi
+gratis y el modo pool no existe para SQLite (se omite).
+
+El operador de prueba (jugadores, pack y API key activa) se borra al terminar,
+también si algún modo falla: no quedan credenciales vivas en la base de datos.
+"""
+
+import io
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .loadtest import summarize
+
+
+MODES = ('per-request', 'persistent', 'pool')
+DEFAULT_PATH = '/api/patterns/'
+DEFAULT_REQUESTS = 500
+DEFAULT_WARMUP = 20
+CREDENTIALS_ENV = 'BINGO_CONNECTION_BENCHMARK_CREDENTIALS'
+
+
+class ConnectionBenchmarkError(Exception):
+    pass
+
+
+def wsgi_request(application, method: str, path: str, headers: Optional[Dict[str, str]] = None,
+                 body: bytes = b'') -> Tuple[int, bytes]:
+    """Petición directa a la aplicación WSGI; devuelve (status, cuerpo)"""
+    path, _, query = path.partition('?')
+    environ = {
+        'REQUEST_METHOD': method,
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'HTTP_HOST': 'localhost',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.url_scheme': 'http',
+        'wsgi.version': (1, 0),
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in (headers or {}).items():
+        environ['HTTP_' + name.upper().replace('-', '_')] = value
+
+    status = []
+
+    def start_response(status_line, response_headers, exc_info=None):
+        status.append(int(status_line.split(' ', 1)[0]))
+
+    result = application(environ, start_response)
+    try:
+        content = b''.join(result)
+    finally:
+        # Como un servidor WSGI: close() emite request_finished
+        if hasattr(result, 'close'):
+            result.close()
+    return status[0], content
+
+
+def measure_current_mode(requests: int = DEFAULT_REQUESTS, threads: int = 1, path: str = DEFAULT_PATH,
+                         warmup: int = DEFAULT_WARMUP) -> Dict:
+    """
+    Mide la configuración de conexiones de este proceso
+
+    Las credenciales (api_key y api_secret) llegan en la variable de entorno
+    CREDENTIALS_ENV que pone run_connection_benchmark.
+    """
+    from django.conf import settings
+    from django.core.wsgi import get_wsgi_application
+    from django.db import connections
+    from django.db.backends.signals import connection_created
+
+    credentials = json.loads(os.environ[CREDENTIALS_ENV])
+    application = get_wsgi_application()
+
+    opened = Counter()
+    opened_lock = threading.Lock()
+
+    def count_connection(sender, connection, **kwargs):
+        with opened_lock:
+            opened['connections'] += 1
+
+    connection_created.connect(count_connection, weak=False)
+
+    status, content = wsgi_request(application, 'POST', '/api/token/', body=json.dumps({
+        'api_key': credentials['api_key'], 'api_secret': credentials['api_secret'],
+    }).encode())
+    if status != 200:
+        raise ConnectionBenchmarkError(f"No se pudo obtener el token ({status}): {content[:200]!r}")
+    headers = {'Authorization': f"Bearer {json.loads(content)['access']}"}
+
+    for _ in range(warmup):
+        wsgi_request(application, 'GET', path, headers)
+    opened.clear()
+
+    samples: List[float] = []
+    statuses: Counter = Counter()
+    results_lock = threading.Lock()
+
+    def worker(count: int):
+        local_samples, local_statuses = [], Counter()
+        try:
+            for _ in range(count):
+                started = time.perf_counter()
+                status, _ = wsgi_request(application, 'GET', path, headers)
+                local_samples.append((time.perf_counter() - started) * 1000)
+                local_statuses[str(status)] += 1
+        finally:
+            connections.close_all()
+        with results_lock:
+            samples.extend(local_samples)
+            statuses.update(local_statuses)
+
+    shares = [requests // threads + (1 if index < requests % threads else 0) for index in range(threads)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for future in [executor.submit(worker, share) for share in shares if share]:
+            future.result()
+    seconds = time.perf_counter() - started
+
+    database = settings.DATABASES['default']
+    return {
+        'mode': settings.DB_CONNECTION_MODE,
+        'vendor': connections['default'].vendor,
+        'threads': threads,
+        'conn_max_age': database.get('CONN_MAX_AGE', 0),
+        'pool': database.get('OPTIONS', {}).get('pool'),
+        'connections_opened': opened['connections'],
+        **summarize(samples, statuses, seconds),
+    }
+
+
+def prepare_credentials() -> Dict:
+    """Siembra un operador pequeño con API key para autenticar las peticiones"""
+    import uuid
+
+    from .dataset import seed_tenant
+
+    data = seed_tenant(
+        players=5, pack_cards=20, legacy_cards=0, drawn_balls=0,
+        operator_code=f'conn-bench-{uuid.uuid4().hex[:8]}',
+    )
+    return {'api_key': data['api_key'].key, 'api_secret': data['api_secret'], 'operator': data['operator'].code}
+
+
+def cleanup_credentials(credentials: Dict):
+    """Borra el operador de prueba; sus jugadores, pack y API key caen en cascada"""
+    from .models import Operator
+
+    Operator.objects.filter(code=credentials['operator']).delete()
+
+
+def run_connection_benchmark(modes=MODES, requests: int = DEFAULT_REQUESTS, threads: int = 1,
+                             path: str = DEFAULT_PATH, warmup: int = DEFAULT_WARMUP,
+                             log: Optional[Callable[[str], None]] = None) -> Dict:
+    """
+    Mide cada modo en un subproceso `manage.py benchmark_connections --worker`
+
+    Returns:
+        dict con el resultado por modo y la mejora de p50 frente a per-request
+    """
+    from django.conf import settings
+    from django.db import connection
+
+    log = log or (lambda message: None)
+    unknown = [mode for mode in modes if mode not in MODES]
+    if unknown:
+        raise ConnectionBenchmarkError(f"Modos desconocidos: {', '.join(unknown)}")
+    if connection.vendor == 'sqlite' and connection.settings_dict['NAME'] in ('', ':memory:'):
+        raise ConnectionBenchmarkError("Los subprocesos necesitan una base de datos compartida (no SQLite en memoria)")
+
+    credentials = prepare_credentials()
+    log(f"Operador de prueba: {credentials['operator']}")
+    results = {}
+    try:
+        for mode in modes:
+            if mode == 'pool' and connection.vendor != 'postgresql':
+                results[mode] = {'mode': mode, 'skipped': 'el pool de conexiones solo existe para PostgreSQL'}
+                log(f"{mode:<12} omitido: {results[mode]['skipped']}")
+                continue
+            env = dict(os.environ, DB_CONNECTION_MODE=mode, **{CREDENTIALS_ENV: json.dumps(credentials)})
+            command = [
+                sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), 'benchmark_connections', '--worker',
+                '--requests', str(requests), '--threads', str(threads), '--path', path, '--warmup', str(warmup),
+            ]
+            completed = subprocess.run(command, env=env, capture_output=True, text=True)
+            if completed.returncode != 0:
+                raise ConnectionBenchmarkError(f"El modo {mode} falló:\n{completed.stderr[-2000:]}")
+            results[mode] = json.loads(completed.stdout.strip().splitlines()[-1])
+            log(
+                f"{mode:<12} p50 {results[mode]['p50_ms']:>8.2f} ms  p95 {results[mode]['p95_ms']:>8.2f} ms  "
+                f"{results[mode]['throughput_rps']:>8.1f} req/s  conexiones abiertas {results[mode]['connections_opened']}"
+            )
+    finally:
+        cleanup_credentials(credentials)
+        log(f"Operador de prueba eliminado: {credentials['operator']}")
+
+    baseline = results.get('per-request', {}).get('p50_ms')
+    if baseline:
+        for result in results.values():
+            if 'p50_ms' in result:
+                result['p50_speedup'] = round(baseline / result['p50_ms'], 3) if result['p50_ms'] else None
+
+    return {
+        'path': path,
+        'requests': requests,
+        'threads': threads,
+        'vendor': connection.vendor,
+        'results': results,
+    }
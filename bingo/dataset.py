@@ -0,0 +1,482 @@
+"""
+Datos sintéticos de un operador realista
+
+Siembra un operador con sus jugadores, un pack de cartas, una sesión por pack
+(SessionCard + PlayerSession) con su partida en curso, y una sesión heredada
+con cartones propios (BingoCardExtended.session) en distintos estados. Lo
+usan las pruebas de presupuesto de consultas y las herramientas de carga.
+
+Todo se inserta en lotes: bulk_create para los modelos simples y
+BingoCardExtended.bulk_create_cards para los cartones (herencia multi-tabla).
+Con la misma semilla los cartones y las bolas son los mismos.
+
+generate_dataset() siembra datasets de escala de producción (N operadores,
+millones de cartones) para evaluar índices y consultas: escribe las filas en
+streaming con COPY en PostgreSQL (executemany en otros motores) sin crear
+instancias de modelos, y genera los cartones de 75/85 bolas vectorizados con
+numpy. Lo usa `python manage.py generate_dataset`.
+"""
+
+import json
+import random
+import time
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+
+from .fairness import derive_sequence, seed_commitment
+from .models import (
+    APIKey, BingoCard, BingoCardExtended, BingoGame, BingoGameExtended, BingoSession,
+    CardPack, DrawnBall, Operator, Player, PlayerCard, PlayerSession,
+    SessionCard, WinningPattern,
+)
+
+
+DEFAULT_CHUNK_SIZE = 1000
+
+TOTAL_BALLS = {'75': 75, '85': 85, '90': 90}
+
+CARD_GENERATORS = {
+    '75': BingoCard.generate_75_ball_card,
+    '85': BingoCard.generate_85_ball_card,
+    '90': BingoCard.generate_90_ball_card,
+}
+
+
+def _progress(log: Optional[Callable[[str], None]], message: str):
+    if log:
+        log(message)
+
+
+def seed_tenant(players: int = 1000, pack_cards: int = 5000, cards_per_player: int = 3,
+                legacy_cards: int = 2000, drawn_balls: int = 30, bingo_type: str = '75',
+                seed: int = 0, operator_code: Optional[str] = None,
+                chunk_size: int = DEFAULT_CHUNK_SIZE, log: Optional[Callable[[str], None]] = None) -> Dict:
+    """
+    Siembra un operador realista
+
+    Args:
+        players: jugadores del operador; todos se unen a la sesión del pack
+        pack_cards: cartas del pack; cada jugador ya tiene `cards_per_player`
+        legacy_cards: cartones propios de la sesión heredada (disponibles,
+            reservados y vendidos)
+        drawn_balls: bolas ya extraídas en cada partida
+        seed: semilla de cartones, estados y bolas
+        operator_code: código del operador (por defecto derivado de la semilla)
+
+    Returns:
+        dict con los objetos creados (operator, api_key, api_secret,
+        players, pack, session, game, legacy_session, legacy_game...)
+    """
+    if bingo_type not in TOTAL_BALLS:
+        raise ValueError(f"Tipo de bingo inválido: {bingo_type}")
+    if players * cards_per_player > pack_cards:
+        raise ValueError("El pack no alcanza para las cartas de todos los jugadores")
+
+    rng = random.Random(seed)
+    # Generador propio para los cartones: no se toca el módulo random global
+    card_rng = random.Random(rng.getrandbits(64))
+    generate = CARD_GENERATORS[bingo_type]
+    now = timezone.now()
+
+    with transaction.atomic():
+        WinningPattern.create_system_patterns()
+
+        suffix = uuid.UUID(int=rng.getrandbits(128)).hex[:8]
+        operator = Operator.objects.create(
+            name=f'Operador {suffix}', code=operator_code or f'op-{suffix}',
+            allowed_bingo_types=['75', '85', '90'],
+        )
+        api_key_value, api_secret = APIKey.generate_credentials()
+        api_key = APIKey.objects.create(
+            operator=operator, name='dataset', key=api_key_value,
+            secret_hash=APIKey.hash_secret(api_secret), permission_level='admin',
+        )
+
+        _progress(log, f"{players} jugadores")
+        player_objs = [
+            Player(
+                operator=operator, username=f'player{number:06d}',
+                phone=f'+58414{number:07d}', email=f'player{number}@example.com',
+            )
+            for number in range(1, players + 1)
+        ]
+        Player.objects.bulk_create(player_objs, batch_size=chunk_size)
+
+        # Pack con sus cartas; las primeras ya están asignadas a los jugadores
+        _progress(log, f"Pack de {pack_cards} cartas")
+        owned = players * cards_per_player
+        pack = CardPack.objects.create(
+            operator=operator, name=f'Pack {bingo_type} {suffix}', bingo_type=bingo_type,
+            total_cards=pack_cards, cards_generated=True, allocation_cursor=owned,
+            price_per_card=Decimal('1.00'),
+        )
+        pack_prefix = f"{operator.code.upper()}-{bingo_type}-{pack.id.hex[:8].upper()}"
+        pack_card_objs = BingoCardExtended.bulk_create_cards([
+            BingoCardExtended(
+                user_id=f'pack_{pack.id}', bingo_type=bingo_type, numbers=generate(card_rng),
+                pack=pack, card_number=number, serial_number=f'{pack_prefix}-{number:04d}',
+                is_reusable=True,
+            )
+            for number in range(1, pack_cards + 1)
+        ], chunk_size)
+
+        PlayerCard.objects.bulk_create([
+            PlayerCard(
+                player=player_objs[index // cards_per_player], card=card, pack=pack,
+                acquisition_type='purchase',
+            )
+            for index, card in enumerate(pack_card_objs[:owned])
+        ], batch_size=chunk_size)
+
+        # Sesión del pack: todos los jugadores juegan sus cartas
+        _progress(log, f"Sesión con {owned} cartas en juego")
+        session = BingoSession.objects.create(
+            operator=operator, name=f'Sesión pack {suffix}', bingo_type=bingo_type,
+            max_players=players, card_source='pack', card_pack=pack, status='active',
+            scheduled_start=now, actual_start=now,
+            winning_patterns=['horizontal_line', 'vertical_line', 'full_card'],
+        )
+        PlayerSession.objects.bulk_create([
+            PlayerSession(session=session, player=player, cards_count=cards_per_player)
+            for player in player_objs
+        ], batch_size=chunk_size)
+        SessionCard.objects.bulk_create([
+            SessionCard(session=session, card=card, player=player_objs[index // cards_per_player])
+            for index, card in enumerate(pack_card_objs[:owned])
+        ], batch_size=chunk_size)
+
+        # Sesión heredada: cartones propios de la sesión en distintos estados;
+        # todos los jugadores están inscritos
+        _progress(log, f"Sesión heredada con {legacy_cards} cartones")
+        legacy_session = BingoSession.objects.create(
+            operator=operator, name=f'Sesión heredada {suffix}', bingo_type=bingo_type,
+            max_players=players, card_source='generate', status='active',
+            scheduled_start=now - timedelta(hours=1), actual_start=now - timedelta(hours=1),
+            entry_fee=Decimal('2.50'), total_cards=legacy_cards, cards_generated=True,
+        )
+        PlayerSession.objects.bulk_create([
+            PlayerSession(session=legacy_session, player=player) for player in player_objs
+        ], batch_size=chunk_size)
+        legacy_card_objs = []
+        for number in range(1, legacy_cards + 1):
+            roll = rng.random()
+            status = 'available' if roll < 0.5 else 'reserved' if roll < 0.6 else 'sold'
+            player = rng.choice(player_objs) if status != 'available' and player_objs else None
+            legacy_card_objs.append(BingoCardExtended(
+                user_id=str(player.id) if player else '', bingo_type=bingo_type, numbers=generate(card_rng),
+                session=legacy_session, player=player, card_number=number, status=status,
+                purchase_price=Decimal('2.50') if status == 'sold' else Decimal('0'),
+                reserved_at=now if status != 'available' else None,
+                purchased_at=now if status == 'sold' else None,
+            ))
+        BingoCardExtended.bulk_create_cards(legacy_card_objs, chunk_size)
+
+        # Partidas en curso con bolas ya extraídas (orden derivado de su semilla)
+        games = []
+        for game_session in (session, legacy_session):
+            server_seed = '%064x' % rng.getrandbits(256)
+            game = BingoGameExtended.objects.create(
+                operator=operator, session=game_session, game_type=bingo_type,
+                name=f'Partida {game_session.name}', server_seed=server_seed,
+                seed_hash=seed_commitment(server_seed),
+            )
+            sequence = derive_sequence(server_seed, game.id, TOTAL_BALLS[bingo_type], drawn_balls)
+            DrawnBall.objects.bulk_create([
+                DrawnBall(game=game, number=number, sequence=index)
+                for index, number in enumerate(sequence, start=1)
+            ])
+            games.append(game)
+
+    return {
+        'operator': operator,
+        'api_key': api_key,
+        'api_secret': api_secret,
+        'players': player_objs,
+        'pack': pack,
+        'pack_cards': pack_card_objs,
+        'session': session,
+        'game': games[0],
+        'legacy_session': legacy_session,
+        'legacy_cards': legacy_card_objs,
+        'legacy_game': games[1],
+    }
+
+
+# === Datasets de escala de producción ===
+
+COPY_CHUNK_SIZE = 10000
+
+# Columnas de cada tipo de cartón de 5x5: (números por columna, primer número)
+GRID_COLUMN_WIDTH = {'75': 15, '85': 16}
+
+
+class TableWriter:
+    """
+    Acumula filas de una tabla y las inserta por lotes
+
+    Las filas se pasan como valores por attname; los campos omitidos toman su
+    default (o `now` si son auto_now/auto_now_add). Con use_copy se usa
+    COPY ... FROM STDIN (psycopg 3); si no, un INSERT con executemany. Las
+    tablas de herencia multi-tabla se escriben con un writer por tabla.
+    """
+
+    def __init__(self, model, now, chunk_size: int = COPY_CHUNK_SIZE, use_copy: Optional[bool] = None):
+        self.model = model
+        self.chunk_size = chunk_size
+        # La conexión real (no el proxy por hilo de django.db.connection): se
+        # consulta en cada valor preparado
+        self.connection = connections[DEFAULT_DB_ALIAS]
+        self.use_copy = self.connection.vendor == 'postgresql' if use_copy is None else use_copy
+        self.fields = model._meta.local_concrete_fields
+        self.rows = []
+        self.written = 0
+
+        quote = self.connection.ops.quote_name
+        table = quote(model._meta.db_table)
+        columns = ', '.join(quote(field.column) for field in self.fields)
+        if self.use_copy:
+            self.sql = f'COPY {table} ({columns}) FROM STDIN'
+        else:
+            self.sql = f"INSERT INTO {table} ({columns}) VALUES ({', '.join(['%s'] * len(self.fields))})"
+
+        # Conversión por columna (None = el valor se escribe tal cual) y
+        # valores por defecto ya convertidos, calculados una vez por tabla
+        self.columns = []
+        for field in self.fields:
+            prepare = self._preparer(field)
+            if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+                default = now
+            else:
+                default = field.get_default()
+            self.columns.append((field.attname, prepare, prepare(default) if prepare else default))
+
+    def _preparer(self, field):
+        if not self.use_copy:
+            return lambda value: field.get_db_prep_save(value, self.connection)
+        # COPY en formato texto: el servidor interpreta cada columna según su tipo
+        if field.get_internal_type() == 'JSONField':
+            return lambda value: None if value is None else json.dumps(value, cls=field.encoder)
+        return None
+
+    def add(self, **values):
+        row = []
+        for attname, prepare, default in self.columns:
+            if attname in values:
+                value = values[attname]
+                row.append(prepare(value) if prepare else value)
+            else:
+                row.append(default)
+        self.rows.append(row)
+        if len(self.rows) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        with self.connection.cursor() as cursor:
+            if self.use_copy:
+                with cursor.copy(self.sql) as copy:
+                    for row in self.rows:
+                        copy.write_row(row)
+            else:
+                cursor.executemany(self.sql, self.rows)
+        self.written += len(self.rows)
+        self.rows = []
+
+
+def generate_cards(bingo_type: str, count: int, rng: np.random.Generator) -> List[List]:
+    """
+    Genera `count` cartones con el mismo formato que los generadores de BingoCard
+
+    Los de 75 y 85 bolas se generan vectorizados (5 números distintos por
+    columna, centro libre); los de 90 usan BingoCard.generate_90_ball_card
+    con un random.Random sembrado desde `rng`.
+    """
+    if bingo_type not in TOTAL_BALLS:
+        raise ValueError(f"Tipo de bingo inválido: {bingo_type}")
+    if bingo_type not in GRID_COLUMN_WIDTH:
+        card_rng = random.Random(int(rng.integers(2 ** 63)))
+        return [CARD_GENERATORS[bingo_type](card_rng) for _ in range(count)]
+
+    width = GRID_COLUMN_WIDTH[bingo_type]
+    # (cartón, columna, fila): los 5 primeros de una permutación por columna
+    picks = rng.random((count, 5, width)).argsort(axis=2)[:, :, :5]
+    picks += 1 + np.arange(5)[None, :, None] * width
+    cards = picks.transpose(0, 2, 1).tolist()
+    for card in cards:
+        card[2][2] = 'FREE'
+    return cards
+
+
+def _uuid(rng: random.Random) -> uuid.UUID:
+    return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+
+def generate_dataset(operators: int = 1, players_per_operator: int = 1000, packs_per_operator: int = 1,
+                     cards_per_pack: int = 10000, cards_per_player: int = 3, sessions_per_operator: int = 2,
+                     games_per_session: int = 3, balls_per_game: int = 50, participation: float = 0.8,
+                     bingo_type: str = '75', seed: int = 0, code_prefix: Optional[str] = None,
+                     chunk_size: int = COPY_CHUNK_SIZE, use_copy: Optional[bool] = None,
+                     log: Optional[Callable[[str], None]] = None) -> Dict:
+    """
+    Siembra un dataset de escala de producción
+
+    Por operador: jugadores, packs de `cards_per_pack` cartas (las primeras se
+    reparten a los jugadores como PlayerCard, `cards_per_player` cada uno),
+    sesiones por pack ya finalizadas (PlayerSession y SessionCard de los
+    jugadores que participan, según `participation`) y sus partidas
+    terminadas con `balls_per_game` bolas derivadas de la semilla de cada
+    partida. Cada operador se escribe en su propia transacción.
+
+    Los ids, cartones, repartos y bolas dependen solo de `seed`; las fechas se
+    calculan hacia atrás desde el momento de la corrida.
+
+    Returns:
+        dict con los códigos de operador, filas escritas por tabla y segundos
+    """
+    if bingo_type not in TOTAL_BALLS:
+        raise ValueError(f"Tipo de bingo inválido: {bingo_type}")
+    if players_per_operator * cards_per_player > packs_per_operator * cards_per_pack:
+        raise ValueError("Los packs no alcanzan para las cartas de todos los jugadores")
+    if sessions_per_operator and not packs_per_operator:
+        raise ValueError("Las sesiones necesitan al menos un pack")
+
+    started = time.perf_counter()
+    rng = random.Random(seed)
+    np_rng = np.random.default_rng(seed)
+    code_prefix = code_prefix or f'ds{seed}'
+    total_balls = TOTAL_BALLS[bingo_type]
+    balls_per_game = min(balls_per_game, total_balls)
+    now = timezone.now()
+
+    writers = {
+        name: TableWriter(model, now, chunk_size, use_copy)
+        for name, model in (
+            ('players', Player), ('cards', BingoCard), ('cards_extended', BingoCardExtended),
+            ('player_cards', PlayerCard), ('player_sessions', PlayerSession),
+            ('session_cards', SessionCard), ('games', BingoGame),
+            ('games_extended', BingoGameExtended), ('drawn_balls', DrawnBall),
+        )
+    }
+
+    WinningPattern.create_system_patterns()
+    codes = []
+    for operator_number in range(1, operators + 1):
+        with transaction.atomic():
+            operator = Operator.objects.create(
+                id=_uuid(rng), name=f'Operador {code_prefix} {operator_number}',
+                code=f'{code_prefix}-{operator_number:04d}', allowed_bingo_types=[bingo_type],
+            )
+            codes.append(operator.code)
+            _progress(log, f"[{operator.code}] {players_per_operator} jugadores")
+
+            player_ids = [_uuid(rng) for _ in range(players_per_operator)]
+            for number, player_id in enumerate(player_ids, start=1):
+                writers['players'].add(
+                    id=player_id, operator_id=operator.id, username=f'player{number:07d}',
+                    phone=f'+58414{number:07d}', email=f'player{number}@example.com',
+                )
+
+            # Packs; las primeras cartas de cada pack se reparten en orden
+            slots = players_per_operator * cards_per_player
+            slot = 0
+            packs = []
+            for pack_number in range(1, packs_per_operator + 1):
+                owned = min(cards_per_pack, slots - slot)
+                pack = CardPack.objects.create(
+                    id=_uuid(rng), operator=operator, name=f'Pack {bingo_type} {pack_number}',
+                    bingo_type=bingo_type, total_cards=cards_per_pack, cards_generated=True,
+                    allocation_cursor=owned, price_per_card=Decimal('1.00'),
+                )
+                _progress(log, f"[{operator.code}] {pack.name}: {cards_per_pack} cartas")
+                serial_prefix = f"{operator.code.upper()}-{bingo_type}-{pack.id.hex[:8].upper()}"
+                owners = []
+
+                for chunk_start in range(0, cards_per_pack, chunk_size):
+                    numbers = generate_cards(bingo_type, min(chunk_size, cards_per_pack - chunk_start), np_rng)
+                    for offset, card_numbers in enumerate(numbers):
+                        card_number = chunk_start + offset + 1
+                        card_id = _uuid(rng)
+                        writers['cards'].add(
+                            id=card_id, user_id=f'pack_{pack.id}', bingo_type=bingo_type,
+                            numbers=card_numbers,
+                        )
+                        writers['cards_extended'].add(
+                            bingocard_ptr_id=card_id, pack_id=pack.id, card_number=card_number,
+                            serial_number=f'{serial_prefix}-{card_number:04d}', is_reusable=True,
+                        )
+                        if card_number <= owned:
+                            player_id = player_ids[slot // cards_per_player]
+                            slot += 1
+                            writers['player_cards'].add(
+                                id=_uuid(rng), player_id=player_id, card_id=card_id, pack_id=pack.id,
+                                acquisition_type='purchase', purchase_price=pack.price_per_card,
+                            )
+                            owners.append((player_id, card_id))
+                packs.append((pack, owners))
+
+            # Sesiones finalizadas, una por día hacia atrás, rotando los packs
+            for session_number in range(sessions_per_operator):
+                pack, owners = packs[session_number % len(packs)]
+                session_start = now - timedelta(days=sessions_per_operator - session_number)
+                session_end = session_start + timedelta(minutes=30 * max(games_per_session, 1))
+                session = BingoSession.objects.create(
+                    id=_uuid(rng), operator=operator, name=f'Sesión {session_number + 1}',
+                    bingo_type=bingo_type, max_players=players_per_operator, card_source='pack',
+                    card_pack=pack, status='finished', scheduled_start=session_start,
+                    actual_start=session_start, actual_end=session_end,
+                )
+
+                # Los dueños de las cartas del pack están agrupados por jugador
+                index = 0
+                while index < len(owners):
+                    player_id = owners[index][0]
+                    end = index
+                    while end < len(owners) and owners[end][0] == player_id:
+                        end += 1
+                    if rng.random() < participation:
+                        writers['player_sessions'].add(
+                            id=_uuid(rng), session_id=session.id, player_id=player_id,
+                            cards_count=end - index, is_active=False, joined_at=session_start,
+                        )
+                        for _, card_id in owners[index:end]:
+                            writers['session_cards'].add(
+                                id=_uuid(rng), session_id=session.id, card_id=card_id, player_id=player_id,
+                                status='finished', joined_at=session_start, finished_at=session_end,
+                            )
+                    index = end
+
+                for game_number in range(games_per_session):
+                    game_id = _uuid(rng)
+                    game_start = session_start + timedelta(minutes=30 * game_number)
+                    server_seed = '%064x' % rng.getrandbits(256)
+                    writers['games'].add(
+                        id=game_id, game_type=bingo_type, name=f'Partida {game_number + 1}',
+                        created_at=game_start, is_active=False, server_seed=server_seed,
+                        seed_hash=seed_commitment(server_seed),
+                        seed_revealed_at=game_start + timedelta(minutes=30),
+                    )
+                    writers['games_extended'].add(
+                        bingogame_ptr_id=game_id, session_id=session.id, operator_id=operator.id,
+                    )
+                    sequence = derive_sequence(server_seed, game_id, total_balls, balls_per_game)
+                    for position, number in enumerate(sequence, start=1):
+                        writers['drawn_balls'].add(
+                            id=_uuid(rng), game_id=game_id, number=number, sequence=position,
+                            drawn_at=game_start + timedelta(seconds=5 * position),
+                        )
+
+            for writer in writers.values():
+                writer.flush()
+
+    return {
+        'operators': codes,
+        'rows': {name: writer.written for name, writer in writers.items()},
+        'seconds': round(time.perf_counter() - started, 3),
+    }
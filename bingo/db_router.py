@@ -0,0 +1,212 @@
+"""
+Lecturas en una réplica de la base de datos
+
+Las lecturas pesadas (estadísticas, listados de cartones, catálogo de patrones,
+changelists del admin) compiten con las escrituras de los sorteos. Con
+DATABASE_REPLICA_URL se define el alias READ_REPLICA_ALIAS y las vistas
+marcadas con @read_replica (o el admin con ReadReplicaAdminMixin) leen de él:
+
+    @api_view(['GET'])
+    @read_replica
+    def operator_statistics(request, operator_id):
+        ...
+
+Fuera de esas vistas todo sigue en `default`; las escrituras van siempre a
+`default`. Se lee del primario aunque la vista esté marcada cuando:
+
+- el cliente escribió hace menos de READ_REPLICA_STICKY_SECONDS: tras una
+  petición POST/PUT/PATCH/DELETE, ReadReplicaMiddleware envía la cookie
+  READ_REPLICA_STICKY_COOKIE (los clientes sin cookies pueden mandar la
+  cabecera `X-Read-Primary: 1`)
+- la propia petición ya escribió o hay una transacción abierta en `default`
+- la réplica va más de READ_REPLICA_MAX_LAG_SECONDS por detrás o no responde
+  (el retraso se consulta como mucho cada READ_REPLICA_LAG_CHECK_SECONDS)
+
+Sin réplica configurada el decorador y el middleware no hacen nada.
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Optional
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STICKY_COOKIE = 'bingo_read_primary'
+DEFAULT_STICKY_SECONDS = 5
+DEFAULT_MAX_LAG_SECONDS = 2.0
+DEFAULT_LAG_CHECK_SECONDS = 1.0
+UNSAFE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+# Segundos de retraso de la réplica; 0 si está al día o si es un primario
+POSTGRESQL_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+class _ReadState:
+    """Decisión de lectura de la petición en curso"""
+
+    def __init__(self, alias: Optional[str]):
+        self.alias = alias
+        self.wrote = False
+
+
+_current: ContextVar[Optional[_ReadState]] = ContextVar('bingo_read_replica', default=None)
+
+_lag_cache = {}
+_lag_lock = threading.Lock()
+
+
+def replica_alias() -> Optional[str]:
+    return getattr(settings, 'READ_REPLICA_ALIAS', None)
+
+
+def replica_lag(alias: str) -> float:
+    """Retraso de la réplica en segundos (infinito si no responde), cacheado por proceso"""
+    now = time.monotonic()
+    cached = _lag_cache.get(alias)
+    if cached is not None and cached[0] > now:
+        return cached[1]
+
+    with _lag_lock:
+        cached = _lag_cache.get(alias)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+        lag = 0.0
+        try:
+            connection = connections[alias]
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute(POSTGRESQL_LAG_SQL)
+                    lag = float(cursor.fetchone()[0])
+        except Exception:
+            logger.warning('Réplica %s no disponible: se lee del primario', alias, exc_info=True)
+            lag = float('inf')
+        interval = getattr(settings, 'READ_REPLICA_LAG_CHECK_SECONDS', DEFAULT_LAG_CHECK_SECONDS)
+        _lag_cache[alias] = (now + interval, lag)
+        return lag
+
+
+def wants_primary(request) -> bool:
+    """El cliente escribió hace poco (cookie) o pide leer del primario (cabecera)"""
+    if request is None:
+        return False
+    cookie = getattr(settings, 'READ_REPLICA_STICKY_COOKIE', DEFAULT_STICKY_COOKIE)
+    return cookie in request.COOKIES or request.META.get('HTTP_X_READ_PRIMARY') == '1'
+
+
+def choose_read_alias(request=None) -> Optional[str]:
+    """Alias de lectura para una vista marcada; None = el de siempre (primario)"""
+    alias = replica_alias()
+    if alias is None or wants_primary(request):
+        return None
+    max_lag = getattr(settings, 'READ_REPLICA_MAX_LAG_SECONDS', DEFAULT_MAX_LAG_SECONDS)
+    if replica_lag(alias) > max_lag:
+        return None
+    return alias
+
+
+@contextmanager
+def use_read_replica(request=None):
+    """Dentro del bloque las lecturas van a la réplica si procede"""
+    token = _current.set(_ReadState(choose_read_alias(request)))
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def read_replica(view):
+    """Marca una vista de solo lectura: sus consultas pueden ir a la réplica"""
+
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        with use_read_replica(request):
+            return view(request, *args, **kwargs)
+
+    return wrapped
+
+
+class ReadReplicaRouter:
+    """Router de DATABASE_ROUTERS: réplica solo dentro de use_read_replica"""
+
+    def db_for_read(self, model, **hints):
+        state = _current.get()
+        if state is None or state.alias is None or state.wrote:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return state.alias
+
+    def db_for_write(self, model, **hints):
+        state = _current.get()
+        if state is not None:
+            # Lo que se lea después en esta petición debe ver la escritura
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, replica_alias()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # La réplica recibe el esquema por replicación
+        if db == replica_alias():
+            return False
+        return None
+
+
+class ReadReplicaMiddleware:
+    """
+    Tras una escritura, envía la cookie que fija las lecturas en el primario
+
+    Settings:
+        READ_REPLICA_ALIAS: alias de la réplica en DATABASES (None = sin réplica)
+        READ_REPLICA_STICKY_COOKIE: nombre de la cookie
+        READ_REPLICA_STICKY_SECONDS: duración de la cookie
+        READ_REPLICA_MAX_LAG_SECONDS: retraso máximo tolerado
+        READ_REPLICA_LAG_CHECK_SECONDS: cada cuánto se mide el retraso
+    """
+
+    def __init__(self, get_response):
+        if replica_alias() is None:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method in UNSAFE_METHODS and response.status_code < 400:
+            response.set_cookie(
+                getattr(settings, 'READ_REPLICA_STICKY_COOKIE', DEFAULT_STICKY_COOKIE), '1',
+                max_age=getattr(settings, 'READ_REPLICA_STICKY_SECONDS', DEFAULT_STICKY_SECONDS),
+                httponly=True, samesite='Lax',
+            )
+        return response
+
+
+class ReadReplicaAdminMixin:
+    """ModelAdmin cuyas changelists (GET) leen de la réplica"""
+
+    def changelist_view(self, request, extra_context=None):
+        if request.method != 'GET':
+            return super().changelist_view(request, extra_context)
+        with use_read_replica(request):
+            response = super().changelist_view(request, extra_context)
+            # La plantilla evalúa el queryset al renderizar: hacerlo aquí dentro
+            if hasattr(response, 'render'):
+                response.render()
+            return response
@@ -0,0 +1,440 @@
+"""
+Motor en vivo de partidas
+
+Mantiene en memoria, por partida, cuántas celdas le faltan a cada cartón para
+completar cada patrón. Los pares (cartón, patrón) se agrupan en cubetas
+indexadas por celdas restantes, de modo que "a 1 bola" o "a 2 bolas" y el
+top-K de cartones más cercanos salen sin recorrer todos los cartones.
+
+Cada bola solo toca los cartones que contienen ese número. El motor se
+sincroniza con las bolas guardadas en la base de datos cada vez que se
+consulta, así que varios procesos pueden extraer bolas sin desincronizarlo.
+
+Cuando la partida tiene su secuencia de bolas comprometida desde el inicio,
+CompletionIndex precalcula con NumPy la bola en que cada cartón completa cada
+patrón, y los ganadores a la bola k salen de una búsqueda binaria.
+"""
+
+import threading
+from collections import OrderedDict, defaultdict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .pattern_compiler import card_bitmaps
+
+
+# Cantidad máxima de partidas con motor en memoria por proceso
+MAX_ENGINES = 64
+
+# Restante de una alternativa sin números reales (nunca se completa)
+UNREACHABLE = None
+
+
+class GameEngine:
+    """Estado en vivo de una partida: celdas restantes por cartón y patrón"""
+
+    def __init__(self, game_id, patterns: list, candidates: List[Dict], signature=None):
+        self.game_id = game_id
+        self.signature = signature
+        self.lock = threading.Lock()
+        self.patterns = [
+            {'code': pattern.code, 'name': pattern.name, 'compiled': pattern.compiled}
+            for pattern in patterns
+        ]
+        self.cards: List[Dict] = []
+        self.drawn: List[int] = []
+
+        # remaining[card][pattern] -> lista de celdas restantes por alternativa
+        self.remaining: List[List[List[Optional[int]]]] = []
+        # best[card][pattern] -> mínimo sobre las alternativas (None = inalcanzable)
+        self.best: List[List[Optional[int]]] = []
+        # buckets[pattern][restantes] -> conjunto de índices de cartón
+        self.buckets: List[List[set]] = [[] for _ in self.patterns]
+        # número -> [(índice de cartón, bit de la celda)]
+        self.cells_by_number: Dict[int, List] = defaultdict(list)
+        # (forma, patrón) -> bit -> índices de alternativas que contienen la celda
+        self._mask_index: Dict = {}
+        self._card_shapes: List = []
+
+        for candidate in candidates:
+            if candidate['numbers']:
+                self._add_card(candidate)
+
+    def _masks_by_bit(self, shape, pattern_index: int) -> Dict[int, List[int]]:
+        key = (shape, pattern_index)
+        index = self._mask_index.get(key)
+        if index is None:
+            index = defaultdict(list)
+            masks = self.patterns[pattern_index]['compiled'].masks_for(*shape)
+            for mask_index, mask in enumerate(masks):
+                bits = mask
+                while bits:
+                    bit = bits & -bits
+                    index[bit].append(mask_index)
+                    bits ^= bit
+            self._mask_index[key] = index
+        return index
+
+    def _add_card(self, candidate: Dict):
+        card_index = len(self.cards)
+        player = candidate['player']
+        self.cards.append({
+            'card_id': str(candidate['card_id']),
+            'card_number': candidate['card_number'],
+            'player_id': str(player.id) if player else None,
+            'username': player.username if player else None,
+        })
+
+        numbers = candidate['numbers']
+        _, numbered_bits, shape = card_bitmaps(numbers, ())
+        self._card_shapes.append(shape)
+        cols = shape[1]
+        for row_index, row in enumerate(numbers):
+            for col_index, value in enumerate(row):
+                bit = 1 << (row_index * cols + col_index)
+                if numbered_bits & bit:
+                    self.cells_by_number[value].append((card_index, bit))
+
+        card_remaining = []
+        card_best = []
+        for pattern_index, pattern in enumerate(self.patterns):
+            per_mask = [
+                (mask & numbered_bits).bit_count() if mask & numbered_bits else UNREACHABLE
+                for mask in pattern['compiled'].masks_for(*shape)
+            ]
+            best = self._min_remaining(per_mask)
+            card_remaining.append(per_mask)
+            card_best.append(best)
+            if best is not None:
+                self._bucket(pattern_index, best).add(card_index)
+        self.remaining.append(card_remaining)
+        self.best.append(card_best)
+
+    @staticmethod
+    def _min_remaining(per_mask: List[Optional[int]]) -> Optional[int]:
+        reachable = [value for value in per_mask if value is not None]
+        return min(reachable) if reachable else None
+
+    def _bucket(self, pattern_index: int, remaining: int) -> set:
+        buckets = self.buckets[pattern_index]
+        while len(buckets) <= remaining:
+            buckets.append(set())
+        return buckets[remaining]
+
+    def apply_ball(self, number: int):
+        """Aplica una bola: O(cartones que contienen el número)"""
+        self.drawn.append(number)
+        for card_index, bit in self.cells_by_number.get(number, ()):
+            shape = self._card_shapes[card_index]
+            for pattern_index in range(len(self.patterns)):
+                mask_indexes = self._masks_by_bit(shape, pattern_index).get(bit)
+                if not mask_indexes:
+                    continue
+                per_mask = self.remaining[card_index][pattern_index]
+                for mask_index in mask_indexes:
+                    per_mask[mask_index] -= 1
+                previous = self.best[card_index][pattern_index]
+                best = self._min_remaining(per_mask)
+                if best != previous:
+                    self.buckets[pattern_index][previous].discard(card_index)
+                    self._bucket(pattern_index, best).add(card_index)
+                    self.best[card_index][pattern_index] = best
+
+    def completed_cards(self, pattern_index: int) -> set:
+        """Índices de los cartones que ya completaron el patrón"""
+        buckets = self.buckets[pattern_index]
+        return buckets[0] if buckets else set()
+
+    def sync(self, drawn_sequence: List[int]) -> bool:
+        """
+        Aplica las bolas nuevas de la secuencia guardada
+
+        Returns:
+            False si la secuencia no continúa la ya aplicada (hay que reconstruir)
+        """
+        applied = len(self.drawn)
+        if drawn_sequence[:applied] != self.drawn:
+            return False
+        for number in drawn_sequence[applied:]:
+            self.apply_ball(number)
+        return True
+
+    def bucket_counts(self) -> List[Dict]:
+        """Cantidad de cartones por celdas restantes, por patrón"""
+        with self.lock:
+            return [
+                {
+                    'pattern_code': pattern['code'],
+                    'pattern_name': pattern['name'],
+                    'buckets': {
+                        remaining: len(cards)
+                        for remaining, cards in enumerate(self.buckets[pattern_index])
+                        if cards
+                    },
+                }
+                for pattern_index, pattern in enumerate(self.patterns)
+            ]
+
+    def closest(self, k: int = 10, pattern_code: str = None, player_id: str = None) -> List[Dict]:
+        """
+        Top-K pares (cartón, patrón) más cercanos a ganar, recorriendo cubetas en orden
+
+        Bajo el lock del motor: record_ball puede estar moviendo cartones entre
+        cubetas desde otro hilo.
+        """
+        pattern_indexes = [
+            index for index, pattern in enumerate(self.patterns)
+            if pattern_code is None or pattern['code'] == pattern_code
+        ]
+
+        results = []
+        with self.lock:
+            max_remaining = max((len(self.buckets[index]) for index in pattern_indexes), default=0)
+            for remaining in range(max_remaining):
+                for pattern_index in pattern_indexes:
+                    buckets = self.buckets[pattern_index]
+                    if remaining >= len(buckets):
+                        continue
+                    for card_index in sorted(buckets[remaining]):
+                        card = self.cards[card_index]
+                        if player_id is not None and card['player_id'] != player_id:
+                            continue
+                        results.append(dict(
+                            card,
+                            pattern_code=self.patterns[pattern_index]['code'],
+                            remaining=remaining,
+                        ))
+                        if len(results) >= k:
+                            return results
+        return results
+
+
+_engines: "OrderedDict[str, GameEngine]" = OrderedDict()
+_registry_lock = threading.Lock()
+
+
+def _game_signature(game, patterns: list) -> tuple:
+    """
+    Identifica el conjunto de cartones y patrones con los que se construyó el motor
+
+    Además de contar los cartones guarda la última incorporación (joined_at de
+    SessionCard, purchased_at de los vendidos): si un cartón sale y otro entra,
+    el conteo no cambia pero ese máximo sí. Los patrones entran con su
+    updated_at, así que editar su pattern_data también reconstruye.
+    """
+    from django.db.models import Count, Max
+
+    from .models import SessionCard, BingoCardExtended
+
+    pattern_versions = tuple((pattern.code, pattern.updated_at) for pattern in patterns)
+    if not game.session_id:
+        return (pattern_versions, (0, None), (0, None))
+    session_cards = SessionCard.objects.filter(session_id=game.session_id, status='active').aggregate(
+        total=Count('id'), last=Max('joined_at')
+    )
+    legacy_cards = BingoCardExtended.objects.filter(session_id=game.session_id, status='sold').aggregate(
+        total=Count('pk'), last=Max('purchased_at')
+    )
+    return (
+        pattern_versions,
+        (session_cards['total'], session_cards['last']),
+        (legacy_cards['total'], legacy_cards['last']),
+    )
+
+
+def get_game_engine(game) -> GameEngine:
+    """
+    Retorna el motor de la partida, sincronizado con las bolas extraídas
+
+    Se reconstruye si cambian los cartones o los patrones en juego, o si la
+    secuencia de bolas guardada no continúa la que ya tenía aplicada.
+    """
+    from .models import DrawnBall
+
+    patterns = game.get_winning_patterns()
+    signature = _game_signature(game, patterns)
+    key = str(game.id)
+
+    with _registry_lock:
+        engine = _engines.get(key)
+        if engine is not None:
+            _engines.move_to_end(key)
+
+    drawn_sequence = DrawnBall.get_drawn_sequence(game.id)
+
+    if engine is not None and engine.signature == signature:
+        with engine.lock:
+            if engine.sync(drawn_sequence):
+                return engine
+
+    engine = GameEngine(game.id, patterns, game._stage_candidates(), signature=signature)
+    with engine.lock:
+        engine.sync(drawn_sequence)
+
+    with _registry_lock:
+        _engines[key] = engine
+        _engines.move_to_end(key)
+        while len(_engines) > MAX_ENGINES:
+            _engines.popitem(last=False)
+    return engine
+
+
+def record_ball(game_id, number: int, total_drawn: int):
+    """Aplica una bola recién extraída si el motor de la partida ya está en memoria"""
+    with _registry_lock:
+        engine = _engines.get(str(game_id))
+    if engine is None:
+        return
+    with engine.lock:
+        # Solo si es exactamente la bola siguiente; si no, se sincroniza al consultar
+        if len(engine.drawn) == total_drawn - 1:
+            engine.apply_ball(number)
+
+
+def numbers_matrix(cards: List[List[List]], cells: int) -> np.ndarray:
+    """Aplana cartones de la misma forma en una matriz (cartones x celdas), 0 en celdas vacías"""
+    numbers = np.zeros((len(cards), cells), dtype=np.int64)
+    for position, card in enumerate(cards):
+        numbers[position] = [
+            value if isinstance(value, int) and not isinstance(value, bool) and value > 0 else 0
+            for row in card
+            for value in row
+        ]
+    return numbers
+
+
+def completion_balls(cell_ranks: np.ndarray, numbered: np.ndarray, masks, never: int) -> np.ndarray:
+    """
+    Bola en que se completa un patrón, vectorizado sobre las dimensiones iniciales
+
+    Args:
+        cell_ranks: (..., celdas) rango en la secuencia del número de cada celda (0 = vacía)
+        numbered: (..., celdas) True en celdas con número
+        masks: máscaras compiladas del patrón para esta forma
+        never: valor para "no se completa nunca"
+    """
+    best = np.full(cell_ranks.shape[:-1], never, dtype=np.int32)
+    for mask in masks:
+        columns = [bit for bit in range(mask.bit_length()) if mask >> bit & 1]
+        mask_completion = cell_ranks[..., columns].max(axis=-1)
+        mask_completion[~numbered[..., columns].any(axis=-1)] = never
+        np.minimum(best, mask_completion, out=best)
+    return best
+
+
+class CompletionIndex:
+    """
+    Tabla de índices de completitud para partidas con secuencia comprometida
+
+    Para cada cartón y patrón guarda la bola (1..N) en que se completa: cada
+    celda toma el rango de su número en la secuencia, cada alternativa el
+    máximo de sus celdas y el patrón el mínimo de sus alternativas. Los
+    valores quedan ordenados, así que los ganadores a la bola k salen de una
+    búsqueda binaria.
+    """
+
+    def __init__(self, game_id, patterns: list, candidates: List[Dict], draw_sequence: List[int], signature=None):
+        self.game_id = game_id
+        self.signature = signature
+        self.draw_sequence = list(draw_sequence)
+        self.never = len(self.draw_sequence) + 1
+
+        # Rango de cada número en la secuencia; 0 = celda vacía (siempre marcada)
+        max_number = max(self.draw_sequence, default=0)
+        rank = np.full(max_number + 2, self.never, dtype=np.int32)
+        rank[0] = 0
+        rank[np.asarray(self.draw_sequence, dtype=np.int64)] = np.arange(1, len(self.draw_sequence) + 1, dtype=np.int32)
+
+        self.sources = []
+        self.pks = []
+        card_numbers = []
+        shapes = defaultdict(list)
+        for candidate in candidates:
+            if not candidate['numbers']:
+                continue
+            _, _, shape = card_bitmaps(candidate['numbers'], ())
+            shapes[shape].append(len(self.pks))
+            self.sources.append(candidate['source'])
+            self.pks.append(candidate['instance'].pk)
+            card_numbers.append(candidate['numbers'])
+
+        # Matriz de números por forma de cartón (0 en celdas vacías)
+        shape_ranks = {}
+        for (rows, cols), card_indexes in shapes.items():
+            numbers = numbers_matrix([card_numbers[index] for index in card_indexes], rows * cols)
+            numbers = np.minimum(numbers, max_number + 1)
+            shape_ranks[(rows, cols)] = (np.asarray(card_indexes), rank[numbers], numbers > 0)
+
+        self.patterns = {}
+        total = len(self.pks)
+        for pattern in patterns:
+            completion = np.full(total, self.never, dtype=np.int32)
+            for (rows, cols), (card_indexes, cell_ranks, numbered) in shape_ranks.items():
+                completion[card_indexes] = completion_balls(
+                    cell_ranks, numbered, pattern.compiled.masks_for(rows, cols), self.never
+                )
+
+            order = np.argsort(completion, kind='stable')
+            self.patterns[pattern.code] = (completion[order], order)
+
+    def winners_at(self, ball_index: int, pattern_code: str) -> Dict[str, list]:
+        """Cartones que completan el patrón con ball_index bolas o menos, agrupados por origen"""
+        result = {'session_card': [], 'legacy': []}
+        entry = self.patterns.get(pattern_code)
+        if entry is None:
+            return result
+        completion, order = entry
+        end = int(np.searchsorted(completion, ball_index, side='right'))
+        for card_index in order[:end]:
+            result[self.sources[card_index]].append(self.pks[card_index])
+        return result
+
+    def first_completion(self, pattern_code: str) -> Optional[int]:
+        """Bola en que se completa el patrón por primera vez (None si nunca)"""
+        entry = self.patterns.get(pattern_code)
+        if entry is None or not len(entry[0]) or entry[0][0] >= self.never:
+            return None
+        return int(entry[0][0])
+
+    def count_completed(self, pattern_code: str, ball_index: int) -> int:
+        """Cantidad de cartones que ya completaron el patrón a la bola ball_index"""
+        entry = self.patterns.get(pattern_code)
+        if entry is None:
+            return 0
+        return int(np.searchsorted(entry[0], ball_index, side='right'))
+
+
+_completion_indexes: "OrderedDict[str, CompletionIndex]" = OrderedDict()
+
+
+def get_completion_index(game, drawn_sequence: List[int] = None) -> Optional[CompletionIndex]:
+    """
+    Tabla de completitud de la partida, o None si no tiene secuencia comprometida
+
+    Si se pasa drawn_sequence y no es un prefijo de la secuencia comprometida,
+    también retorna None (los llamadores vuelven a la evaluación bola a bola).
+    """
+    sequence = game.get_draw_sequence()
+    if not sequence:
+        return None
+    if drawn_sequence is not None and list(drawn_sequence) != sequence[:len(drawn_sequence)]:
+        return None
+
+    patterns = game.get_winning_patterns()
+    signature = _game_signature(game, patterns) + (hash(tuple(sequence)),)
+    key = str(game.id)
+
+    with _registry_lock:
+        index = _completion_indexes.get(key)
+        if index is not None and index.signature == signature:
+            _completion_indexes.move_to_end(key)
+            return index
+
+    index = CompletionIndex(game.id, patterns, game._stage_candidates(), sequence, signature=signature)
+    with _registry_lock:
+        _completion_indexes[key] = index
+        _completion_indexes.move_to_end(key)
+        while len(_completion_indexes) > MAX_ENGINES:
+            _completion_indexes.popitem(last=False)
+    return index
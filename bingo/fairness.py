@@ -0,0 +1,98 @@
+"""
+Extracción demostrablemente justa (provably fair)
+
+Cada partida genera al crearse una semilla secreta (`server_seed`, 32 bytes
+en hexadecimal) y publica solo su compromiso:
+
+    seed_hash = SHA-256(bytes de server_seed)
+
+El orden de las bolas se deriva de la semilla; no se guarda ni se elige bola a
+bola. Al terminar la partida se revela la semilla y cualquiera puede
+recalcular la secuencia y compararla con las bolas extraídas.
+
+Derivación (Fisher-Yates hacia adelante con un flujo HMAC-SHA256):
+
+    bloque_c = HMAC-SHA256(clave=server_seed, mensaje="<game_id>:<c>")   c = 0, 1, 2...
+    enteros  = cada bloque partido en 8 enteros de 32 bits big-endian
+    j        = i + uniforme(n - i)   (muestreo por rechazo, sin sesgo de módulo)
+    bolas[i], bolas[j] = bolas[j], bolas[i]   → la bola i+1 es bolas[i]
+
+Como la posición i queda fija en el paso i, la bola k se obtiene en O(k) sin
+consultar la base de datos.
+"""
+
+import hashlib
+import hmac
+import secrets
+from itertools import islice
+from typing import Iterator, List, Optional
+
+
+SEED_BYTES = 32
+
+
+def generate_server_seed() -> str:
+    return secrets.token_hex(SEED_BYTES)
+
+
+def seed_commitment(server_seed: str) -> str:
+    """Compromiso público de la semilla: SHA-256 hexadecimal de sus bytes"""
+    return hashlib.sha256(bytes.fromhex(server_seed)).hexdigest()
+
+
+def _uint32_stream(server_seed: str, game_id) -> Iterator[int]:
+    key = bytes.fromhex(server_seed)
+    counter = 0
+    while True:
+        block = hmac.new(key, f"{game_id}:{counter}".encode(), hashlib.sha256).digest()
+        for offset in range(0, len(block), 4):
+            yield int.from_bytes(block[offset:offset + 4], 'big')
+        counter += 1
+
+
+def _uniform(stream: Iterator[int], n: int) -> int:
+    """Entero uniforme en [0, n) por rechazo"""
+    limit = 2 ** 32 - (2 ** 32 % n)
+    while True:
+        value = next(stream)
+        if value < limit:
+            return value % n
+
+
+def iter_sequence(server_seed: str, game_id, total_balls: int) -> Iterator[int]:
+    """Genera las bolas en orden de extracción"""
+    stream = _uint32_stream(server_seed, game_id)
+    balls = list(range(1, total_balls + 1))
+    for i in range(total_balls):
+        j = i + _uniform(stream, total_balls - i)
+        balls[i], balls[j] = balls[j], balls[i]
+        yield balls[i]
+
+
+def derive_sequence(server_seed: str, game_id, total_balls: int, count: Optional[int] = None) -> List[int]:
+    """Las primeras `count` bolas (todas si es None)"""
+    return list(islice(iter_sequence(server_seed, game_id, total_balls), count))
+
+
+def verify_sequence(server_seed: str, seed_hash: str, game_id, total_balls: int, drawn: List[int]) -> dict:
+    """
+    Comprueba la semilla contra su compromiso y las bolas extraídas contra la secuencia derivada
+
+    Returns:
+        dict con verified, seed_matches_commitment, balls_checked y first_mismatch
+    """
+    seed_matches = hmac.compare_digest(seed_commitment(server_seed), seed_hash)
+    expected = derive_sequence(server_seed, game_id, total_balls, len(drawn))
+
+    first_mismatch = None
+    for index, (expected_ball, drawn_ball) in enumerate(zip(expected, drawn)):
+        if expected_ball != drawn_ball:
+            first_mismatch = {'sequence': index + 1, 'expected': expected_ball, 'drawn': drawn_ball}
+            break
+
+    return {
+        'verified': seed_matches and first_mismatch is None,
+        'seed_matches_commitment': seed_matches,
+        'balls_checked': len(drawn),
+        'first_mismatch': first_mismatch,
+    }
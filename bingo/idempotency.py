@@ -0,0 +1,189 @@
+"""
+Claves de idempotencia para endpoints que modifican estado
+
+Los clientes móviles reintentan cuando vence el timeout; sin protección un
+reintento de draw-ball extrae otra bola y uno de acquire-cards compra dos
+veces. Con la cabecera `Idempotency-Key` la primera respuesta se guarda en
+IdempotencyRecord y los reintentos con la misma clave la reciben tal cual, sin
+volver a ejecutar la vista.
+
+- El alcance de la clave es cliente (operador autenticado) + método + ruta.
+  Las peticiones anónimas ignoran la cabecera: no hay cliente que las separe
+  (la IP la comparten los clientes detrás de un NAT o proxy) y dos de ellas
+  con la misma clave recibirían la respuesta de la otra.
+- Reusar la clave con otro cuerpo de petición responde 422.
+- Un reintento mientras la primera petición sigue en curso responde 409.
+  Si la reserva lleva más de IDEMPOTENCY_IN_PROGRESS_LEASE (60 s por defecto)
+  sin completarse, el proceso que la tenía se da por caído y el reintento la
+  toma y ejecuta la vista.
+- La vista y el guardado de su respuesta van en la misma transacción: o quedan
+  los dos o ninguno. Si otra petición tomó la reserva entretanto, los cambios
+  de esta se deshacen y responde 409.
+- Las respuestas 5xx y las excepciones no se guardan: el reintento se ejecuta.
+- Los registros vencen a los IDEMPOTENCY_KEY_TTL (settings, 24 h por defecto);
+  `python manage.py purge_idempotency_keys` borra los vencidos.
+
+Uso (debajo de @api_view, para que la petición ya esté autenticada):
+
+    @api_view(['POST'])
+    @idempotent
+    def draw_ball(request):
+        ...
+"""
+
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+
+HEADER = 'HTTP_IDEMPOTENCY_KEY'
+REPLAY_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+DEFAULT_TTL = timedelta(hours=24)
+DEFAULT_IN_PROGRESS_LEASE = timedelta(seconds=60)
+
+
+def get_ttl() -> timedelta:
+    return getattr(settings, 'IDEMPOTENCY_KEY_TTL', DEFAULT_TTL)
+
+
+def get_in_progress_lease() -> timedelta:
+    return getattr(settings, 'IDEMPOTENCY_IN_PROGRESS_LEASE', DEFAULT_IN_PROGRESS_LEASE)
+
+
+def _sha256(value: str) -> str:
+    return hashlib.sha256(value.encode()).hexdigest()
+
+
+def _scope_hash(request, key: str) -> str:
+    return _sha256(f"{request.user.pk}|{request.method}|{request.path}|{key}")
+
+
+def _request_hash(request) -> str:
+    data = request.data
+    if hasattr(data, 'lists'):
+        data = dict(data.lists())
+    payload = {'data': data, 'query': dict(request.query_params.lists())}
+    return _sha256(json.dumps(payload, sort_keys=True, cls=JSONEncoder))
+
+
+def _claim(scope_hash: str, request_hash: str):
+    """
+    Reserva la clave para esta petición
+
+    Una reserva en curso más antigua que el lease se toma con un UPDATE
+    condicional (solo un reintento lo consigue); su created_at pasa a ser el
+    de esta petición y sirve de testigo de propiedad (ver _complete).
+
+    Returns:
+        (registro, creado): creado=False si la clave ya existía y sigue vigente
+    """
+    from .models import IdempotencyRecord
+
+    for _ in range(2):
+        try:
+            with transaction.atomic():
+                record = IdempotencyRecord.objects.create(
+                    scope_hash=scope_hash,
+                    request_hash=request_hash,
+                    expires_at=timezone.now() + get_ttl()
+                )
+            return record, True
+        except IntegrityError:
+            record = IdempotencyRecord.objects.filter(scope_hash=scope_hash).first()
+            if record is None:
+                continue
+            now = timezone.now()
+            if record.expires_at <= now:
+                IdempotencyRecord.objects.filter(pk=record.pk).delete()
+                record = None
+                continue
+            if (record.status == 'in_progress' and record.request_hash == request_hash
+                    and record.created_at <= now - get_in_progress_lease()):
+                taken = IdempotencyRecord.objects.filter(
+                    pk=record.pk, status='in_progress', created_at=record.created_at
+                ).update(created_at=now, expires_at=now + get_ttl())
+                if taken:
+                    record.created_at = now
+                    record.expires_at = now + get_ttl()
+                    return record, True
+            return record, False
+
+    return record, False
+
+
+def _owned(record):
+    """El registro sigue reservado por esta petición"""
+    from .models import IdempotencyRecord
+
+    return IdempotencyRecord.objects.filter(pk=record.pk, status='in_progress', created_at=record.created_at)
+
+
+def _replay(record, request_hash: str) -> Response:
+    if record is not None and record.request_hash != request_hash:
+        return Response({
+            'error': 'Idempotency-Key ya usada con una petición distinta'
+        }, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    if record is None or record.status != 'completed':
+        return Response({
+            'error': 'Hay una petición en curso con esta Idempotency-Key'
+        }, status=status.HTTP_409_CONFLICT, headers={'Retry-After': '1'})
+
+    return Response(record.response_body, status=record.response_status, headers={REPLAY_HEADER: 'true'})
+
+
+def idempotent(view_func):
+    """Decorador para vistas de función DRF: honra la cabecera Idempotency-Key"""
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        key = request.META.get(HEADER)
+        if not key or not getattr(request.user, 'is_authenticated', False):
+            return view_func(request, *args, **kwargs)
+
+        if len(key) > MAX_KEY_LENGTH:
+            return Response({
+                'error': f'Idempotency-Key no puede superar {MAX_KEY_LENGTH} caracteres'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        request_hash = _request_hash(request)
+        record, created = _claim(_scope_hash(request, key), request_hash)
+        if not created:
+            return _replay(record, request_hash)
+
+        try:
+            with transaction.atomic():
+                response = view_func(request, *args, **kwargs)
+                stored = response.status_code < 500 and hasattr(response, 'data')
+                if stored:
+                    # Se guarda el JSON tal como lo renderiza DRF (UUID, Decimal, fechas)
+                    stored = _owned(record).update(
+                        status='completed',
+                        response_status=response.status_code,
+                        response_body=json.loads(json.dumps(response.data, cls=JSONEncoder))
+                    )
+                    if not stored:
+                        # Otra petición tomó la reserva vencida: ella ejecuta la vista
+                        transaction.set_rollback(True)
+                        return _replay(None, request_hash)
+        except Exception:
+            _owned(record).delete()
+            raise
+
+        if not stored:
+            _owned(record).delete()
+            return response
+
+        response[REPLAY_HEADER] = 'false'
+        return response
+
+    return wrapper
@@ -7,6 +7,7 @@ from rest_framework import exceptions
 import jwt
 from django.conf import settings
 
+from .metrics import observe_auth
 from .models import Operator, APIKey
 
 
@@ -19,6 +20,13 @@ class CustomJWTAuthentication(BaseAuthentication):
         """
         Autentica el request usando el token JWT del header Authorization
         """
+        with observe_auth('jwt') as outcome:
+            result = self._authenticate(request)
+            if result is not None:
+                outcome['result'] = 'success'
+            return result
+    
+    def _authenticate(self, request):
         auth_header = request.META.get('HTTP_AUTHORIZATION', '')
         
         if not auth_header.startswith('Bearer '):
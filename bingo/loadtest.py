@@ -0,0 +1,562 @@
+"""
+Generador de carga local: tráfico de una noche de juego
+
+Reproduce contra un servidor local la mezcla de tráfico de una noche de
+juego: refresco de tokens JWT, jugadores que se unen a la sesión con sus
+cartas, ticks de extracción automática, marcado de números y consulta
+periódica de las bolas extraídas. Mide por endpoint la latencia
+(p50/p95/p99) y el throughput, y escribe un reporte JSON.
+
+El escenario es un archivo JSON (ver benchmarks/scenarios/game_night.json):
+
+    {
+        "name": "game_night",
+        "dataset": {"players": 1000, "pack_cards": 5000, "cards_per_player": 3},
+        "phases": [
+            {
+                "name": "pico",
+                "duration_seconds": 120,
+                "concurrency": 50,
+                "think_time_ms": [200, 1500],
+                "mix": {"poll_drawn_balls": 60, "mark_number": 30, "join_session": 8, "token_refresh": 2},
+                "ticks": [{"action": "draw_ball", "interval_seconds": 4}]
+            }
+        ]
+    }
+
+`mix` reparte las acciones de los usuarios concurrentes por peso; `ticks`
+son acciones periódicas independientes de la concurrencia (la extracción
+automática). Los datos de la prueba se siembran con bingo.dataset en la misma
+base de datos que usa el servidor y cleanup_target los borra al terminar: la
+API key de la prueba (con permisos de admin) no queda activa.
+
+Uso: python manage.py loadtest game_night --base-url http://127.0.0.1:8000
+"""
+
+import http.client
+import json
+import math
+import random
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+
+class LoadTestError(Exception):
+    """Escenario inválido o preparación fallida"""
+
+
+# === Escenarios ===
+
+def load_scenario(path: str) -> Dict:
+    """Lee y valida un escenario JSON"""
+    try:
+        with open(path, encoding='utf-8') as handle:
+            scenario = json.load(handle)
+    except (OSError, ValueError) as error:
+        raise LoadTestError(f"No se pudo leer el escenario {path}: {error}")
+
+    phases = scenario.get('phases')
+    if not isinstance(phases, list) or not phases:
+        raise LoadTestError("El escenario necesita al menos una fase en 'phases'")
+
+    for index, phase in enumerate(phases, start=1):
+        phase.setdefault('name', f'fase_{index}')
+        if phase.get('duration_seconds', 0) <= 0:
+            raise LoadTestError(f"Fase {phase['name']}: duration_seconds debe ser positivo")
+        if phase.get('concurrency', 0) < 0:
+            raise LoadTestError(f"Fase {phase['name']}: concurrency no puede ser negativa")
+
+        mix = phase.setdefault('mix', {})
+        unknown = [action for action in mix if action not in ACTIONS]
+        if unknown:
+            raise LoadTestError(f"Fase {phase['name']}: acciones desconocidas {', '.join(unknown)}")
+        if phase.get('concurrency') and not any(weight > 0 for weight in mix.values()):
+            raise LoadTestError(f"Fase {phase['name']}: 'mix' necesita al menos una acción con peso")
+
+        for tick in phase.setdefault('ticks', []):
+            if tick.get('action') not in ACTIONS:
+                raise LoadTestError(f"Fase {phase['name']}: acción de tick desconocida {tick.get('action')!r}")
+            if tick.get('interval_seconds', 0) <= 0:
+                raise LoadTestError(f"Fase {phase['name']}: interval_seconds debe ser positivo")
+
+        think_time = phase.setdefault('think_time_ms', [0, 0])
+        if len(think_time) != 2 or think_time[0] > think_time[1]:
+            raise LoadTestError(f"Fase {phase['name']}: think_time_ms debe ser [mínimo, máximo]")
+
+    scenario.setdefault('name', 'escenario')
+    scenario.setdefault('dataset', {})
+    return scenario
+
+
+def scale_scenario(scenario: Dict, duration_scale: float = 1.0, concurrency_scale: float = 1.0) -> Dict:
+    """Escala duración y concurrencia de todas las fases (corridas cortas de humo)"""
+    for phase in scenario['phases']:
+        phase['duration_seconds'] = max(phase['duration_seconds'] * duration_scale, 1)
+        phase['concurrency'] = max(int(round(phase['concurrency'] * concurrency_scale)), 0)
+    return scenario
+
+
+# === Datos de la prueba ===
+
+def prepare_target(dataset: Dict, seed: int = 0, operator_code: Optional[str] = None) -> Dict:
+    """
+    Prepara los datos de la prueba en la base de datos del servidor
+
+    Sin operator_code siembra un operador nuevo con bingo.dataset.seed_tenant;
+    con operator_code reutiliza sus jugadores y su pack (por ejemplo, el
+    dataset de otra corrida). En ambos casos crea una
+    API key nueva, una sesión activa del pack sin inscritos y su partida;
+    cleanup_target los borra.
+
+    Returns:
+        dict con credenciales e ids que consumen las acciones
+    """
+    from django.utils import timezone as django_timezone
+
+    from .dataset import seed_tenant
+    from .models import APIKey, BingoGameExtended, BingoSession, CardPack, Operator, PlayerCard
+
+    if operator_code:
+        try:
+            operator = Operator.objects.get(code=operator_code)
+        except Operator.DoesNotExist:
+            raise LoadTestError(f"No existe el operador {operator_code}")
+        pack = CardPack.objects.filter(operator=operator, cards_generated=True).order_by('-created_at').first()
+        if pack is None:
+            raise LoadTestError(f"El operador {operator_code} no tiene packs generados")
+    else:
+        options = {'legacy_cards': 0, 'drawn_balls': 0}
+        options.update(dataset)
+        data = seed_tenant(seed=seed, **options)
+        operator, pack = data['operator'], data['pack']
+
+    cards_by_player = defaultdict(list)
+    for player_id, card_id in PlayerCard.objects.filter(
+        player__operator=operator, card__bingo_type=pack.bingo_type
+    ).values_list('player_id', 'card_id').order_by('player_id', 'card__card_number'):
+        cards_by_player[str(player_id)].append(str(card_id))
+
+    players = [{'id': player_id, 'card_ids': card_ids} for player_id, card_ids in cards_by_player.items()]
+    random.Random(seed).shuffle(players)
+    if not players:
+        if not operator_code:
+            operator.delete()
+        raise LoadTestError("No hay jugadores con cartas para unirse a la sesión")
+
+    key, secret = APIKey.generate_credentials()
+    APIKey.objects.create(
+        operator=operator, name='loadtest', key=key,
+        secret_hash=APIKey.hash_secret(secret), permission_level='admin', rate_limit=1_000_000,
+    )
+
+    now = django_timezone.now()
+    session = BingoSession.objects.create(
+        operator=operator, name=f'Carga {now:%Y-%m-%d %H:%M:%S}', bingo_type=pack.bingo_type,
+        max_players=1_000_000, card_source='pack', card_pack=pack, status='active',
+        scheduled_start=now, actual_start=now,
+    )
+    game = BingoGameExtended.objects.create(
+        operator=operator, session=session, game_type=pack.bingo_type, name='Carga partida 1'
+    )
+
+    return {
+        'api_key': key,
+        'api_secret': secret,
+        'operator_id': str(operator.id),
+        'seeded_operator': not operator_code,
+        'bingo_type': pack.bingo_type,
+        'session_id': str(session.id),
+        'game_id': str(game.id),
+        'players': players,
+    }
+
+
+def cleanup_target(target: Dict):
+    """
+    Borra los datos que creó prepare_target
+
+    El operador sembrado se borra entero (jugadores, pack, API key y sesiones
+    caen en cascada). De un operador existente solo se borran la API key y la
+    sesión de la prueba, con sus partidas, bolas e inscripciones.
+    """
+    from .models import APIKey, BingoSession, Operator
+
+    if target['seeded_operator']:
+        Operator.objects.filter(pk=target['operator_id']).delete()
+        return
+    APIKey.objects.filter(key=target['api_key']).delete()
+    BingoSession.objects.filter(pk=target['session_id']).delete()
+
+
+# === Cliente HTTP ===
+
+class HttpClient:
+    """Una conexión keep-alive por hilo"""
+
+    def __init__(self, base_url: str, timeout: float = 30.0):
+        parts = urlsplit(base_url)
+        if parts.scheme not in ('http', 'https'):
+            raise LoadTestError(f"URL base inválida: {base_url}")
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.prefix = parts.path.rstrip('/')
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            factory = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+            connection = self._local.connection = factory(self.host, self.port, timeout=self.timeout)
+        return connection
+
+    def _reset(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+        self._local.connection = None
+
+    def request(self, method: str, path: str, body=None, token: Optional[str] = None):
+        """
+        Returns:
+            (status, cuerpo JSON o None, milisegundos)
+        """
+        headers = {'Accept': 'application/json'}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+
+        for attempt in (1, 2):
+            started = time.perf_counter()
+            try:
+                connection = self._connection()
+                connection.request(method, self.prefix + path, body=payload, headers=headers)
+                response = connection.getresponse()
+                raw = response.read()
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                break
+            except (http.client.HTTPException, OSError):
+                # Conexión keep-alive cerrada por el servidor: se reintenta una vez
+                self._reset()
+                if attempt == 2:
+                    raise
+
+        try:
+            data = json.loads(raw) if raw else None
+        except ValueError:
+            data = None
+        return response.status, data, elapsed_ms
+
+
+# === Estado compartido y métricas ===
+
+class RunState:
+    """Tokens, partida en curso, jugadores por unirse y cartas en juego"""
+
+    def __init__(self, target: Dict):
+        self.target = target
+        self.lock = threading.Lock()
+        self.access = None
+        self.refresh = None
+        self.game_id = target['game_id']
+        self.games_played = 1
+        self.drawn = set()
+        self.pending_players = list(target['players'])
+        self.session_cards = []
+
+    def next_player(self):
+        with self.lock:
+            return self.pending_players.pop() if self.pending_players else None
+
+    def add_session_cards(self, cards: List[Dict]):
+        with self.lock:
+            for card in cards:
+                numbers = card.get('card_details', {}).get('numbers') or []
+                flat = {number for row in numbers for number in row if isinstance(number, int) and number}
+                self.session_cards.append({
+                    'id': card['id'],
+                    'numbers': flat,
+                    'marked': set(card.get('marked_numbers') or []),
+                })
+
+
+class Recorder:
+    """Latencias y códigos de estado por fase y endpoint"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(lambda: defaultdict(list))
+        self.statuses = defaultdict(lambda: defaultdict(lambda: defaultdict(int)))
+        self.skipped = defaultdict(lambda: defaultdict(int))
+
+    def record(self, phase: str, endpoint: str, status, elapsed_ms: float):
+        with self.lock:
+            self.samples[phase][endpoint].append(elapsed_ms)
+            self.statuses[phase][endpoint][str(status)] += 1
+
+    def skip(self, phase: str, action: str):
+        with self.lock:
+            self.skipped[phase][action] += 1
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Percentil por rango más cercano"""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(fraction * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def summarize(samples: List[float], statuses: Dict[str, int], seconds: float) -> Dict:
+    ordered = sorted(samples)
+    errors = sum(count for status, count in statuses.items() if not status.isdigit() or int(status) >= 400)
+    return {
+        'requests': len(ordered),
+        'errors': errors,
+        'statuses': dict(sorted(statuses.items())),
+        'throughput_rps': round(len(ordered) / seconds, 3) if seconds else 0.0,
+        'mean_ms': round(sum(ordered) / len(ordered), 3) if ordered else 0.0,
+        'min_ms': round(ordered[0], 3) if ordered else 0.0,
+        'p50_ms': round(percentile(ordered, 0.50), 3),
+        'p95_ms': round(percentile(ordered, 0.95), 3),
+        'p99_ms': round(percentile(ordered, 0.99), 3),
+        'max_ms': round(ordered[-1], 3) if ordered else 0.0,
+    }
+
+
+# === Acciones ===
+
+class ActionContext:
+    def __init__(self, client: HttpClient, state: RunState, recorder: Recorder, phase: str, rng: random.Random):
+        self.client = client
+        self.state = state
+        self.recorder = recorder
+        self.phase = phase
+        self.rng = rng
+
+    def call(self, endpoint: str, method: str, path: str, body=None, token: bool = True):
+        """Ejecuta una petición y la registra bajo `endpoint` (ruta con plantilla)"""
+        try:
+            status, data, elapsed_ms = self.client.request(
+                method, path, body, token=self.state.access if token else None
+            )
+        except (http.client.HTTPException, OSError) as error:
+            self.recorder.record(self.phase, endpoint, type(error).__name__, 0.0)
+            return None, None
+        self.recorder.record(self.phase, endpoint, status, elapsed_ms)
+        return status, data
+
+
+def obtain_token(ctx: ActionContext):
+    target = ctx.state.target
+    status, data = ctx.call('POST /api/token/', 'POST', '/api/token/', {
+        'api_key': target['api_key'], 'api_secret': target['api_secret']
+    }, token=False)
+    if status != 200:
+        raise LoadTestError(f"No se pudo obtener el token JWT (HTTP {status}): {data}")
+    with ctx.state.lock:
+        ctx.state.access = data['access']
+        ctx.state.refresh = data['refresh']
+
+
+def token_refresh(ctx: ActionContext):
+    status, data = ctx.call('POST /api/token/refresh/', 'POST', '/api/token/refresh/',
+                            {'refresh': ctx.state.refresh}, token=False)
+    if status == 200 and data and data.get('access'):
+        with ctx.state.lock:
+            ctx.state.access = data['access']
+            ctx.state.refresh = data.get('refresh', ctx.state.refresh)
+
+
+def join_session(ctx: ActionContext):
+    player = ctx.state.next_player()
+    if player is None:
+        ctx.recorder.skip(ctx.phase, 'join_session')
+        return
+    session_id = ctx.state.target['session_id']
+    status, data = ctx.call(
+        'POST /api/card-packs/sessions/{id}/join-with-cards/', 'POST',
+        f'/api/card-packs/sessions/{session_id}/join-with-cards/',
+        {'player_id': player['id'], 'card_ids': player['card_ids']},
+    )
+    if status == 201 and data:
+        ctx.state.add_session_cards(data.get('cards', []))
+
+
+def draw_ball(ctx: ActionContext):
+    game_id = ctx.state.game_id
+    status, data = ctx.call(
+        'POST /api/multi-tenant/games/{id}/draw-ball/', 'POST', f'/api/multi-tenant/games/{game_id}/draw-ball/'
+    )
+    if not data:
+        return
+    if status == 201 and data.get('ball_number'):
+        with ctx.state.lock:
+            if ctx.state.game_id == game_id:
+                ctx.state.drawn.add(data['ball_number'])
+    if data.get('game_status') == 'finished' or data.get('status') == 'finished':
+        _next_game(ctx, game_id)
+
+
+def _next_game(ctx: ActionContext, finished_game_id: str):
+    """Al terminar una partida el organizador abre la siguiente en la misma sesión"""
+    with ctx.state.lock:
+        if ctx.state.game_id != finished_game_id:
+            return
+        number = ctx.state.games_played + 1
+    target = ctx.state.target
+    status, data = ctx.call('POST /api/multi-tenant/games/', 'POST', '/api/multi-tenant/games/', {
+        'operator': target['operator_id'], 'session': target['session_id'],
+        'game_type': target['bingo_type'], 'name': f'Carga partida {number}',
+    })
+    if status == 201 and data:
+        with ctx.state.lock:
+            if ctx.state.game_id == finished_game_id:
+                ctx.state.game_id = str(data['id'])
+                ctx.state.games_played = number
+                ctx.state.drawn = set()
+
+
+def mark_number(ctx: ActionContext):
+    with ctx.state.lock:
+        if not ctx.state.session_cards:
+            candidate = None
+        else:
+            card = ctx.rng.choice(ctx.state.session_cards)
+            pending = sorted((card['numbers'] & ctx.state.drawn) - card['marked'])
+            candidate = (card, ctx.rng.choice(pending)) if pending else None
+            if candidate:
+                card['marked'].add(candidate[1])
+    if candidate is None:
+        ctx.recorder.skip(ctx.phase, 'mark_number')
+        return
+    card, number = candidate
+    ctx.call('POST /api/card-packs/mark-number/', 'POST', '/api/card-packs/mark-number/', {
+        'session_card_id': card['id'], 'number': number
+    })
+
+
+def poll_drawn_balls(ctx: ActionContext):
+    game_id = ctx.state.game_id
+    ctx.call('GET /api/multi-tenant/games/{id}/drawn-balls/', 'GET', f'/api/multi-tenant/games/{game_id}/drawn-balls/')
+
+
+ACTIONS: Dict[str, Callable[[ActionContext], None]] = {
+    'token_refresh': token_refresh,
+    'join_session': join_session,
+    'draw_ball': draw_ball,
+    'mark_number': mark_number,
+    'poll_drawn_balls': poll_drawn_balls,
+}
+
+
+# === Ejecución ===
+
+def _worker_seed(seed: int, phase_number: int, worker: int) -> int:
+    # Semilla estable por hilo (hash() de tuplas con str cambia entre procesos)
+    return (seed * 1_000_003 + phase_number) * 1_000_003 + worker
+
+
+def _user_loop(client, state, recorder, phase, deadline, seed):
+    rng = random.Random(seed)
+    actions = [action for action, weight in phase['mix'].items() if weight > 0]
+    weights = [phase['mix'][action] for action in actions]
+    think_min, think_max = phase['think_time_ms']
+    while time.monotonic() < deadline:
+        action = rng.choices(actions, weights)[0]
+        ACTIONS[action](ActionContext(client, state, recorder, phase['name'], rng))
+        if think_max:
+            time.sleep(min(rng.uniform(think_min, think_max) / 1000, max(deadline - time.monotonic(), 0)))
+
+
+def _tick_loop(client, state, recorder, phase, tick, deadline, seed):
+    rng = random.Random(seed)
+    interval = tick['interval_seconds']
+    next_run = time.monotonic()
+    while next_run < deadline:
+        ACTIONS[tick['action']](ActionContext(client, state, recorder, phase['name'], rng))
+        next_run += interval
+        time.sleep(max(min(next_run, deadline) - time.monotonic(), 0))
+
+
+def run_scenario(scenario: Dict, target: Dict, base_url: str, seed: int = 0, progress=None) -> Dict:
+    """
+    Ejecuta las fases del escenario y arma el reporte
+
+    Returns:
+        dict JSON-serializable con métricas por fase y por endpoint
+    """
+    client = HttpClient(base_url)
+    state = RunState(target)
+    recorder = Recorder()
+    obtain_token(ActionContext(client, state, recorder, 'setup', random.Random(seed)))
+
+    started_at = datetime.now(timezone.utc)
+    phase_reports = []
+    for phase_number, phase in enumerate(scenario['phases']):
+        if progress:
+            progress(f"Fase {phase['name']}: {phase['concurrency']} usuarios durante {phase['duration_seconds']:g} s")
+        phase_started = time.monotonic()
+        deadline = phase_started + phase['duration_seconds']
+
+        threads = [
+            threading.Thread(
+                target=_user_loop, daemon=True,
+                args=(client, state, recorder, phase, deadline, _worker_seed(seed, phase_number, worker)),
+            )
+            for worker in range(phase['concurrency'])
+        ] + [
+            threading.Thread(
+                target=_tick_loop, daemon=True,
+                args=(client, state, recorder, phase, tick, deadline, _worker_seed(seed, phase_number, -1 - index)),
+            )
+            for index, tick in enumerate(phase['ticks'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        elapsed = time.monotonic() - phase_started
+        phase_reports.append({
+            'name': phase['name'],
+            'duration_seconds': round(elapsed, 3),
+            'concurrency': phase['concurrency'],
+            'endpoints': {
+                endpoint: summarize(samples, recorder.statuses[phase['name']][endpoint], elapsed)
+                for endpoint, samples in sorted(recorder.samples[phase['name']].items())
+            },
+            'skipped_actions': dict(recorder.skipped[phase['name']]),
+        })
+
+    total_seconds = sum(report['duration_seconds'] for report in phase_reports)
+    overall = {}
+    endpoints = sorted({endpoint for report in phase_reports for endpoint in report['endpoints']})
+    for endpoint in endpoints:
+        samples, statuses = [], defaultdict(int)
+        for phase in scenario['phases']:
+            samples.extend(recorder.samples[phase['name']].get(endpoint, []))
+            for status, count in recorder.statuses[phase['name']].get(endpoint, {}).items():
+                statuses[status] += count
+        overall[endpoint] = summarize(samples, statuses, total_seconds)
+
+    return {
+        'scenario': scenario['name'],
+        'base_url': base_url,
+        'seed': seed,
+        'started_at': started_at.isoformat(timespec='seconds'),
+        'finished_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'duration_seconds': round(total_seconds, 3),
+        'games_played': state.games_played,
+        'players_joined': len(target['players']) - len(state.pending_players),
+        'phases': phase_reports,
+        'endpoints': overall,
+    }
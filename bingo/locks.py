@@ -0,0 +1,128 @@
+"""
+Bloqueos por partida para serializar las extracciones
+
+En PostgreSQL se usa un advisory lock de transacción (pg_advisory_xact_lock)
+con una clave derivada del id de la partida: las extracciones concurrentes de
+la misma partida esperan en cola dentro de la base de datos, sin bloquear filas
+ni fallar por IntegrityError, y partidas distintas no compiten entre sí.
+
+SQLite (tests y desarrollo) ya serializa las escrituras; ahí basta un lock por
+partida dentro del proceso. Otros motores bloquean la fila de la partida con
+SELECT ... FOR UPDATE.
+
+El tiempo de espera de cada adquisición se acumula en lock_wait_stats().
+"""
+
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+
+from .metrics import DRAW_LOCK_WAIT_SECONDS
+
+
+logger = logging.getLogger(__name__)
+
+# Esperas mayores a este umbral (segundos) se registran en el log
+SLOW_WAIT_SECONDS = 0.5
+
+# Esperas menores a este umbral (segundos) no cuentan como contención
+CONTENDED_WAIT_SECONDS = 0.001
+
+
+class LockHandle:
+    """Resultado de adquirir el lock: cuánto se esperó"""
+
+    def __init__(self, key: int):
+        self.key = key
+        self.wait_seconds = 0.0
+
+
+_stats_lock = threading.Lock()
+_stats = {
+    'acquisitions': 0,
+    'contended': 0,
+    'total_wait_seconds': 0.0,
+    'max_wait_seconds': 0.0,
+}
+
+_local_locks = {}
+_local_locks_guard = threading.Lock()
+
+
+def advisory_key(game_id) -> int:
+    """Clave bigint con signo para pg_advisory_xact_lock a partir del UUID de la partida"""
+    game_uuid = game_id if isinstance(game_id, uuid.UUID) else uuid.UUID(str(game_id))
+    return int.from_bytes(game_uuid.bytes[:8], 'big', signed=True)
+
+
+def _record_wait(handle: LockHandle, started: float):
+    handle.wait_seconds = time.perf_counter() - started
+    DRAW_LOCK_WAIT_SECONDS.observe(handle.wait_seconds)
+    with _stats_lock:
+        _stats['acquisitions'] += 1
+        _stats['total_wait_seconds'] += handle.wait_seconds
+        _stats['max_wait_seconds'] = max(_stats['max_wait_seconds'], handle.wait_seconds)
+        if handle.wait_seconds >= CONTENDED_WAIT_SECONDS:
+            _stats['contended'] += 1
+    if handle.wait_seconds >= SLOW_WAIT_SECONDS:
+        logger.warning("Espera de %.3fs por el lock de extracción (clave %s)", handle.wait_seconds, handle.key)
+
+
+def _local_lock(key: int) -> threading.Lock:
+    with _local_locks_guard:
+        lock = _local_locks.get(key)
+        if lock is None:
+            lock = _local_locks[key] = threading.Lock()
+        return lock
+
+
+@contextmanager
+def game_draw_lock(game_id):
+    """
+    Sección crítica de extracción de una partida, dentro de una transacción
+
+    Uso:
+        with game_draw_lock(game.id) as lock:
+            # leer bolas extraídas, elegir la siguiente e insertarla
+            ...
+        lock.wait_seconds  # tiempo esperado por el lock
+
+    El lock se libera al terminar la transacción que abre este contexto.
+    """
+    key = advisory_key(game_id)
+    handle = LockHandle(key)
+    started = time.perf_counter()
+
+    if connection.vendor == 'postgresql':
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_xact_lock(%s)', [key])
+            _record_wait(handle, started)
+            yield handle
+    elif connection.vendor == 'sqlite':
+        # El lock envuelve la transacción para liberarse después del COMMIT
+        with _local_lock(key):
+            _record_wait(handle, started)
+            with transaction.atomic():
+                yield handle
+    else:
+        from .models import BingoGame
+
+        with transaction.atomic():
+            BingoGame.objects.select_for_update().filter(pk=game_id).first()
+            _record_wait(handle, started)
+            yield handle
+
+
+def lock_wait_stats() -> dict:
+    """Estadísticas acumuladas de espera por locks de extracción en este proceso"""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats['average_wait_seconds'] = (
+        stats['total_wait_seconds'] / stats['acquisitions'] if stats['acquisitions'] else 0.0
+    )
+    return stats
@@ -0,0 +1,100 @@
+"""
+Micro-benchmarks con líneas base JSON
+
+Uso:
+    python manage.py benchmark                                   # ejecutar y mostrar
+    python manage.py benchmark --save benchmarks/baseline.json   # guardar línea base
+    python manage.py benchmark --compare benchmarks/baseline.json --threshold 0.15
+    python manage.py benchmark --filter pattern. --list
+"""
+
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bingo.benchmarks import (
+    DEFAULT_THRESHOLD, MIN_REPEAT_SECONDS, REPEATS,
+    available_benchmarks, compare_results, confirm_regressions, run_benchmarks,
+)
+
+
+class Command(BaseCommand):
+    help = 'Ejecuta los micro-benchmarks y compara contra una línea base JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filter', help='Solo benchmarks cuyo nombre contenga este texto')
+        parser.add_argument('--list', action='store_true', help='Lista los benchmarks disponibles')
+        parser.add_argument('--save', help='Guarda los resultados como línea base en esta ruta')
+        parser.add_argument('--compare', help='Línea base JSON contra la que comparar')
+        parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                            help='Empeoramiento relativo que cuenta como regresión (0.15 = 15%%)')
+        parser.add_argument('--repeats', type=int, default=REPEATS)
+        parser.add_argument('--min-time', type=float, default=MIN_REPEAT_SECONDS,
+                            help='Segundos mínimos por repetición')
+
+    def handle(self, *args, **options):
+        names = available_benchmarks()
+        if options['filter']:
+            names = [name for name in names if options['filter'] in name]
+            if not names:
+                raise CommandError(f"Ningún benchmark coincide con {options['filter']!r}")
+
+        if options['list']:
+            for name in names:
+                self.stdout.write(name)
+            return
+
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare'], encoding='utf-8') as handle:
+                    baseline = json.load(handle)
+            except (OSError, ValueError) as error:
+                raise CommandError(f"No se pudo leer la línea base: {error}")
+
+        def progress(name, result):
+            self.stdout.write(
+                f"{name:<50} min {result['min_us']:>12.2f} µs  mediana {result['median_us']:>12.2f} µs  (x{result['loops']})"
+            )
+
+        current = run_benchmarks(
+            names, repeats=options['repeats'], min_repeat_seconds=options['min_time'], progress=progress
+        )
+
+        if options['save']:
+            with open(options['save'], 'w', encoding='utf-8') as handle:
+                json.dump(current, handle, indent=2)
+                handle.write('\n')
+            self.stdout.write(self.style.SUCCESS(f"Línea base guardada en {options['save']}"))
+
+        if baseline is None:
+            return
+
+        if options['filter']:
+            baseline = dict(baseline, results={
+                name: result for name, result in baseline.get('results', {}).items() if name in names
+            })
+
+        current = confirm_regressions(
+            baseline, current, options['threshold'],
+            repeats=options['repeats'], min_repeat_seconds=options['min_time']
+        )
+        rows = compare_results(baseline, current, options['threshold'])
+        self.stdout.write('')
+        for row in rows:
+            change = f"{row['change'] * 100:+.1f}%" if row['change'] is not None else '-'
+            line = f"{row['name']:<50} {change:>8}  {row['status']}"
+            if row['status'] == 'regression':
+                self.stdout.write(self.style.ERROR(line))
+            elif row['status'] == 'improved':
+                self.stdout.write(self.style.SUCCESS(line))
+            else:
+                self.stdout.write(line)
+
+        regressions = [row for row in rows if row['status'] == 'regression']
+        if regressions:
+            raise CommandError(
+                f"{len(regressions)} benchmark(s) empeoraron más de {options['threshold'] * 100:.0f}%: "
+                + ', '.join(row['name'] for row in regressions)
+            )
+        self.stdout.write(self.style.SUCCESS('Sin regresiones'))
@@ -0,0 +1,69 @@
+"""
+Latencia por petición según DB_CONNECTION_MODE
+
+Mide per-request, persistent y pool contra la base de datos configurada
+(DATABASE_URL); cada modo corre en su propio proceso. Las cifras
+representativas son las de PostgreSQL.
+
+Uso:
+    python manage.py benchmark_connections
+    python manage.py benchmark_connections --requests 2000 --threads 8 --report conexiones.json
+    python manage.py benchmark_connections --modes per-request,pool --path /api/multi-tenant/sessions/
+"""
+
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bingo.connection_benchmark import (
+    DEFAULT_PATH, DEFAULT_REQUESTS, DEFAULT_WARMUP, MODES,
+    ConnectionBenchmarkError, measure_current_mode, run_connection_benchmark,
+)
+
+
+class Command(BaseCommand):
+    help = 'Compara la latencia por petición con y sin reutilización de conexiones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', default=','.join(MODES), help='Modos separados por comas')
+        parser.add_argument('--requests', type=int, default=DEFAULT_REQUESTS, help='Peticiones medidas por modo')
+        parser.add_argument('--threads', type=int, default=1, help='Hilos concurrentes (como gunicorn gthread)')
+        parser.add_argument('--path', default=DEFAULT_PATH, help='Ruta GET autenticada a medir')
+        parser.add_argument('--warmup', type=int, default=DEFAULT_WARMUP)
+        parser.add_argument('--report', help='Guarda el reporte JSON en esta ruta')
+        parser.add_argument('--worker', action='store_true',
+                            help='Uso interno: mide el modo de este proceso e imprime JSON')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['threads'] < 1:
+            raise CommandError('--requests y --threads deben ser positivos')
+
+        try:
+            if options['worker']:
+                result = measure_current_mode(
+                    options['requests'], options['threads'], options['path'], options['warmup']
+                )
+                self.stdout.write(json.dumps(result))
+                return
+
+            report = run_connection_benchmark(
+                [mode.strip() for mode in options['modes'].split(',') if mode.strip()],
+                options['requests'], options['threads'], options['path'], options['warmup'],
+                log=self.stdout.write,
+            )
+        except ConnectionBenchmarkError as error:
+            raise CommandError(str(error))
+
+        if report['vendor'] != 'postgresql':
+            self.stdout.write(self.style.WARNING(
+                f"Base de datos {report['vendor']}: abrir conexiones es casi gratis, las cifras no representan PostgreSQL"
+            ))
+        for mode, result in report['results'].items():
+            if result.get('p50_speedup'):
+                self.stdout.write(f"{mode:<12} p50 x{result['p50_speedup']:.2f} frente a per-request")
+
+        if options['report']:
+            with open(options['report'], 'w', encoding='utf-8') as handle:
+                json.dump(report, handle, indent=2)
+                handle.write('\n')
+            self.stdout.write(self.style.SUCCESS(f"Reporte guardado en {options['report']}"))
@@ -0,0 +1,71 @@
+"""
+Dataset sintético de escala de producción
+
+Uso:
+    python manage.py generate_dataset --operators 10 --players 10000 --packs 2 --cards-per-pack 500000
+    python manage.py generate_dataset --seed 7 --code-prefix perf --bingo-type 90
+
+Con PostgreSQL las filas se escriben con COPY; --no-copy fuerza INSERT por
+lotes. Los operadores creados se pueden reutilizar con
+`python manage.py loadtest --operator <código>`.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from bingo.dataset import COPY_CHUNK_SIZE, generate_dataset
+
+
+class Command(BaseCommand):
+    help = 'Siembra operadores, jugadores, packs, sesiones y partidas terminadas en lote (determinista por semilla)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--operators', type=int, default=1)
+        parser.add_argument('--players', type=int, default=1000, help='Jugadores por operador')
+        parser.add_argument('--packs', type=int, default=1, help='Packs por operador')
+        parser.add_argument('--cards-per-pack', type=int, default=10000)
+        parser.add_argument('--cards-per-player', type=int, default=3)
+        parser.add_argument('--sessions', type=int, default=2, help='Sesiones finalizadas por operador')
+        parser.add_argument('--games', type=int, default=3, help='Partidas terminadas por sesión')
+        parser.add_argument('--balls', type=int, default=50, help='Bolas extraídas por partida')
+        parser.add_argument('--participation', type=float, default=0.8,
+                            help='Fracción de jugadores que juega cada sesión')
+        parser.add_argument('--bingo-type', choices=['75', '85', '90'], default='75')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--code-prefix', help='Prefijo de los códigos de operador (por defecto ds<semilla>)')
+        parser.add_argument('--chunk-size', type=int, default=COPY_CHUNK_SIZE)
+        parser.add_argument('--no-copy', action='store_true', help='Usa INSERT por lotes en vez de COPY')
+
+    def handle(self, *args, **options):
+        try:
+            result = generate_dataset(
+                operators=options['operators'],
+                players_per_operator=options['players'],
+                packs_per_operator=options['packs'],
+                cards_per_pack=options['cards_per_pack'],
+                cards_per_player=options['cards_per_player'],
+                sessions_per_operator=options['sessions'],
+                games_per_session=options['games'],
+                balls_per_game=options['balls'],
+                participation=options['participation'],
+                bingo_type=options['bingo_type'],
+                seed=options['seed'],
+                code_prefix=options['code_prefix'],
+                chunk_size=options['chunk_size'],
+                use_copy=False if options['no_copy'] else None,
+                log=self.stdout.write,
+            )
+        except ValueError as error:
+            raise CommandError(str(error))
+        except IntegrityError as error:
+            raise CommandError(f"{error} (¿ya existe un dataset con esta semilla? usa otro --seed)")
+
+        self.stdout.write('')
+        for name, count in result['rows'].items():
+            self.stdout.write(f"{name:<20} {count:>12,}")
+        cards = result['rows']['cards']
+        rate = cards / result['seconds'] if result['seconds'] else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(result['operators'])} operador(es) en {result['seconds']:.1f} s ({rate:,.0f} cartones/s): "
+            + ', '.join(result['operators'][:5]) + (' …' if len(result['operators']) > 5 else '')
+        ))
@@ -0,0 +1,94 @@
+"""
+Prueba de carga local con escenarios JSON
+
+El servidor tiene que usar la misma base de datos que este comando
+(DATABASE_URL): aquí se siembran el operador, la sesión y la partida, que se
+borran al terminar (también si la prueba falla) salvo con --keep-data. Con
+SQLite las escrituras concurrentes fallan con "database is locked"; las
+cifras representativas se miden con PostgreSQL.
+
+Uso:
+    python manage.py runserver                       # en otra terminal
+    python manage.py loadtest game_night --report loadtest.json
+    python manage.py loadtest benchmarks/scenarios/game_night.json --duration-scale 0.1
+    python manage.py loadtest game_night --operator op-1234abcd   # reutilizar datos existentes
+"""
+
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from bingo.loadtest import (
+    ACTIONS, LoadTestError, cleanup_target, load_scenario, prepare_target, run_scenario, scale_scenario,
+)
+
+
+SCENARIOS_DIR = os.path.join(settings.BASE_DIR, 'benchmarks', 'scenarios')
+
+
+class Command(BaseCommand):
+    help = 'Genera tráfico de una noche de juego contra un servidor local y reporta latencias por endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenario', nargs='?', default='game_night',
+                            help='Ruta a un escenario JSON o nombre en benchmarks/scenarios/')
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--report', help='Guarda el reporte JSON en esta ruta')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--operator', help='Código de un operador existente (no siembra datos)')
+        parser.add_argument('--duration-scale', type=float, default=1.0,
+                            help='Multiplica la duración de cada fase (0.1 = corrida de humo)')
+        parser.add_argument('--concurrency-scale', type=float, default=1.0,
+                            help='Multiplica la concurrencia de cada fase')
+        parser.add_argument('--keep-data', action='store_true',
+                            help='No borra el operador, la API key ni la sesión de la prueba al terminar')
+        parser.add_argument('--list-actions', action='store_true', help='Lista las acciones disponibles')
+
+    def handle(self, *args, **options):
+        if options['list_actions']:
+            for action in ACTIONS:
+                self.stdout.write(action)
+            return
+
+        path = options['scenario']
+        if not os.path.exists(path):
+            path = os.path.join(SCENARIOS_DIR, f"{options['scenario']}.json")
+
+        try:
+            scenario = scale_scenario(
+                load_scenario(path), options['duration_scale'], options['concurrency_scale']
+            )
+            self.stdout.write(f"Preparando datos del escenario {scenario['name']}...")
+            target = prepare_target(scenario['dataset'], seed=options['seed'], operator_code=options['operator'])
+            try:
+                report = run_scenario(
+                    scenario, target, options['base_url'], seed=options['seed'], progress=self.stdout.write
+                )
+            finally:
+                if options['keep_data']:
+                    self.stdout.write(f"Datos de la prueba conservados (operador {target['operator_id']})")
+                else:
+                    cleanup_target(target)
+        except LoadTestError as error:
+            raise CommandError(str(error))
+
+        self.stdout.write('')
+        self.stdout.write(f"{'endpoint':<55} {'req':>7} {'err':>5} {'rps':>8} {'p50':>9} {'p95':>9} {'p99':>9}")
+        for endpoint, stats in report['endpoints'].items():
+            line = (
+                f"{endpoint:<55} {stats['requests']:>7} {stats['errors']:>5} {stats['throughput_rps']:>8.2f} "
+                f"{stats['p50_ms']:>7.1f}ms {stats['p95_ms']:>7.1f}ms {stats['p99_ms']:>7.1f}ms"
+            )
+            self.stdout.write(self.style.ERROR(line) if stats['errors'] else line)
+        self.stdout.write(
+            f"\n{report['games_played']} partida(s), {report['players_joined']} jugador(es) unidos "
+            f"en {report['duration_seconds']:.1f} s"
+        )
+
+        if options['report']:
+            with open(options['report'], 'w', encoding='utf-8') as handle:
+                json.dump(report, handle, indent=2)
+                handle.write('\n')
+            self.stdout.write(self.style.SUCCESS(f"Reporte guardado en {options['report']}"))
@@ -0,0 +1,18 @@
+"""
+Borra las respuestas guardadas por Idempotency-Key que ya vencieron
+
+Uso (por ejemplo desde cron cada hora):
+    python manage.py purge_idempotency_keys
+"""
+
+from django.core.management.base import BaseCommand
+
+from bingo.models import IdempotencyRecord
+
+
+class Command(BaseCommand):
+    help = 'Elimina los registros de Idempotency-Key vencidos'
+
+    def handle(self, *args, **options):
+        deleted = IdempotencyRecord.purge_expired()
+        self.stdout.write(self.style.SUCCESS(f'{deleted} registros de idempotencia eliminados'))
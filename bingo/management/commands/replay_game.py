@@ -0,0 +1,76 @@
+"""
+Repite una partida en memoria, sin base de datos
+
+Uso:
+    python manage.py replay_game --snapshot partida.json
+    python manage.py replay_game --game <uuid> --export partida.json [--full-sequence]
+    python manage.py replay_game --generate --bingo-type 90 --cards 500 --seed 7 --events
+"""
+
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bingo.models import BingoGameExtended
+from bingo.replay import (
+    TOTAL_BALLS, GameReplay, ReplayError, dump_snapshot, first_completions,
+    generate_snapshot, load_snapshot, snapshot_from_game,
+)
+
+
+class Command(BaseCommand):
+    help = 'Repite una partida en memoria desde una foto JSON y emite sus eventos'
+
+    def add_arguments(self, parser):
+        source = parser.add_mutually_exclusive_group(required=True)
+        source.add_argument('--snapshot', help='Ruta de la foto JSON de la partida')
+        source.add_argument('--game', help='ID de una partida guardada (BingoGameExtended)')
+        source.add_argument('--generate', action='store_true', help='Genera una foto sintética')
+        parser.add_argument('--full-sequence', action='store_true', help='Con --game: jugar toda la secuencia comprometida')
+        parser.add_argument('--bingo-type', choices=sorted(TOTAL_BALLS), default='75')
+        parser.add_argument('--cards', type=int, default=100, help='Con --generate: cartones en juego')
+        parser.add_argument('--patterns', help='Con --generate: códigos de patrones separados por coma')
+        parser.add_argument('--seed', type=int, help='Con --generate: semilla para una foto reproducible')
+        parser.add_argument('--export', help='Guarda la foto usada en esta ruta')
+        parser.add_argument('--events', action='store_true', help='Imprime cada evento como una línea JSON')
+
+    def handle(self, *args, **options):
+        try:
+            if options['snapshot']:
+                snapshot = load_snapshot(options['snapshot'])
+            elif options['game']:
+                game = BingoGameExtended.objects.filter(id=options['game']).first()
+                if game is None:
+                    raise CommandError('Partida no encontrada')
+                snapshot = snapshot_from_game(game, full_sequence=options['full_sequence'])
+            else:
+                codes = [code.strip() for code in (options['patterns'] or '').split(',') if code.strip()]
+                snapshot = generate_snapshot(options['bingo_type'], options['cards'], codes or None, seed=options['seed'])
+
+            if options['export']:
+                dump_snapshot(snapshot, options['export'])
+
+            replay = GameReplay(snapshot)
+        except (OSError, ValueError, KeyError) as error:
+            raise CommandError(str(error))
+
+        if options['events']:
+            for event in replay.events():
+                self.stdout.write(json.dumps(event, default=str))
+            return
+
+        result = replay.run(collect_events=False)
+        self.stdout.write(
+            f"Partida {result['game_id']} ({result['bingo_type']} bolas): {result['cards']} cartones, "
+            f"{result['balls_played']} bolas, fin: {result['end_reason']}"
+        )
+        for stage in result['stages_won']:
+            self.stdout.write(
+                f"  Etapa {stage['stage']} {stage['pattern_code']}: bola {stage['ball_index']} "
+                f"({stage['number']}), {stage['winners']} ganador(es)"
+            )
+        if not result['stages_won']:
+            for code, ball_index in first_completions(result).items():
+                self.stdout.write(f"  {code}: primer ganador en la bola {ball_index}")
+        self.stdout.write(f"  Eventos: {result['event_counts']}")
+        self.stdout.write(self.style.SUCCESS(f"Repetida en {result['elapsed_ms']} ms"))
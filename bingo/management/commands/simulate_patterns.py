@@ -0,0 +1,90 @@
+"""
+Simulación Monte Carlo de patrones de victoria
+
+Uso:
+    python manage.py simulate_patterns --bingo-type 75 --cards 100 --games 1000000 \
+        --patterns horizontal_line,full_card,blackout_jackpot --workers 8 --seed 42
+"""
+
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bingo.models import WinningPattern
+from bingo.simulation import TOTAL_BALLS, simulate
+
+
+class Command(BaseCommand):
+    help = 'Simula partidas para estimar probabilidades de patrones y calibrar jackpots'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bingo-type', choices=sorted(TOTAL_BALLS), default='75')
+        parser.add_argument('--cards', type=int, default=100, help='Cartones en juego por partida')
+        parser.add_argument('--games', type=int, default=100000, help='Partidas a simular')
+        parser.add_argument(
+            '--patterns',
+            help='Códigos de patrones separados por coma (por defecto: todos los activos compatibles)'
+        )
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Procesos a usar')
+        parser.add_argument('--seed', type=int, help='Semilla para resultados reproducibles')
+        parser.add_argument('--jackpot-balls', type=int, help='Máximo de bolas del jackpot a evaluar en todos los patrones')
+        parser.add_argument('--json', action='store_true', help='Imprime el resultado completo en JSON')
+
+    def handle(self, *args, **options):
+        bingo_type = options['bingo_type']
+        patterns = WinningPattern.objects.filter(is_active=True, compatible_with__in=['all', bingo_type])
+        if options['patterns']:
+            codes = [code.strip() for code in options['patterns'].split(',') if code.strip()]
+            patterns = patterns.filter(code__in=codes)
+            missing = set(codes) - set(patterns.values_list('code', flat=True))
+            if missing:
+                raise CommandError(f"Patrones no encontrados o incompatibles: {', '.join(sorted(missing))}")
+        patterns = list(patterns)
+        if not patterns:
+            raise CommandError('No hay patrones para simular')
+
+        started = time.perf_counter()
+        try:
+            result = simulate(
+                bingo_type=bingo_type,
+                cards_count=options['cards'],
+                games=options['games'],
+                patterns=patterns,
+                workers=options['workers'],
+                seed=options['seed'],
+                jackpot_balls=options['jackpot_balls'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - started
+
+        if options['json']:
+            result['elapsed_seconds'] = round(elapsed, 2)
+            self.stdout.write(json.dumps(result, indent=2))
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['games']} partidas de {bingo_type} bolas con {result['cards_count']} cartones "
+            f"en {elapsed:.1f}s ({result['workers']} procesos)"
+        ))
+        for summary in result['patterns']:
+            self.stdout.write(f"\n{summary['pattern_name']} ({summary['pattern_code']})")
+            balls = summary['balls_to_first_winner']
+            if balls is None:
+                self.stdout.write('  Ninguna partida tuvo ganador')
+                continue
+            self.stdout.write(
+                f"  Bolas al primer ganador: media {balls['mean']}, p50 {balls['p50']}, "
+                f"p95 {balls['p95']}, p99 {balls['p99']} (rango {balls['min']}-{balls['max']})"
+            )
+            self.stdout.write(
+                f"  Varios ganadores en la misma bola: {summary['multiple_winners_probability']:.2%} "
+                f"(promedio {summary['average_winners_at_first_win']} ganadores)"
+            )
+            if summary.get('jackpot'):
+                jackpot = summary['jackpot']
+                self.stdout.write(
+                    f"  Jackpot (<= {jackpot['max_balls']} bolas): {jackpot['hit_rate']:.4%}"
+                )
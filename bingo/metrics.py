@@ -0,0 +1,434 @@
+"""
+Métricas estilo Prometheus de las rutas calientes del motor
+
+Contadores e histogramas en memoria, expuestos en `GET /metrics` con el
+formato de texto de Prometheus (version 0.0.4). Sin dependencias externas.
+
+Varios workers de gunicorn: con METRICS_MULTIPROC_DIR (settings, tomado de la
+variable de entorno del mismo nombre) cada proceso vuelca sus valores a
+`<dir>/metrics_<pid>_<inicio>.json` como mucho cada METRICS_FLUSH_SECONDS y al
+salir; /metrics suma los archivos de todos los procesos. El instante de inicio
+en el nombre evita que un worker nuevo con un pid reutilizado pise el archivo
+de uno muerto: esos archivos se conservan y se siguen sumando (los contadores
+no retroceden y rate() no ve un reinicio). El directorio se vacía al desplegar.
+
+Acceso: con METRICS_AUTH_TOKEN, `Authorization: Bearer <token>`; sin token
+solo usuarios staff, salvo con DEBUG. Las etiquetas de operador no quedan
+públicas por defecto.
+
+Etiqueta `operator`: el id del operador, con cardinalidad acotada. Con
+METRICS_OPERATOR_IDS solo esos operadores tienen etiqueta propia; si no, los
+primeros METRICS_MAX_OPERATORS que ve cada proceso. El resto va a "other".
+
+Instrumentado:
+    bingo_balls_drawn_total, bingo_draw_seconds        extracción de bolas
+    bingo_draw_lock_wait_seconds                       espera del lock de extracción
+    bingo_pattern_check_seconds                        patrones de un cartón (check-winner)
+    bingo_winner_check_seconds, bingo_winners_total    check-all-cards
+    bingo_cards_generated_total, bingo_card_generation_seconds
+    bingo_auth_total, bingo_auth_seconds               backends de autenticación
+    bingo_card_transitions_total                       reservas, ventas y liberaciones
+"""
+
+import atexit
+import json
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, Iterable, Optional, Tuple
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.http import HttpResponse
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Operaciones de microsegundos (patrones de un cartón)
+FAST_BUCKETS = (0.000005, 0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.01)
+
+DEFAULT_FLUSH_SECONDS = 1.0
+DEFAULT_MAX_OPERATORS = 50
+OTHER = 'other'
+
+
+class Metric:
+    """
+    Base de contadores e histogramas: una serie por combinación de etiquetas
+
+    labels() devuelve la serie ya creada (caché por valores), así que en rutas
+    calientes conviene `METRIC.labels(valor).observe(...)` con valores posicionales.
+    """
+
+    type = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values, **labels):
+        if labels:
+            try:
+                values = tuple([labels[name] for name in self.labelnames])
+            except KeyError:
+                values = ()
+            if len(labels) != len(self.labelnames):
+                values = ()
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} espera las etiquetas {', '.join(self.labelnames) or '(ninguna)'}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child(tuple(str(value) for value in values)))
+        return child
+
+    def snapshot(self) -> list:
+        with self._lock:
+            return [[list(child.key), child.value()] for child in self._children.values()]
+
+    def _new_child(self, key):
+        raise NotImplementedError
+
+
+class _CounterChild:
+    __slots__ = ('key', '_lock', '_value')
+
+    def __init__(self, key):
+        self.key = key
+        self._lock = threading.Lock()
+        self._value = 0
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self._value += amount
+        registry.maybe_flush()
+
+    def value(self):
+        return self._value
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        self.labels(**labels).inc(amount)
+
+    def _new_child(self, key):
+        return _CounterChild(key)
+
+
+class _HistogramChild:
+    __slots__ = ('key', '_lock', '_bounds', '_buckets', '_sum', '_count')
+
+    def __init__(self, key, bounds):
+        self.key = key
+        self._lock = threading.Lock()
+        self._bounds = bounds
+        self._buckets = [0] * (len(bounds) + 1)
+        self._sum = 0.0
+        self._count = 0
+
+    def observe(self, value: float):
+        # Índice del primer bucket con le >= value (len(bounds) = +Inf)
+        index = bisect_left(self._bounds, value)
+        with self._lock:
+            self._buckets[index] += 1
+            self._sum += value
+            self._count += 1
+        registry.maybe_flush()
+
+    def value(self):
+        with self._lock:
+            return {'buckets': list(self._buckets), 'sum': self._sum, 'count': self._count}
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        self.labels(**labels).observe(value)
+
+    @contextmanager
+    def time(self, **labels):
+        child = self.labels(**labels)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            child.observe(time.perf_counter() - started)
+
+    def _new_child(self, key):
+        return _HistogramChild(key, self.buckets)
+
+
+class Registry:
+    """Métricas registradas y volcado a disco en modo multiproceso"""
+
+    def __init__(self):
+        self.metrics = {}
+        self._flush_lock = threading.Lock()
+        self._last_flush = 0.0
+        self._next_flush = None
+        self._atexit_registered = False
+        self._process = None
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self.metrics:
+            raise ValueError(f"Métrica duplicada: {metric.name}")
+        self.metrics[metric.name] = metric
+        return metric
+
+    # --- Multiproceso ---
+
+    def multiproc_dir(self) -> Optional[str]:
+        return getattr(settings, 'METRICS_MULTIPROC_DIR', None)
+
+    def process_filename(self) -> str:
+        """Archivo de este proceso: pid e instante de inicio (un fork obtiene el suyo)"""
+        pid = os.getpid()
+        if self._process is None or self._process[0] != pid:
+            self._process = (pid, time.time_ns())
+        return f'metrics_{pid}_{self._process[1]}.json'
+
+    def settings_changed(self, **kwargs):
+        self._next_flush = None
+
+    def maybe_flush(self):
+        # Se llama en cada inc/observe: sin modo multiproceso solo compara un float
+        next_flush = self._next_flush
+        if next_flush is None:
+            next_flush = self._schedule_flush()
+        if time.monotonic() >= next_flush:
+            self.flush()
+
+    def _schedule_flush(self) -> float:
+        if not self.multiproc_dir():
+            self._next_flush = math.inf
+        else:
+            interval = getattr(settings, 'METRICS_FLUSH_SECONDS', DEFAULT_FLUSH_SECONDS)
+            self._next_flush = self._last_flush + interval
+        return self._next_flush
+
+    def flush(self, directory: Optional[str] = None):
+        """Escribe los valores de este proceso en su archivo (reemplazo atómico)"""
+        directory = directory or self.multiproc_dir()
+        if not directory:
+            return
+        with self._flush_lock:
+            self._last_flush = time.monotonic()
+            self._next_flush = None
+            if not self._atexit_registered:
+                atexit.register(self.flush)
+                self._atexit_registered = True
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, self.process_filename())
+            temporary = f'{path}.tmp'
+            with open(temporary, 'w', encoding='utf-8') as handle:
+                json.dump({name: metric.snapshot() for name, metric in self.metrics.items()}, handle)
+            os.replace(temporary, path)
+
+    def collect(self) -> Dict[str, list]:
+        """Valores por métrica: de este proceso, o sumados entre procesos en modo multiproceso"""
+        directory = self.multiproc_dir()
+        if not directory:
+            return {name: metric.snapshot() for name, metric in self.metrics.items()}
+
+        self.flush(directory)
+        merged = {name: {} for name in self.metrics}
+        for filename in sorted(os.listdir(directory)):
+            if not (filename.startswith('metrics_') and filename.endswith('.json')):
+                continue
+            try:
+                with open(os.path.join(directory, filename), encoding='utf-8') as handle:
+                    data = json.load(handle)
+            except (OSError, ValueError):
+                continue
+            for name, samples in data.items():
+                if name not in merged:
+                    continue
+                target = merged[name]
+                for labels, value in samples:
+                    key = tuple(labels)
+                    if isinstance(value, dict):
+                        current = target.setdefault(key, {'buckets': [0] * len(value['buckets']), 'sum': 0.0, 'count': 0})
+                        if len(current['buckets']) != len(value['buckets']):
+                            # Buckets cambiados entre versiones: se descarta el archivo viejo
+                            continue
+                        current['buckets'] = [a + b for a, b in zip(current['buckets'], value['buckets'])]
+                        current['sum'] += value['sum']
+                        current['count'] += value['count']
+                    else:
+                        target[key] = target.get(key, 0) + value
+        return {name: [[list(key), value] for key, value in samples.items()] for name, samples in merged.items()}
+
+    # --- Exposición ---
+
+    def render(self) -> str:
+        lines = []
+        collected = self.collect()
+        for name, metric in self.metrics.items():
+            lines.append(f'# HELP {name} {_escape_help(metric.documentation)}')
+            lines.append(f'# TYPE {name} {metric.type}')
+            for labels, value in sorted(collected.get(name, [])):
+                pairs = list(zip(metric.labelnames, labels))
+                if metric.type == 'histogram':
+                    cumulative = 0
+                    bounds = [_format_value(bound) for bound in metric.buckets] + ['+Inf']
+                    for bound, count in zip(bounds, value['buckets']):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{_format_labels(pairs + [("le", bound)])} {cumulative}')
+                    lines.append(f'{name}_sum{_format_labels(pairs)} {_format_value(value["sum"])}')
+                    lines.append(f'{name}_count{_format_labels(pairs)} {value["count"]}')
+                else:
+                    lines.append(f'{name}{_format_labels(pairs)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape_help(text: str) -> str:
+    return text.replace('\\', r'\\').replace('\n', r'\n')
+
+
+def _escape_label(value: str) -> str:
+    return value.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _format_labels(pairs) -> str:
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape_label(str(value))}"' for name, value in pairs) + '}'
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, float):
+        if math.isinf(value):
+            return '+Inf' if value > 0 else '-Inf'
+        return repr(value)
+    return str(value)
+
+
+registry = Registry()
+setting_changed.connect(registry.settings_changed)
+
+
+def counter(name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+    return registry.register(Counter(name, documentation, labelnames))
+
+
+def histogram(name: str, documentation: str, labelnames: Iterable[str] = (),
+              buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+    return registry.register(Histogram(name, documentation, labelnames, buckets))
+
+
+# === Etiqueta de operador con cardinalidad acotada ===
+
+_operators_lock = threading.Lock()
+_seen_operators = set()
+
+
+def operator_label(operator_id) -> str:
+    """Id del operador como etiqueta, u "other" fuera del límite de cardinalidad"""
+    if operator_id is None:
+        return 'none'
+    value = str(operator_id)
+
+    allowed = getattr(settings, 'METRICS_OPERATOR_IDS', None)
+    if allowed is not None:
+        return value if value in {str(operator) for operator in allowed} else OTHER
+
+    with _operators_lock:
+        if value in _seen_operators:
+            return value
+        if len(_seen_operators) < getattr(settings, 'METRICS_MAX_OPERATORS', DEFAULT_MAX_OPERATORS):
+            _seen_operators.add(value)
+            return value
+    return OTHER
+
+
+def request_operator_label(request) -> str:
+    """Etiqueta del operador autenticado (request.user es el Operator en esta API)"""
+    return operator_label(getattr(getattr(request, 'user', None), 'pk', None))
+
+
+def timed_view(metric: Histogram):
+    """Decorador para vistas: observa su duración con la etiqueta del operador autenticado"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            with metric.time(operator=request_operator_label(request)):
+                return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# === Métricas del servicio ===
+
+BALLS_DRAWN = counter(
+    'bingo_balls_drawn_total', 'Bolas extraídas', ['operator'])
+DRAW_SECONDS = histogram(
+    'bingo_draw_seconds', 'Duración de la extracción de una bola (incluye la espera del lock)', ['operator'])
+DRAW_LOCK_WAIT_SECONDS = histogram(
+    'bingo_draw_lock_wait_seconds', 'Espera por el lock de extracción de la partida')
+PATTERN_CHECK_SECONDS = histogram(
+    'bingo_pattern_check_seconds', 'Duración de la verificación de los patrones de un cartón', ['source'],
+    buckets=FAST_BUCKETS)
+WINNER_CHECK_SECONDS = histogram(
+    'bingo_winner_check_seconds', 'Duración de la verificación de todos los cartones de una partida', ['operator'])
+WINNERS_FOUND = counter(
+    'bingo_winners_total', 'Cartones ganadores encontrados por check-all-cards', ['operator'])
+CARDS_GENERATED = counter(
+    'bingo_cards_generated_total', 'Cartones generados', ['operator', 'source'])
+CARD_GENERATION_SECONDS = histogram(
+    'bingo_card_generation_seconds', 'Duración de la generación de cartones de un pack o sesión', ['source'])
+AUTH_TOTAL = counter(
+    'bingo_auth_total', 'Intentos de autenticación por backend y resultado', ['backend', 'result'])
+AUTH_SECONDS = histogram(
+    'bingo_auth_seconds', 'Duración de la autenticación por backend', ['backend'])
+CARD_TRANSITIONS = counter(
+    'bingo_card_transitions_total', 'Reservas, ventas y liberaciones de cartones', ['transition', 'result'])
+
+
+@contextmanager
+def observe_auth(backend: str):
+    """
+    Cuenta y cronometra una autenticación
+
+    El resultado es "success" si devuelve credenciales, "anonymous" si no
+    aplica (devuelve None) y "failure" si lanza excepción.
+    """
+    outcome = {'result': 'anonymous'}
+    started = time.perf_counter()
+    try:
+        yield outcome
+    except Exception:
+        outcome['result'] = 'failure'
+        raise
+    finally:
+        AUTH_SECONDS.observe(time.perf_counter() - started, backend=backend)
+        AUTH_TOTAL.inc(backend=backend, result=outcome['result'])
+
+
+def metrics_view(request):
+    """GET /metrics: formato de texto de Prometheus (Bearer METRICS_AUTH_TOKEN, staff o DEBUG)"""
+    token = getattr(settings, 'METRICS_AUTH_TOKEN', None)
+    if token:
+        allowed = request.META.get('HTTP_AUTHORIZATION') == f'Bearer {token}'
+    else:
+        user = getattr(request, 'user', None)
+        allowed = settings.DEBUG or bool(user and user.is_staff)
+    if not allowed:
+        return HttpResponse('No autorizado\n', status=401, content_type='text/plain; charset=utf-8')
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,220 @@
+"""
+Métricas por petición: consultas SQL, tiempo de base de datos, de vista y de serializers
+
+En las peticiones muestreadas (REQUEST_TIMING_SAMPLE_RATE) se registra:
+
+- db: consultas y tiempo total en la base de datos (execute_wrapper en todas
+  las conexiones)
+- view: tiempo dentro de la vista (incluye su SQL y sus serializers)
+- ser: tiempo en `serializer.data` (solo el serializer más externo)
+- render: tiempo de renderizar la respuesta DRF a JSON
+- total: la petición completa a partir de este middleware
+
+Se devuelven en la cabecera `Server-Timing` (visible en las DevTools del
+navegador) y en una línea JSON del logger `bingo.request_timing`. Si la
+petición tarda más de REQUEST_TIMING_SLOW_MS se registra como WARNING con su
+SQL: las consultas más lentas y las que se repiten (N+1), cada una recortada a
+REQUEST_TIMING_MAX_SQL_LENGTH caracteres (un IN con miles de parámetros no
+llena el log). total - db es el
+tiempo de CPU del proceso: así se distingue un check-all-cards lento por CPU
+de uno lento por base de datos.
+
+Las peticiones no muestreadas solo pagan un random().
+"""
+
+import json
+import logging
+import random
+import time
+from collections import Counter
+from contextlib import ExitStack
+from contextvars import ContextVar
+from typing import Optional
+
+from django.conf import settings
+from django.db import connections
+
+
+logger = logging.getLogger('bingo.request_timing')
+
+DEFAULT_SAMPLE_RATE = 0.0
+DEFAULT_SLOW_MS = 500
+DEFAULT_MAX_CAPTURED_QUERIES = 20
+DEFAULT_MAX_SQL_LENGTH = 1000
+
+_current: ContextVar[Optional['RequestTiming']] = ContextVar('bingo_request_timing', default=None)
+
+
+class RequestTiming:
+    """Mediciones de una petición muestreada"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.queries = []
+        self.serializer_seconds = 0.0
+        self.serializer_depth = 0
+        self.view_started = None
+        self.view_seconds = None
+        self.render_started = None
+
+    def __call__(self, execute, sql, params, many, context):
+        """execute_wrapper: cuenta y cronometra cada consulta"""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.db_queries += 1
+            self.db_seconds += elapsed
+            self.queries.append((sql, elapsed))
+
+    def finish_view(self):
+        if self.view_started is not None and self.view_seconds is None:
+            self.view_seconds = time.perf_counter() - self.view_started
+
+    def as_dict(self, total_seconds: float, render_seconds: float) -> dict:
+        return {
+            'total_ms': round(total_seconds * 1000, 3),
+            'view_ms': round((self.view_seconds or 0.0) * 1000, 3),
+            'db_ms': round(self.db_seconds * 1000, 3),
+            'db_queries': self.db_queries,
+            'serializer_ms': round(self.serializer_seconds * 1000, 3),
+            'render_ms': round(render_seconds * 1000, 3),
+        }
+
+    def captured_sql(self, limit: int, max_sql_length: int = DEFAULT_MAX_SQL_LENGTH) -> dict:
+        """Consultas más lentas y consultas repetidas (mismo SQL, otros parámetros)"""
+        def truncate(sql: str) -> str:
+            if len(sql) <= max_sql_length:
+                return sql
+            return f'{sql[:max_sql_length]}... [+{len(sql) - max_sql_length} caracteres]'
+
+        slowest = sorted(self.queries, key=lambda query: query[1], reverse=True)[:limit]
+        repeated = Counter(sql for sql, _ in self.queries)
+        return {
+            'slowest': [{'sql': truncate(sql), 'ms': round(elapsed * 1000, 3)} for sql, elapsed in slowest],
+            'repeated': [
+                {'sql': truncate(sql), 'count': count} for sql, count in repeated.most_common(limit) if count > 1
+            ],
+        }
+
+
+def current_timing() -> Optional[RequestTiming]:
+    """Mediciones de la petición en curso (None si no está muestreada)"""
+    return _current.get()
+
+
+def _timed_serializer_data(original):
+    """Envuelve la propiedad `data` de un serializer para acumular su tiempo"""
+
+    def data(self):
+        timing = _current.get()
+        if timing is None:
+            return original(self)
+        # ListSerializer.data llama a Serializer.data: solo cuenta el externo
+        timing.serializer_depth += 1
+        started = time.perf_counter()
+        try:
+            return original(self)
+        finally:
+            timing.serializer_depth -= 1
+            if timing.serializer_depth == 0:
+                timing.serializer_seconds += time.perf_counter() - started
+
+    return property(data)
+
+
+def install_serializer_timing():
+    """Instala el cronómetro de serializers (idempotente; se llama desde BingoConfig.ready)"""
+    from rest_framework import serializers
+
+    for cls in (serializers.BaseSerializer, serializers.Serializer, serializers.ListSerializer):
+        prop = cls.__dict__.get('data')
+        if isinstance(prop, property) and not getattr(prop.fget, '_request_timing', False):
+            wrapped = _timed_serializer_data(prop.fget)
+            wrapped.fget._request_timing = True
+            setattr(cls, 'data', wrapped)
+
+
+def server_timing_header(metrics: dict) -> str:
+    return ', '.join([
+        f'db;dur={metrics["db_ms"]:.1f};desc="{metrics["db_queries"]} queries"',
+        f'view;dur={metrics["view_ms"]:.1f}',
+        f'ser;dur={metrics["serializer_ms"]:.1f}',
+        f'render;dur={metrics["render_ms"]:.1f}',
+        f'total;dur={metrics["total_ms"]:.1f}',
+    ])
+
+
+class RequestTimingMiddleware:
+    """
+    Server-Timing y log estructurado por petición muestreada
+
+    Settings:
+        REQUEST_TIMING_SAMPLE_RATE: fracción de peticiones medidas (0 a 1)
+        REQUEST_TIMING_SLOW_MS: umbral para registrar el SQL de la petición
+        REQUEST_TIMING_MAX_CAPTURED_QUERIES: consultas por lista en el log
+        REQUEST_TIMING_MAX_SQL_LENGTH: caracteres por consulta en el log
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sample_rate = getattr(settings, 'REQUEST_TIMING_SAMPLE_RATE', DEFAULT_SAMPLE_RATE)
+        if sample_rate <= 0 or (sample_rate < 1 and random.random() >= sample_rate):
+            return self.get_response(request)
+
+        timing = RequestTiming()
+        token = _current.set(timing)
+        try:
+            with ExitStack() as stack:
+                # connections[alias] no abre la conexión: solo registra el wrapper
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(timing))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        finished = time.perf_counter()
+        timing.finish_view()
+        render_seconds = finished - timing.render_started if timing.render_started else 0.0
+        metrics = timing.as_dict(finished - timing.started, render_seconds)
+        response['Server-Timing'] = server_timing_header(metrics)
+        self._log(request, response, timing, metrics)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timing = _current.get()
+        if timing is not None:
+            timing.view_started = time.perf_counter()
+        return None
+
+    def process_template_response(self, request, response):
+        # Las respuestas DRF se renderizan después de la vista
+        timing = _current.get()
+        if timing is not None:
+            timing.finish_view()
+            timing.render_started = time.perf_counter()
+        return response
+
+    def _log(self, request, response, timing: RequestTiming, metrics: dict):
+        match = getattr(request, 'resolver_match', None)
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'route': match.route if match else None,
+            'status': response.status_code,
+            **metrics,
+        }
+        slow_ms = getattr(settings, 'REQUEST_TIMING_SLOW_MS', DEFAULT_SLOW_MS)
+        if metrics['total_ms'] >= slow_ms:
+            limit = getattr(settings, 'REQUEST_TIMING_MAX_CAPTURED_QUERIES', DEFAULT_MAX_CAPTURED_QUERIES)
+            max_sql_length = getattr(settings, 'REQUEST_TIMING_MAX_SQL_LENGTH', DEFAULT_MAX_SQL_LENGTH)
+            record['sql'] = timing.captured_sql(limit, max_sql_length)
+            logger.warning(json.dumps(record), extra={'request_timing': record})
+        else:
+            logger.info(json.dumps(record), extra={'request_timing': record})
+
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-19 14:54
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def init_allocation_cursor(apps, schema_editor):
+    """Sitúa el cursor después de la última carta ya asignada de cada pack"""
+    CardPack = apps.get_model('bingo', 'CardPack')
+    BingoCardExtended = apps.get_model('bingo', 'BingoCardExtended')
+
+    last_owned = BingoCardExtended.objects.filter(
+        pack__isnull=False,
+        owners__isnull=False
+    ).values('pack_id').annotate(last_number=Max('card_number'))
+
+    for row in last_owned:
+        CardPack.objects.filter(pk=row['pack_id']).update(allocation_cursor=row['last_number'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bingo', '0006_alter_bingocardextended_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cardpack',
+            name='allocation_cursor',
+            field=models.IntegerField(default=0, help_text='Cursor de asignación: las cartas con card_number <= cursor ya fueron entregadas'),
+        ),
+        migrations.AddIndex(
+            model_name='bingocardextended',
+            index=models.Index(fields=['pack', 'card_number'], name='bingo_card_pack_number_idx'),
+        ),
+        migrations.RunPython(init_allocation_cursor, migrations.RunPython.noop),
+    ]
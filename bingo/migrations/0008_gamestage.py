@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-19 15:00
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bingo', '0007_cardpack_allocation_cursor_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GameStage',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('order', models.PositiveSmallIntegerField(help_text='Orden de la etapa dentro de la partida (1, 2, 3...)')),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('active', 'En juego'), ('won', 'Ganada')], default='pending', max_length=20)),
+                ('winners', models.JSONField(blank=True, default=list, help_text='Cartones ganadores de la etapa')),
+                ('won_at_ball', models.IntegerField(blank=True, help_text='Cantidad de bolas extraídas al ganar la etapa', null=True)),
+                ('winning_number', models.IntegerField(blank=True, help_text='Bola con la que se ganó la etapa', null=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('game', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stages', to='bingo.bingogameextended')),
+                ('pattern', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='game_stages', to='bingo.winningpattern')),
+            ],
+            options={
+                'verbose_name': 'Etapa de Partida',
+                'verbose_name_plural': 'Etapas de Partida',
+                'ordering': ['game', 'order'],
+                'unique_together': {('game', 'order')},
+            },
+        ),
+    ]
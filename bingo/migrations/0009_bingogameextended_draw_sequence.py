@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 15:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bingo', '0008_gamestage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bingogameextended',
+            name='draw_sequence',
+            field=models.JSONField(blank=True, default=list, help_text='Secuencia de extracción comprometida al iniciar la partida'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-19 15:07
+
+from django.db import migrations, models
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+
+def init_sequence(apps, schema_editor):
+    """Numera las bolas ya extraídas de cada partida según drawn_at"""
+    DrawnBall = apps.get_model('bingo', 'DrawnBall')
+
+    numbered = DrawnBall.objects.annotate(
+        position=Window(
+            expression=RowNumber(),
+            partition_by=[F('game_id')],
+            order_by=[F('drawn_at').asc(), F('id').asc()]
+        )
+    ).values_list('id', 'position')
+
+    balls = [DrawnBall(id=ball_id, sequence=position) for ball_id, position in numbered]
+    DrawnBall.objects.bulk_update(balls, ['sequence'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bingo', '0009_bingogameextended_draw_sequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='drawnball',
+            name='sequence',
+            field=models.PositiveIntegerField(blank=True, help_text='Orden de extracción dentro de la partida (1, 2, 3...)', null=True),
+        ),
+        migrations.RunPython(init_sequence, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-19 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bingo', '0010_drawnball_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyRecord',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('scope_hash', models.CharField(help_text='SHA-256 del alcance de la clave', max_length=64, unique=True)),
+                ('request_hash', models.CharField(help_text='SHA-256 del cuerpo de la petición original', max_length=64)),
+                ('status', models.CharField(choices=[('in_progress', 'En curso'), ('completed', 'Completada')], default='in_progress', max_length=20)),
+                ('response_status', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('response_body', models.JSONField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
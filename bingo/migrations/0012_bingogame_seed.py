@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-19 15:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bingo', '0011_idempotencyrecord'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bingogame',
+            name='seed_hash',
+            field=models.CharField(blank=True, default='', help_text='SHA-256 de la semilla, publicado al crear la partida', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='bingogame',
+            name='seed_revealed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='bingogame',
+            name='server_seed',
+            field=models.CharField(blank=True, default='', help_text='Semilla secreta de la extracción (se revela al terminar)', max_length=64),
+        ),
+    ]
@@ -0,0 +1,44 @@
+from django.db import migrations
+from django.db.models import Max, Min
+
+
+def backfill_allocation_cursor(apps, schema_editor):
+    """
+    Sitúa el cursor justo antes de la primera carta sin dueño de cada pack
+
+    0007 lo dejaba en la última carta asignada: las cartas sin dueño anteriores
+    a esa (huecos por regalos o asignaciones fuera de orden) quedaban fuera del
+    alcance de allocate_cards, que ahora busca card_number > cursor.
+    """
+    CardPack = apps.get_model('bingo', 'CardPack')
+    BingoCardExtended = apps.get_model('bingo', 'BingoCardExtended')
+
+    first_unowned = dict(
+        BingoCardExtended.objects.filter(pack__isnull=False, owners__isnull=True)
+        .values('pack_id').annotate(first_number=Min('card_number'))
+        .values_list('pack_id', 'first_number')
+    )
+    last_number = dict(
+        BingoCardExtended.objects.filter(pack__isnull=False)
+        .values('pack_id').annotate(last_number=Max('card_number'))
+        .values_list('pack_id', 'last_number')
+    )
+
+    for pack_id in CardPack.objects.filter(cards_generated=True).values_list('pk', flat=True):
+        if pack_id in first_unowned:
+            cursor = first_unowned[pack_id] - 1
+        else:
+            # Pack agotado (o sin cartas)
+            cursor = last_number.get(pack_id) or 0
+        CardPack.objects.filter(pk=pack_id).update(allocation_cursor=cursor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bingo', '0012_bingogame_seed'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_allocation_cursor, migrations.RunPython.noop),
+    ]
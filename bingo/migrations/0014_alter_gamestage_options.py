@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:33
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bingo', '0013_backfill_cardpack_allocation_cursor'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='gamestage',
+            options={'ordering': ['order'], 'verbose_name': 'Etapa de Partida', 'verbose_name_plural': 'Etapas de Partida'},
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 16:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bingo', '0014_alter_gamestage_options'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bingosession',
+            name='finalized_at',
+            field=models.DateTimeField(blank=True, help_text='Cuándo finalize_session() liquidó las cartas y estadísticas de la sesión', null=True),
+        ),
+    ]
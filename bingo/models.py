@@ -1,11 +1,17 @@
 from django.db import models
 import uuid
 import random
-from typing import List, Dict, Set
+from typing import List, Dict, Optional, Set
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import RegexValidator
 import secrets
 import hashlib
+import time
+
+from .metrics import (
+    BALLS_DRAWN, CARD_GENERATION_SECONDS, CARD_TRANSITIONS, CARDS_GENERATED,
+    DRAW_SECONDS, PATTERN_CHECK_SECONDS, operator_label,
+)
 
 
 class BingoCard(models.Model):
@@ -28,11 +34,16 @@ class BingoCard(models.Model):
         return f"Bingo {self.bingo_type} - {self.id}"
     
     @classmethod
-    def generate_90_ball_card(cls) -> List[List]:
+    def generate_90_ball_card(cls, rng: Optional[random.Random] = None) -> List[List]:
         """
         Genera un cartón de bingo de 90 bolas (3x9)
         Cada fila tiene exactamente 5 números y 4 espacios vacíos
+        
+        Args:
+            rng: generador propio (random.Random) para cartones reproducibles;
+                por defecto el módulo random
         """
+        rng = rng or random
         max_attempts = 100
         for attempt in range(max_attempts):
             try:
@@ -41,7 +52,7 @@ class BingoCard(models.Model):
                 # Generar números para cada fila, asegurando exactamente 5 por fila
                 for row in range(3):
                     # Seleccionar 5 columnas aleatorias para esta fila
-                    selected_cols = random.sample(range(9), 5)
+                    selected_cols = rng.sample(range(9), 5)
                     
                     # Llenar las columnas seleccionadas
                     for col in selected_cols:
@@ -56,7 +67,7 @@ class BingoCard(models.Model):
                         available_numbers = [num for num in available_numbers if num not in used_numbers]
                         
                         if available_numbers:
-                            card[row][col] = random.choice(available_numbers)
+                            card[row][col] = rng.choice(available_numbers)
                         else:
                             # No hay números disponibles, reintentar
                             raise ValueError("No hay números disponibles")
@@ -66,7 +77,7 @@ class BingoCard(models.Model):
                     col_numbers = [card[row][col] for row in range(3)]
                     if all(num is None for num in col_numbers):
                         # Esta columna está vacía, agregar un número
-                        row = random.randint(0, 2)
+                        row = rng.randint(0, 2)
                         if col == 8:
                             available_numbers = list(range(80, 91))
                         else:
@@ -77,7 +88,7 @@ class BingoCard(models.Model):
                         available_numbers = [num for num in available_numbers if num not in used_numbers]
                         
                         if available_numbers:
-                            card[row][col] = random.choice(available_numbers)
+                            card[row][col] = rng.choice(available_numbers)
                         else:
                             raise ValueError("No se pudo llenar columna vacía")
                 
@@ -94,13 +105,14 @@ class BingoCard(models.Model):
                 continue
         
         # Si llegamos aquí, usar un método más simple pero garantizado
-        return cls._generate_simple_90_ball_card()
+        return cls._generate_simple_90_ball_card(rng)
     
     @classmethod
-    def _generate_simple_90_ball_card(cls) -> List[List]:
+    def _generate_simple_90_ball_card(cls, rng: Optional[random.Random] = None) -> List[List]:
         """
         Método alternativo más simple para generar cartones de 90 bolas
         """
+        rng = rng or random
         card = [[None for _ in range(9)] for _ in range(3)]
         
         # Generar números por columna
@@ -112,12 +124,12 @@ class BingoCard(models.Model):
                 numbers = list(range(col * 10 + 1, (col + 1) * 10 + 1))
             
             # Seleccionar 1-3 números para esta columna
-            num_count = random.randint(1, 3)
-            selected_numbers = random.sample(numbers, num_count)
+            num_count = rng.randint(1, 3)
+            selected_numbers = rng.sample(numbers, num_count)
             
             # Colocar los números en filas aleatorias
             available_rows = list(range(3))
-            random.shuffle(available_rows)
+            rng.shuffle(available_rows)
             
             for i, num in enumerate(selected_numbers):
                 if i < len(available_rows):
@@ -135,7 +147,7 @@ class BingoCard(models.Model):
                 
                 # Seleccionar columnas aleatorias para completar
                 if len(empty_cols) >= needed:
-                    cols_to_fill = random.sample(empty_cols, needed)
+                    cols_to_fill = rng.sample(empty_cols, needed)
                     
                     for col in cols_to_fill:
                         # Rango de números para esta columna
@@ -149,16 +161,17 @@ class BingoCard(models.Model):
                         available_numbers = [num for num in available_numbers if num not in used_numbers]
                         
                         if available_numbers:
-                            card[row][col] = random.choice(available_numbers)
+                            card[row][col] = rng.choice(available_numbers)
         
         return card
     
     @classmethod
-    def generate_75_ball_card(cls) -> List[List]:
+    def generate_75_ball_card(cls, rng: Optional[random.Random] = None) -> List[List]:
         """
         Genera un cartón de bingo de 75 bolas (5x5)
         Formato clásico americano con centro libre
         """
+        rng = rng or random
         card = [[None for _ in range(5)] for _ in range(5)]
         
         # Definir rangos para cada columna (B-I-N-G-O)
@@ -176,7 +189,7 @@ class BingoCard(models.Model):
             numbers = list(range(start, end))
             
             # Seleccionar 5 números para esta columna
-            selected_numbers = random.sample(numbers, 5)
+            selected_numbers = rng.sample(numbers, 5)
             
             # Colocar los números en la columna
             for row in range(5):
@@ -188,11 +201,12 @@ class BingoCard(models.Model):
         return card
     
     @classmethod
-    def generate_85_ball_card(cls) -> List[List]:
+    def generate_85_ball_card(cls, rng: Optional[random.Random] = None) -> List[List]:
         """
         Genera un cartón de bingo de 85 bolas (5x5)
         Formato estilo bingo americano
         """
+        rng = rng or random
         card = [[None for _ in range(5)] for _ in range(5)]
         
         # Definir rangos para cada columna (B-I-N-G-O)
@@ -210,7 +224,7 @@ class BingoCard(models.Model):
             numbers = list(range(start, end))
             
             # Seleccionar 5 números para esta columna
-            selected_numbers = random.sample(numbers, 5)
+            selected_numbers = rng.sample(numbers, 5)
             
             # Colocar los números en la columna
             for row in range(5):
@@ -639,19 +653,147 @@ class BingoGame(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     is_active = models.BooleanField(default=True)
     
+    # Extracción demostrablemente justa (ver bingo/fairness.py): el orden de
+    # las bolas se deriva de server_seed, que solo se revela al terminar
+    server_seed = models.CharField(max_length=64, blank=True, default='', help_text="Semilla secreta de la extracción (se revela al terminar)")
+    seed_hash = models.CharField(max_length=64, blank=True, default='', help_text="SHA-256 de la semilla, publicado al crear la partida")
+    seed_revealed_at = models.DateTimeField(null=True, blank=True)
+    
     def __str__(self):
         return f"Bingo {self.game_type} - {self.name or self.id}"
     
+    def save(self, *args, **kwargs):
+        from django.utils import timezone
+        from .fairness import generate_server_seed, seed_commitment
+        
+        # La partida se compromete con la semilla desde su creación
+        if self._state.adding and not self.server_seed:
+            self.server_seed = generate_server_seed()
+            self.seed_hash = seed_commitment(self.server_seed)
+        
+        # Terminar es definitivo: con la semilla revelada las bolas que
+        # faltan serían predecibles
+        if not self._state.adding and self.is_active and self.seed_revealed_at is not None:
+            raise ValueError("Una partida terminada no se puede reactivar")
+        
+        # Al terminar la partida la semilla queda revelada
+        if not self.is_active and self.server_seed and self.seed_revealed_at is None:
+            self.seed_revealed_at = timezone.now()
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'seed_revealed_at'}
+        
+        super().save(*args, **kwargs)
+    
+    def is_finished(self) -> bool:
+        """La partida terminó: no admite más bolas ni volver a activarse"""
+        return not self.is_active or self.seed_revealed_at is not None
+    
+    def refresh_finished_state(self) -> bool:
+        """Relee is_active y seed_revealed_at (dentro del lock de extracción) y retorna is_finished()"""
+        state = BingoGame.objects.filter(pk=self.pk).values_list('is_active', 'seed_revealed_at').first()
+        if state is not None:
+            self.is_active, self.seed_revealed_at = state
+        return self.is_finished()
+    
+    def get_total_balls(self) -> int:
+        """Cantidad de bolas del bombo según el tipo de juego"""
+        return {'75': 75, '85': 85, '90': 90}.get(self.game_type, 90)
+    
+    def get_seed_sequence(self, count: Optional[int] = None) -> List[int]:
+        """Primeras `count` bolas derivadas de la semilla (lista vacía si la partida no tiene semilla)"""
+        from .fairness import derive_sequence
+        
+        if not self.server_seed:
+            return []
+        return derive_sequence(self.server_seed, self.id, self.get_total_balls(), count)
+    
+    def get_draw_sequence(self) -> List[int]:
+        """Secuencia derivada de la semilla (lista vacía si la partida no tiene semilla)"""
+        if not self.server_seed:
+            return []
+        # Derivarla es barato, pero se consulta en cada bola: se cachea por instancia
+        cached = self.__dict__.get('_seed_sequence')
+        if cached is None or cached[0] != self.server_seed:
+            cached = self.__dict__['_seed_sequence'] = (self.server_seed, self.get_seed_sequence())
+        return list(cached[1])
+    
+    def get_committed_ball(self, drawn_count: int) -> Optional[int]:
+        """Siguiente bola de la secuencia comprometida, o None si no hay secuencia o se agotó"""
+        sequence = self.get_draw_sequence()
+        if drawn_count < len(sequence):
+            return sequence[drawn_count]
+        return None
+    
+    def get_ball_limit(self) -> int:
+        """Bolas que se pueden extraer"""
+        return self.get_total_balls()
+    
+    def draw_next_ball(self) -> tuple:
+        """
+        Extrae la siguiente bola dentro de la sección crítica de la partida
+        
+        Leer las bolas extraídas, elegir la siguiente e insertarla ocurre bajo
+        el lock de la partida (locks.game_draw_lock), así que extracciones
+        concurrentes esperan en cola en vez de repetir bola o pasar el límite.
+        
+        Returns:
+            (DrawnBall o None si la partida terminó o no quedan bolas, total extraídas, segundos de espera del lock)
+        """
+        from .locks import game_draw_lock
+        
+        operator = operator_label(getattr(self, 'operator_id', None))
+        started = time.perf_counter()
+        with game_draw_lock(self.id) as lock:
+            drawn = DrawnBall.get_drawn_sequence(self.id)
+            # Otra petición pudo terminar la partida mientras se esperaba el lock
+            if self.refresh_finished_state() or len(drawn) >= self.get_ball_limit():
+                return None, len(drawn), lock.wait_seconds
+            
+            ball_number = self.get_committed_ball(len(drawn))
+            if ball_number is None:
+                available = sorted(set(range(1, self.get_total_balls() + 1)) - set(drawn))
+                ball_number = random.choice(available)
+            
+            drawn_ball = DrawnBall.objects.create(
+                game=self,
+                number=ball_number,
+                sequence=len(drawn) + 1
+            )
+        
+        DRAW_SECONDS.observe(time.perf_counter() - started, operator=operator)
+        BALLS_DRAWN.inc(operator=operator)
+        return drawn_ball, len(drawn) + 1, lock.wait_seconds
+    
+    def verify_draws(self) -> tuple[bool, str, dict]:
+        """
+        Recalcula la secuencia desde la semilla revelada y la compara con las bolas extraídas
+        
+        Returns:
+            (success, message, result); success=False si no se puede verificar todavía
+        """
+        from .fairness import verify_sequence
+        
+        if not self.seed_hash:
+            return False, "La partida no tiene semilla comprometida", {}
+        if self.seed_revealed_at is None or self.is_active:
+            return False, "La semilla se revela al terminar la partida", {}
+        
+        drawn = DrawnBall.get_drawn_sequence(self.id)
+        result = verify_sequence(self.server_seed, self.seed_hash, self.id, self.get_total_balls(), drawn)
+        message = "Extracción verificada" if result['verified'] else "La extracción no coincide con la semilla"
+        return True, message, result
+    
     def draw_ball(self) -> int:
-        """Extrae una bola aleatoria según el tipo de juego"""
-        if self.game_type == '75':
-            return random.randint(1, 75)
-        elif self.game_type == '85':
-            return random.randint(1, 85)
-        elif self.game_type == '90':
-            return random.randint(1, 90)
-        else:
+        """Extrae la siguiente bola: la derivada de la semilla, o una aleatoria en partidas sin semilla"""
+        if self.game_type not in ('75', '85', '90'):
             raise ValueError(f"Tipo de juego no válido: {self.game_type}")
+        
+        if self.server_seed:
+            drawn_count = self.drawn_balls.count()
+            if drawn_count < self.get_total_balls():
+                return self.get_seed_sequence(drawn_count + 1)[-1]
+        
+        return random.randint(1, self.get_total_balls())
 
 
 class DrawnBall(models.Model):
@@ -659,6 +801,7 @@ class DrawnBall(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     game = models.ForeignKey(BingoGame, on_delete=models.CASCADE, related_name='drawn_balls')
     number = models.IntegerField()
+    sequence = models.PositiveIntegerField(null=True, blank=True, help_text="Orden de extracción dentro de la partida (1, 2, 3...)")
     drawn_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
@@ -668,6 +811,15 @@ class DrawnBall(models.Model):
     def __str__(self):
         return f"Bola {self.get_display_name()} - Juego {self.game.id}"
     
+    def save(self, *args, **kwargs):
+        # Las extracciones en bloque comparten drawn_at: el orden real va en sequence
+        if self.sequence is None and self._state.adding:
+            last = DrawnBall.objects.filter(game_id=self.game_id).aggregate(
+                last=models.Max('sequence')
+            )['last']
+            self.sequence = (last or 0) + 1
+        super().save(*args, **kwargs)
+    
     def get_letter(self) -> str:
         """Obtiene la letra (B-I-N-G-O) según el número para bingo americano"""
         game_type = self.game.game_type
@@ -726,6 +878,13 @@ class DrawnBall(models.Model):
         """Obtiene todos los números extraídos en un juego"""
         drawn_balls = cls.objects.filter(game_id=game_id)
         return set(ball.number for ball in drawn_balls)
+    
+    @classmethod
+    def get_drawn_sequence(cls, game_id: str) -> List[int]:
+        """Obtiene los números extraídos en orden de extracción"""
+        return list(
+            cls.objects.filter(game_id=game_id).order_by('sequence', 'drawn_at').values_list('number', flat=True)
+        )
 
 
 # === MODELOS PARA SISTEMA MULTI-TENANT ===
@@ -845,6 +1004,10 @@ class BingoSession(models.Model):
     scheduled_start = models.DateTimeField(help_text="Fecha y hora programada de inicio")
     actual_start = models.DateTimeField(null=True, blank=True, help_text="Fecha y hora real de inicio")
     actual_end = models.DateTimeField(null=True, blank=True, help_text="Fecha y hora real de fin")
+    finalized_at = models.DateTimeField(
+        null=True, blank=True,
+        help_text="Cuándo finalize_session() liquidó las cartas y estadísticas de la sesión"
+    )
     
     # Estado
     STATUS_CHOICES = [
@@ -876,40 +1039,53 @@ class BingoSession(models.Model):
         return f"{self.name} - {self.operator.name} ({self.bingo_type} bolas)"
     
     def get_winning_patterns(self):
-        """Retorna los patrones ganadores configurados como objetos WinningPattern"""
-        if not self.winning_patterns:
-            # Patrones por defecto
-            return WinningPattern.objects.filter(
-                code__in=['horizontal_line', 'vertical_line', 'full_card'],
-                is_active=True
-            )
+        """
+        Retorna los patrones ganadores configurados como objetos WinningPattern
         
-        # Retornar patrones configurados
-        return WinningPattern.objects.filter(
-            code__in=self.winning_patterns,
-            is_active=True
-        )
+        Sin winning_patterns se usan los por defecto (líneas y cartón lleno).
+        Se resuelven desde el catálogo en memoria (bingo.pattern_registry):
+        lista de solo lectura, sin consulta por llamada.
+        """
+        from .pattern_registry import session_patterns
+        
+        return session_patterns(self)
     
     def generate_cards_for_session(self):
         """Genera los cartones para esta sesión y devuelve todos los cartones generados"""
         if self.cards_generated:
             return False, "Los cartones ya fueron generados para esta sesión", []
         
-        # Generar cartones
-        cards_created = []
-        for i in range(self.total_cards):
-            card = BingoCardExtended.create_card(
+        from django.db import transaction
+        
+        generators = {
+            '75': BingoCard.generate_75_ball_card,
+            '85': BingoCard.generate_85_ball_card,
+            '90': BingoCard.generate_90_ball_card,
+        }
+        if self.bingo_type not in generators:
+            raise ValueError(f"Tipo de bingo no válido: {self.bingo_type}")
+        generate = generators[self.bingo_type]
+        started = time.perf_counter()
+        
+        # Generar cartones en memoria e insertarlos en lote
+        cards_created = [
+            BingoCardExtended(
+                user_id=f"session_{self.id}_card_{i+1}",
                 bingo_type=self.bingo_type,
-                user_id=f"session_{self.id}_card_{i+1}"
+                numbers=generate(),
+                session=self,
+                status='available',
+                card_number=i + 1
             )
-            card.session = self
-            card.status = 'available'
-            card.card_number = i + 1
-            card.save()
-            cards_created.append(card)
+            for i in range(self.total_cards)
+        ]
         
-        self.cards_generated = True
-        self.save()
+        with transaction.atomic():
+            BingoCardExtended.bulk_create_cards(cards_created)
+            self.cards_generated = True
+            self.save()
+        CARD_GENERATION_SECONDS.observe(time.perf_counter() - started, source='session')
+        CARDS_GENERATED.inc(len(cards_created), operator=operator_label(self.operator_id), source='session')
         
         # ✅ CORREGIDO: Ahora devuelve los cartones en la respuesta
         return True, f"{len(cards_created)} cartones generados exitosamente", cards_created
@@ -925,6 +1101,152 @@ class BingoSession(models.Model):
     def get_sold_cards(self):
         """Retorna los cartones vendidos"""
         return self.cards.filter(status='sold')
+    
+    @staticmethod
+    def annotate_counts(queryset):
+        """
+        Anota jugadores activos y cartones (totales, disponibles y vendidos)
+        
+        BingoSessionSerializer usa las anotaciones si existen; sin ellas hace
+        cuatro COUNT por sesión al listar.
+        """
+        from django.db.models import Count, OuterRef, Subquery, Value
+        from django.db.models.functions import Coalesce
+        
+        def count_of(queryset):
+            return Coalesce(
+                Subquery(
+                    queryset.values('session').annotate(total=Count('id')).values('total')[:1]
+                ),
+                Value(0)
+            )
+        
+        cards = BingoCardExtended.objects.filter(session=OuterRef('pk'))
+        return queryset.annotate(
+            players_total=count_of(PlayerSession.objects.filter(session=OuterRef('pk'), is_active=True)),
+            cards_total=count_of(cards),
+            available_cards_total=count_of(cards.filter(status='available')),
+            sold_cards_total=count_of(cards.filter(status='sold')),
+        )
+    
+    def finalize_session(self) -> dict:
+        """
+        Finaliza la sesión y todas sus SessionCard con operaciones en bloque
+        
+        Equivale a llamar SessionCard.finish() en cada carta, pero con unas
+        pocas sentencias UPDATE basadas en F() y subconsultas:
+        estadísticas de PlayerCard, estadísticas globales de las cartas,
+        resultados de PlayerSession y cierre de las SessionCard.
+        
+        La sesión se cierra primero con un UPDATE condicional (no cancelada y
+        sin finalized_at), que bloquea su fila y marca finalized_at: de dos
+        llamadas concurrentes solo una actualiza las estadísticas. Una sesión
+        que otro camino (admin, código anterior) dejó en 'finished' sin
+        liquidar se liquida igual; los UPDATE solo tocan cartas abiertas.
+        
+        Returns:
+            dict con el resumen de filas actualizadas, o None si la sesión ya
+            estaba liquidada o cancelada
+        """
+        from decimal import Decimal
+        from django.db import transaction
+        from django.db.models import (
+            F, Q, Exists, OuterRef, Subquery, Count, Sum, Case, When, Value
+        )
+        from django.db.models.functions import Coalesce
+        from django.utils import timezone
+        
+        now = timezone.now()
+        zero = Value(Decimal('0'), output_field=models.DecimalField(max_digits=10, decimal_places=2))
+        
+        with transaction.atomic():
+            # 0. Cerrar la sesión (solo una llamada lo consigue)
+            closed = BingoSession.objects.filter(pk=self.pk, finalized_at__isnull=True).exclude(
+                status='cancelled'
+            ).update(
+                status='finished',
+                actual_end=Coalesce(F('actual_end'), Value(now)),
+                finalized_at=now,
+                updated_at=now
+            )
+            self.refresh_from_db(fields=['status', 'actual_end', 'finalized_at', 'updated_at'])
+            if not closed:
+                return None
+            
+            open_cards = SessionCard.objects.filter(
+                session=self,
+                finished_at__isnull=True
+            ).exclude(status='cancelled')
+            
+            # 1. PlayerCard: cada par (jugador, carta) aparece una sola vez por sesión
+            pair = open_cards.filter(player=OuterRef('player'), card=OuterRef('card'))
+            player_cards_updated = PlayerCard.objects.filter(Exists(pair)).update(
+                times_used=F('times_used') + 1,
+                last_used_at=now,
+                times_won=F('times_won') + Case(
+                    When(Exists(pair.filter(is_winner=True)), then=Value(1)),
+                    default=Value(0)
+                ),
+                total_prizes=F('total_prizes') + Coalesce(
+                    Subquery(pair.filter(is_winner=True).values('prize_amount')[:1]),
+                    zero
+                )
+            )
+            
+            # 2. Estadísticas globales de la carta (solo cartas con dueño, como finish())
+            owned_instances = open_cards.filter(card=OuterRef('pk')).filter(
+                Exists(PlayerCard.objects.filter(
+                    player=OuterRef('player'),
+                    card=OuterRef('card')
+                ))
+            )
+            
+            def count_of(queryset):
+                return Coalesce(
+                    Subquery(
+                        queryset.values('card').annotate(total=Count('id')).values('total')[:1]
+                    ),
+                    Value(0)
+                )
+            
+            cards_updated = BingoCardExtended.objects.filter(Exists(owned_instances)).update(
+                total_sessions=F('total_sessions') + count_of(owned_instances),
+                total_wins=F('total_wins') + count_of(owned_instances.filter(is_winner=True))
+            )
+            
+            # 3. Resultados por jugador
+            player_wins = SessionCard.objects.filter(
+                session=self,
+                player=OuterRef('player'),
+                is_winner=True
+            )
+            winners_updated = PlayerSession.objects.filter(
+                Q(session=self) & Exists(player_wins)
+            ).update(
+                has_won=True,
+                prize_amount=Coalesce(
+                    Subquery(
+                        player_wins.values('player').annotate(total=Sum('prize_amount')).values('total')[:1]
+                    ),
+                    zero
+                )
+            )
+            
+            # 4. Cerrar las cartas de la sesión
+            cards_finished = open_cards.update(
+                status=Case(
+                    When(is_winner=True, then=Value('won')),
+                    default=Value('finished')
+                ),
+                finished_at=now
+            )
+        
+        return {
+            'cards_finished': cards_finished,
+            'player_cards_updated': player_cards_updated,
+            'cards_updated': cards_updated,
+            'winners_updated': winners_updated
+        }
 
 
 class PlayerSession(models.Model):
@@ -1002,6 +1324,9 @@ class BingoCardExtended(BingoCard):
     
     class Meta:
         ordering = ['pack', 'card_number']
+        indexes = [
+            models.Index(fields=['pack', 'card_number'], name='bingo_card_pack_number_idx'),
+        ]
     
     def __str__(self):
         return f"Cartón #{self.card_number} - {self.bingo_type} ({self.get_status_display()})"
@@ -1009,6 +1334,7 @@ class BingoCardExtended(BingoCard):
     def reserve_for_player(self, player):
         """Reserva el cartón para un jugador"""
         if self.status != 'available':
+            CARD_TRANSITIONS.inc(transition='reserve', result='rejected')
             return False, f"El cartón no está disponible (estado: {self.get_status_display()})"
         
         from django.utils import timezone
@@ -1016,12 +1342,14 @@ class BingoCardExtended(BingoCard):
         self.status = 'reserved'
         self.reserved_at = timezone.now()
         self.save()
+        CARD_TRANSITIONS.inc(transition='reserve', result='ok')
         
         return True, "Cartón reservado exitosamente"
     
     def mark_as_sold(self):
         """Marca el cartón como vendido"""
         if self.status != 'reserved':
+            CARD_TRANSITIONS.inc(transition='sell', result='rejected')
             return False, f"El cartón debe estar reservado primero (estado actual: {self.get_status_display()})"
         
         from django.utils import timezone
@@ -1029,21 +1357,191 @@ class BingoCardExtended(BingoCard):
         self.purchased_at = timezone.now()
         self.purchase_price = self.session.entry_fee if self.session else 0
         self.save()
+        CARD_TRANSITIONS.inc(transition='sell', result='ok')
         
         return True, "Cartón vendido exitosamente"
     
     def release(self):
         """Libera el cartón para que esté disponible nuevamente"""
         if self.status in ['sold', 'cancelled']:
+            CARD_TRANSITIONS.inc(transition='release', result='rejected')
             return False, f"No se puede liberar un cartón {self.get_status_display()}"
         
         self.player = None
         self.status = 'available'
         self.reserved_at = None
         self.save()
+        CARD_TRANSITIONS.inc(transition='release', result='ok')
         
         return True, "Cartón liberado exitosamente"
+
+    # Tamaño máximo de lote para las transiciones masivas
+    BULK_TRANSITION_BATCH_SIZE = 500
     
+    # Tamaño de lote para la inserción masiva de cartones
+    BULK_CREATE_BATCH_SIZE = 1000
+
+    @classmethod
+    def bulk_create_cards(cls, cards: List['BingoCardExtended'], batch_size: int = BULK_CREATE_BATCH_SIZE) -> List['BingoCardExtended']:
+        """
+        Inserta cartones en lote
+
+        bulk_create no soporta herencia multi-tabla: primero se insertan las
+        filas padre (BingoCard) con bulk_create y después las de
+        BingoCardExtended con un INSERT por lotes (executemany). Debe llamarse
+        dentro de una transacción.
+        """
+        from django.db import connection
+        from django.utils import timezone
+
+        now = timezone.now()
+        parents = []
+        for card in cards:
+            if card.id is None:
+                card.id = uuid.uuid4()
+            card.bingocard_ptr_id = card.id
+            card.created_at = now
+            parents.append(BingoCard(
+                id=card.id, user_id=card.user_id, bingo_type=card.bingo_type,
+                numbers=card.numbers, created_at=now
+            ))
+        BingoCard.objects.bulk_create(parents, batch_size=batch_size)
+
+        fields = cls._meta.local_concrete_fields
+        sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            connection.ops.quote_name(cls._meta.db_table),
+            ', '.join(connection.ops.quote_name(field.column) for field in fields),
+            ', '.join(['%s'] * len(fields)),
+        )
+        with connection.cursor() as cursor:
+            for start in range(0, len(cards), batch_size):
+                cursor.executemany(sql, [
+                    [field.get_db_prep_save(field.pre_save(card, True), connection) for field in fields]
+                    for card in cards[start:start + batch_size]
+                ])
+
+        for card in cards:
+            card._state.adding = False
+        return cards
+
+    @classmethod
+    def bulk_mark_as_sold(cls, session, player, card_ids=None) -> List[Dict]:
+        """
+        Marca como vendidos (reserved → sold) los cartones reservados de un jugador
+
+        Un único UPDATE condicional por lote: el precio se toma de
+        BingoSession.entry_fee dentro del propio SQL y solo cambian de estado
+        las filas que siguen en 'reserved', por lo que la transición es atómica.
+
+        Returns:
+            Lista de {'id', 'card_number', 'purchase_price'} de los cartones vendidos
+        """
+        from django.utils import timezone
+
+        session_table = BingoSession._meta.db_table
+        price_sql = (
+            f"COALESCE((SELECT s.entry_fee FROM {session_table} s "
+            f"WHERE s.id = {cls._meta.db_table}.session_id), 0)"
+        )
+        sold = cls._bulk_transition(
+            session, player, card_ids,
+            from_status='reserved',
+            assignments=[
+                ('status', '%s', 'sold'),
+                ('purchased_at', '%s', timezone.now()),
+                ('purchase_price', price_sql, None),
+            ]
+        )
+        CARD_TRANSITIONS.inc(len(sold), transition='sell', result='ok')
+        return sold
+
+    @classmethod
+    def bulk_release(cls, session, player, card_ids=None) -> List[Dict]:
+        """
+        Libera (reserved → available) los cartones reservados de un jugador
+
+        Returns:
+            Lista de {'id', 'card_number', 'purchase_price'} de los cartones liberados
+        """
+        released = cls._bulk_transition(
+            session, player, card_ids,
+            from_status='reserved',
+            assignments=[
+                ('status', '%s', 'available'),
+                ('player', 'NULL', None),
+                ('reserved_at', 'NULL', None),
+            ]
+        )
+        CARD_TRANSITIONS.inc(len(released), transition='release', result='ok')
+        return released
+
+    @classmethod
+    def _bulk_transition(cls, session, player, card_ids, from_status, assignments) -> List[Dict]:
+        """
+        Ejecuta UPDATE ... WHERE status = from_status RETURNING por lotes
+
+        assignments es una lista de (campo, expresión SQL, valor); el valor solo
+        se usa cuando la expresión es '%s'.
+        """
+        from decimal import Decimal
+        from django.db import connection, transaction
+
+        meta = cls._meta
+        pk_field = meta.pk
+
+        def prep(field_name, value):
+            return meta.get_field(field_name).get_db_prep_value(value, connection)
+
+        set_clauses = []
+        set_params = []
+        for field_name, expression, value in assignments:
+            set_clauses.append(f"{meta.get_field(field_name).column} = {expression}")
+            if expression == '%s':
+                set_params.append(prep(field_name, value))
+
+        base_where = (
+            f"{meta.get_field('session').column} = %s "
+            f"AND {meta.get_field('player').column} = %s "
+            f"AND {meta.get_field('status').column} = %s"
+        )
+        base_params = [prep('session', session.pk), prep('player', player.pk), from_status]
+
+        if card_ids is None:
+            batches = [None]
+        else:
+            card_ids = list(card_ids)
+            size = cls.BULK_TRANSITION_BATCH_SIZE
+            batches = [card_ids[i:i + size] for i in range(0, len(card_ids), size)]
+
+        sql_template = (
+            f"UPDATE {meta.db_table} SET {', '.join(set_clauses)} "
+            f"WHERE {base_where}{{extra_where}} "
+            f"RETURNING {pk_field.column}, {meta.get_field('card_number').column}, "
+            f"{meta.get_field('purchase_price').column}"
+        )
+
+        transitioned = []
+        with transaction.atomic(), connection.cursor() as cursor:
+            for batch in batches:
+                extra_where = ''
+                params = set_params + base_params
+                if batch is not None:
+                    if not batch:
+                        continue
+                    placeholders = ', '.join(['%s'] * len(batch))
+                    extra_where = f" AND {pk_field.column} IN ({placeholders})"
+                    params = params + [pk_field.get_db_prep_value(card_id, connection) for card_id in batch]
+
+                cursor.execute(sql_template.format(extra_where=extra_where), params)
+                for pk_value, card_number, purchase_price in cursor.fetchall():
+                    transitioned.append({
+                        'id': pk_field.to_python(pk_value),
+                        'card_number': card_number,
+                        'purchase_price': Decimal(str(purchase_price or 0)).quantize(Decimal('0.01')),
+                    })
+
+        return transitioned
+
     def can_be_reused_in_session(self, new_session):
         """Verifica si el cartón puede ser reutilizado en otra sesión"""
         if self.bingo_type != new_session.bingo_type:
@@ -1101,11 +1599,436 @@ class BingoGameExtended(BingoGame):
     draw_interval = models.IntegerField(default=5, help_text="Intervalo entre extracciones (segundos)")
     max_balls = models.IntegerField(default=0, help_text="Máximo de bolas a extraer (0 = sin límite)")
     
+    # Orden de bolas guardado por partidas anteriores a la semilla (ver BingoGame.server_seed)
+    draw_sequence = models.JSONField(default=list, blank=True, help_text="Secuencia de extracción comprometida al iniciar la partida")
+    
     class Meta:
         ordering = ['-created_at']
     
+    # Etapas por defecto de una partida de 90 bolas
+    DEFAULT_90_BALL_STAGES = ['horizontal_line', 'two_lines', 'full_card']
+    
     def __str__(self):
         return f"Partida {self.game_type} - {self.operator.name if self.operator else 'Sin operador'}"
+    
+    def configure_stages(self, pattern_codes: List[str] = None) -> tuple[bool, str, list]:
+        """
+        Define las etapas ordenadas de la partida (ej. línea → dos líneas → bingo)
+        
+        Args:
+            pattern_codes: Códigos de WinningPattern en orden de juego.
+                En 90 bolas se usa DEFAULT_90_BALL_STAGES si no se indica.
+        
+        Returns:
+            (success, message, stages)
+        """
+        from django.db import transaction
+        
+        if not pattern_codes:
+            if self.game_type != '90':
+                return False, "Debe indicar los patrones de cada etapa", []
+            pattern_codes = self.DEFAULT_90_BALL_STAGES
+        
+        if self.drawn_balls.exists():
+            return False, "No se pueden cambiar las etapas después de extraer bolas", []
+        
+        patterns = {
+            pattern.code: pattern
+            for pattern in WinningPattern.objects.filter(
+                code__in=pattern_codes,
+                is_active=True,
+                compatible_with__in=['all', self.game_type]
+            )
+        }
+        missing = [code for code in pattern_codes if code not in patterns]
+        if missing:
+            return False, f"Patrones no encontrados, inactivos o incompatibles: {', '.join(missing)}", []
+        
+        with transaction.atomic():
+            self.stages.all().delete()
+            stages = GameStage.objects.bulk_create([
+                GameStage(
+                    game=self,
+                    order=order,
+                    pattern=patterns[code],
+                    status='active' if order == 1 else 'pending'
+                )
+                for order, code in enumerate(pattern_codes, start=1)
+            ])
+        
+        return True, f"{len(stages)} etapas configuradas", stages
+    
+    def configure_default_stages(self) -> tuple[bool, str, list]:
+        """
+        Etapas por defecto de una partida nueva de 90 bolas (DEFAULT_90_BALL_STAGES)
+        
+        No hace nada en 75/85 bolas ni si la sesión configura sus propios
+        winning_patterns: esos patrones siguen en juego sin etapas.
+        
+        Returns:
+            (success, message, stages)
+        """
+        if self.game_type != '90':
+            return False, "Solo las partidas de 90 bolas tienen etapas por defecto", []
+        if self.session_id and self.session.winning_patterns:
+            return False, "La sesión define sus propios patrones de victoria", []
+        return self.configure_stages()
+    
+    def commit_draw_sequence(self) -> tuple[bool, str]:
+        """
+        Compromete el orden completo de extracción antes de la primera bola
+        
+        Las partidas nuevas ya nacen comprometidas con su semilla; las
+        anteriores sin bolas extraídas reciben una semilla aquí. Con la
+        secuencia comprometida, la bola en que cada cartón completa cada
+        patrón se calcula una sola vez (ver engine.CompletionIndex).
+        """
+        from .fairness import generate_server_seed, seed_commitment
+        
+        if self.server_seed or self.draw_sequence:
+            return True, "La partida ya tiene una secuencia de extracción comprometida"
+        if self.drawn_balls.exists():
+            return False, "No se puede fijar la secuencia después de extraer bolas"
+        
+        self.server_seed = generate_server_seed()
+        self.seed_hash = seed_commitment(self.server_seed)
+        self.save(update_fields=['server_seed', 'seed_hash'])
+        return True, f"Secuencia de {self.get_total_balls()} bolas comprometida"
+    
+    def get_draw_sequence(self) -> List[int]:
+        """
+        Secuencia comprometida: la guardada en draw_sequence por partidas
+        anteriores a la semilla, o la derivada de la semilla
+        """
+        if self.draw_sequence:
+            return list(self.draw_sequence)
+        return super().get_draw_sequence()
+    
+    def get_ball_limit(self) -> int:
+        """Bolas que se pueden extraer: max_balls si está configurado, si no todo el bombo"""
+        total_balls = self.get_total_balls()
+        if 0 < self.max_balls < total_balls:
+            return self.max_balls
+        return total_balls
+    
+    def get_winning_patterns(self) -> list:
+        """Patrones en juego: los de las etapas si la partida las tiene, si no los de la sesión"""
+        stages = list(self.stages.select_related('pattern'))
+        if stages:
+            return [stage.pattern for stage in stages]
+        if self.session_id:
+            return list(self.session.get_winning_patterns())
+        return []
+    
+    def get_current_stage(self):
+        """Retorna la etapa en juego o None si no hay etapas o ya terminaron"""
+        return self.stages.filter(status='active').select_related('pattern').first()
+    
+    def _stage_candidates(self, session_card_ids: list = None, legacy_card_ids: list = None) -> List[Dict]:
+        """
+        Cartones que participan en la partida (SessionCard y cartones vendidos heredados)
+        
+        Args:
+            session_card_ids / legacy_card_ids: limitar la carga a esos ids
+                (ambos None = todos los cartones de la sesión)
+        """
+        candidates = []
+        if not self.session_id:
+            return candidates
+        
+        filtered = session_card_ids is not None or legacy_card_ids is not None
+        
+        session_cards = SessionCard.objects.filter(
+            session_id=self.session_id,
+            status='active'
+        ).select_related('card', 'player')
+        if filtered:
+            session_cards = session_cards.filter(pk__in=session_card_ids or [])
+        for session_card in session_cards:
+            candidates.append({
+                'instance': session_card,
+                'source': 'session_card',
+                'numbers': session_card.card.numbers,
+                'card_id': session_card.card_id,
+                'card_number': session_card.card.card_number,
+                'player': session_card.player,
+            })
+        
+        legacy_cards = BingoCardExtended.objects.filter(
+            session_id=self.session_id,
+            status='sold'
+        ).select_related('player')
+        if filtered:
+            legacy_cards = legacy_cards.filter(pk__in=legacy_card_ids or [])
+        for card in legacy_cards:
+            candidates.append({
+                'instance': card,
+                'source': 'legacy',
+                'numbers': card.numbers,
+                'card_id': card.id,
+                'card_number': card.card_number,
+                'player': card.player,
+            })
+        
+        return candidates
+    
+    def advance_stages(self, drawn_numbers: List[int]) -> List[Dict]:
+        """
+        Evalúa solo la etapa actual con las bolas extraídas y avanza si hay ganadores
+        
+        Si una etapa se gana, la siguiente se evalúa con la misma bola (un cartón
+        puede completar línea y dos líneas a la vez). Cada etapa ganada registra
+        sus ganadores, la bola ganadora y el índice de bola.
+        
+        Args:
+            drawn_numbers: Bolas extraídas en orden de extracción
+        
+        Returns:
+            Lista con el resultado de cada etapa ganada en esta bola
+        """
+        from django.db import transaction
+        from django.utils import timezone
+        from .engine import get_completion_index
+        from .pattern_compiler import card_bitmaps
+        
+        if not drawn_numbers:
+            return []
+        
+        won_stages = []
+        with transaction.atomic():
+            stages = list(
+                self.stages.select_for_update().filter(
+                    status__in=['active', 'pending']
+                ).select_related('pattern').order_by('order')
+            )
+            if not stages or stages[0].status != 'active':
+                return []
+            
+            # Con secuencia comprometida los ganadores salen de la tabla de
+            # índices de completitud; si no, de los mapas de bits de cada cartón
+            # (calculados una sola vez por bola)
+            completion_index = get_completion_index(self, drawn_numbers)
+            bitmaps = None
+            ball_index = len(drawn_numbers)
+            now = timezone.now()
+            
+            for position, stage in enumerate(stages):
+                if completion_index is not None:
+                    winner_ids = completion_index.winners_at(ball_index, stage.pattern.code)
+                    winners = self._stage_candidates(
+                        session_card_ids=winner_ids['session_card'],
+                        legacy_card_ids=winner_ids['legacy']
+                    ) if winner_ids['session_card'] or winner_ids['legacy'] else []
+                else:
+                    if bitmaps is None:
+                        bitmaps = [
+                            (candidate, card_bitmaps(candidate['numbers'], drawn_numbers))
+                            for candidate in self._stage_candidates()
+                            if candidate['numbers']
+                        ]
+                    
+                    compiled = stage.pattern.compiled
+                    winners = [
+                        candidate for candidate, (marked, numbered, shape) in bitmaps
+                        if compiled.match_bitmaps(marked, numbered, shape)
+                    ]
+                if not winners:
+                    break
+                
+                stage.status = 'won'
+                stage.won_at_ball = ball_index
+                stage.winning_number = drawn_numbers[-1]
+                stage.completed_at = now
+                stage.winners = [
+                    {
+                        'card_id': str(winner['card_id']),
+                        'card_number': winner['card_number'],
+                        'player_id': str(winner['player'].id) if winner['player'] else None,
+                        'username': winner['player'].username if winner['player'] else None,
+                    }
+                    for winner in winners
+                ]
+                stage.save(update_fields=['status', 'won_at_ball', 'winning_number', 'completed_at', 'winners'])
+                
+                for winner in winners:
+                    instance = winner['instance']
+                    instance.is_winner = True
+                    instance.winning_patterns = instance.winning_patterns or []
+                    instance.winning_patterns.append(
+                        stage.pattern.code if isinstance(instance, BingoCardExtended) else {
+                            'code': stage.pattern.code,
+                            'name': stage.pattern.name,
+                            'balls_drawn': ball_index
+                        }
+                    )
+                    instance.save(update_fields=['is_winner', 'winning_patterns'])
+                
+                won_stages.append(stage.to_result())
+                
+                if position + 1 < len(stages):
+                    next_stage = stages[position + 1]
+                    next_stage.status = 'active'
+                    next_stage.started_at = now
+                    next_stage.save(update_fields=['status', 'started_at'])
+                else:
+                    # Última etapa ganada: la partida termina
+                    self.is_active = False
+                    self.save(update_fields=['is_active'])
+        
+        return won_stages
+    
+    def draw_many(self, count: int, stop_at_first_winner: bool = False) -> Dict:
+        """
+        Extrae hasta `count` bolas en una sola transacción
+        
+        Las bolas se eligen y evalúan en memoria (engine.GameEngine) y se
+        guardan con un único INSERT masivo. Los ganadores se resuelven en una
+        pasada al final; en partidas por etapas cada etapa se registra con la
+        bola exacta en que se ganó.
+        
+        Args:
+            count: cantidad máxima de bolas a extraer
+            stop_at_first_winner: detenerse en la primera bola que produce un ganador nuevo
+        
+        Returns:
+            dict con las bolas extraídas, ganadores y estado de la partida
+        """
+        from .engine import GameEngine
+        from .locks import game_draw_lock
+        
+        total_balls = self.get_total_balls()
+        ball_limit = self.get_ball_limit()
+        
+        # Serializa extracciones concurrentes sobre la misma partida
+        with game_draw_lock(self.id) as lock:
+            drawn = DrawnBall.get_drawn_sequence(self.id)
+            count = max(0, min(count, ball_limit - len(drawn)))
+            if self.refresh_finished_state():
+                count = 0
+            
+            sequence = self.get_draw_sequence()
+            if sequence:
+                balls = sequence[len(drawn):len(drawn) + count]
+            else:
+                available = sorted(set(range(1, total_balls + 1)) - set(drawn))
+                balls = random.sample(available, count)
+            
+            # Patrones a vigilar: etapas pendientes en orden, o los de la sesión
+            stages = [stage for stage in self.stages.select_related('pattern') if stage.status != 'won']
+            patterns = [stage.pattern for stage in stages] if stages else self.get_winning_patterns()
+            engine = GameEngine(self.id, patterns, self._stage_candidates())
+            engine.sync(drawn)
+            already_completed = [set(engine.completed_cards(index)) for index in range(len(patterns))]
+            
+            drawn_now = []
+            stage_pointer = 0
+            stage_breaks = []
+            first_winner_at = None
+            
+            for number in balls:
+                engine.apply_ball(number)
+                drawn_now.append(number)
+                ball_index = len(drawn) + len(drawn_now)
+                
+                if stages:
+                    won_before = stage_pointer
+                    while stage_pointer < len(stages) and engine.completed_cards(stage_pointer):
+                        stage_pointer += 1
+                        stage_breaks.append(ball_index)
+                    new_winner = stage_pointer > won_before
+                else:
+                    new_winner = any(
+                        len(engine.completed_cards(index)) > len(already_completed[index])
+                        for index in range(len(patterns))
+                    )
+                
+                if new_winner and first_winner_at is None:
+                    first_winner_at = ball_index
+                if new_winner and stop_at_first_winner:
+                    break
+                if stages and stage_pointer == len(stages):
+                    # Última etapa ganada: la partida termina
+                    break
+            
+            DrawnBall.objects.bulk_create([
+                DrawnBall(game=self, number=number, sequence=len(drawn) + position)
+                for position, number in enumerate(drawn_now, start=1)
+            ])
+            full_sequence = drawn + drawn_now
+            
+            # Pasada de ganadores
+            won_stages = []
+            winners = []
+            if stages:
+                for ball_index in sorted(set(stage_breaks)):
+                    won_stages.extend(self.advance_stages(full_sequence[:ball_index]))
+            else:
+                for index, pattern in enumerate(patterns):
+                    for card_index in sorted(engine.completed_cards(index) - already_completed[index]):
+                        winners.append(dict(engine.cards[card_index], pattern_code=pattern.code))
+            
+            if len(full_sequence) >= ball_limit and self.is_active:
+                self.is_active = False
+                self.save(update_fields=['is_active'])
+        
+        if drawn_now:
+            BALLS_DRAWN.inc(len(drawn_now), operator=operator_label(self.operator_id))
+        return {
+            'drawn': drawn_now,
+            'first_index': len(drawn) + 1 if drawn_now else None,
+            'total_drawn': len(full_sequence),
+            'remaining_balls': ball_limit - len(full_sequence),
+            'first_winner_at': first_winner_at,
+            'stopped_at_winner': bool(stop_at_first_winner and first_winner_at),
+            'winners': winners,
+            'stages_won': won_stages,
+            'game_status': 'active' if self.is_active else 'finished',
+            'lock_wait_ms': round(lock.wait_seconds * 1000, 3),
+        }
+
+
+class GameStage(models.Model):
+    """Etapa ordenada de una partida (ej. 90 bolas: línea → dos líneas → bingo)"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    game = models.ForeignKey(BingoGameExtended, on_delete=models.CASCADE, related_name='stages')
+    order = models.PositiveSmallIntegerField(help_text="Orden de la etapa dentro de la partida (1, 2, 3...)")
+    pattern = models.ForeignKey('WinningPattern', on_delete=models.PROTECT, related_name='game_stages')
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pendiente'),
+        ('active', 'En juego'),
+        ('won', 'Ganada'),
+    ]
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    
+    # Resultado
+    winners = models.JSONField(default=list, blank=True, help_text="Cartones ganadores de la etapa")
+    won_at_ball = models.IntegerField(null=True, blank=True, help_text="Cantidad de bolas extraídas al ganar la etapa")
+    winning_number = models.IntegerField(null=True, blank=True, help_text="Bola con la que se ganó la etapa")
+    
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['order']
+        unique_together = ['game', 'order']
+        verbose_name = 'Etapa de Partida'
+        verbose_name_plural = 'Etapas de Partida'
+    
+    def __str__(self):
+        return f"Etapa {self.order} ({self.pattern.name}) - {self.get_status_display()}"
+    
+    def to_result(self) -> dict:
+        """Representación compacta de la etapa para respuestas de la API"""
+        return {
+            'stage': self.order,
+            'pattern_code': self.pattern.code,
+            'pattern_name': self.pattern.name,
+            'status': self.status,
+            'won_at_ball': self.won_at_ball,
+            'winning_number': self.winning_number,
+            'winners': self.winners,
+        }
 
 
 # === SISTEMA DE AUTENTICACIÓN ===
@@ -1180,6 +2103,40 @@ class APIKey(models.Model):
         return True, "API Key válida"
 
 
+
+class IdempotencyRecord(models.Model):
+    """Respuesta guardada de una petición con cabecera Idempotency-Key (ver bingo/idempotency.py)"""
+    id = models.BigAutoField(primary_key=True)
+    
+    # Alcance: cliente + método + ruta + clave enviada por el cliente
+    scope_hash = models.CharField(max_length=64, unique=True, help_text="SHA-256 del alcance de la clave")
+    request_hash = models.CharField(max_length=64, help_text="SHA-256 del cuerpo de la petición original")
+    
+    STATUS_CHOICES = [
+        ('in_progress', 'En curso'),
+        ('completed', 'Completada'),
+    ]
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='in_progress')
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.scope_hash[:12]}... ({self.status})"
+    
+    @classmethod
+    def purge_expired(cls) -> int:
+        """Elimina los registros vencidos; devuelve cuántos se borraron"""
+        from django.utils import timezone
+        deleted, _ = cls.objects.filter(expires_at__lte=timezone.now()).delete()
+        return deleted
+
+
 # === SISTEMA DE PATRONES DE VICTORIA ===
 
 class WinningPattern(models.Model):
@@ -1236,6 +2193,20 @@ class WinningPattern(models.Model):
     def __str__(self):
         return f"{self.name} ({self.get_category_display()})"
     
+    def save(self, *args, **kwargs):
+        # Invalidar la forma compilada: pattern_type o pattern_data pudieron cambiar
+        self.__dict__.pop('_compiled', None)
+        super().save(*args, **kwargs)
+    
+    @property
+    def compiled(self):
+        """Máscaras precompiladas del patrón (ver bingo.pattern_compiler)"""
+        compiled = self.__dict__.get('_compiled')
+        if compiled is None:
+            from .pattern_compiler import compile_pattern
+            compiled = self.__dict__['_compiled'] = compile_pattern(self.pattern_type, self.pattern_data)
+        return compiled
+    
     @classmethod
     def create_system_patterns(cls):
         """Crea los patrones del sistema si no existen"""
@@ -1268,6 +2239,16 @@ class WinningPattern(models.Model):
                 'compatible_with': '75',  # Solo para 75 bolas (5x5)
                 'is_system': True,
             },
+            {
+                'code': 'two_lines',
+                'name': 'Dos Líneas',
+                'description': 'Completa dos filas horizontales (segunda etapa en 90 bolas)',
+                'category': 'classic',
+                'pattern_type': 'two_lines',
+                'compatible_with': '90',
+                'prize_multiplier': 1.5,
+                'is_system': True,
+            },
             {
                 'code': 'full_card',
                 'name': 'Cartón Lleno (Bingo)',
@@ -1363,25 +2344,8 @@ class WinningPattern(models.Model):
         if self.has_jackpot and self.jackpot_max_balls and balls_drawn > 0:
             is_jackpot = balls_drawn <= self.jackpot_max_balls
         
-        # Delegar según el tipo de patrón
-        if self.pattern_type == 'horizontal_line':
-            is_winner = self._check_horizontal_line(marked_numbers, card_numbers)
-        elif self.pattern_type == 'vertical_line':
-            is_winner = self._check_vertical_line(marked_numbers, card_numbers)
-        elif self.pattern_type == 'diagonal_line':
-            is_winner = self._check_diagonal_line(marked_numbers, card_numbers)
-        elif self.pattern_type == 'full_card':
-            is_winner = self._check_full_card(marked_numbers, card_numbers)
-        elif self.pattern_type == 'four_corners':
-            is_winner = self._check_four_corners(marked_numbers, card_numbers)
-        elif self.pattern_type == 'x_pattern':
-            is_winner = self._check_x_pattern(marked_numbers, card_numbers)
-        elif self.pattern_type == 'letter_l':
-            is_winner = self._check_letter_l(marked_numbers, card_numbers)
-        elif self.pattern_type == 'letter_t':
-            is_winner = self._check_letter_t(marked_numbers, card_numbers)
-        else:
-            is_winner = False
+        # Evaluar con las máscaras precompiladas del patrón
+        is_winner = self.compiled.matches(marked_numbers, card_numbers)
         
         return {
             'is_winner': is_winner,
@@ -1391,100 +2355,6 @@ class WinningPattern(models.Model):
             'is_jackpot': is_jackpot,
             'balls_drawn': balls_drawn
         }
-    
-    def _check_horizontal_line(self, marked: List[int], card: List[List[int]]) -> bool:
-        """Verifica línea horizontal"""
-        for row in card:
-            non_zero = [num for num in row if num != 0]
-            if all(num in marked for num in non_zero):
-                return True
-        return False
-    
-    def _check_vertical_line(self, marked: List[int], card: List[List[int]]) -> bool:
-        """Verifica línea vertical"""
-        cols = len(card[0])
-        for col in range(cols):
-            column_numbers = [card[row][col] for row in range(len(card)) if card[row][col] != 0]
-            if column_numbers and all(num in marked for num in column_numbers):
-                return True
-        return False
-    
-    def _check_diagonal_line(self, marked: List[int], card: List[List[int]]) -> bool:
-        """Verifica línea diagonal (solo para 5x5)"""
-        if len(card) != 5 or len(card[0]) != 5:
-            return False
-        
-        # Diagonal principal (top-left a bottom-right)
-        diagonal1 = [card[i][i] for i in range(5) if card[i][i] != 0]
-        if diagonal1 and all(num in marked for num in diagonal1):
-            return True
-        
-        # Diagonal inversa (top-right a bottom-left)
-        diagonal2 = [card[i][4-i] for i in range(5) if card[i][4-i] != 0]
-        if diagonal2 and all(num in marked for num in diagonal2):
-            return True
-        
-        return False
-    
-    def _check_full_card(self, marked: List[int], card: List[List[int]]) -> bool:
-        """Verifica cartón lleno"""
-        all_numbers = []
-        for row in card:
-            all_numbers.extend([num for num in row if num != 0])
-        return all(num in marked for num in all_numbers)
-    
-    def _check_four_corners(self, marked: List[int], card: List[List[int]]) -> bool:
-        """Verifica cuatro esquinas (solo para 5x5)"""
-        if len(card) != 5 or len(card[0]) != 5:
-            return False
-        
-        corners = [
-            card[0][0],   # Top-left
-            card[0][4],   # Top-right
-            card[4][0],   # Bottom-left
-            card[4][4]    # Bottom-right
-        ]
-        corners = [c for c in corners if c != 0]
-        return all(num in marked for num in corners)
-    
-    def _check_x_pattern(self, marked: List[int], card: List[List[int]]) -> bool:
-        """Verifica patrón X (ambas diagonales)"""
-        if len(card) != 5 or len(card[0]) != 5:
-            return False
-        
-        # Diagonal principal
-        diagonal1 = [card[i][i] for i in range(5) if card[i][i] != 0]
-        # Diagonal inversa
-        diagonal2 = [card[i][4-i] for i in range(5) if card[i][4-i] != 0]
-        
-        all_diagonal = diagonal1 + diagonal2
-        return all(num in marked for num in all_diagonal)
-    
-    def _check_letter_l(self, marked: List[int], card: List[List[int]]) -> bool:
-        """Verifica patrón L (primera columna + última fila)"""
-        if len(card) != 5 or len(card[0]) != 5:
-            return False
-        
-        # Primera columna
-        first_col = [card[row][0] for row in range(5) if card[row][0] != 0]
-        # Última fila
-        last_row = [card[4][col] for col in range(5) if card[4][col] != 0]
-        
-        l_pattern = first_col + last_row
-        return all(num in marked for num in l_pattern)
-    
-    def _check_letter_t(self, marked: List[int], card: List[List[int]]) -> bool:
-        """Verifica patrón T (primera fila + columna central)"""
-        if len(card) != 5 or len(card[0]) != 5:
-            return False
-        
-        # Primera fila
-        first_row = [card[0][col] for col in range(5) if card[0][col] != 0]
-        # Columna central
-        middle_col = [card[row][2] for row in range(5) if card[row][2] != 0]
-        
-        t_pattern = first_row + middle_col
-        return all(num in marked for num in t_pattern)
 
 
 # ============================================================================
@@ -1507,6 +2377,10 @@ class CardPack(models.Model):
     # Configuración
     total_cards = models.IntegerField(default=100, help_text="Cantidad total de cartas en el pack")
     cards_generated = models.BooleanField(default=False, help_text="Si las cartas ya fueron generadas")
+    allocation_cursor = models.IntegerField(
+        default=0,
+        help_text="Cursor de asignación: las cartas con card_number <= cursor ya fueron entregadas"
+    )
     
     # Precio y disponibilidad
     price_per_card = models.DecimalField(
@@ -1550,44 +2424,119 @@ class CardPack(models.Model):
         if self.cards_generated:
             return False, "Las cartas ya fueron generadas para este pack"
         
-        cards_created = []
-        for i in range(self.total_cards):
-            # Generar números del cartón
-            if self.bingo_type == '75':
-                numbers = BingoCard.generate_75_ball_card()
-            elif self.bingo_type == '85':
-                numbers = BingoCard.generate_85_ball_card()
-            elif self.bingo_type == '90':
-                numbers = BingoCard.generate_90_ball_card()
-            else:
-                return False, f"Tipo de bingo no válido: {self.bingo_type}"
-            
-            # Crear carta con serial number único
-            serial_number = f"{self.operator.code.upper()}-{self.bingo_type}-{self.id.hex[:8].upper()}-{i+1:04d}"
-            
-            card = BingoCardExtended.objects.create(
+        from django.db import transaction
+        
+        generators = {
+            '75': BingoCard.generate_75_ball_card,
+            '85': BingoCard.generate_85_ball_card,
+            '90': BingoCard.generate_90_ball_card,
+        }
+        if self.bingo_type not in generators:
+            return False, f"Tipo de bingo no válido: {self.bingo_type}"
+        generate = generators[self.bingo_type]
+        started = time.perf_counter()
+        
+        # Cartas con serial number único, insertadas en lote
+        prefix = f"{self.operator.code.upper()}-{self.bingo_type}-{self.id.hex[:8].upper()}"
+        cards_created = [
+            BingoCardExtended(
                 user_id=f"pack_{self.id}",
                 bingo_type=self.bingo_type,
-                numbers=numbers,
+                numbers=generate(),
                 pack=self,
                 card_number=i + 1,
-                serial_number=serial_number,
+                serial_number=f"{prefix}-{i+1:04d}",
                 is_reusable=True
             )
-            cards_created.append(card)
+            for i in range(self.total_cards)
+        ]
         
-        self.cards_generated = True
-        self.save()
+        with transaction.atomic():
+            BingoCardExtended.bulk_create_cards(cards_created)
+            self.cards_generated = True
+            self.save()
+        CARD_GENERATION_SECONDS.observe(time.perf_counter() - started, source='pack')
+        CARDS_GENERATED.inc(len(cards_created), operator=operator_label(self.operator_id), source='pack')
         
         return True, f"{len(cards_created)} cartas generadas exitosamente"
     
     def get_available_cards(self):
-        """Retorna cartas disponibles (no asignadas a ningún jugador)"""
-        return self.cards.filter(owners__isnull=True)
+        """
+        Retorna cartas disponibles (sin dueño y después del cursor de asignación)
+        
+        Las cartas con dueño más allá del cursor (filas heredadas o regalos
+        asignados a mano) se excluyen con NOT EXISTS: allocate_cards las salta.
+        """
+        from django.db.models import Exists, OuterRef
+        
+        return self.cards.filter(card_number__gt=self.allocation_cursor).exclude(
+            Exists(PlayerCard.objects.filter(card=OuterRef('pk')))
+        )
+    
+    def get_available_cards_count(self) -> int:
+        """Retorna cuántas cartas quedan por asignar (un COUNT sobre el índice (pack, card_number))"""
+        if not self.cards_generated:
+            return 0
+        return self.get_available_cards().count()
     
     def get_cards_count(self):
         """Retorna el conteo de cartas generadas"""
         return self.cards.count()
+    
+    def allocate_cards(self, player, quantity: int, acquisition_type: str = 'purchase') -> tuple[bool, str, list]:
+        """
+        Asigna `quantity` cartas del pack a un jugador de forma atómica
+        
+        Se entregan las siguientes cartas sin dueño con card_number > cursor,
+        en orden (card_number > cursor ORDER BY card_number LIMIT quantity,
+        sobre el índice (pack, card_number)), y el cursor avanza hasta la
+        última entregada. Un UPDATE inicial bloquea la fila del pack hasta el
+        fin de la transacción: compradores concurrentes esperan y leen el
+        cursor ya avanzado, así que nunca reciben la misma carta, y los huecos
+        en la numeración no descuadran el cursor.
+        
+        Returns:
+            (success, message, player_cards)
+        """
+        from django.db import transaction
+        from django.db.models import F
+        
+        with transaction.atomic():
+            locked = CardPack.objects.filter(pk=self.pk, cards_generated=True).update(
+                allocation_cursor=F('allocation_cursor')
+            )
+            if not locked:
+                return False, f'Solo hay 0 cartas disponibles, solicitaste {quantity}', []
+            
+            # Releer el cursor: la fila sigue bloqueada por este UPDATE
+            self.allocation_cursor = CardPack.objects.filter(pk=self.pk).values_list(
+                'allocation_cursor', flat=True
+            ).get()
+            
+            cards = list(self.cards.filter(
+                card_number__gt=self.allocation_cursor,
+                owners__isnull=True
+            ).order_by('card_number')[:quantity])
+            
+            if len(cards) < quantity:
+                return False, f'Solo hay {len(cards)} cartas disponibles, solicitaste {quantity}', []
+            
+            purchase_price = self.price_per_card if acquisition_type == 'purchase' else 0
+            player_cards = PlayerCard.objects.bulk_create([
+                PlayerCard(
+                    player=player,
+                    card=card,
+                    pack=self,
+                    acquisition_type=acquisition_type,
+                    purchase_price=purchase_price
+                )
+                for card in cards
+            ])
+            
+            self.allocation_cursor = cards[-1].card_number
+            CardPack.objects.filter(pk=self.pk).update(allocation_cursor=self.allocation_cursor)
+        
+        return True, f'{len(player_cards)} cartas adquiridas exitosamente', player_cards
 
 
 class PlayerCard(models.Model):
@@ -1655,22 +2604,24 @@ class PlayerCard(models.Model):
     
     def update_stats(self, won: bool = False, prize_amount: float = 0):
         """Actualiza las estadísticas después de usar la carta"""
+        from decimal import Decimal
+        from django.db.models import F
         from django.utils import timezone
         
-        self.times_used += 1
-        self.last_used_at = timezone.now()
-        
-        if won:
-            self.times_won += 1
-            self.total_prizes += prize_amount
-        
-        self.save()
+        # Incrementos con F() para no perder actualizaciones concurrentes
+        PlayerCard.objects.filter(pk=self.pk).update(
+            times_used=F('times_used') + 1,
+            last_used_at=timezone.now(),
+            times_won=F('times_won') + (1 if won else 0),
+            total_prizes=F('total_prizes') + (Decimal(str(prize_amount)) if won else 0)
+        )
+        self.refresh_from_db(fields=['times_used', 'last_used_at', 'times_won', 'total_prizes'])
         
         # Actualizar también las estadísticas globales de la carta
-        self.card.total_sessions += 1
-        if won:
-            self.card.total_wins += 1
-        self.card.save()
+        BingoCardExtended.objects.filter(pk=self.card_id).update(
+            total_sessions=F('total_sessions') + 1,
+            total_wins=F('total_wins') + (1 if won else 0)
+        )
 
 
 class SessionCard(models.Model):
@@ -1729,7 +2680,143 @@ class SessionCard(models.Model):
     
     def __str__(self):
         return f"Sesión {self.session.name} - {self.player.username} - Carta #{self.card.card_number}"
-    
+
+    @classmethod
+    def bulk_join(cls, session, player, cards) -> list:
+        """
+        Une varias cartas de un jugador a una sesión en una sola transacción
+
+        Crea las SessionCard con un único bulk_create (ignorando duplicados
+        concurrentes) y actualiza PlayerSession.cards_count con F() en lugar
+        de leer-modificar-escribir. Con ignore_conflicts la base de datos no
+        informa qué filas entraron: se releen por id (los UUID se generan
+        aquí) y solo esas cuentan.
+
+        Returns:
+            Lista de SessionCard creadas (con session, player y card ya cargados)
+        """
+        from django.db import transaction
+        from django.db.models import F
+
+        session_cards = [
+            cls(session=session, card=card, player=player, status='active')
+            for card in cards
+        ]
+
+        with transaction.atomic():
+            cls.objects.bulk_create(session_cards, ignore_conflicts=True)
+            if session_cards:
+                inserted = set(cls.objects.filter(
+                    pk__in=[session_card.pk for session_card in session_cards]
+                ).values_list('pk', flat=True))
+                session_cards = [session_card for session_card in session_cards if session_card.pk in inserted]
+
+            player_session, created = PlayerSession.objects.get_or_create(
+                session=session,
+                player=player,
+                defaults={'cards_count': len(session_cards)}
+            )
+
+            if not created and session_cards:
+                PlayerSession.objects.filter(pk=player_session.pk).update(
+                    cards_count=F('cards_count') + len(session_cards)
+                )
+
+        return session_cards
+
+    @classmethod
+    def attach_legacy_session_cards(cls, old_session, new_session) -> int:
+        """
+        Adjunta a una nueva sesión los cartones vendidos de una sesión antigua
+
+        En lugar de clonar cada BingoCardExtended (dos INSERT por herencia
+        multi-tabla y matrices duplicadas) se crea una fila SessionCard por
+        cartón y dueño con un único INSERT ... SELECT. Los cartones conservan
+        su identidad y sus estadísticas. Cada dueño queda inscrito en la nueva
+        sesión (PlayerSession) con un segundo INSERT ... SELECT ... ON CONFLICT
+        que crea su inscripción o le suma los cartones adjuntados.
+
+        Los cartones sin vender no se adjuntan: la nueva sesión no recibe un
+        pool de venta y puede generar el suyo.
+
+        Returns:
+            Cantidad de cartones adjuntados
+        """
+        from django.db import NotSupportedError, connection, transaction
+        from django.utils import timezone
+
+        # Expresiones dependientes del motor para generar el UUID y el JSON vacío
+        vendor_sql = {
+            'postgresql': ('gen_random_uuid()', "'[]'::jsonb"),
+            'sqlite': ('lower(hex(randomblob(16)))', "'[]'"),
+        }
+        if connection.vendor not in vendor_sql:
+            raise NotSupportedError(f"attach_legacy_session_cards no soporta {connection.vendor}")
+        uuid_sql, empty_json_sql = vendor_sql[connection.vendor]
+
+        card_meta = BingoCardExtended._meta
+        meta = cls._meta
+        enrolment_meta = PlayerSession._meta
+
+        def column(model_meta, field_name):
+            return model_meta.get_field(field_name).column
+
+        def prep(model_meta, field_name, value):
+            return model_meta.get_field(field_name).get_db_prep_value(value, connection)
+
+        card_pk = card_meta.pk.column
+        card_player = column(card_meta, 'player')
+        new_session_id = prep(meta, 'session', new_session.pk)
+        # Las filas de esta llamada se reconocen por su joined_at
+        joined_at = prep(meta, 'joined_at', timezone.now())
+
+        attach_sql = (
+            f"INSERT INTO {meta.db_table} ("
+            f"{meta.pk.column}, {column(meta, 'session')}, {column(meta, 'card')}, {column(meta, 'player')}, "
+            f"{column(meta, 'status')}, {column(meta, 'marked_numbers')}, {column(meta, 'is_winner')}, "
+            f"{column(meta, 'winning_patterns')}, {column(meta, 'prize_amount')}, {column(meta, 'joined_at')}) "
+            f"SELECT {uuid_sql}, %s, c.{card_pk}, c.{card_player}, %s, {empty_json_sql}, %s, {empty_json_sql}, %s, %s "
+            f"FROM {card_meta.db_table} c "
+            f"WHERE c.{column(card_meta, 'session')} = %s "
+            f"AND c.{column(card_meta, 'status')} = %s "
+            f"AND c.{card_player} IS NOT NULL "
+            f"AND NOT EXISTS (SELECT 1 FROM {meta.db_table} sc "
+            f"WHERE sc.{column(meta, 'session')} = %s AND sc.{column(meta, 'card')} = c.{card_pk} "
+            f"AND sc.{column(meta, 'player')} = c.{card_player})"
+        )
+        attach_params = [
+            new_session_id, 'active', False, prep(meta, 'prize_amount', 0), joined_at,
+            prep(card_meta, 'session', old_session.pk), 'sold', new_session_id,
+        ]
+
+        enrolment_session = column(enrolment_meta, 'session')
+        enrolment_player = column(enrolment_meta, 'player')
+        enrolment_count = column(enrolment_meta, 'cards_count')
+        enrol_sql = (
+            f"INSERT INTO {enrolment_meta.db_table} ("
+            f"{enrolment_meta.pk.column}, {enrolment_session}, {enrolment_player}, "
+            f"{column(enrolment_meta, 'joined_at')}, {enrolment_count}, {column(enrolment_meta, 'is_active')}, "
+            f"{column(enrolment_meta, 'has_won')}, {column(enrolment_meta, 'winning_cards')}, "
+            f"{column(enrolment_meta, 'prize_amount')}) "
+            f"SELECT {uuid_sql}, %s, sc.{column(meta, 'player')}, %s, COUNT(*), %s, %s, {empty_json_sql}, %s "
+            f"FROM {meta.db_table} sc "
+            f"WHERE sc.{column(meta, 'session')} = %s AND sc.{column(meta, 'joined_at')} = %s "
+            f"GROUP BY sc.{column(meta, 'player')} "
+            f"ON CONFLICT ({enrolment_session}, {enrolment_player}) DO UPDATE SET "
+            f"{enrolment_count} = {enrolment_meta.db_table}.{enrolment_count} + excluded.{enrolment_count}"
+        )
+        enrol_params = [
+            new_session_id, prep(enrolment_meta, 'joined_at', timezone.now()), True, False,
+            prep(enrolment_meta, 'prize_amount', 0), new_session_id, joined_at,
+        ]
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(attach_sql, attach_params)
+            attached = cursor.rowcount
+            if attached:
+                cursor.execute(enrol_sql, enrol_params)
+        return attached
+
     def mark_number(self, number: int) -> bool:
         """Marca un número en esta carta para esta sesión"""
         if number not in self.marked_numbers:
@@ -1742,29 +2829,35 @@ class SessionCard(models.Model):
         """Verifica si esta carta es ganadora según los patrones de la sesión"""
         patterns = self.session.get_winning_patterns()
         
-        for pattern in patterns:
-            result = pattern.check_pattern(
-                marked_numbers=self.marked_numbers,
-                card_numbers=self.card.numbers,
-                bingo_type=self.session.bingo_type,
-                balls_drawn=len(self.marked_numbers)
-            )
+        # Una observación por cartón (todos sus patrones), no por patrón
+        winner = None
+        with PATTERN_CHECK_SECONDS.time(source='session_card'):
+            for pattern in patterns:
+                result = pattern.check_pattern(
+                    marked_numbers=self.marked_numbers,
+                    card_numbers=self.card.numbers,
+                    bingo_type=self.session.bingo_type,
+                    balls_drawn=len(self.marked_numbers)
+                )
+                if result['is_winner']:
+                    winner = pattern
+                    break
+        
+        if winner is not None:
+            self.is_winner = True
+            self.winning_patterns.append({
+                'code': winner.code,
+                'name': winner.name,
+                'balls_drawn': len(self.marked_numbers)
+            })
+            self.save()
             
-            if result['is_winner']:
-                self.is_winner = True
-                self.winning_patterns.append({
-                    'code': pattern.code,
-                    'name': pattern.name,
-                    'balls_drawn': len(self.marked_numbers)
-                })
-                self.save()
-                
-                return {
-                    'is_winner': True,
-                    'pattern': pattern.name,
-                    'pattern_code': pattern.code,
-                    'balls_drawn': len(self.marked_numbers)
-                }
+            return {
+                'is_winner': True,
+                'pattern': winner.name,
+                'pattern_code': winner.code,
+                'balls_drawn': len(self.marked_numbers)
+            }
         
         return {'is_winner': False}
     
@@ -1778,8 +2871,8 @@ class SessionCard(models.Model):
         
         # Actualizar estadísticas del jugador si tiene esta carta
         player_card = PlayerCard.objects.filter(
-            player=self.player,
-            card=self.card
+            player_id=self.player_id,
+            card_id=self.card_id
         ).first()
         
         if player_card:
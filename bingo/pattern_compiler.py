@@ -0,0 +1,265 @@
+"""
+Compilador de patrones de victoria basado en máscaras de celdas
+
+Convierte el `pattern_data` de un WinningPattern en una lista de máscaras de
+bits precompiladas por forma de cartón (5x5 para 75/85 bolas, 3x9 para 90
+bolas). Cada máscara es una alternativa ganadora: el cartón gana si todas las
+celdas de alguna máscara están marcadas.
+
+Formato de `pattern_data` (todas las claves son opcionales y combinables):
+
+    {"positions": [[0, 0], [1, 1], [2, 2]]}    celdas fijas (una alternativa)
+    {"alternatives": [[[0, 0]], [[4, 4]]]}     varias alternativas explícitas
+    {"any": "row"}                             cualquier fila
+    {"any": ["row", "column", "diagonal"]}     cualquier línea
+    {"any": "row", "count": 2}                 N de M: dos filas cualesquiera
+    {"full": true}                             cartón lleno
+    {"shapes": [[5, 5]]}                       restringe las formas de cartón
+
+Las celdas vacías del cartón (None, 0 o "FREE") cuentan siempre como
+marcadas; una alternativa sin ningún número real no gana nunca.
+"""
+
+from itertools import combinations
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+# Formas de cartón soportadas: (filas, columnas)
+GRID_SHAPES = {
+    '75': (5, 5),
+    '85': (5, 5),
+    '90': (3, 9),
+}
+
+LINE_KINDS = ('row', 'column', 'diagonal')
+
+# Límite de máscaras generadas por reglas N de M
+MAX_MASKS = 5000
+
+# Especificaciones equivalentes a los pattern_type históricos del sistema
+BUILTIN_SPECS = {
+    'horizontal_line': {'any': 'row'},
+    'vertical_line': {'any': 'column'},
+    'two_lines': {'any': 'row', 'count': 2},
+    'diagonal_line': {'any': 'diagonal', 'shapes': [[5, 5]]},
+    'full_card': {'full': True},
+    'four_corners': {
+        'positions': [[0, 0], [0, 4], [4, 0], [4, 4]],
+        'shapes': [[5, 5]],
+    },
+    'x_pattern': {
+        'positions': [[i, i] for i in range(5)] + [[i, 4 - i] for i in range(5)],
+        'shapes': [[5, 5]],
+    },
+    'letter_l': {
+        'positions': [[row, 0] for row in range(5)] + [[4, col] for col in range(5)],
+        'shapes': [[5, 5]],
+    },
+    'letter_t': {
+        'positions': [[0, col] for col in range(5)] + [[row, 2] for row in range(5)],
+        'shapes': [[5, 5]],
+    },
+}
+
+SPEC_KEYS = {'positions', 'alternatives', 'any', 'count', 'full', 'shapes'}
+
+
+class PatternCompileError(ValueError):
+    """pattern_data inválido"""
+
+
+def is_blank_cell(value) -> bool:
+    """Celda sin número (hueco en 90 bolas o centro libre en 75/85)"""
+    return value is None or value == 0 or value == 'FREE'
+
+
+def _cell_bit(row: int, col: int, cols: int) -> int:
+    return 1 << (row * cols + col)
+
+
+def _positions_mask(positions, rows: int, cols: int) -> Optional[int]:
+    """Máscara para una lista de [fila, columna]; None si no cabe en la forma"""
+    mask = 0
+    for position in positions:
+        if not isinstance(position, (list, tuple)) or len(position) != 2:
+            raise PatternCompileError(f"Posición inválida: {position!r}. Use [fila, columna]")
+        row, col = position
+        if not isinstance(row, int) or not isinstance(col, int) or row < 0 or col < 0:
+            raise PatternCompileError(f"Posición inválida: {position!r}. Use enteros no negativos")
+        if row >= rows or col >= cols:
+            return None
+        mask |= _cell_bit(row, col, cols)
+    return mask
+
+
+def _line_masks(kind: str, rows: int, cols: int) -> List[int]:
+    """Máscaras de todas las líneas de un tipo"""
+    if kind == 'row':
+        return [
+            sum(_cell_bit(row, col, cols) for col in range(cols))
+            for row in range(rows)
+        ]
+    if kind == 'column':
+        return [
+            sum(_cell_bit(row, col, cols) for row in range(rows))
+            for col in range(cols)
+        ]
+    if kind == 'diagonal':
+        if rows != cols:
+            return []
+        return [
+            sum(_cell_bit(i, i, cols) for i in range(rows)),
+            sum(_cell_bit(i, cols - 1 - i, cols) for i in range(rows)),
+        ]
+    raise PatternCompileError(f"Tipo de línea inválido: {kind!r}. Opciones: {', '.join(LINE_KINDS)}")
+
+
+def _normalize_kinds(value) -> List[str]:
+    kinds = [value] if isinstance(value, str) else value
+    if not isinstance(kinds, list) or not kinds:
+        raise PatternCompileError("'any' debe ser un tipo de línea o una lista de tipos")
+    expanded = []
+    for kind in kinds:
+        expanded.extend(LINE_KINDS if kind == 'line' else [kind])
+    return expanded
+
+
+def validate_spec(spec: Dict) -> None:
+    """Valida un pattern_data compilándolo para las formas de cartón soportadas"""
+    if not isinstance(spec, dict):
+        raise PatternCompileError("pattern_data debe ser un objeto JSON")
+
+    unknown = set(spec) - SPEC_KEYS
+    if unknown:
+        raise PatternCompileError(f"Claves desconocidas en pattern_data: {', '.join(sorted(unknown))}")
+
+    if not SPEC_KEYS.intersection(spec) - {'shapes', 'count'}:
+        raise PatternCompileError("pattern_data debe definir 'positions', 'alternatives', 'any' o 'full'")
+
+    count = spec.get('count', 1)
+    if not isinstance(count, int) or isinstance(count, bool) or count < 1:
+        raise PatternCompileError("'count' debe ser un entero mayor o igual a 1")
+
+    # Compilar contra las formas soportadas detecta posiciones y tipos inválidos
+    compiled = [_compile_masks(spec, *shape) for shape in set(GRID_SHAPES.values())]
+    if not any(compiled):
+        raise PatternCompileError("El patrón no genera ninguna máscara para cartones 5x5 ni 3x9")
+
+
+def _allowed_shapes(spec: Dict) -> Optional[List[Tuple[int, int]]]:
+    shapes = spec.get('shapes')
+    if shapes is None:
+        return None
+    try:
+        return [(int(rows), int(cols)) for rows, cols in shapes]
+    except (TypeError, ValueError):
+        raise PatternCompileError("'shapes' debe ser una lista de [filas, columnas]")
+
+
+def _compile_masks(spec: Dict, rows: int, cols: int) -> Tuple[int, ...]:
+    """Compila un pattern_data para una forma de cartón concreta"""
+    allowed = _allowed_shapes(spec)
+    if allowed is not None and (rows, cols) not in allowed:
+        return ()
+
+    alternatives: List[int] = []
+
+    if spec.get('full'):
+        alternatives.append((1 << (rows * cols)) - 1)
+
+    if 'positions' in spec:
+        mask = _positions_mask(spec['positions'], rows, cols)
+        if mask:
+            alternatives.append(mask)
+
+    for positions in spec.get('alternatives', []):
+        mask = _positions_mask(positions, rows, cols)
+        if mask:
+            alternatives.append(mask)
+
+    if 'any' in spec:
+        for kind in _normalize_kinds(spec['any']):
+            alternatives.extend(_line_masks(kind, rows, cols))
+
+    # Quitar duplicados conservando el orden
+    alternatives = list(dict.fromkeys(alternatives))
+
+    count = spec.get('count', 1)
+    if count == 1:
+        return tuple(alternatives)
+    if count > len(alternatives):
+        return ()
+
+    masks = []
+    for combo in combinations(alternatives, count):
+        mask = 0
+        for alternative in combo:
+            mask |= alternative
+        masks.append(mask)
+        if len(masks) > MAX_MASKS:
+            raise PatternCompileError(f"La regla genera más de {MAX_MASKS} combinaciones")
+    return tuple(dict.fromkeys(masks))
+
+
+def card_bitmaps(card_numbers: List[List], marked_numbers: Iterable[int]) -> Tuple[int, int, Tuple[int, int]]:
+    """
+    Calcula los mapas de bits de un cartón
+
+    Returns:
+        (marcadas, numeradas, (filas, columnas)); las celdas vacías cuentan
+        como marcadas pero no como numeradas
+    """
+    marked = set(marked_numbers)
+    rows = len(card_numbers)
+    cols = len(card_numbers[0]) if rows else 0
+    marked_bits = 0
+    numbered_bits = 0
+    for row_index, row in enumerate(card_numbers):
+        for col_index, value in enumerate(row):
+            bit = _cell_bit(row_index, col_index, cols)
+            if is_blank_cell(value):
+                marked_bits |= bit
+            else:
+                numbered_bits |= bit
+                if value in marked:
+                    marked_bits |= bit
+    return marked_bits, numbered_bits, (rows, cols)
+
+
+class CompiledPattern:
+    """Patrón compilado: máscaras por forma de cartón, generadas bajo demanda"""
+
+    def __init__(self, spec: Dict):
+        self.spec = spec
+        self._masks: Dict[Tuple[int, int], Tuple[int, ...]] = {}
+
+    def masks_for(self, rows: int, cols: int) -> Tuple[int, ...]:
+        shape = (rows, cols)
+        masks = self._masks.get(shape)
+        if masks is None:
+            masks = self._masks[shape] = _compile_masks(self.spec, rows, cols) if self.spec else ()
+        return masks
+
+    def match_bitmaps(self, marked_bits: int, numbered_bits: int, shape: Tuple[int, int]) -> bool:
+        """Evalúa el patrón sobre mapas de bits ya calculados (ver card_bitmaps)"""
+        for mask in self.masks_for(*shape):
+            if mask & numbered_bits and marked_bits & mask == mask:
+                return True
+        return False
+
+    def matches(self, marked_numbers: Iterable[int], card_numbers: List[List]) -> bool:
+        if not card_numbers:
+            return False
+        marked_bits, numbered_bits, shape = card_bitmaps(card_numbers, marked_numbers)
+        return self.match_bitmaps(marked_bits, numbered_bits, shape)
+
+
+def resolve_spec(pattern_type: str, pattern_data: Optional[Dict]) -> Dict:
+    """pattern_data explícito tiene prioridad; si no, la definición del pattern_type"""
+    if pattern_data and SPEC_KEYS.intersection(pattern_data):
+        return pattern_data
+    return BUILTIN_SPECS.get(pattern_type, {})
+
+
+def compile_pattern(pattern_type: str, pattern_data: Optional[Dict]) -> CompiledPattern:
+    return CompiledPattern(resolve_spec(pattern_type, pattern_data))
@@ -0,0 +1,199 @@
+"""
+Catálogo de patrones de victoria en memoria con invalidación por versión
+
+Los patrones cambian muy poco y se consultan en cada cartón marcado
+(SessionCard.check_winner), en cada verificación de ganadores y en el
+catálogo de la API. Cada proceso guarda una instantánea de todos los
+WinningPattern (con sus máscaras compiladas, que se calculan una vez por
+proceso) junto a la versión global con la que se cargó:
+
+- la versión vive en la caché de Django (PATTERN_REGISTRY_VERSION_KEY) y se
+  cambia al guardar o borrar un WinningPattern (señales conectadas en
+  BingoConfig.ready) y en configure_session_patterns
+- cada proceso comprueba la versión como mucho cada
+  PATTERN_REGISTRY_CHECK_SECONDS; los cambios hechos en el propio proceso se
+  ven al instante. La versión solo es global si CACHES es compartida (Redis,
+  Memcached); con la LocMemCache por defecto cada worker de gunicorn tiene la
+  suya y los cambios de otros workers se ven al recargar por antigüedad
+  (PATTERN_REGISTRY_MAX_AGE_SECONDS)
+- dentro de una transacción, un cambio de patrones solo publica la nueva
+  versión al hacer commit (otro proceso no debe cachear filas sin confirmar);
+  hasta entonces las búsquedas de ese hilo van a la base de datos sin tocar
+  la instantánea, así un rollback no deja patrones fantasma
+
+También guarda la lista resuelta por sesión (session_patterns), así que
+resolver los patrones de una sesión es una búsqueda en un dict.
+
+Las instancias son compartidas entre peticiones e hilos: son de solo lectura.
+"""
+
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connection, transaction
+
+
+DEFAULT_VERSION_KEY = 'bingo:patterns:version'
+DEFAULT_CHECK_SECONDS = 1.0
+DEFAULT_MAX_AGE_SECONDS = 300.0
+DEFAULT_MAX_SESSIONS = 10000
+
+# Patrones de una sesión sin winning_patterns configurados
+DEFAULT_SESSION_PATTERNS = ('horizontal_line', 'vertical_line', 'full_card')
+
+BINGO_TYPES = ('75', '85', '90')
+
+
+class _Snapshot:
+    """Patrones cargados con una versión concreta"""
+
+    def __init__(self, version, patterns: list):
+        self.version = version
+        self.loaded_at = time.monotonic()
+        # Orden del modelo (Meta.ordering): categoría y nombre
+        self.all = patterns
+        self.active = [pattern for pattern in patterns if pattern.is_active]
+        self.by_code = {pattern.code: pattern for pattern in patterns}
+        self.by_id = {pattern.pk: pattern for pattern in patterns}
+        self.by_bingo_type = {
+            bingo_type: [pattern for pattern in self.active if pattern.compatible_with in ('all', bingo_type)]
+            for bingo_type in BINGO_TYPES
+        }
+        self.sessions: Dict[object, Tuple[tuple, list]] = {}
+
+    def resolve(self, codes: tuple) -> list:
+        wanted = set(codes)
+        return [pattern for pattern in self.active if pattern.code in wanted]
+
+
+_snapshot: Optional[_Snapshot] = None
+_checked_at = 0.0
+_lock = threading.Lock()
+_pending = threading.local()
+
+
+def _version_key() -> str:
+    return getattr(settings, 'PATTERN_REGISTRY_VERSION_KEY', DEFAULT_VERSION_KEY)
+
+
+def current_version():
+    """Versión global; se crea si la caché no la tiene (arranque o expulsión)"""
+    key = _version_key()
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def _publish_version():
+    global _checked_at
+    # Un valor nuevo (no un incremento): si la caché pierde la clave, ningún
+    # proceso puede confundir una versión nueva con la que ya tenía
+    cache.set(_version_key(), time.time_ns(), None)
+    _checked_at = 0.0
+    _pending.dirty = False
+
+
+def bump_version():
+    """Invalida el catálogo en todos los procesos (al confirmar la transacción en curso)"""
+    if connection.in_atomic_block:
+        _pending.dirty = True
+        transaction.on_commit(_publish_version)
+    else:
+        _publish_version()
+
+
+def _bypass() -> bool:
+    """Este hilo cambió patrones en una transacción que aún no terminó"""
+    if not getattr(_pending, 'dirty', False):
+        return False
+    if connection.in_atomic_block:
+        return True
+    # Terminó sin commit (rollback): la instantánea nunca vio esos cambios
+    _pending.dirty = False
+    return False
+
+
+def _load(version) -> _Snapshot:
+    from .models import WinningPattern
+
+    # Del primario: una réplica atrasada quedaría cacheada en todo el proceso
+    return _Snapshot(version, list(WinningPattern.objects.db_manager(DEFAULT_DB_ALIAS).all()))
+
+
+def snapshot() -> _Snapshot:
+    """Instantánea vigente, recargada si la versión global cambió"""
+    global _snapshot, _checked_at
+
+    if _bypass():
+        return _load(None)
+
+    now = time.monotonic()
+    current = _snapshot
+    interval = getattr(settings, 'PATTERN_REGISTRY_CHECK_SECONDS', DEFAULT_CHECK_SECONDS)
+    if current is not None and now - _checked_at < interval:
+        return current
+
+    with _lock:
+        version = current_version()
+        max_age = getattr(settings, 'PATTERN_REGISTRY_MAX_AGE_SECONDS', DEFAULT_MAX_AGE_SECONDS)
+        if _snapshot is None or _snapshot.version != version or now - _snapshot.loaded_at > max_age:
+            _snapshot = _load(version)
+        _checked_at = now
+        return _snapshot
+
+
+def clear():
+    """Descarta la instantánea de este proceso (la próxima búsqueda recarga)"""
+    global _snapshot, _checked_at
+    with _lock:
+        _snapshot = None
+        _checked_at = 0.0
+
+
+def active_patterns() -> List:
+    return snapshot().active
+
+
+def patterns_for_bingo_type(bingo_type: str) -> List:
+    """Patrones activos compatibles con un tipo de bingo"""
+    return snapshot().by_bingo_type.get(bingo_type, [])
+
+
+def get_pattern(pk):
+    """Patrón por id (activo o no), o None"""
+    return snapshot().by_id.get(pk)
+
+
+def session_patterns(session) -> List:
+    """Patrones activos configurados en una sesión (o los por defecto)"""
+    current = snapshot()
+    codes = tuple(session.winning_patterns or DEFAULT_SESSION_PATTERNS)
+    cached = current.sessions.get(session.pk)
+    if cached is not None and cached[0] == codes:
+        return cached[1]
+
+    patterns = current.resolve(codes)
+    if current.version is not None and session.pk is not None:
+        if len(current.sessions) >= getattr(settings, 'PATTERN_REGISTRY_MAX_SESSIONS', DEFAULT_MAX_SESSIONS):
+            current.sessions.clear()
+        current.sessions[session.pk] = (codes, patterns)
+    return patterns
+
+
+def _pattern_changed(sender, **kwargs):
+    bump_version()
+
+
+def install_invalidation():
+    """Conecta las señales de WinningPattern (se llama desde BingoConfig.ready)"""
+    from django.db.models.signals import post_delete, post_save
+
+    from .models import WinningPattern
+
+    post_save.connect(_pattern_changed, sender=WinningPattern, dispatch_uid='bingo_pattern_registry_save')
+    post_delete.connect(_pattern_changed, sender=WinningPattern, dispatch_uid='bingo_pattern_registry_delete')
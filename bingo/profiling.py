@@ -0,0 +1,313 @@
+"""
+Perfilado bajo demanda de peticiones con la cabecera `X-Profile: 1`
+
+Para reproducir una petición lenta de un operador (por ejemplo
+join_session_with_cards) sin perfilar todo el tráfico:
+
+    curl -H 'Authorization: Bearer <jwt del operador>' \\
+         -H 'X-Profile: 1' -H 'X-Profile-Token: <PROFILING_TOKEN>' ...
+
+La respuesta lleva `X-Profile-Id` y en PROFILING_DIR quedan:
+
+- `<id>.pstats` (cProfile, determinista; se abre con pstats o snakeviz) o
+  `<id>.html` (pyinstrument, por muestreo, si está instalado y
+  PROFILING_ENGINE = 'pyinstrument')
+- `<id>.json`: petición, tiempos, todas las consultas SQL con su duración,
+  las repetidas (N+1), las funciones con más tiempo acumulado y las
+  PROFILING_TRACEMALLOC_TOP líneas que más memoria reservaron (tracemalloc)
+
+Se listan con `GET /api/profiles/` y se descargan con `GET /api/profiles/<archivo>`.
+
+Autorización: el token PROFILING_TOKEN en `X-Profile-Token` o una sesión de
+Django de un usuario staff (/admin/). Sin autorización la petición se sirve
+normal, sin perfilar ni cabeceras extra.
+
+Desactivado por defecto (PROFILING_ENABLED): el middleware se descarta al
+arrancar y no añade nada al resto de peticiones. Activado, las peticiones sin
+la cabecera solo pagan una búsqueda en request.META. Límite de
+PROFILING_RATE_LIMIT perfiles por minuto (contador en la caché de Django) y
+uno a la vez por proceso: cProfile y tracemalloc son globales del intérprete.
+"""
+
+import cProfile
+import hmac
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import ExitStack
+from datetime import datetime, timezone
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import FileResponse, Http404, JsonResponse
+
+from .middleware import RequestTiming
+
+
+DEFAULT_ENGINE = 'cprofile'
+DEFAULT_RATE_LIMIT = 10
+DEFAULT_MAX_REPORTS = 100
+DEFAULT_TRACEMALLOC_TOP = 25
+TOP_FUNCTIONS = 40
+ARTIFACT_EXTENSIONS = ('.json', '.pstats', '.html')
+
+_busy = threading.Lock()
+
+
+def profiling_dir() -> str:
+    return str(getattr(settings, 'PROFILING_DIR', None) or os.path.join(settings.BASE_DIR, 'profiles'))
+
+
+def is_authorized(request) -> bool:
+    """Token PROFILING_TOKEN en X-Profile-Token o usuario staff con sesión"""
+    token = getattr(settings, 'PROFILING_TOKEN', None)
+    supplied = request.META.get('HTTP_X_PROFILE_TOKEN')
+    if token and supplied and hmac.compare_digest(supplied.encode(), token.encode()):
+        return True
+    user = getattr(request, 'user', None)
+    return bool(user is not None and getattr(user, 'is_active', False) and getattr(user, 'is_staff', False))
+
+
+def take_rate_slot() -> bool:
+    """Reserva un perfil en la ventana del minuto actual (compartida vía caché)"""
+    limit = getattr(settings, 'PROFILING_RATE_LIMIT', DEFAULT_RATE_LIMIT)
+    key = f'bingo:profiling:{int(time.time() // 60)}'
+    cache.add(key, 0, timeout=60)
+    try:
+        return cache.incr(key) <= limit
+    except ValueError:
+        # La clave expiró entre add e incr: empieza una ventana nueva
+        cache.add(key, 1, timeout=60)
+        return True
+
+
+def _new_profile_id() -> str:
+    return f'{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}'
+
+
+class _CProfileEngine:
+    name = 'cprofile'
+    extension = '.pstats'
+
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+
+    def start(self):
+        self.profiler.enable()
+
+    def stop(self):
+        self.profiler.disable()
+
+    def save(self, path: str):
+        self.profiler.dump_stats(path)
+
+    def top_functions(self, limit: int) -> str:
+        output = io.StringIO()
+        pstats.Stats(self.profiler, stream=output).sort_stats('cumulative').print_stats(limit)
+        return output.getvalue()
+
+
+class _PyinstrumentEngine:
+    name = 'pyinstrument'
+    extension = '.html'
+
+    def __init__(self):
+        from pyinstrument import Profiler
+        self.profiler = Profiler(async_mode='disabled')
+
+    def start(self):
+        self.profiler.start()
+
+    def stop(self):
+        self.profiler.stop()
+
+    def save(self, path: str):
+        with open(path, 'w', encoding='utf-8') as handle:
+            handle.write(self.profiler.output_html())
+
+    def top_functions(self, limit: int) -> str:
+        return self.profiler.output_text(unicode=True, color=False)
+
+
+def _make_engine():
+    """Motor configurado; pyinstrument es opcional y sin él se usa cProfile"""
+    if getattr(settings, 'PROFILING_ENGINE', DEFAULT_ENGINE) == 'pyinstrument':
+        try:
+            return _PyinstrumentEngine()
+        except ImportError:
+            pass
+    return _CProfileEngine()
+
+
+def _allocation_top(snapshot, limit: int) -> list:
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        tracemalloc.Filter(False, '<unknown>'),
+    ))
+    return [
+        {
+            'location': f'{stat.traceback[0].filename}:{stat.traceback[0].lineno}',
+            'size_kb': round(stat.size / 1024, 1),
+            'count': stat.count,
+        }
+        for stat in snapshot.statistics('lineno')[:limit]
+    ]
+
+
+def _prune_reports(directory: str):
+    """Conserva los PROFILING_MAX_REPORTS perfiles más recientes"""
+    keep = getattr(settings, 'PROFILING_MAX_REPORTS', DEFAULT_MAX_REPORTS)
+    reports = sorted(name[:-5] for name in os.listdir(directory) if name.endswith('.json'))
+    for profile_id in reports[:max(len(reports) - keep, 0)]:
+        for extension in ARTIFACT_EXTENSIONS:
+            try:
+                os.remove(os.path.join(directory, profile_id + extension))
+            except FileNotFoundError:
+                pass
+
+
+class ProfilingMiddleware:
+    """
+    Perfila las peticiones autorizadas que llevan `X-Profile: 1`
+
+    Va al final de MIDDLEWARE (necesita request.user de AuthenticationMiddleware).
+
+    Settings:
+        PROFILING_ENABLED: activa el middleware (False por defecto)
+        PROFILING_TOKEN: valor esperado en X-Profile-Token
+        PROFILING_DIR: dónde se guardan los perfiles
+        PROFILING_ENGINE: 'cprofile' o 'pyinstrument'
+        PROFILING_RATE_LIMIT: perfiles por minuto
+        PROFILING_MAX_REPORTS: perfiles conservados en disco
+        PROFILING_TRACEMALLOC_TOP: líneas del resumen de memoria
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.META.get('HTTP_X_PROFILE') != '1' or not is_authorized(request):
+            return self.get_response(request)
+        if not take_rate_slot():
+            response = self.get_response(request)
+            response['X-Profile-Status'] = 'rate-limited'
+            return response
+        if not _busy.acquire(blocking=False):
+            response = self.get_response(request)
+            response['X-Profile-Status'] = 'busy'
+            return response
+        try:
+            return self._profile(request)
+        finally:
+            _busy.release()
+
+    def _profile(self, request):
+        profile_id = _new_profile_id()
+        engine = _make_engine()
+        timing = RequestTiming()
+        top = getattr(settings, 'PROFILING_TRACEMALLOC_TOP', DEFAULT_TRACEMALLOC_TOP)
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        tracemalloc.clear_traces()
+
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(timing))
+                engine.start()
+                try:
+                    response = self.get_response(request)
+                    # Las respuestas DRF se renderizan fuera de la vista: incluirlo
+                    if hasattr(response, 'render') and not getattr(response, 'is_rendered', True):
+                        response.render()
+                finally:
+                    engine.stop()
+            elapsed = time.perf_counter() - started
+            allocations = _allocation_top(tracemalloc.take_snapshot(), top)
+        finally:
+            if started_tracing:
+                tracemalloc.stop()
+
+        directory = profiling_dir()
+        os.makedirs(directory, exist_ok=True)
+        engine.save(os.path.join(directory, profile_id + engine.extension))
+        match = getattr(request, 'resolver_match', None)
+        report = {
+            'id': profile_id,
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'engine': engine.name,
+            'artifact': profile_id + engine.extension,
+            'method': request.method,
+            'path': request.get_full_path(),
+            'route': match.route if match else None,
+            'status': response.status_code,
+            'total_ms': round(elapsed * 1000, 3),
+            'db_ms': round(timing.db_seconds * 1000, 3),
+            'db_queries': timing.db_queries,
+            'sql': [{'sql': sql, 'ms': round(seconds * 1000, 3)} for sql, seconds in timing.queries],
+            'sql_repeated': timing.captured_sql(TOP_FUNCTIONS)['repeated'],
+            'allocations': allocations,
+            'top_functions': engine.top_functions(TOP_FUNCTIONS),
+        }
+        with open(os.path.join(directory, profile_id + '.json'), 'w', encoding='utf-8') as handle:
+            json.dump(report, handle, indent=2, ensure_ascii=False)
+        _prune_reports(directory)
+
+        response['X-Profile-Id'] = profile_id
+        response['X-Profile-Status'] = 'stored'
+        return response
+
+
+def _forbidden():
+    return JsonResponse({'error': 'No autorizado'}, status=403)
+
+
+def profile_list(request):
+    """GET /api/profiles/: perfiles guardados, del más reciente al más antiguo"""
+    if not is_authorized(request):
+        return _forbidden()
+    directory = profiling_dir()
+    reports = []
+    if os.path.isdir(directory):
+        for name in sorted(os.listdir(directory), reverse=True):
+            if not name.endswith('.json'):
+                continue
+            with open(os.path.join(directory, name), encoding='utf-8') as handle:
+                report = json.load(handle)
+            reports.append({
+                key: report.get(key)
+                for key in ('id', 'created_at', 'engine', 'artifact', 'method', 'path',
+                            'status', 'total_ms', 'db_ms', 'db_queries')
+            })
+    return JsonResponse({'profiles': reports})
+
+
+def profile_download(request, filename: str):
+    """GET /api/profiles/<archivo>: descarga el informe JSON o el artefacto del perfilador"""
+    if not is_authorized(request):
+        return _forbidden()
+    path = _artifact_path(filename)
+    if path is None or not os.path.isfile(path):
+        raise Http404('Perfil no encontrado')
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=filename)
+
+
+def _artifact_path(filename: str) -> Optional[str]:
+    """Ruta del artefacto solo si el nombre es un id de perfil con extensión conocida"""
+    profile_id, extension = os.path.splitext(filename)
+    if extension not in ARTIFACT_EXTENSIONS or not profile_id.replace('-', '').isalnum():
+        return None
+    return os.path.join(profiling_dir(), filename)
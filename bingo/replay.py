@@ -0,0 +1,353 @@
+"""
+Repetición de partidas en memoria, sin base de datos
+
+Carga una foto de la partida (cartones, patrones, etapas y orden de bolas)
+desde JSON y la juega completa en memoria emitiendo cada evento: bola
+extraída, cartones marcados, ganadores, etapas ganadas y fin de partida.
+Usa los mismos generadores de cartones (BingoCard.generate_*_ball_card) y las
+mismas máscaras de patrones (pattern_compiler) que el servicio, pero no el
+motor en vivo (engine.GameEngine): la evaluación se hace con mapas de bits
+por cartón, de forma independiente, para servir de oráculo en pruebas del
+motor y en pruebas de rendimiento.
+
+Formato de la foto:
+
+    {
+        "game_id": "...",
+        "bingo_type": "90",
+        "max_balls": 0,
+        "patterns": [{"code": "horizontal_line", "name": "...", "pattern_type": "...", "pattern_data": {}}],
+        "stages": ["horizontal_line", "two_lines", "full_card"],
+        "cards": [{"card_id": "...", "card_number": 1, "player_id": "...", "numbers": [[...]]}],
+        "draw_sequence": [17, 4, ...]
+    }
+
+Con `stages` la partida se juega por etapas como BingoGameExtended.advance_stages();
+sin etapas se reporta el primer momento en que cada cartón completa cada patrón.
+
+Uso:
+    snapshot = snapshot_from_game(game)            # desde la base de datos
+    snapshot = generate_snapshot('90', 500, seed=7)  # sintética, sin base de datos
+    result = GameReplay(snapshot).run()
+"""
+
+import json
+import random
+import time
+import uuid
+from typing import Dict, Iterator, List, Optional
+
+from .fairness import derive_sequence, generate_server_seed
+from .pattern_compiler import BUILTIN_SPECS, card_bitmaps, compile_pattern
+
+
+TOTAL_BALLS = {'75': 75, '85': 85, '90': 90}
+
+# Cartones por jugador en las fotos sintéticas
+CARDS_PER_PLAYER = 4
+
+DEFAULT_PATTERNS = {
+    '75': ['horizontal_line', 'vertical_line', 'diagonal_line', 'full_card'],
+    '85': ['horizontal_line', 'vertical_line', 'diagonal_line', 'full_card'],
+    '90': ['horizontal_line', 'two_lines', 'full_card'],
+}
+
+
+class ReplayError(ValueError):
+    """Foto de partida inválida"""
+
+
+class GameReplay:
+    """Partida en memoria a partir de una foto JSON"""
+
+    def __init__(self, snapshot: Dict):
+        bingo_type = str(snapshot.get('bingo_type', ''))
+        if bingo_type not in TOTAL_BALLS:
+            raise ReplayError(f"Tipo de bingo inválido: {bingo_type!r}")
+        self.bingo_type = bingo_type
+        self.game_id = snapshot.get('game_id')
+        self.draw_sequence = [int(number) for number in snapshot.get('draw_sequence') or []]
+        if len(set(self.draw_sequence)) != len(self.draw_sequence):
+            raise ReplayError("draw_sequence tiene bolas repetidas")
+
+        max_balls = int(snapshot.get('max_balls') or 0)
+        total_balls = TOTAL_BALLS[bingo_type]
+        self.ball_limit = max_balls if 0 < max_balls < total_balls else total_balls
+
+        self.patterns = []
+        for pattern in snapshot.get('patterns') or []:
+            self.patterns.append({
+                'code': pattern['code'],
+                'name': pattern.get('name', pattern['code']),
+                'compiled': compile_pattern(pattern.get('pattern_type', pattern['code']), pattern.get('pattern_data')),
+            })
+        codes = [pattern['code'] for pattern in self.patterns]
+
+        self.stages = list(snapshot.get('stages') or [])
+        missing = [code for code in self.stages if code not in codes]
+        if missing:
+            raise ReplayError(f"Etapas sin patrón en la foto: {', '.join(missing)}")
+
+        self.cards = []
+        self.blank_bits: List[int] = []
+        self.marked_bits: List[int] = []
+        self.numbered_bits: List[int] = []
+        self.shapes = []
+        self.cells_by_number: Dict[int, List] = {}
+        for card in snapshot.get('cards') or []:
+            self._add_card(card)
+
+    def _add_card(self, card: Dict):
+        numbers = card.get('numbers')
+        if not numbers:
+            return
+        card_index = len(self.cards)
+        self.cards.append({
+            'card_id': card.get('card_id'),
+            'card_number': card.get('card_number'),
+            'player_id': card.get('player_id'),
+        })
+        # Las celdas vacías nacen marcadas (ver pattern_compiler.card_bitmaps)
+        blank_bits, numbered_bits, shape = card_bitmaps(numbers, ())
+        self.blank_bits.append(blank_bits)
+        self.marked_bits.append(blank_bits)
+        self.numbered_bits.append(numbered_bits)
+        self.shapes.append(shape)
+        cols = shape[1]
+        for row_index, row in enumerate(numbers):
+            for col_index, value in enumerate(row):
+                bit = 1 << (row_index * cols + col_index)
+                if numbered_bits & bit:
+                    self.cells_by_number.setdefault(value, []).append((card_index, bit))
+
+    def _matches(self, pattern: Dict, card_index: int) -> bool:
+        return pattern['compiled'].match_bitmaps(
+            self.marked_bits[card_index], self.numbered_bits[card_index], self.shapes[card_index]
+        )
+
+    def _winner_event(self, ball_index: int, number: int, pattern: Dict, card_index: int, stage=None) -> Dict:
+        return dict(
+            self.cards[card_index],
+            type='winner',
+            ball_index=ball_index,
+            number=number,
+            pattern_code=pattern['code'],
+            stage=stage,
+        )
+
+    def events(self) -> Iterator[Dict]:
+        """Juega la partida desde el principio y emite los eventos en orden"""
+        patterns_by_code = {pattern['code']: pattern for pattern in self.patterns}
+        self.marked_bits = list(self.blank_bits)
+        stage_pointer = 0
+        won = [set() for _ in self.patterns]
+        ball_index = 0
+
+        for number in self.draw_sequence[:self.ball_limit]:
+            ball_index += 1
+            yield {'type': 'draw', 'ball_index': ball_index, 'number': number}
+
+            touched = []
+            for card_index, bit in self.cells_by_number.get(number, ()):
+                self.marked_bits[card_index] |= bit
+                touched.append(card_index)
+            yield {
+                'type': 'mark',
+                'ball_index': ball_index,
+                'number': number,
+                'cards': [self.cards[card_index]['card_id'] for card_index in touched],
+            }
+
+            if self.stages:
+                # Solo los cartones marcados pueden completar la etapa actual;
+                # al avanzar, la etapa nueva se evalúa sobre todos con la misma bola
+                candidates = touched
+                while stage_pointer < len(self.stages):
+                    pattern = patterns_by_code[self.stages[stage_pointer]]
+                    winners = [card_index for card_index in candidates if self._matches(pattern, card_index)]
+                    if not winners:
+                        break
+                    stage_pointer += 1
+                    for card_index in sorted(winners):
+                        yield self._winner_event(ball_index, number, pattern, card_index, stage=stage_pointer)
+                    yield {
+                        'type': 'stage_won',
+                        'ball_index': ball_index,
+                        'number': number,
+                        'stage': stage_pointer,
+                        'pattern_code': pattern['code'],
+                        'winners': len(winners),
+                    }
+                    candidates = range(len(self.cards))
+
+                if stage_pointer == len(self.stages):
+                    yield {'type': 'game_over', 'ball_index': ball_index, 'reason': 'stages_completed'}
+                    return
+            else:
+                for pattern_index, pattern in enumerate(self.patterns):
+                    for card_index in sorted(set(touched) - won[pattern_index]):
+                        if self._matches(pattern, card_index):
+                            won[pattern_index].add(card_index)
+                            yield self._winner_event(ball_index, number, pattern, card_index)
+
+        reason = 'max_balls' if ball_index == self.ball_limit and self.ball_limit < TOTAL_BALLS[self.bingo_type] else 'sequence_exhausted'
+        yield {'type': 'game_over', 'ball_index': ball_index, 'reason': reason}
+
+    def run(self, collect_events: bool = True) -> Dict:
+        """
+        Juega la partida completa
+
+        Returns:
+            dict con ganadores, etapas ganadas, bolas jugadas, tiempo y (opcional) todos los eventos
+        """
+        started = time.perf_counter()
+        events = []
+        winners = []
+        stages_won = []
+        counts: Dict[str, int] = {}
+        last = None
+        for event in self.events():
+            counts[event['type']] = counts.get(event['type'], 0) + 1
+            if event['type'] == 'winner':
+                winners.append(event)
+            elif event['type'] == 'stage_won':
+                stages_won.append(event)
+            if collect_events:
+                events.append(event)
+            last = event
+
+        result = {
+            'game_id': self.game_id,
+            'bingo_type': self.bingo_type,
+            'cards': len(self.cards),
+            'balls_played': last['ball_index'] if last else 0,
+            'end_reason': last['reason'] if last else None,
+            'winners': winners,
+            'stages_won': stages_won,
+            'event_counts': counts,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 3),
+        }
+        if collect_events:
+            result['events'] = events
+        return result
+
+
+def first_completions(result: Dict) -> Dict[str, Optional[int]]:
+    """Bola en que se gana cada patrón por primera vez, a partir del resultado de run()"""
+    firsts: Dict[str, Optional[int]] = {}
+    for winner in result['winners']:
+        firsts.setdefault(winner['pattern_code'], winner['ball_index'])
+    return firsts
+
+
+def load_snapshot(path: str) -> Dict:
+    with open(path, encoding='utf-8') as handle:
+        return json.load(handle)
+
+
+def dump_snapshot(snapshot: Dict, path: str):
+    with open(path, 'w', encoding='utf-8') as handle:
+        json.dump(snapshot, handle, default=str)
+
+
+def snapshot_from_game(game, full_sequence: bool = False) -> Dict:
+    """
+    Foto de una BingoGameExtended guardada
+
+    Args:
+        full_sequence: usar la secuencia comprometida completa en lugar de
+            solo las bolas ya extraídas (para jugar la partida hasta el final)
+    """
+    from .models import DrawnBall
+
+    drawn = DrawnBall.get_drawn_sequence(game.id)
+    sequence = drawn
+    if full_sequence:
+        committed = game.get_draw_sequence()
+        if committed[:len(drawn)] == drawn:
+            sequence = committed
+
+    stages = list(game.stages.select_related('pattern').order_by('order'))
+    patterns = [stage.pattern for stage in stages] or game.get_winning_patterns()
+
+    return {
+        'game_id': str(game.id),
+        'bingo_type': game.game_type,
+        'max_balls': game.max_balls,
+        'patterns': [
+            {
+                'code': pattern.code,
+                'name': pattern.name,
+                'pattern_type': pattern.pattern_type,
+                'pattern_data': pattern.pattern_data,
+            }
+            for pattern in {pattern.code: pattern for pattern in patterns}.values()
+        ],
+        'stages': [stage.pattern.code for stage in stages],
+        'cards': [
+            {
+                'card_id': str(candidate['card_id']),
+                'card_number': candidate['card_number'],
+                'player_id': str(candidate['player'].id) if candidate['player'] else None,
+                'numbers': candidate['numbers'],
+            }
+            for candidate in game._stage_candidates()
+        ],
+        'draw_sequence': sequence,
+    }
+
+
+def generate_snapshot(bingo_type: str, cards_count: int, pattern_codes: List[str] = None,
+                      stages: Optional[List[str]] = None, seed: Optional[int] = None) -> Dict:
+    """
+    Foto sintética con cartones de los generadores del servicio y orden de bolas derivado de una semilla
+
+    Args:
+        pattern_codes: patrones del sistema (BUILTIN_SPECS); por defecto los del tipo de bingo
+        stages: etapas en orden; en 90 bolas por defecto línea → dos líneas → bingo
+        seed: semilla para una foto reproducible
+    """
+    from .models import BingoCard
+
+    if bingo_type not in TOTAL_BALLS:
+        raise ReplayError(f"Tipo de bingo inválido: {bingo_type!r}")
+
+    pattern_codes = pattern_codes or DEFAULT_PATTERNS[bingo_type]
+    unknown = [code for code in pattern_codes if code not in BUILTIN_SPECS]
+    if unknown:
+        raise ReplayError(f"Patrones desconocidos: {', '.join(unknown)}")
+    if stages is None and bingo_type == '90':
+        stages = [code for code in DEFAULT_PATTERNS['90'] if code in pattern_codes]
+
+    rng = random.Random(seed)
+    # Los cartones salen de un generador propio: no se toca el módulo random global
+    card_rng = random.Random(rng.getrandbits(64))
+    generator = {
+        '75': BingoCard.generate_75_ball_card,
+        '85': BingoCard.generate_85_ball_card,
+        '90': BingoCard.generate_90_ball_card,
+    }[bingo_type]
+
+    game_id = str(uuid.UUID(int=rng.getrandbits(128)))
+    server_seed = '%064x' % rng.getrandbits(256) if seed is not None else generate_server_seed()
+
+    return {
+        'game_id': game_id,
+        'bingo_type': bingo_type,
+        'max_balls': 0,
+        'patterns': [
+            {'code': code, 'name': code, 'pattern_type': code, 'pattern_data': {}}
+            for code in pattern_codes
+        ],
+        'stages': stages or [],
+        'cards': [
+            {
+                'card_id': f'card-{number}',
+                'card_number': number,
+                'player_id': f'player-{(number - 1) // CARDS_PER_PLAYER + 1}',
+                'numbers': generator(card_rng),
+            }
+            for number in range(1, cards_count + 1)
+        ],
+        'draw_sequence': derive_sequence(server_seed, game_id, TOTAL_BALLS[bingo_type]),
+    }
@@ -68,12 +68,20 @@ class BingoGameSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = BingoGame
-        fields = ['id', 'game_type', 'name', 'created_at', 'is_active', 'drawn_balls_count']
-        read_only_fields = ['id', 'created_at', 'drawn_balls_count']
+        fields = ['id', 'game_type', 'name', 'created_at', 'is_active', 'drawn_balls_count', 'seed_hash']
+        read_only_fields = ['id', 'created_at', 'drawn_balls_count', 'seed_hash']
     
     def get_drawn_balls_count(self, obj):
         """Retorna la cantidad de bolas extraídas"""
+        if hasattr(obj, 'drawn_balls_total'):
+            return obj.drawn_balls_total
         return obj.drawn_balls.count()
+    
+    def validate_is_active(self, value):
+        """Terminar la partida revela la semilla: no se puede volver atrás"""
+        if value and self.instance is not None and self.instance.is_finished():
+            raise serializers.ValidationError("Una partida terminada no se puede reactivar")
+        return value
 
 
 class DrawnBallSerializer(serializers.ModelSerializer):
@@ -19,7 +19,7 @@ class CardPackSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'operator', 'operator_name', 'name', 'description',
             'bingo_type', 'bingo_type_display', 'total_cards', 'cards_generated',
-            'price_per_card', 'is_active', 'is_public', 'category', 'category_display',
+            'allocation_cursor', 'price_per_card', 'is_active', 'is_public', 'category', 'category_display',
             'cards_count', 'available_cards_count',
             'created_at', 'updated_at'
         ]
@@ -30,8 +30,8 @@ class CardPackSerializer(serializers.ModelSerializer):
         return obj.get_cards_count()
     
     def get_available_cards_count(self, obj):
-        """Retorna el número de cartas disponibles (sin dueño)"""
-        return obj.get_available_cards().count()
+        """Retorna el número de cartas disponibles (aún no asignadas)"""
+        return obj.get_available_cards_count()
 
 
 class BingoCardExtendedSimpleSerializer(serializers.ModelSerializer):
@@ -94,18 +94,26 @@ class BingoSessionSerializer(serializers.ModelSerializer):
     
     def get_players_count(self, obj):
         """Retorna el número de jugadores inscritos"""
+        if hasattr(obj, 'players_total'):
+            return obj.players_total
         return obj.player_sessions.filter(is_active=True).count()
     
     def get_cards_count(self, obj):
         """Retorna el número total de cartones en la sesión"""
+        if hasattr(obj, 'cards_total'):
+            return obj.cards_total
         return obj.cards.count()
     
     def get_available_cards_count(self, obj):
         """Retorna el número de cartones disponibles"""
+        if hasattr(obj, 'available_cards_total'):
+            return obj.available_cards_total
         return obj.cards.filter(status='available').count()
     
     def get_sold_cards_count(self, obj):
         """Retorna el número de cartones vendidos"""
+        if hasattr(obj, 'sold_cards_total'):
+            return obj.sold_cards_total
         return obj.cards.filter(status='sold').count()
 
 
@@ -160,19 +168,38 @@ class BingoGameExtendedSerializer(serializers.ModelSerializer):
     operator_name = serializers.CharField(source='operator.name', read_only=True)
     session_name = serializers.CharField(source='session.name', read_only=True)
     drawn_balls_count = serializers.SerializerMethodField()
+    has_committed_sequence = serializers.SerializerMethodField()
+    server_seed = serializers.SerializerMethodField()
     
     class Meta:
         model = BingoGameExtended
         fields = [
             'id', 'operator', 'operator_name', 'session', 'session_name',
             'game_type', 'name', 'is_active', 'auto_draw', 'draw_interval',
-            'max_balls', 'drawn_balls_count', 'created_at'
+            'max_balls', 'drawn_balls_count', 'has_committed_sequence',
+            'seed_hash', 'server_seed', 'seed_revealed_at', 'created_at'
         ]
-        read_only_fields = ['id', 'created_at']
+        read_only_fields = ['id', 'seed_hash', 'seed_revealed_at', 'created_at']
     
     def get_drawn_balls_count(self, obj):
         """Retorna el número de bolas extraídas"""
+        if hasattr(obj, 'drawn_balls_total'):
+            return obj.drawn_balls_total
         return obj.drawn_balls.count()
+    
+    def get_has_committed_sequence(self, obj):
+        """Indica si el orden de extracción está fijado (la secuencia nunca se expone)"""
+        return bool(obj.draw_sequence or obj.seed_hash)
+    
+    def get_server_seed(self, obj):
+        """La semilla solo se publica una vez revelada al terminar la partida"""
+        return obj.server_seed if obj.seed_revealed_at and not obj.is_active else None
+    
+    def validate_is_active(self, value):
+        """Terminar la partida revela la semilla: no se puede volver atrás"""
+        if value and self.instance is not None and self.instance.is_finished():
+            raise serializers.ValidationError("Una partida terminada no se puede reactivar")
+        return value
 
 
 # Serializers para creación específica
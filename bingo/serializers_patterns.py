@@ -3,7 +3,8 @@ Serializers para el sistema de patrones de victoria
 """
 
 from rest_framework import serializers
-from .models import WinningPattern, BingoSession
+from .models import WinningPattern, BingoSession, GameStage
+from .pattern_compiler import PatternCompileError, validate_spec
 
 
 class WinningPatternSerializer(serializers.ModelSerializer):
@@ -42,12 +43,29 @@ class WinningPatternCreateSerializer(serializers.ModelSerializer):
     def validate_pattern_type(self, value):
         """Validar que el tipo de patrón sea válido"""
         valid_types = [
-            'horizontal_line', 'vertical_line', 'diagonal_line', 'full_card',
+            'horizontal_line', 'two_lines', 'vertical_line', 'diagonal_line', 'full_card',
             'four_corners', 'x_pattern', 'letter_l', 'letter_t', 'custom'
         ]
         if value not in valid_types:
             raise serializers.ValidationError(f"Tipo de patrón inválido. Opciones: {', '.join(valid_types)}")
         return value
+    
+    def validate_pattern_data(self, value):
+        """Validar que el pattern_data se pueda compilar a máscaras"""
+        if value:
+            try:
+                validate_spec(value)
+            except PatternCompileError as e:
+                raise serializers.ValidationError(str(e))
+        return value
+    
+    def validate(self, attrs):
+        """Un patrón personalizado necesita pattern_data"""
+        if attrs.get('pattern_type') == 'custom' and not attrs.get('pattern_data'):
+            raise serializers.ValidationError({
+                'pattern_data': "Los patrones personalizados requieren pattern_data (positions, alternatives, any o full)"
+            })
+        return attrs
 
 
 class SessionPatternConfigSerializer(serializers.Serializer):
@@ -72,6 +90,53 @@ class SessionPatternConfigSerializer(serializers.Serializer):
         return value
 
 
+class GameStageSerializer(serializers.ModelSerializer):
+    """Serializer para las etapas de una partida"""
+    pattern_code = serializers.CharField(source='pattern.code', read_only=True)
+    pattern_name = serializers.CharField(source='pattern.name', read_only=True)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    
+    class Meta:
+        model = GameStage
+        fields = [
+            'id', 'order', 'pattern_code', 'pattern_name', 'status', 'status_display',
+            'winners', 'won_at_ball', 'winning_number', 'started_at', 'completed_at'
+        ]
+        read_only_fields = fields
+
+
+class GameStageConfigSerializer(serializers.Serializer):
+    """Serializer para configurar las etapas de una partida"""
+    pattern_codes = serializers.ListField(
+        child=serializers.CharField(),
+        required=False,
+        help_text="Códigos de patrones en orden de juego (90 bolas: línea, dos líneas, bingo por defecto)"
+    )
+
+
+class PatternSimulationSerializer(serializers.Serializer):
+    """Serializer para simular probabilidades de patrones"""
+    # La simulación corre en el hilo de la petición: cartones x partidas x
+    # patrones acotado a ~1 s de CPU (para más usar el comando simulate_patterns)
+    MAX_CARDS = 1000
+    MAX_GAMES = 10000
+    MAX_EVALUATIONS = 2_000_000
+    
+    bingo_type = serializers.ChoiceField(choices=['75', '85', '90'])
+    cards_count = serializers.IntegerField(min_value=1, max_value=MAX_CARDS, help_text="Cartones en juego por partida")
+    games = serializers.IntegerField(
+        min_value=1, max_value=MAX_GAMES, default=1000,
+        help_text="Partidas a simular (para millones usar el comando simulate_patterns)"
+    )
+    pattern_codes = serializers.ListField(
+        child=serializers.CharField(),
+        required=False,
+        help_text="Patrones a simular (por defecto todos los activos compatibles)"
+    )
+    jackpot_balls = serializers.IntegerField(min_value=1, required=False, help_text="Máximo de bolas del jackpot a evaluar")
+    seed = serializers.IntegerField(min_value=0, required=False, help_text="Semilla para resultados reproducibles")
+
+
 class CheckWinnerWithPatternsSerializer(serializers.Serializer):
     """Serializer para verificar ganador con múltiples patrones"""
     card_id = serializers.UUIDField(help_text="ID del cartón a verificar")
@@ -0,0 +1,249 @@
+"""
+Simulación Monte Carlo de patrones de victoria
+
+Juega partidas virtuales con los mismos generadores de cartones
+(BingoCard.generate_*_ball_card) y las mismas máscaras compiladas de
+WinningPattern que usa el servicio, para estimar:
+
+- la distribución de bolas hasta el primer ganador de cada patrón,
+- la probabilidad de varios ganadores en esa misma bola,
+- la tasa de acierto del jackpot (primer ganador con jackpot_max_balls o menos).
+
+Cada lote de partidas se evalúa vectorizado con NumPy (ver
+engine.completion_balls) y los lotes se reparten entre procesos. Cada patrón
+se evalúa por separado, como si la partida siguiera hasta que alguien lo gane.
+
+Los cartones de cada partida se toman sin reemplazo de un pool generado con
+los generadores reales, que se renueva cada POOL_REFRESH_GAMES partidas;
+generar cada cartón de cada partida en Python haría inviables millones de
+partidas.
+"""
+
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .engine import completion_balls, numbers_matrix
+from .pattern_compiler import GRID_SHAPES, compile_pattern
+
+
+TOTAL_BALLS = {'75': 75, '85': 85, '90': 90}
+
+# Partidas entre renovaciones del pool de cartones
+POOL_REFRESH_GAMES = 1000
+
+# Partidas evaluadas por lote vectorizado
+BATCH_GAMES = 250
+
+# Celdas (partidas x cartones x celdas) evaluadas por lote
+MAX_BATCH_CELLS = 2_000_000
+
+
+def _card_generator(bingo_type: str):
+    from .models import BingoCard
+
+    return {
+        '75': BingoCard.generate_75_ball_card,
+        '85': BingoCard.generate_85_ball_card,
+        '90': BingoCard.generate_90_ball_card,
+    }[bingo_type]
+
+
+def _init_worker():
+    """Los procesos hijos necesitan Django configurado para importar los modelos"""
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bingo_service.settings')
+        django.setup()
+
+
+def _run_shard(bingo_type: str, cards_count: int, games: int, pattern_specs: List[Dict], seed) -> Dict:
+    """Juega `games` partidas y devuelve histogramas por patrón"""
+    rng = np.random.default_rng(seed)
+    # Los cartones salen de un random.Random propio sembrado desde la misma
+    # semilla: la simulación es reproducible sin tocar el módulo random global
+    card_rng = random.Random(int(rng.integers(2 ** 63)))
+    generator = _card_generator(bingo_type)
+    rows, cols = GRID_SHAPES[bingo_type]
+    cells = rows * cols
+    total_balls = TOTAL_BALLS[bingo_type]
+    never = total_balls + 1
+
+    compiled = [
+        compile_pattern(spec['pattern_type'], spec['pattern_data']).masks_for(rows, cols)
+        for spec in pattern_specs
+    ]
+    results = {
+        spec['code']: {
+            'histogram': np.zeros(never + 1, dtype=np.int64),
+            'multiple_winners': 0,
+            'winners_at_first': 0,
+        }
+        for spec in pattern_specs
+    }
+
+    pool_size = max(cards_count * 4, 1000)
+    batch_size = max(1, min(BATCH_GAMES, MAX_BATCH_CELLS // (cards_count * cells)))
+    ball_numbers = np.arange(1, total_balls + 1, dtype=np.int32)
+
+    played = 0
+    while played < games:
+        if played % POOL_REFRESH_GAMES == 0:
+            pool = numbers_matrix([generator(card_rng) for _ in range(pool_size)], cells)
+            pool_numbered = pool > 0
+
+        batch = min(batch_size, games - played, POOL_REFRESH_GAMES - played % POOL_REFRESH_GAMES)
+
+        # Cartones de cada partida (sin reemplazo) y orden de extracción
+        picks = rng.random((batch, pool_size)).argsort(axis=1)[:, :cards_count]
+        order = rng.random((batch, total_balls)).argsort(axis=1) + 1
+        rank = np.zeros((batch, total_balls + 1), dtype=np.int32)
+        np.put_along_axis(rank, order, ball_numbers, axis=1)
+
+        numbers = pool[picks]
+        cell_ranks = rank[np.arange(batch)[:, None, None], numbers]
+        numbered = pool_numbered[picks]
+
+        for spec, masks in zip(pattern_specs, compiled):
+            completion = completion_balls(cell_ranks, numbered, masks, never)
+            first = completion.min(axis=1)
+            winners = (completion == first[:, None]).sum(axis=1)
+            won = first < never
+
+            result = results[spec['code']]
+            result['histogram'] += np.bincount(first, minlength=never + 1)
+            result['multiple_winners'] += int(((winners > 1) & won).sum())
+            result['winners_at_first'] += int(winners[won].sum())
+
+        played += batch
+
+    return results
+
+
+def _summarize(spec: Dict, histogram: np.ndarray, multiple_winners: int, winners_at_first: int,
+               games: int, jackpot_balls: Optional[int]) -> Dict:
+    never = len(histogram) - 1
+    won_histogram = histogram[:never]
+    won_games = int(won_histogram.sum())
+    balls = np.arange(never)
+
+    summary = {
+        'pattern_code': spec['code'],
+        'pattern_name': spec['name'],
+        'games': games,
+        'games_without_winner': int(histogram[never]),
+        'multiple_winners_probability': round(multiple_winners / games, 6),
+        'average_winners_at_first_win': round(winners_at_first / won_games, 4) if won_games else None,
+    }
+
+    if won_games:
+        cumulative = np.cumsum(won_histogram)
+
+        def percentile(fraction):
+            return int(np.searchsorted(cumulative, fraction * won_games))
+
+        summary['balls_to_first_winner'] = {
+            'mean': round(float((balls * won_histogram).sum() / won_games), 3),
+            'min': int(balls[won_histogram > 0][0]),
+            'max': int(balls[won_histogram > 0][-1]),
+            'p50': percentile(0.50),
+            'p90': percentile(0.90),
+            'p95': percentile(0.95),
+            'p99': percentile(0.99),
+            'distribution': {
+                int(ball): round(count / games, 6)
+                for ball, count in zip(balls, won_histogram) if count
+            },
+        }
+    else:
+        summary['balls_to_first_winner'] = None
+
+    max_balls = jackpot_balls or spec.get('jackpot_max_balls')
+    if max_balls:
+        hits = int(won_histogram[:max_balls + 1].sum())
+        summary['jackpot'] = {
+            'max_balls': max_balls,
+            'hit_rate': round(hits / games, 6),
+            'hits': hits,
+        }
+
+    return summary
+
+
+def simulate(bingo_type: str, cards_count: int, games: int, patterns: list,
+             workers: int = 1, seed: Optional[int] = None, jackpot_balls: Optional[int] = None) -> Dict:
+    """
+    Simula partidas y resume las probabilidades de cada patrón
+
+    Args:
+        bingo_type: '75', '85' o '90'
+        cards_count: cartones en juego por partida
+        games: partidas a simular
+        patterns: instancias de WinningPattern
+        workers: procesos (1 = en el proceso actual)
+        seed: semilla para resultados reproducibles
+        jackpot_balls: fuerza el máximo de bolas del jackpot para todos los patrones
+
+    Returns:
+        dict con los parámetros y un resumen por patrón
+    """
+    if bingo_type not in TOTAL_BALLS:
+        raise ValueError(f"Tipo de bingo inválido: {bingo_type}")
+    if cards_count < 1 or games < 1:
+        raise ValueError("cards_count y games deben ser mayores que cero")
+
+    pattern_specs = [
+        {
+            'code': pattern.code,
+            'name': pattern.name,
+            'pattern_type': pattern.pattern_type,
+            'pattern_data': pattern.pattern_data,
+            'jackpot_max_balls': pattern.jackpot_max_balls if pattern.has_jackpot else None,
+        }
+        for pattern in patterns
+    ]
+
+    workers = max(1, workers)
+    shard_count = 1 if workers == 1 else workers * 4
+    shard_games = [games // shard_count + (1 if index < games % shard_count else 0) for index in range(shard_count)]
+    shard_games = [count for count in shard_games if count]
+    seeds = np.random.SeedSequence(seed).spawn(len(shard_games))
+
+    if workers == 1:
+        shard_results = [
+            _run_shard(bingo_type, cards_count, count, pattern_specs, shard_seed)
+            for count, shard_seed in zip(shard_games, seeds)
+        ]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+            futures = [
+                executor.submit(_run_shard, bingo_type, cards_count, count, pattern_specs, shard_seed)
+                for count, shard_seed in zip(shard_games, seeds)
+            ]
+            shard_results = [future.result() for future in futures]
+
+    summaries = []
+    for spec in pattern_specs:
+        parts = [result[spec['code']] for result in shard_results]
+        summaries.append(_summarize(
+            spec,
+            histogram=sum(part['histogram'] for part in parts),
+            multiple_winners=sum(part['multiple_winners'] for part in parts),
+            winners_at_first=sum(part['winners_at_first'] for part in parts),
+            games=games,
+            jackpot_balls=jackpot_balls,
+        ))
+
+    return {
+        'bingo_type': bingo_type,
+        'cards_count': cards_count,
+        'games': games,
+        'workers': workers,
+        'seed': seed,
+        'patterns': summaries,
+    }
@@ -1,3 +1,2268 @@
-from django.test import TestCase
+"""
+Presupuestos de consultas SQL y de tiempo por endpoint
 
-# Create your tests here.
+Siembra un operador realista (bingo.dataset.seed_tenant: 1000 jugadores, un
+pack de 5000 cartas, una sesión con 3000 cartas en juego y una sesión heredada
+con 2000 cartones) y recorre cada ruta de urls.py, urls_multi_tenant.py,
+urls_card_packs.py y urls_patterns.py comprobando un máximo de consultas y de
+milisegundos. Si una ruta se pasa del presupuesto, el fallo lista las
+consultas agrupadas por el punto del código que las lanzó.
+
+    python manage.py test bingo
+    DATABASE_URL=sqlite:///db.sqlite3 python manage.py test bingo
+
+QUERY_BUDGET_TIME_SCALE multiplica los presupuestos de tiempo (máquinas
+lentas o CI compartido); con 0 no se comprueba el tiempo.
+"""
+
+import hashlib
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import tempfile
+import threading
+import time
+import traceback
+import unittest
+from collections import OrderedDict, namedtuple
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.http import QueryDict
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from bingo_service.settings import database_from_url, with_connection_mode
+
+import numpy as np
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from . import db_router, pattern_registry
+from .connection_benchmark import ConnectionBenchmarkError, run_connection_benchmark
+from .benchmarks import compare_results, confirm_regressions
+from .dataset import generate_cards, generate_dataset, seed_tenant
+from .engine import CompletionIndex, GameEngine, get_game_engine
+from .idempotency import REPLAY_HEADER, _request_hash, _scope_hash, idempotent
+from .loadtest import (
+    LoadTestError, cleanup_target, load_scenario, percentile, prepare_target, run_scenario, scale_scenario,
+    summarize,
+)
+from .locks import lock_wait_stats
+from .metrics import PATTERN_CHECK_SECONDS, Counter, Histogram, Registry, operator_label
+from .middleware import RequestTiming
+from .models import (
+    APIKey, BingoCard, BingoCardExtended, BingoGame, BingoGameExtended, BingoSession,
+    CardPack, DrawnBall, GameStage, IdempotencyRecord, Operator, PlayerCard, PlayerSession, SessionCard,
+    WinningPattern,
+)
+from .pattern_compiler import (
+    BUILTIN_SPECS, PatternCompileError, card_bitmaps, compile_pattern, resolve_spec, validate_spec,
+)
+from .replay import GameReplay, generate_snapshot
+from .simulation import simulate
+
+
+TIME_SCALE = float(os.environ.get('QUERY_BUDGET_TIME_SCALE', '1'))
+
+PROJECT_DIR = str(settings.BASE_DIR)
+THIS_FILE = os.path.abspath(__file__)
+
+
+Route = namedtuple('Route', 'name method path data max_queries max_ms')
+
+
+class QueryCapture:
+    """Registra cada consulta con su duración y el punto del código que la lanzó"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': sql,
+                'ms': (time.perf_counter() - started) * 1000,
+                'call_site': self._call_site(),
+            })
+
+    @staticmethod
+    def _call_site():
+        # El frame más interno del proyecto; si la consulta sale de una vista
+        # genérica de DRF, el frame más interno fuera del ORM
+        fallback = None
+        for frame in reversed(traceback.extract_stack()[:-2]):
+            filename = os.path.abspath(frame.filename)
+            if filename == THIS_FILE or os.sep + os.path.join('django', 'db') + os.sep in filename:
+                continue
+            if 'site-packages' in filename:
+                if fallback is None:
+                    fallback = f"{filename.split('site-packages' + os.sep, 1)[1]}:{frame.lineno} en {frame.name}"
+                continue
+            if filename.startswith(PROJECT_DIR) and os.path.basename(filename) != 'manage.py':
+                return f"{os.path.relpath(filename, PROJECT_DIR)}:{frame.lineno} en {frame.name}"
+        return fallback or '(fuera del proyecto)'
+
+    def report(self) -> str:
+        """Consultas agrupadas por punto del código, de la más repetida a la menos"""
+        groups = OrderedDict()
+        for query in self.queries:
+            group = groups.setdefault(query['call_site'], {'count': 0, 'ms': 0.0, 'sql': []})
+            group['count'] += 1
+            group['ms'] += query['ms']
+            if query['sql'] not in group['sql']:
+                group['sql'].append(query['sql'])
+
+        lines = []
+        for call_site, group in sorted(groups.items(), key=lambda item: -item[1]['count']):
+            lines.append(f"  {group['count']:>4}x  {group['ms']:>8.1f} ms  {call_site}")
+            for sql in group['sql'][:3]:
+                lines.append(f"          {sql[:200]}")
+            if len(group['sql']) > 3:
+                lines.append(f"          ... {len(group['sql']) - 3} consultas distintas más")
+        return '\n'.join(lines)
+
+
+def _pending_card(f):
+    """Cartón heredado reservado por un jugador (para confirmar o liberar)"""
+    return BingoCardExtended.objects.filter(session=f.legacy_session, status='reserved').first()
+
+
+def _fresh_session(f, **extra):
+    values = dict(
+        operator=f.operator, name='Sesión nueva', bingo_type='75', max_players=100,
+        scheduled_start=timezone.now() + timedelta(hours=1), total_cards=100,
+    )
+    values.update(extra)
+    return BingoSession.objects.create(**values)
+
+
+def _fresh_game(f, **extra):
+    return BingoGameExtended.objects.create(
+        operator=f.operator, session=f.session, game_type='75', name='Partida nueva', **extra
+    )
+
+
+def _finished_game(f):
+    """Partida terminada con la semilla revelada y 30 bolas extraídas"""
+    game = f.legacy_game
+    game.is_active = False
+    game.save()
+    return game
+
+
+def _custom_pattern(f):
+    return WinningPattern.objects.create(
+        operator=f.operator, name='Esquinas y centro', code='budget_corners_center',
+        pattern_type='custom', pattern_data={'positions': [[0, 0], [0, 4], [2, 2], [4, 0], [4, 4]]},
+    )
+
+
+# Presupuestos medidos con el dataset de seed_tenant: las consultas son las
+# medidas exactas y el tiempo, unas tres veces lo medido (mínimo 150 ms,
+# incluye autenticación JWT y serialización). Una ruta que introduce un N+1 se
+# pasa de consultas aunque el dataset no cambie. select_multiple_cards sigue
+# reservando cartón por cartón (7 consultas por cartón).
+ROUTES = [
+    # === Autenticación (bingo_service/urls.py) ===
+    Route('token_obtain', 'post', lambda f: '/api/token/',
+          lambda f: {'api_key': f.api_key.key, 'api_secret': f.api_secret}, 3, 150),
+    Route('token_refresh', 'post', lambda f: '/api/token/refresh/',
+          lambda f: {'refresh': f.refresh}, 1, 150),
+
+    # === API original (bingo/urls.py) ===
+    Route('bingo_card_list', 'get', lambda f: '/api/bingo/cards/', None, 3, 150),
+    Route('bingo_card_detail', 'get', lambda f: f"/api/bingo/cards/{f.legacy_card.id}/", None, 2, 150),
+    Route('bingo_card_create', 'post', lambda f: '/api/bingo/cards/create/',
+          lambda f: {'bingo_type': '75', 'user_id': 'budget'}, 2, 150),
+    Route('bingo_card_validate', 'post', lambda f: '/api/bingo/cards/validate/',
+          lambda f: {'card_id': str(f.legacy_card.id)}, 3, 150),
+    Route('bingo_card_winner', 'post', lambda f: '/api/bingo/cards/check-winner/',
+          lambda f: {'card_id': str(f.legacy_card.id), 'drawn_numbers': list(range(3, 150))}, 3, 150),
+    Route('bingo_card_generate_multiple', 'post', lambda f: '/api/bingo/cards/generate-multiple/',
+          lambda f: {'bingo_type': '90', 'count': 10}, 11, 150),
+    Route('bingo_card_generate_for_game', 'post', lambda f: '/api/bingo/cards/generate-for-game/',
+          lambda f: {'game_id': str(f.game.id), 'user_id': 'budget'}, 3, 150),
+    Route('bingo_game_list', 'get', lambda f: '/api/bingo/games/', None, 3, 150),
+    Route('bingo_game_create', 'post', lambda f: '/api/bingo/games/',
+          lambda f: {'game_type': '75', 'name': 'Partida presupuesto'}, 2, 150),
+    Route('bingo_game_detail', 'get', lambda f: f"/api/bingo/games/{f.game.id}/", None, 3, 150),
+    Route('bingo_draw_ball', 'post', lambda f: '/api/bingo/games/draw-ball/',
+          lambda f: {'game_id': str(f.game.id)}, 8, 150),
+    Route('bingo_drawn_balls', 'get', lambda f: f"/api/bingo/games/{f.game.id}/drawn-balls/", None, 3, 150),
+    Route('bingo_check_winner_with_game', 'post', lambda f: '/api/bingo/games/check-winner/',
+          lambda f: {'card_id': str(f.legacy_card.id), 'game_id': str(f.legacy_game.id)}, 4, 150),
+    Route('bingo_statistics', 'get', lambda f: '/api/bingo/statistics/', None, 5, 150),
+
+    # === Operadores y jugadores (urls_multi_tenant.py) ===
+    Route('operator_list', 'get', lambda f: '/api/multi-tenant/operators/', None, 3, 150),
+    Route('operator_create', 'post', lambda f: '/api/multi-tenant/operators/',
+          lambda f: {'name': 'Operador nuevo', 'code': 'nuevo', 'allowed_bingo_types': ['75']}, 3, 150),
+    Route('operator_detail', 'get', lambda f: f"/api/multi-tenant/operators/{f.operator.id}/", None, 2, 150),
+    Route('operator_statistics', 'get', lambda f: f"/api/multi-tenant/operators/{f.operator.id}/statistics/", None, 15, 150),
+    Route('player_list', 'get', lambda f: f"/api/multi-tenant/players/?operator={f.operator.id}", None, 3, 150),
+    Route('player_create', 'post', lambda f: '/api/multi-tenant/players/',
+          lambda f: {'operator': str(f.operator.id), 'username': 'nuevo', 'phone': '+584140000000'}, 4, 150),
+    Route('player_detail', 'get', lambda f: f"/api/multi-tenant/players/{f.player.id}/", None, 2, 150),
+    Route('register_player_by_phone', 'post', lambda f: '/api/multi-tenant/players/register-by-phone/',
+          lambda f: {'operator_code': f.operator.code, 'phone': '+584249999999', 'username': 'telefono'}, 4, 150),
+    Route('link_social_account', 'post', lambda f: '/api/multi-tenant/players/link-social/',
+          lambda f: {'player_id': str(f.player.id), 'whatsapp_id': 'wa-1'}, 4, 150),
+
+    # === Sesiones ===
+    Route('session_list', 'get', lambda f: f"/api/multi-tenant/sessions/?operator={f.operator.id}", None, 3, 150),
+    Route('session_create', 'post', lambda f: '/api/multi-tenant/sessions/',
+          lambda f: {'operator': str(f.operator.id), 'name': 'Sesión nueva', 'bingo_type': '75',
+                     'scheduled_start': (timezone.now() + timedelta(hours=2)).isoformat()}, 7, 150),
+    Route('session_detail', 'get', lambda f: f"/api/multi-tenant/sessions/{f.session.id}/", None, 2, 150),
+    Route('session_statistics', 'get', lambda f: f"/api/multi-tenant/sessions/{f.session.id}/statistics/", None, 7, 150),
+    Route('join_session', 'post', lambda f: '/api/multi-tenant/sessions/join/',
+          lambda f: {'session_id': str(f.scheduled_session.id), 'player_id': str(f.player.id), 'cards_count': 2}, 12, 150),
+    Route('leave_session', 'post', lambda f: '/api/multi-tenant/sessions/leave/',
+          lambda f: {'session_id': str(f.session.id), 'player_id': str(f.player.id)}, 3, 150),
+    Route('player_session_list', 'get', lambda f: f"/api/multi-tenant/player-sessions/?session={f.session.id}", None, 3, 150),
+
+    # === Cartones ===
+    Route('card_list', 'get', lambda f: f"/api/multi-tenant/cards/?session={f.legacy_session.id}", None, 3, 150),
+    Route('card_detail', 'get', lambda f: f"/api/multi-tenant/cards/{f.legacy_card.id}/", None, 2, 150),
+    Route('generate_cards_for_session', 'post', lambda f: '/api/multi-tenant/cards/generate-for-session/',
+          lambda f: {'session_id': str(_fresh_session(f, card_source='generate').id)}, 13, 250),
+    Route('select_card', 'post', lambda f: '/api/multi-tenant/cards/select/',
+          lambda f: {'session_id': str(f.legacy_session.id), 'player_id': str(f.buyer.id),
+                     'card_id': str(f.available_cards[0].id)}, 14, 150),
+    Route('select_multiple_cards', 'post', lambda f: '/api/multi-tenant/cards/select-multiple/',
+          lambda f: {'session_id': str(f.legacy_session.id), 'player_id': str(f.buyer.id),
+                     'card_ids': [str(card.id) for card in f.available_cards[:5]]}, 35, 200),
+    Route('confirm_card_purchase', 'post', lambda f: '/api/multi-tenant/cards/confirm-purchase/',
+          lambda f: {'card_id': str(_pending_card(f).id)}, 7, 150),
+    Route('confirm_multiple_purchase', 'post', lambda f: '/api/multi-tenant/cards/confirm-multiple-purchase/',
+          lambda f: {'player_id': str(_pending_card(f).player_id), 'session_id': str(f.legacy_session.id),
+                     'card_ids': [str(_pending_card(f).id)]}, 7, 150),
+    Route('release_card', 'post', lambda f: '/api/multi-tenant/cards/release/',
+          lambda f: {'card_id': str(_pending_card(f).id)}, 5, 150),
+    Route('release_multiple_cards', 'post', lambda f: '/api/multi-tenant/cards/release-multiple/',
+          lambda f: {'player_id': str(_pending_card(f).player_id), 'session_id': str(f.legacy_session.id),
+                     'card_ids': [str(_pending_card(f).id)]}, 7, 150),
+    # Un INSERT ... SELECT de SessionCard y otro de PlayerSession (más su savepoint)
+    Route('reuse_cards', 'post', lambda f: '/api/multi-tenant/cards/reuse/',
+          lambda f: {'new_session_id': str(_fresh_session(f, allow_card_reuse=True).id), 'old_session_id': str(f.legacy_session.id)}, 16, 150),
+    Route('available_cards', 'get', lambda f: f"/api/multi-tenant/sessions/{f.legacy_session.id}/available-cards/", None, 3, 1000),
+    Route('player_cards', 'get',
+          lambda f: f"/api/multi-tenant/sessions/{f.legacy_session.id}/player/{f.legacy_owner.id}/cards/", None, 5, 150),
+
+    # === Partidas ===
+    Route('game_list', 'get', lambda f: f"/api/multi-tenant/games/?operator={f.operator.id}", None, 3, 150),
+    Route('game_create', 'post', lambda f: '/api/multi-tenant/games/',
+          lambda f: {'operator': str(f.operator.id), 'session': str(f.session.id), 'game_type': '75',
+                     'name': 'Partida nueva'}, 6, 150),
+    Route('game_detail', 'get', lambda f: f"/api/multi-tenant/games/{f.game.id}/", None, 3, 150),
+    Route('session_game', 'get', lambda f: f"/api/multi-tenant/sessions/{f.session.id}/game/", None, 9, 150),
+    Route('draw_ball', 'post', lambda f: '/api/multi-tenant/games/draw-ball/',
+          lambda f: {'game_id': str(f.game.id)}, 11, 150),
+    Route('draw_ball_by_id', 'post', lambda f: f"/api/multi-tenant/games/{f.game.id}/draw-ball/", None, 11, 150),
+    # draw-many, check-all-cards y closest construyen en Python el motor o la tabla de
+    # completitud de los ~3800 cartones de la partida (caché del proceso vacía en cada
+    # test): ~600, ~400 y ~550 ms medidos en SQLite; el presupuesto es ~2x eso
+    Route('draw_many', 'post', lambda f: f"/api/multi-tenant/games/{f.game.id}/draw-many/",
+          lambda f: {'count': 10}, 12, 1400),
+    Route('commit_draw_sequence', 'post', lambda f: f"/api/multi-tenant/games/{f.game.id}/commit-sequence/", None, 7, 150),
+    Route('verify_draw_sequence', 'get', lambda f: f"/api/multi-tenant/games/{_finished_game(f).id}/verify/", None, 3, 150),
+    Route('drawn_balls', 'get', lambda f: f"/api/multi-tenant/games/{f.game.id}/drawn-balls/", None, 3, 150),
+    Route('check_winner', 'post', lambda f: '/api/multi-tenant/games/check-winner/',
+          lambda f: {'game_id': str(f.legacy_game.id), 'card_id': str(f.legacy_card.id)}, 7, 150),
+
+    # === Packs de cartas (urls_card_packs.py) ===
+    # Cada pack serializado cuenta sus cartas disponibles (un COUNT ... NOT EXISTS)
+    Route('cardpack_list', 'get', lambda f: f"/api/card-packs/packs/?operator={f.operator.id}", None, 6, 150),
+    Route('cardpack_create', 'post', lambda f: '/api/card-packs/packs/',
+          lambda f: {'operator': str(f.operator.id), 'name': 'Pack nuevo', 'bingo_type': '90',
+                     'total_cards': 50}, 4, 150),
+    Route('cardpack_detail', 'get', lambda f: f"/api/card-packs/packs/{f.pack.id}/", None, 5, 150),
+    Route('cardpack_generate_cards', 'post',
+          lambda f: f"/api/card-packs/packs/{CardPack.objects.create(operator=f.operator, name='Pack vacío', bingo_type='75', total_cards=50).id}/generate-cards/",
+          lambda f: {}, 10, 150),
+    Route('cardpack_cards', 'get', lambda f: f"/api/card-packs/packs/{f.pack.id}/cards/?available_only=true", None, 7, 150),
+    Route('player_acquire_cards', 'post', lambda f: f"/api/card-packs/players/{f.player.id}/acquire-cards/",
+          lambda f: {'pack_id': str(f.pack.id), 'quantity': 5}, 10, 150),
+    Route('pack_player_cards', 'get', lambda f: f"/api/card-packs/players/{f.player.id}/cards/", None, 4, 150),
+    Route('player_card_favorite', 'patch',
+          lambda f: f"/api/card-packs/players/{f.player.id}/cards/{f.player_card.id}/favorite/",
+          lambda f: {'is_favorite': True}, 7, 150),
+    Route('player_card_nickname', 'patch',
+          lambda f: f"/api/card-packs/players/{f.player.id}/cards/{f.player_card.id}/nickname/",
+          lambda f: {'nickname': 'La suertuda'}, 7, 150),
+    Route('session_join_with_cards', 'post', lambda f: f"/api/card-packs/sessions/{f.scheduled_session.id}/join-with-cards/",
+          lambda f: {'player_id': str(f.player.id), 'card_ids': [str(f.player_card.card_id)]}, 12, 150),
+    Route('session_cards', 'get', lambda f: f"/api/card-packs/sessions/{f.session.id}/cards/?player={f.player.id}", None, 4, 150),
+    Route('session_player_cards', 'get',
+          lambda f: f"/api/card-packs/sessions/{f.session.id}/players/{f.player.id}/cards/", None, 4, 150),
+    Route('session_finalize', 'post', lambda f: f"/api/card-packs/sessions/{f.session.id}/finalize/", None, 10, 1750),
+    Route('mark_number', 'post', lambda f: '/api/card-packs/mark-number/',
+          lambda f: {'session_card_id': str(f.session_card.id), 'number': f.session_card_number}, 7, 150),
+
+    # === Patrones (urls_patterns.py) ===
+    Route('pattern_list', 'get', lambda f: '/api/patterns/', None, 3, 150),
+    Route('pattern_detail', 'get', lambda f: f"/api/patterns/{f.system_pattern.id}/", None, 2, 150),
+    Route('pattern_create', 'post', lambda f: '/api/patterns/create/',
+          lambda f: {'operator': str(f.operator.id), 'name': 'Diagonal doble', 'code': 'budget_double_diagonal',
+                     'pattern_type': 'custom', 'pattern_data': {'any': 'diagonal', 'count': 2}}, 5, 150),
+    Route('pattern_update', 'patch', lambda f: f"/api/patterns/{_custom_pattern(f).id}/update/",
+          lambda f: {'name': 'Esquinas y centro (editado)'}, 3, 150),
+    Route('pattern_delete', 'delete', lambda f: f"/api/patterns/{_custom_pattern(f).id}/delete/", None, 4, 150),
+    Route('patterns_by_type', 'get', lambda f: '/api/patterns/available/75/', None, 2, 150),
+    Route('simulate_patterns', 'post', lambda f: '/api/patterns/simulate/',
+          lambda f: {'bingo_type': '75', 'cards_count': 50, 'games': 200, 'pattern_codes': ['full_card']}, 3, 250),
+    Route('session_configure_patterns', 'post', lambda f: f"/api/patterns/sessions/{f.session.id}/configure/",
+          lambda f: {'pattern_codes': ['horizontal_line', 'full_card']}, 5, 150),
+    Route('session_patterns', 'get', lambda f: f"/api/patterns/sessions/{f.session.id}/patterns/", None, 3, 150),
+    Route('check_winner_with_patterns', 'post', lambda f: '/api/patterns/check-winner/',
+          lambda f: {'card_id': str(f.legacy_card.id), 'drawn_numbers': list(range(5, 150))}, 6, 200),
+    Route('check_all_cards', 'post', lambda f: f"/api/patterns/games/{f.game.id}/check-all-cards/", None, 12, 900),
+    Route('game_stages', 'get', lambda f: f"/api/patterns/games/{f.game.id}/stages/", None, 3, 150),
+    Route('game_stages_configure', 'post', lambda f: f"/api/patterns/games/{_fresh_game(f).id}/stages/configure/",
+          lambda f: {'pattern_codes': ['horizontal_line', 'four_corners', 'full_card']}, 9, 150),
+    Route('game_closest_cards', 'get', lambda f: f"/api/patterns/games/{f.game.id}/closest/?k=10", None, 9, 1100),
+]
+
+
+class Fixtures:
+    """Objetos sembrados que usan las rutas para construir URLs y cuerpos"""
+
+
+class EndpointQueryBudgetTests(TestCase):
+    """Un test por ruta: consultas SQL y milisegundos máximos"""
+
+    @classmethod
+    def setUpTestData(cls):
+        data = seed_tenant()
+        f = cls.fixtures = Fixtures()
+        for key, value in data.items():
+            setattr(f, key, value)
+
+        f.player = data['players'][0]
+        f.player_card = PlayerCard.objects.filter(player=f.player).order_by('acquired_at', 'id').first()
+        f.session_card = SessionCard.objects.filter(session=f.session, player=f.player).select_related('card').first()
+        drawn = set(f.game.drawn_balls.values_list('number', flat=True))
+        f.session_card_number = next(
+            number for row in f.session_card.card.numbers for number in row
+            if isinstance(number, int) and number and number not in drawn
+        )
+        # Cartón vendido que no gana: check-winner no debe guardar (dos UPDATE más)
+        legacy_drawn = set(DrawnBall.get_drawn_numbers(f.legacy_game.id))
+        f.legacy_card = next(
+            card for card in data['legacy_cards']
+            if card.status == 'sold' and not card.check_winner(legacy_drawn)['is_winner']
+        )
+        f.legacy_owner = f.legacy_card.player
+        f.available_cards = [card for card in data['legacy_cards'] if card.status == 'available'][:5]
+        # Jugador sin cartones en la sesión heredada (para seleccionar hasta 5)
+        with_cards = {card.player_id for card in data['legacy_cards'] if card.player_id}
+        f.buyer = next(player for player in data['players'] if player.id not in with_cards)
+        f.system_pattern = WinningPattern.objects.get(code='full_card')
+        f.scheduled_session = _fresh_session(
+            f, name='Sesión programada', card_source='player_cards', max_players=2000
+        )
+
+        # TestCase copia los atributos de setUpTestData en cada test: fuera las listas grandes
+        f.players = f.pack_cards = f.legacy_cards = None
+
+        response = cls.client_class().post(
+            '/api/token/', {'api_key': f.api_key.key, 'api_secret': f.api_secret}, content_type='application/json'
+        )
+        f.access = response.json()['access']
+        f.refresh = response.json()['refresh']
+
+    def assert_route_within_budget(self, route: Route):
+        f = self.fixtures
+        path = route.path(f)
+        data = route.data(f) if route.data else None
+
+        capture = QueryCapture()
+        request = getattr(self.client, route.method)
+        started = time.perf_counter()
+        with connection.execute_wrapper(capture):
+            response = request(
+                path, data, content_type='application/json', HTTP_AUTHORIZATION=f'Bearer {f.access}'
+            ) if data is not None else request(path, HTTP_AUTHORIZATION=f'Bearer {f.access}')
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        self.assertLess(
+            response.status_code, 400,
+            f"{route.method.upper()} {path} respondió {response.status_code}: {response.content[:500]!r}"
+        )
+        self.assertLessEqual(
+            len(capture.queries), route.max_queries,
+            f"{route.method.upper()} {path}: {len(capture.queries)} consultas "
+            f"(presupuesto {route.max_queries})\n{capture.report()}"
+        )
+        if TIME_SCALE:
+            budget_ms = route.max_ms * TIME_SCALE
+            self.assertLessEqual(
+                elapsed_ms, budget_ms,
+                f"{route.method.upper()} {path}: {elapsed_ms:.0f} ms (presupuesto {budget_ms:.0f} ms)\n"
+                f"{capture.report()}"
+            )
+
+
+def _make_test(route: Route):
+    def test(self):
+        self.assert_route_within_budget(route)
+    test.__doc__ = f"{route.method.upper()} {route.name}"
+    return test
+
+
+for _route in ROUTES:
+    setattr(EndpointQueryBudgetTests, f'test_{_route.name}', _make_test(_route))
+
+
+class DatasetTests(TestCase):
+    """El dataset sembrado es determinista y coherente"""
+
+    def test_seed_tenant_is_deterministic(self):
+        first = seed_tenant(players=20, pack_cards=80, legacy_cards=40, seed=7, operator_code='first')
+        second = seed_tenant(players=20, pack_cards=80, legacy_cards=40, seed=7, operator_code='second')
+
+        self.assertEqual(
+            [card.numbers for card in first['pack_cards']],
+            [card.numbers for card in second['pack_cards']],
+        )
+        self.assertEqual(
+            [card.status for card in first['legacy_cards']],
+            [card.status for card in second['legacy_cards']],
+        )
+
+    def test_seed_tenant_creates_multi_table_cards(self):
+        data = seed_tenant(players=10, pack_cards=40, legacy_cards=30, drawn_balls=12)
+
+        self.assertEqual(BingoCardExtended.objects.filter(pack=data['pack']).count(), 40)
+        self.assertEqual(BingoCard.objects.filter(id=data['legacy_cards'][0].id).count(), 1)
+        self.assertEqual(SessionCard.objects.filter(session=data['session']).count(), 30)
+        self.assertEqual(data['game'].drawn_balls.count(), 12)
+        self.assertEqual(
+            list(data['game'].drawn_balls.order_by('sequence').values_list('number', flat=True)),
+            data['game'].get_seed_sequence(12),
+        )
+        self.assertEqual(data['pack'].cards.filter(owners__isnull=True).count(), 10)
+        self.assertTrue(BingoGameExtended.objects.filter(id=data['legacy_game'].id).exists())
+        self.assertTrue(BingoGame.objects.filter(id=data['game'].id).exists())
+        self.assertEqual(data['legacy_session'].cards.count(), 30)
+
+    def test_generate_cards_matches_model_format(self):
+        # Los de 90 bolas los genera BingoCard.generate_90_ball_card
+        for bingo_type in ('75', '85'):
+            for numbers in generate_cards(bingo_type, 50, np.random.default_rng(1)):
+                card = BingoCard(bingo_type=bingo_type, numbers=numbers)
+                self.assertTrue(card.validate_card()['is_valid'], (bingo_type, numbers))
+
+    def test_generate_dataset_writes_related_rows(self):
+        result = generate_dataset(
+            operators=2, players_per_operator=20, packs_per_operator=2, cards_per_pack=50,
+            cards_per_player=3, sessions_per_operator=3, games_per_session=2, balls_per_game=10,
+            participation=1.0, seed=3, chunk_size=32, use_copy=False,
+        )
+
+        self.assertEqual(result['operators'], ['ds3-0001', 'ds3-0002'])
+        self.assertEqual(result['rows']['cards'], 200)
+        self.assertEqual(BingoCardExtended.objects.filter(pack__operator__code='ds3-0001').count(), 100)
+        self.assertEqual(PlayerCard.objects.filter(player__operator__code='ds3-0001').count(), 60)
+
+        # 60 cartas repartidas: 50 del primer pack y 10 del segundo
+        sessions = BingoSession.objects.filter(operator__code='ds3-0001').order_by('scheduled_start')
+        self.assertEqual([session.session_cards.count() for session in sessions], [50, 10, 50])
+        self.assertEqual(PlayerSession.objects.filter(session=sessions[1]).count(), 4)
+
+        game = BingoGameExtended.objects.filter(session=sessions[0]).first()
+        self.assertFalse(game.is_active)
+        self.assertEqual(
+            list(game.drawn_balls.order_by('sequence').values_list('number', flat=True)),
+            game.get_seed_sequence(10),
+        )
+        self.assertEqual(DrawnBall.objects.count(), result['rows']['drawn_balls'])
+
+    def test_generate_dataset_is_deterministic(self):
+        def snapshot():
+            with transaction.atomic():
+                generate_dataset(players_per_operator=10, cards_per_pack=40, seed=11, use_copy=False)
+                cards = list(BingoCardExtended.objects.order_by('id').values_list('id', 'numbers', 'owners__player_id'))
+                balls = list(DrawnBall.objects.order_by('game_id', 'sequence').values_list('game_id', 'number'))
+                transaction.set_rollback(True)
+            return cards, balls
+
+        self.assertEqual(snapshot(), snapshot())
+
+    def test_global_random_is_untouched(self):
+        state = random.getstate()
+
+        seed_tenant(players=5, pack_cards=20, legacy_cards=10, bingo_type='90', seed=3)
+        generate_cards('90', 10, np.random.default_rng(3))
+
+        self.assertEqual(random.getstate(), state)
+
+
+class RequestTimingMiddlewareTests(TestCase):
+    """Server-Timing y log de las peticiones muestreadas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        data = seed_tenant(players=5, pack_cards=20, legacy_cards=10, drawn_balls=8)
+        cls.game_id = data['game'].id
+        response = cls.client_class().post(
+            '/api/token/', {'api_key': data['api_key'].key, 'api_secret': data['api_secret']},
+            content_type='application/json'
+        )
+        cls.access = response.json()['access']
+
+    def get_drawn_balls(self):
+        return self.client.get(
+            f'/api/multi-tenant/games/{self.game_id}/drawn-balls/', HTTP_AUTHORIZATION=f'Bearer {self.access}'
+        )
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=1, REQUEST_TIMING_SLOW_MS=60_000)
+    def test_sampled_request_reports_server_timing(self):
+        capture = QueryCapture()
+        with connection.execute_wrapper(capture):
+            response = self.get_drawn_balls()
+
+        self.assertEqual(response.status_code, 200)
+        header = response['Server-Timing']
+        for metric in ('db;dur=', 'view;dur=', 'ser;dur=', 'render;dur=', 'total;dur='):
+            self.assertIn(metric, header)
+        self.assertIn(f'desc="{len(capture.queries)} queries"', header)
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=0)
+    def test_unsampled_request_has_no_header(self):
+        self.assertNotIn('Server-Timing', self.get_drawn_balls())
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=1, REQUEST_TIMING_SLOW_MS=0)
+    def test_slow_request_logs_captured_sql(self):
+        with self.assertLogs('bingo.request_timing', 'WARNING') as logs:
+            self.client.get('/api/multi-tenant/sessions/', HTTP_AUTHORIZATION=f'Bearer {self.access}')
+
+        record = logs.records[0].request_timing
+        self.assertEqual(record['route'], 'api/multi-tenant/sessions/')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['serializer_ms'], 0)
+        self.assertEqual(len(record['sql']['slowest']), record['db_queries'])
+
+    def test_repeated_queries_are_grouped(self):
+        timing = RequestTiming()
+        timing.queries = [('SELECT 1 WHERE id = %s', 0.001)] * 3 + [('SELECT 2', 0.002)]
+
+        captured = timing.captured_sql(limit=10)
+
+        self.assertEqual(captured['repeated'], [{'sql': 'SELECT 1 WHERE id = %s', 'count': 3}])
+        self.assertEqual(captured['slowest'][0]['sql'], 'SELECT 2')
+
+    def test_long_sql_is_truncated(self):
+        timing = RequestTiming()
+        sql = 'SELECT 1 WHERE id IN (' + ', '.join(['%s'] * 500) + ')'
+        timing.queries = [(sql, 0.001)] * 2
+
+        captured = timing.captured_sql(limit=10, max_sql_length=100)
+
+        for entry in captured['slowest'] + captured['repeated']:
+            self.assertTrue(entry['sql'].startswith(sql[:100]))
+            self.assertTrue(entry['sql'].endswith(f'[+{len(sql) - 100} caracteres]'))
+
+    def test_logger_is_quiet_under_tests(self):
+        self.assertFalse(logging.getLogger('bingo.request_timing').isEnabledFor(logging.WARNING))
+
+
+class MetricsTests(TestCase):
+    """Registro de métricas, exposición en /metrics y modo multiproceso"""
+
+    def test_render_text_exposition(self):
+        registry = Registry()
+        draws = registry.register(Counter('test_draws_total', 'Bolas', ['operator']))
+        latency = registry.register(Histogram('test_seconds', 'Duración', buckets=(0.1, 1.0)))
+        draws.inc(operator='a"b')
+        draws.labels('a"b').inc(2)
+        latency.observe(0.05)
+        latency.observe(5)
+
+        text = registry.render()
+
+        self.assertIn('# TYPE test_draws_total counter', text)
+        self.assertIn('test_draws_total{operator="a\\"b"} 3', text)
+        self.assertIn('test_seconds_bucket{le="0.1"} 1', text)
+        self.assertIn('test_seconds_bucket{le="1.0"} 1', text)
+        self.assertIn('test_seconds_bucket{le="+Inf"} 2', text)
+        self.assertIn('test_seconds_count 2', text)
+
+    def test_wrong_labels_raise(self):
+        with self.assertRaises(ValueError):
+            Counter('test_total', 'x', ['operator']).inc(game='g')
+
+    def test_multiprocess_directory_sums_workers(self):
+        registry = Registry()
+        draws = registry.register(Counter('test_draws_total', 'Bolas', ['operator']))
+        latency = registry.register(Histogram('test_seconds', 'Duración', buckets=(0.1,)))
+        draws.inc(2, operator='a')
+        latency.observe(0.05)
+
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_MULTIPROC_DIR=directory):
+            with open(os.path.join(directory, 'metrics_1.json'), 'w') as handle:
+                json.dump({
+                    'test_draws_total': [[['a'], 5], [['b'], 1]],
+                    'test_seconds': [[[], {'buckets': [0, 3], 'sum': 9.0, 'count': 3}]],
+                }, handle)
+            collected = registry.collect()
+
+        self.assertEqual(sorted(collected['test_draws_total']), [[['a'], 7], [['b'], 1]])
+        self.assertEqual(collected['test_seconds'], [[[], {'buckets': [1, 3], 'sum': 9.05, 'count': 4}]])
+
+    @override_settings(METRICS_OPERATOR_IDS=['allowed'])
+    def test_operator_label_is_bounded(self):
+        self.assertEqual(operator_label('allowed'), 'allowed')
+        self.assertEqual(operator_label('another'), 'other')
+        self.assertEqual(operator_label(None), 'none')
+
+    def test_metrics_endpoint_exposes_draws(self):
+        data = seed_tenant(players=5, pack_cards=20, legacy_cards=10, drawn_balls=8)
+        data['game'].draw_next_ball()
+
+        with override_settings(DEBUG=True):
+            response = self.client.get('/metrics')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        text = response.content.decode()
+        self.assertIn(f'bingo_balls_drawn_total{{operator="{data["operator"].id}"}}', text)
+        self.assertIn('bingo_draw_lock_wait_seconds_count', text)
+
+    @override_settings(METRICS_AUTH_TOKEN='secreto')
+    def test_metrics_endpoint_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secreto').status_code, 200)
+
+    @override_settings(METRICS_AUTH_TOKEN=None, DEBUG=False)
+    def test_metrics_endpoint_without_token_needs_staff(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+
+        self.client.force_login(User.objects.create_user('jugador', password='x'))
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+
+        self.client.force_login(User.objects.create_user('admin', password='x', is_staff=True))
+        self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+        self.client.logout()
+        with override_settings(DEBUG=True):
+            self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+    def test_reused_pid_does_not_overwrite_a_dead_worker(self):
+        def worker(draws):
+            registry = Registry()
+            registry.register(Counter('test_draws_total', 'Bolas')).inc(draws)
+            registry.flush(directory)
+            return registry
+
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_MULTIPROC_DIR=directory):
+            # Mismo pid (este proceso), otro inicio: como un worker nuevo con el pid de uno muerto
+            worker(5)
+            collected = worker(2).collect()
+
+        self.assertEqual(collected['test_draws_total'], [[[], 7]])
+
+    def test_pattern_check_observed_once_per_card(self):
+        data = seed_tenant(players=5, pack_cards=20, legacy_cards=10, drawn_balls=8)
+        card = data['legacy_cards'][0]
+        access = self.client.post(
+            '/api/token/', {'api_key': data['api_key'].key, 'api_secret': data['api_secret']},
+            content_type='application/json'
+        ).json()['access']
+        patterns = card.session.get_winning_patterns()
+        self.assertGreater(len(patterns), 1)
+        histogram = PATTERN_CHECK_SECONDS.labels('card')
+        before = histogram.value()['count']
+
+        # check_pattern por sí solo no observa nada
+        patterns[0].check_pattern([], card.numbers, card.bingo_type)
+        self.assertEqual(histogram.value()['count'], before)
+
+        response = self.client.post(
+            '/api/patterns/check-winner/',
+            {'card_id': str(card.id), 'drawn_numbers': [1], 'check_all_patterns': True},
+            content_type='application/json', HTTP_AUTHORIZATION=f'Bearer {access}'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(histogram.value()['count'], before + 1)
+
+
+class ProfilingTests(TestCase):
+    """Perfilado bajo demanda con X-Profile: 1"""
+
+    @classmethod
+    def setUpTestData(cls):
+        data = seed_tenant(players=5, pack_cards=20, legacy_cards=10, drawn_balls=8)
+        cls.game_id = data['game'].id
+        response = cls.client_class().post(
+            '/api/token/', {'api_key': data['api_key'].key, 'api_secret': data['api_secret']},
+            content_type='application/json'
+        )
+        cls.access = response.json()['access']
+
+    def setUp(self):
+        cache.clear()
+        self.directory = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(
+            PROFILING_ENABLED=True, PROFILING_TOKEN='perfil', PROFILING_DIR=self.directory
+        ))
+
+    def get_drawn_balls(self, **headers):
+        return self.client.get(
+            f'/api/multi-tenant/games/{self.game_id}/drawn-balls/',
+            HTTP_AUTHORIZATION=f'Bearer {self.access}', **headers
+        )
+
+    def test_profiled_request_stores_artifacts(self):
+        response = self.get_drawn_balls(HTTP_X_PROFILE='1', HTTP_X_PROFILE_TOKEN='perfil')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Profile-Status'], 'stored')
+        profile_id = response['X-Profile-Id']
+        with open(os.path.join(self.directory, f'{profile_id}.json'), encoding='utf-8') as handle:
+            report = json.load(handle)
+        self.assertEqual(report['route'], 'api/multi-tenant/games/<uuid:game_id>/drawn-balls/')
+        self.assertEqual(report['db_queries'], len(report['sql']))
+        self.assertGreater(report['db_queries'], 0)
+        self.assertIn('drawn_ball', report['top_functions'] + json.dumps(report['sql']))
+        self.assertTrue(report['allocations'])
+
+        listing = self.client.get('/api/profiles/', HTTP_X_PROFILE_TOKEN='perfil').json()
+        self.assertEqual([entry['id'] for entry in listing['profiles']], [profile_id])
+        download = self.client.get(f'/api/profiles/{profile_id}.pstats', HTTP_X_PROFILE_TOKEN='perfil')
+        self.assertEqual(download.status_code, 200)
+        with tempfile.NamedTemporaryFile(suffix='.pstats') as handle:
+            handle.write(b''.join(download.streaming_content))
+            handle.flush()
+            self.assertTrue(pstats.Stats(handle.name).total_calls)
+
+    def test_unauthorized_request_is_not_profiled(self):
+        response = self.get_drawn_balls(HTTP_X_PROFILE='1', HTTP_X_PROFILE_TOKEN='otro')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Profile-Status', response)
+        self.assertEqual(os.listdir(self.directory), [])
+        self.assertEqual(self.client.get('/api/profiles/').status_code, 403)
+        self.assertEqual(
+            self.client.get('/api/profiles/..%2Fsettings.py', HTTP_X_PROFILE_TOKEN='perfil').status_code, 404
+        )
+
+    @override_settings(PROFILING_RATE_LIMIT=1)
+    def test_rate_limit(self):
+        headers = {'HTTP_X_PROFILE': '1', 'HTTP_X_PROFILE_TOKEN': 'perfil'}
+        self.assertEqual(self.get_drawn_balls(**headers)['X-Profile-Status'], 'stored')
+        limited = self.get_drawn_balls(**headers)
+        self.assertEqual(limited.status_code, 200)
+        self.assertEqual(limited['X-Profile-Status'], 'rate-limited')
+
+    def test_disabled_by_default(self):
+        with override_settings(PROFILING_ENABLED=False):
+            response = self.get_drawn_balls(HTTP_X_PROFILE='1', HTTP_X_PROFILE_TOKEN='perfil')
+        self.assertNotIn('X-Profile-Status', response)
+
+
+@override_settings(READ_REPLICA_ALIAS='replica', READ_REPLICA_MAX_LAG_SECONDS=2)
+class ReadReplicaRouterTests(SimpleTestCase):
+    """Elección de la base de datos de lectura (sin consultas: queryset.db)"""
+
+    def setUp(self):
+        self.set_replica_lag(0.0)
+        self.addCleanup(db_router._lag_cache.clear)
+
+    def set_replica_lag(self, seconds):
+        db_router._lag_cache['replica'] = (time.monotonic() + 60, seconds)
+
+    def test_marked_block_reads_from_replica(self):
+        self.assertEqual(WinningPattern.objects.all().db, 'default')
+        with db_router.use_read_replica(RequestFactory().get('/')):
+            self.assertEqual(WinningPattern.objects.all().db, 'replica')
+            self.assertEqual(WinningPattern.objects.db_manager('default').all().db, 'default')
+        self.assertEqual(WinningPattern.objects.all().db, 'default')
+
+    def test_recent_write_sticks_to_primary(self):
+        cookie = RequestFactory().get('/')
+        cookie.COOKIES['bingo_read_primary'] = '1'
+        header = RequestFactory().get('/', HTTP_X_READ_PRIMARY='1')
+        for request in (cookie, header):
+            with db_router.use_read_replica(request):
+                self.assertEqual(WinningPattern.objects.all().db, 'default')
+
+        with db_router.use_read_replica(RequestFactory().get('/')):
+            self.assertEqual(db_router.ReadReplicaRouter().db_for_write(WinningPattern), 'default')
+            self.assertEqual(WinningPattern.objects.all().db, 'default')
+
+    def test_lagging_replica_falls_back_to_primary(self):
+        self.set_replica_lag(30.0)
+        with db_router.use_read_replica(RequestFactory().get('/')):
+            self.assertEqual(WinningPattern.objects.all().db, 'default')
+
+    def test_no_replica_configured(self):
+        with override_settings(READ_REPLICA_ALIAS=None), db_router.use_read_replica(RequestFactory().get('/')):
+            self.assertEqual(WinningPattern.objects.all().db, 'default')
+
+
+class ReadReplicaMiddlewareTests(TestCase):
+    """Cookie de lectura en el primario tras una escritura"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_tenant(players=5, pack_cards=20, legacy_cards=10, drawn_balls=8)
+
+    def obtain_token(self):
+        return self.client.post(
+            '/api/token/', {'api_key': self.data['api_key'].key, 'api_secret': self.data['api_secret']},
+            content_type='application/json'
+        )
+
+    @override_settings(READ_REPLICA_ALIAS='default', READ_REPLICA_STICKY_SECONDS=7)
+    def test_write_sets_sticky_cookie(self):
+        response = self.obtain_token()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.cookies['bingo_read_primary']['max-age'], 7)
+
+        access = response.json()['access']
+        listing = self.client.get(
+            f"/api/card-packs/packs/{self.data['pack'].id}/cards/", HTTP_AUTHORIZATION=f'Bearer {access}'
+        )
+        self.assertEqual(listing.status_code, 200)
+        self.assertNotIn('bingo_read_primary', listing.cookies)
+
+    def test_disabled_without_replica(self):
+        self.assertNotIn('bingo_read_primary', self.obtain_token().cookies)
+
+
+class PatternRegistryTests(TestCase):
+    """Catálogo de patrones en memoria e invalidación por versión"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_tenant(players=5, pack_cards=20, legacy_cards=10, drawn_balls=8)
+
+    def setUp(self):
+        self.addCleanup(pattern_registry.clear)
+        # Publica la versión como si los datos de la clase estuvieran confirmados
+        with self.captureOnCommitCallbacks(execute=True):
+            pattern_registry.bump_version()
+
+    def create_pattern(self, code, **fields):
+        return WinningPattern.objects.create(
+            name=code, code=code, pattern_type='custom', pattern_data={'positions': [[0, 0], [4, 4]]}, **fields
+        )
+
+    def test_session_resolution_is_cached(self):
+        session = self.data['session']
+        expected = list(WinningPattern.objects.filter(
+            code__in=['horizontal_line', 'vertical_line', 'full_card'], is_active=True
+        ))
+        self.assertEqual(session.get_winning_patterns(), expected)
+
+        reloaded = BingoSession.objects.get(pk=session.pk)
+        with self.assertNumQueries(0):
+            patterns = reloaded.get_winning_patterns()
+            pattern_registry.patterns_for_bingo_type('75')
+        self.assertIs(patterns, session.get_winning_patterns())
+
+        reloaded.winning_patterns = ['full_card']
+        self.assertEqual([pattern.code for pattern in reloaded.get_winning_patterns()], ['full_card'])
+
+    def test_save_and_delete_bump_version(self):
+        version = pattern_registry.current_version()
+        self.assertNotIn('registry_corners', [pattern.code for pattern in pattern_registry.active_patterns()])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            pattern = self.create_pattern('registry_corners', compatible_with='90')
+        self.assertNotEqual(pattern_registry.current_version(), version)
+        self.assertIn(pattern, pattern_registry.patterns_for_bingo_type('90'))
+        self.assertNotIn(pattern, pattern_registry.patterns_for_bingo_type('75'))
+        self.assertEqual(pattern_registry.get_pattern(pattern.pk), pattern)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            pattern.delete()
+        self.assertIsNone(pattern_registry.get_pattern(pattern.pk))
+
+    def test_uncommitted_change_bypasses_snapshot(self):
+        cached = pattern_registry.snapshot()
+        pattern = self.create_pattern('registry_pending')
+
+        self.assertIn(pattern, pattern_registry.active_patterns())
+        self.assertNotIn(pattern.code, cached.by_code)
+        self.assertIs(pattern_registry._snapshot, cached)
+
+    def test_configure_session_patterns(self):
+        access = self.client.post(
+            '/api/token/', {'api_key': self.data['api_key'].key, 'api_secret': self.data['api_secret']},
+            content_type='application/json'
+        ).json()['access']
+        session = self.data['session']
+        session.get_winning_patterns()
+
+        response = self.client.post(
+            f'/api/patterns/sessions/{session.id}/configure/', {'pattern_codes': ['four_corners', 'full_card']},
+            content_type='application/json', HTTP_AUTHORIZATION=f'Bearer {access}'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        codes = {pattern['code'] for pattern in response.json()['patterns']}
+        self.assertEqual(codes, {'four_corners', 'full_card'})
+        reloaded = BingoSession.objects.get(pk=session.pk)
+        self.assertEqual({pattern.code for pattern in reloaded.get_winning_patterns()}, codes)
+
+
+def _access_token(client, data) -> str:
+    """JWT del operador sembrado por seed_tenant"""
+    return client.post(
+        '/api/token/', {'api_key': data['api_key'].key, 'api_secret': data['api_secret']},
+        content_type='application/json'
+    ).json()['access']
+
+
+class FairnessTests(TestCase):
+    """Semilla comprometida al crear la partida y revelada solo al terminarla"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_tenant(players=5, pack_cards=20, legacy_cards=10, drawn_balls=8)
+
+    def setUp(self):
+        self.access = _access_token(self.client, self.data)
+        self.game = self.data['game']
+
+    def api(self, method, path, data=None):
+        return getattr(self.client, method)(
+            path, data, content_type='application/json', HTTP_AUTHORIZATION=f'Bearer {self.access}'
+        )
+
+    def test_seed_is_committed_and_hidden_while_active(self):
+        game = BingoGameExtended.objects.create(operator=self.data['operator'], game_type='75')
+        self.assertEqual(len(game.server_seed), 64)
+        self.assertEqual(game.seed_hash, hashlib.sha256(bytes.fromhex(game.server_seed)).hexdigest())
+
+        body = self.api('get', f'/api/multi-tenant/games/{game.id}/').json()
+        self.assertEqual(body['seed_hash'], game.seed_hash)
+        self.assertIsNone(body['server_seed'])
+        self.assertEqual(self.api('get', f'/api/multi-tenant/games/{game.id}/verify/').status_code, 400)
+
+    def test_draws_follow_the_seed_and_verify_after_finish(self):
+        response = self.api('post', f'/api/multi-tenant/games/{self.game.id}/draw-ball/')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['ball_number'], self.game.get_seed_sequence(9)[-1])
+
+        response = self.api('patch', f'/api/multi-tenant/games/{self.game.id}/', {'is_active': False})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['server_seed'], self.game.server_seed)
+        self.assertIsNotNone(response.json()['seed_revealed_at'])
+
+        body = self.api('get', f'/api/multi-tenant/games/{self.game.id}/verify/').json()
+        self.assertTrue(body['verified'])
+        self.assertEqual(body['balls_checked'], 9)
+
+    def test_finished_game_cannot_be_reactivated(self):
+        self.api('patch', f'/api/multi-tenant/games/{self.game.id}/', {'is_active': False})
+
+        response = self.api('patch', f'/api/multi-tenant/games/{self.game.id}/', {'is_active': True})
+
+        self.assertEqual(response.status_code, 400)
+        game = BingoGameExtended.objects.get(pk=self.game.pk)
+        self.assertFalse(game.is_active)
+        game.is_active = True
+        with self.assertRaises(ValueError):
+            game.save()
+
+    def test_finished_game_rejects_draws(self):
+        stale = BingoGameExtended.objects.get(pk=self.game.pk)
+        self.api('patch', f'/api/multi-tenant/games/{self.game.id}/', {'is_active': False})
+
+        self.assertEqual(self.api('post', f'/api/multi-tenant/games/{self.game.id}/draw-ball/').status_code, 400)
+        self.assertEqual(
+            self.api('post', f'/api/multi-tenant/games/{self.game.id}/draw-many/', {'count': 5}).status_code, 400
+        )
+        # Una instancia cargada antes de terminar relee el estado bajo el lock
+        self.assertEqual(stale.draw_next_ball()[0], None)
+        self.assertEqual(stale.draw_many(5)['drawn'], [])
+        self.assertEqual(DrawnBall.objects.filter(game_id=self.game.pk).count(), 8)
+
+
+class SimulationTests(TestCase):
+    """Simulación Monte Carlo reproducible y acotada en la API"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_tenant(players=5, pack_cards=20, legacy_cards=10, drawn_balls=8)
+
+    def test_seeded_simulation_leaves_global_random_untouched(self):
+        patterns = list(WinningPattern.objects.filter(code__in=['horizontal_line', 'full_card']))
+        state = random.getstate()
+
+        first = simulate('75', 20, 300, patterns, seed=5)
+
+        self.assertEqual(random.getstate(), state)
+        self.assertEqual(simulate('75', 20, 300, patterns, seed=5), first)
+        self.assertEqual(
+            BingoCard.generate_90_ball_card(random.Random(3)), BingoCard.generate_90_ball_card(random.Random(3))
+        )
+
+    def test_completion_counts_match_brute_force(self):
+        patterns = list(WinningPattern.objects.filter(
+            code__in=['horizontal_line', 'diagonal_line', 'four_corners', 'full_card']
+        ))
+        cards_count, games, seed = 6, 8, 11
+
+        report = simulate('75', cards_count, games, patterns, seed=seed)
+
+        # Mismas extracciones que _run_shard con un solo proceso
+        rng = np.random.default_rng(np.random.SeedSequence(seed).spawn(1)[0])
+        card_rng = random.Random(int(rng.integers(2 ** 63)))
+        pool = [BingoCard.generate_75_ball_card(card_rng) for _ in range(1000)]
+        picks = rng.random((games, len(pool))).argsort(axis=1)[:, :cards_count]
+        orders = rng.random((games, 75)).argsort(axis=1) + 1
+
+        # Primera bola en que cada cartón completa cada patrón, con check_pattern
+        first_balls = {pattern.code: [] for pattern in patterns}
+        for game_picks, order in zip(picks, orders):
+            completions = {pattern.code: [] for pattern in patterns}
+            for index in game_picks:
+                pending = list(patterns)
+                for balls in range(1, 76):
+                    marked = [int(number) for number in order[:balls]]
+                    for pattern in list(pending):
+                        if pattern.check_pattern(marked, pool[index], '75', balls)['is_winner']:
+                            completions[pattern.code].append(balls)
+                            pending.remove(pattern)
+                    if not pending:
+                        break
+            for code, balls in completions.items():
+                first = min(balls)
+                first_balls[code].append((first, balls.count(first)))
+
+        for summary in report['patterns']:
+            with self.subTest(summary['pattern_code']):
+                results = first_balls[summary['pattern_code']]
+                firsts = [first for first, _ in results]
+                self.assertEqual(summary['games_without_winner'], 0)
+                self.assertEqual(
+                    summary['multiple_winners_probability'],
+                    round(sum(1 for _, winners in results if winners > 1) / games, 6),
+                )
+                self.assertEqual(
+                    summary['average_winners_at_first_win'],
+                    round(sum(winners for _, winners in results) / games, 4),
+                )
+                self.assertEqual(summary['balls_to_first_winner']['distribution'], {
+                    ball: round(firsts.count(ball) / games, 6) for ball in sorted(set(firsts))
+                })
+                self.assertEqual(summary['balls_to_first_winner']['min'], min(firsts))
+                self.assertEqual(summary['balls_to_first_winner']['max'], max(firsts))
+                self.assertEqual(summary['balls_to_first_winner']['mean'], round(sum(firsts) / games, 3))
+
+    def test_api_rejects_oversized_simulation(self):
+        access = _access_token(self.client, self.data)
+
+        response = self.client.post(
+            '/api/patterns/simulate/', {'bingo_type': '75', 'cards_count': 1000, 'games': 10000},
+            content_type='application/json', HTTP_AUTHORIZATION=f'Bearer {access}'
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('simulate_patterns', response.json()['error'])
+
+
+class ReplayTests(SimpleTestCase):
+    """Repetición de partidas en memoria"""
+
+    def test_generated_snapshot_is_reproducible_without_global_seed(self):
+        state = random.getstate()
+
+        snapshot = generate_snapshot('90', 40, seed=7)
+
+        self.assertEqual(random.getstate(), state)
+        self.assertEqual(generate_snapshot('90', 40, seed=7), snapshot)
+        self.assertNotEqual(generate_snapshot('90', 40, seed=8)['cards'], snapshot['cards'])
+
+    def test_stages_are_won_in_order(self):
+        result = GameReplay(generate_snapshot('90', 40, seed=7)).run(collect_events=False)
+
+        self.assertEqual(
+            [stage['pattern_code'] for stage in result['stages_won']], ['horizontal_line', 'two_lines', 'full_card']
+        )
+        balls = [stage['ball_index'] for stage in result['stages_won']]
+        self.assertEqual(balls, sorted(balls))
+        self.assertEqual(result['end_reason'], 'stages_completed')
+        self.assertEqual(result['balls_played'], balls[-1])
+
+
+class DrawLockTests(TransactionTestCase):
+    """Extracciones serializadas por el lock de la partida"""
+
+    def setUp(self):
+        self.data = seed_tenant(players=5, pack_cards=20, legacy_cards=10, drawn_balls=0)
+
+    def test_concurrent_draws_never_repeat_a_ball(self):
+        game = self.data['game']
+        errors = []
+
+        def draw(count):
+            try:
+                instance = BingoGameExtended.objects.get(pk=game.pk)
+                for _ in range(count):
+                    instance.draw_next_ball()
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=draw, args=(5,)) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        balls = list(DrawnBall.objects.filter(game=game).order_by('sequence').values_list('sequence', 'number'))
+        self.assertEqual([sequence for sequence, _ in balls], list(range(1, 21)))
+        self.assertEqual([number for _, number in balls], game.get_seed_sequence(20))
+
+    def test_classic_endpoint_draws_through_the_lock(self):
+        game = BingoGame.objects.create(game_type='75')
+        DrawnBall.objects.bulk_create([
+            DrawnBall(game=game, number=number, sequence=index)
+            for index, number in enumerate(game.get_seed_sequence(74), start=1)
+        ])
+        access = _access_token(self.client, self.data)
+        acquisitions = lock_wait_stats()['acquisitions']
+
+        def draw():
+            return self.client.post(
+                '/api/bingo/games/draw-ball/', {'game_id': str(game.id)},
+                content_type='application/json', HTTP_AUTHORIZATION=f'Bearer {access}'
+            )
+
+        response = draw()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['drawn_ball']['number'], game.get_seed_sequence()[74])
+        self.assertEqual(response.json()['total_drawn'], 75)
+        self.assertEqual(draw().status_code, 400)
+        self.assertEqual(lock_wait_stats()['acquisitions'], acquisitions + 2)
+
+
+class SessionJoinTests(TestCase):
+    """Unión masiva de cartas a una sesión"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_tenant(players=5, pack_cards=40, legacy_cards=10, drawn_balls=0)
+
+    def test_bulk_join_counts_only_inserted_rows(self):
+        session = BingoSession.objects.create(
+            operator=self.data['operator'], name='Sesión nueva', bingo_type='75', card_source='player_cards',
+            scheduled_start=timezone.now() + timedelta(hours=1),
+        )
+        player = self.data['players'][0]
+        cards = [player_card.card for player_card in PlayerCard.objects.filter(player=player).select_related('card')]
+        SessionCard.objects.create(session=session, card=cards[0], player=player)
+        PlayerSession.objects.create(session=session, player=player, cards_count=1)
+
+        # INSERT, relectura de ids, PlayerSession y UPDATE con F() (más el savepoint)
+        with self.assertNumQueries(6):
+            joined = SessionCard.bulk_join(session, player, cards)
+
+        self.assertEqual([session_card.card for session_card in joined], cards[1:])
+        self.assertEqual(PlayerSession.objects.get(session=session, player=player).cards_count, len(cards))
+        self.assertEqual(SessionCard.objects.filter(session=session).count(), len(cards))
+
+        with self.assertNumQueries(5):
+            self.assertEqual(SessionCard.bulk_join(session, player, cards), [])
+        self.assertEqual(PlayerSession.objects.get(session=session, player=player).cards_count, len(cards))
+
+
+class CardAllocationTests(TransactionTestCase):
+    """Asignación de cartas de un pack por el cursor"""
+
+    def setUp(self):
+        self.data = seed_tenant(players=4, pack_cards=40, legacy_cards=0, drawn_balls=0)
+        self.pack = self.data['pack']
+
+    @unittest.skipIf(connection.vendor == 'sqlite', 'SQLite en memoria no espera locks entre hilos')
+    def test_concurrent_buyers_never_get_the_same_card(self):
+        errors, allocated = [], []
+
+        def buy(player):
+            try:
+                pack = CardPack.objects.get(pk=self.pack.pk)
+                for _ in range(3):
+                    success, message, player_cards = pack.allocate_cards(player, 2)
+                    if not success:
+                        errors.append(message)
+                    allocated.extend(player_card.card_id for player_card in player_cards)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=buy, args=(player,)) for player in self.data['players']]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(allocated), 24)
+        self.assertEqual(len(set(allocated)), 24)
+        self.pack.refresh_from_db()
+        self.assertEqual(self.pack.allocation_cursor, 12 + 24)
+
+    def test_cards_owned_after_the_cursor_are_skipped(self):
+        player = self.data['players'][0]
+        gifted = self.pack.cards.get(card_number=self.pack.allocation_cursor + 2)
+        PlayerCard.objects.create(player=player, card=gifted, pack=self.pack, acquisition_type='gift')
+
+        success, _, player_cards = self.pack.allocate_cards(player, 3)
+
+        self.assertTrue(success)
+        self.assertEqual([player_card.card.card_number for player_card in player_cards], [13, 15, 16])
+        self.assertEqual(self.pack.allocation_cursor, 16)
+        self.assertEqual(PlayerCard.objects.filter(card__pack=self.pack).count(), 12 + 4)
+
+    def test_available_count_skips_cards_owned_after_the_cursor(self):
+        player = self.data['players'][0]
+        for number in (self.pack.allocation_cursor + 2, 40):
+            PlayerCard.objects.create(
+                player=player, card=self.pack.cards.get(card_number=number), pack=self.pack, acquisition_type='gift'
+            )
+
+        self.assertEqual(self.pack.get_available_cards_count(), 40 - 12 - 2)
+        success, _, player_cards = self.pack.allocate_cards(player, 26)
+        self.assertTrue(success)
+        self.assertEqual(self.pack.get_available_cards_count(), 0)
+        self.assertFalse(self.pack.allocate_cards(player, 1)[0])
+
+    def test_not_enough_cards_leaves_the_cursor(self):
+        success, message, player_cards = self.pack.allocate_cards(self.data['players'][0], 29)
+
+        self.assertFalse(success)
+        self.assertIn('Solo hay 28 cartas disponibles', message)
+        self.assertEqual(player_cards, [])
+        self.pack.refresh_from_db()
+        self.assertEqual(self.pack.allocation_cursor, 12)
+
+    def test_backfill_points_at_the_first_unowned_card(self):
+        from importlib import import_module
+
+        from django.apps import apps
+
+        backfill = import_module('bingo.migrations.0013_backfill_cardpack_allocation_cursor')
+        PlayerCard.objects.filter(card__pack=self.pack, card__card_number=5).delete()
+        CardPack.objects.filter(pk=self.pack.pk).update(allocation_cursor=12)
+
+        backfill.backfill_allocation_cursor(apps, None)
+
+        self.pack.refresh_from_db()
+        self.assertEqual(self.pack.allocation_cursor, 4)
+        # Las cartas 6 a 12 siguen con dueño más allá del cursor
+        self.assertEqual(self.pack.get_available_cards_count(), 40 - 4 - 7)
+
+
+class BulkTransitionTests(TestCase):
+    """Confirmación y liberación masiva de cartones reservados"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_tenant(players=3, pack_cards=10, legacy_cards=10, drawn_balls=0)
+
+    def setUp(self):
+        self.session = self.data['legacy_session']
+        self.player = self.data['players'][0]
+        self.cards = sorted(self.data['legacy_cards'], key=lambda card: card.card_number)
+        BingoCardExtended.objects.filter(session=self.session).update(status='available', player=None)
+        BingoCardExtended.objects.filter(pk__in=[card.pk for card in self.cards[:2]]).update(
+            status='reserved', player=self.player
+        )
+        self.access = _access_token(self.client, self.data)
+
+    def post(self, path, card_ids):
+        return self.client.post(path, {
+            'player_id': str(self.player.id), 'session_id': str(self.session.id), 'card_ids': card_ids,
+        }, content_type='application/json', HTTP_AUTHORIZATION=f'Bearer {self.access}')
+
+    def card_ids(self):
+        # El mismo cartón en otro formato (mayúsculas, sin guiones) sigue siendo el mismo
+        return [self.cards[0].id.hex.upper(), str(self.cards[1].id).upper(), str(self.cards[2].id)]
+
+    def test_confirm_reports_only_the_cards_that_did_not_change(self):
+        response = self.post('/api/multi-tenant/cards/confirm-multiple-purchase/', self.card_ids())
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['total_cards'], 2)
+        self.assertEqual(
+            [failed['card_id'] for failed in response.json()['failed_cards']], [str(self.cards[2].id)]
+        )
+        self.assertEqual(
+            BingoCardExtended.objects.filter(session=self.session, status='sold').count(), 2
+        )
+
+    def test_release_reports_only_the_cards_that_did_not_change(self):
+        response = self.post('/api/multi-tenant/cards/release-multiple/', self.card_ids())
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['total_cards'], 2)
+        self.assertEqual(
+            [failed['card_id'] for failed in response.json()['failed_cards']], [str(self.cards[2].id)]
+        )
+        self.assertFalse(BingoCardExtended.objects.filter(session=self.session, status='reserved').exists())
+
+
+class ReuseCardsTests(TestCase):
+    """Reutilización de los cartones vendidos de una sesión anterior"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_tenant(players=3, pack_cards=10, legacy_cards=12, drawn_balls=0)
+
+    def setUp(self):
+        self.old_session = self.data['legacy_session']
+        self.players = self.data['players']
+        cards = sorted(self.data['legacy_cards'], key=lambda card: card.card_number)
+        BingoCardExtended.objects.filter(session=self.old_session).update(status='available', player=None)
+        # Jugador 0: tres cartones vendidos; jugador 1: uno; el resto sin vender o reservados
+        for card, player in zip(cards[:4], [self.players[0]] * 3 + [self.players[1]]):
+            BingoCardExtended.objects.filter(pk=card.pk).update(status='sold', player=player)
+        BingoCardExtended.objects.filter(pk=cards[4].pk).update(status='reserved', player=self.players[2])
+        self.new_session = BingoSession.objects.create(
+            operator=self.data['operator'], name='Sesión nueva', bingo_type=self.old_session.bingo_type,
+            allow_card_reuse=True, scheduled_start=timezone.now(),
+        )
+        # El jugador 1 ya estaba inscrito con un cartón
+        PlayerSession.objects.create(session=self.new_session, player=self.players[1], cards_count=1)
+        self.access = _access_token(self.client, self.data)
+
+    def reuse(self):
+        return self.client.post('/api/multi-tenant/cards/reuse/', {
+            'new_session_id': str(self.new_session.id), 'old_session_id': str(self.old_session.id),
+        }, content_type='application/json', HTTP_AUTHORIZATION=f'Bearer {self.access}')
+
+    def test_sold_cards_are_attached_to_their_owners(self):
+        response = self.reuse()
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['cards_reused'], 4)
+        self.assertEqual(SessionCard.objects.filter(session=self.new_session).count(), 4)
+        counts = dict(PlayerSession.objects.filter(session=self.new_session).values_list('player_id', 'cards_count'))
+        self.assertEqual(counts, {self.players[0].id: 3, self.players[1].id: 2})
+        # Los cartones sin vender no llenan el pool de la nueva sesión
+        self.new_session.refresh_from_db()
+        self.assertFalse(self.new_session.cards_generated)
+        self.assertFalse(BingoCardExtended.objects.filter(session=self.new_session).exists())
+
+    def test_repeating_the_reuse_attaches_nothing(self):
+        self.reuse()
+        response = self.reuse()
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['cards_reused'], 0)
+        self.assertEqual(SessionCard.objects.filter(session=self.new_session).count(), 4)
+        self.assertEqual(PlayerSession.objects.get(session=self.new_session, player=self.players[0]).cards_count, 3)
+
+
+class FinalizeSessionTests(TestCase):
+    """Cierre de una sesión con sus estadísticas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_tenant(players=3, pack_cards=12, legacy_cards=0, drawn_balls=0)
+
+    def test_only_one_finalize_updates_the_stats(self):
+        session = self.data['session']
+        stale = BingoSession.objects.get(pk=session.pk)
+        times_used = dict(PlayerCard.objects.values_list('pk', 'times_used'))
+
+        summary = session.finalize_session()
+
+        self.assertEqual(summary['cards_finished'], 9)
+        self.assertEqual(session.status, 'finished')
+        # Una segunda llamada (p. ej. concurrente, con la sesión leída antes del cierre) no hace nada
+        self.assertEqual(stale.status, 'active')
+        self.assertIsNone(stale.finalize_session())
+        self.assertEqual(stale.status, 'finished')
+        self.assertEqual(
+            dict(PlayerCard.objects.values_list('pk', 'times_used')),
+            {pk: used + 1 for pk, used in times_used.items()}
+        )
+
+    def test_session_finished_elsewhere_is_still_settled(self):
+        session = self.data['session']
+        BingoSession.objects.filter(pk=session.pk).update(status='finished')
+        times_used = dict(PlayerCard.objects.values_list('pk', 'times_used'))
+        access = _access_token(self.client, self.data)
+        path = f"/api/card-packs/sessions/{session.id}/finalize/"
+
+        first = self.client.post(path, HTTP_AUTHORIZATION=f'Bearer {access}')
+        second = self.client.post(path, HTTP_AUTHORIZATION=f'Bearer {access}')
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.json()['summary']['cards_finished'], 9)
+        self.assertEqual(second.status_code, 400)
+        session.refresh_from_db()
+        self.assertIsNotNone(session.finalized_at)
+        self.assertFalse(SessionCard.objects.filter(session=session, finished_at__isnull=True).exists())
+        self.assertEqual(
+            dict(PlayerCard.objects.values_list('pk', 'times_used')),
+            {pk: used + 1 for pk, used in times_used.items()}
+        )
+
+    def test_cancelled_session_is_not_settled(self):
+        session = self.data['session']
+        BingoSession.objects.filter(pk=session.pk).update(status='cancelled')
+        session.refresh_from_db()
+
+        self.assertIsNone(session.finalize_session())
+        self.assertEqual(session.status, 'cancelled')
+        self.assertTrue(SessionCard.objects.filter(session=session, finished_at__isnull=True).exists())
+
+    def test_finalize_endpoint_rejects_a_finished_session(self):
+        access = _access_token(self.client, self.data)
+        path = f"/api/card-packs/sessions/{self.data['session'].id}/finalize/"
+
+        first = self.client.post(path, HTTP_AUTHORIZATION=f'Bearer {access}')
+        second = self.client.post(path, HTTP_AUTHORIZATION=f'Bearer {access}')
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 400)
+
+
+class PatternCompilerTests(SimpleTestCase):
+    """Máscaras de bits de los patrones de victoria"""
+
+    # 5x5 con centro libre y 3x9 con huecos (None)
+    CARD_75 = [
+        [1, 16, 31, 46, 61],
+        [2, 17, 32, 47, 62],
+        [3, 18, 'FREE', 48, 63],
+        [4, 19, 34, 49, 64],
+        [5, 20, 35, 50, 65],
+    ]
+    CARD_90 = [
+        [1, None, 21, None, 41, None, 61, None, 81],
+        [None, 12, None, 32, None, 52, 62, 72, None],
+        [3, None, 23, 33, None, 53, None, 73, 83],
+    ]
+
+    def test_line_masks(self):
+        self.assertEqual(len(compile_pattern('horizontal_line', None).masks_for(5, 5)), 5)
+        self.assertEqual(len(compile_pattern('vertical_line', None).masks_for(3, 9)), 9)
+        self.assertEqual(compile_pattern('diagonal_line', None).masks_for(3, 9), ())
+        self.assertEqual(
+            compile_pattern('custom', {'any': 'line'}).masks_for(5, 5),
+            compile_pattern('custom', {'any': ['row', 'column', 'diagonal']}).masks_for(5, 5),
+        )
+        self.assertEqual(compile_pattern('full_card', None).masks_for(3, 9), ((1 << 27) - 1,))
+
+    def test_free_center_counts_as_marked(self):
+        diagonal = compile_pattern('diagonal_line', None)
+
+        self.assertTrue(diagonal.matches([1, 17, 49, 65], self.CARD_75))
+        self.assertFalse(diagonal.matches([1, 17, 49], self.CARD_75))
+        self.assertTrue(compile_pattern('horizontal_line', None).matches([3, 18, 48, 63], self.CARD_75))
+
+    def test_blank_cells_of_90_ball_cards(self):
+        line = compile_pattern('horizontal_line', None)
+        full = compile_pattern('full_card', None)
+        numbers = [value for row in self.CARD_90 for value in row if value is not None]
+
+        self.assertTrue(line.matches([1, 21, 41, 61, 81], self.CARD_90))
+        self.assertFalse(line.matches([1, 21, 41, 61], self.CARD_90))
+        self.assertTrue(full.matches(numbers, self.CARD_90))
+        self.assertFalse(full.matches(numbers[:-1], self.CARD_90))
+
+    def test_alternative_without_numbers_never_wins(self):
+        # La única celda del patrón es el centro libre
+        center = compile_pattern('custom', {'positions': [[2, 2]]})
+
+        self.assertEqual(len(center.masks_for(5, 5)), 1)
+        self.assertFalse(center.matches([], self.CARD_75))
+
+    def test_n_of_m_rule(self):
+        two_lines = compile_pattern('two_lines', None)
+        first, second = self.CARD_90[0], self.CARD_90[1]
+
+        self.assertEqual(len(two_lines.masks_for(3, 9)), 3)
+        self.assertFalse(two_lines.matches([n for n in first if n], self.CARD_90))
+        self.assertTrue(two_lines.matches([n for n in first + second if n], self.CARD_90))
+        self.assertEqual(compile_pattern('custom', {'any': 'row', 'count': 4}).masks_for(3, 9), ())
+
+    def test_shapes_and_positions_outside_the_card(self):
+        corners = compile_pattern('four_corners', None)
+
+        self.assertEqual(corners.masks_for(3, 9), ())
+        self.assertTrue(corners.matches([1, 61, 5, 65], self.CARD_75))
+        self.assertEqual(compile_pattern('custom', {'positions': [[4, 8]]}).masks_for(3, 9), ())
+
+    def test_validate_spec_rejects_invalid_data(self):
+        for spec in (
+            [],
+            {'unknown': 1},
+            {'count': 2},
+            {'any': 'row', 'count': 0},
+            {'any': 'zigzag'},
+            {'positions': [[0]]},
+            {'positions': [[-1, 0]]},
+            {'positions': [[9, 9]]},
+            {'shapes': 'x', 'full': True},
+            {'any': 'column', 'count': 10},
+        ):
+            with self.subTest(spec=spec), self.assertRaises(PatternCompileError):
+                validate_spec(spec)
+
+        validate_spec({'any': 'row', 'count': 2})
+        validate_spec({'alternatives': [[[0, 0]], [[2, 8]]]})
+
+    def test_explicit_pattern_data_overrides_the_type(self):
+        self.assertEqual(resolve_spec('horizontal_line', {'full': True}), {'full': True})
+        self.assertEqual(resolve_spec('horizontal_line', {'note': 'x'}), BUILTIN_SPECS['horizontal_line'])
+        self.assertEqual(compile_pattern('custom', None).masks_for(5, 5), ())
+
+
+class GameStageTests(TestCase):
+    """Partidas de 90 bolas por etapas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_tenant(players=4, pack_cards=16, legacy_cards=0, drawn_balls=0, bingo_type='90')
+
+    def setUp(self):
+        self.game = BingoGameExtended.objects.get(pk=self.data['game'].pk)
+
+    def test_new_90_ball_game_gets_the_default_stages(self):
+        BingoSession.objects.filter(pk=self.data['session'].pk).update(winning_patterns=[])
+        access = _access_token(self.client, self.data)
+        response = self.client.post('/api/multi-tenant/games/', {
+            'operator': str(self.data['operator'].id), 'session': str(self.data['session'].id),
+            'game_type': '90', 'name': 'Partida por etapas',
+        }, content_type='application/json', HTTP_AUTHORIZATION=f'Bearer {access}')
+
+        self.assertEqual(response.status_code, 201)
+        stages = GameStage.objects.filter(game_id=response.json()['id']).select_related('pattern')
+        self.assertEqual(
+            [(stage.order, stage.pattern.code, stage.status) for stage in stages],
+            [(1, 'horizontal_line', 'active'), (2, 'two_lines', 'pending'), (3, 'full_card', 'pending')]
+        )
+
+    def test_session_patterns_skip_the_default_stages(self):
+        BingoSession.objects.filter(pk=self.data['session'].pk).update(winning_patterns=['full_card'])
+        game = BingoGameExtended.objects.get(pk=self.game.pk)
+
+        success, _, stages = game.configure_default_stages()
+
+        self.assertFalse(success)
+        self.assertEqual(stages, [])
+        self.assertFalse(game.stages.exists())
+
+    def test_configure_stages_validation(self):
+        game_75 = BingoGameExtended.objects.create(operator=self.data['operator'], game_type='75')
+
+        self.assertFalse(game_75.configure_stages()[0])
+        self.assertFalse(self.game.configure_stages(['horizontal_line', 'no_such_pattern'])[0])
+        self.assertTrue(self.game.configure_stages()[0])
+        self.game.draw_next_ball()
+        self.assertFalse(self.game.configure_stages(['full_card'])[0])
+
+    def assert_stages_match_brute_force(self, order):
+        self.game.configure_stages()
+        cards = {
+            str(session_card.card_id): session_card.card.numbers
+            for session_card in SessionCard.objects.filter(session_id=self.game.session_id).select_related('card')
+        }
+
+        for ball_index in range(1, len(order) + 1):
+            self.game.advance_stages(order[:ball_index])
+            if not self.game.stages.exclude(status='won').exists():
+                break
+
+        stages = list(self.game.stages.select_related('pattern'))
+        self.assertEqual([stage.status for stage in stages], ['won'] * 3)
+        previous = 0
+        for stage in stages:
+            self.assertGreaterEqual(stage.won_at_ball, previous)
+            previous = stage.won_at_ball
+            compiled = compile_pattern(stage.pattern.code, stage.pattern.pattern_data)
+            drawn = order[:stage.won_at_ball]
+            self.assertEqual(stage.winning_number, drawn[-1])
+            self.assertEqual(
+                sorted(winner['card_id'] for winner in stage.winners),
+                sorted(card_id for card_id, numbers in cards.items() if compiled.matches(drawn, numbers)),
+            )
+
+    def test_stages_with_committed_sequence(self):
+        self.assert_stages_match_brute_force(self.game.get_draw_sequence())
+
+    def test_stages_without_completion_index(self):
+        # Un orden que no es prefijo de la secuencia comprometida usa los mapas de bits
+        self.assert_stages_match_brute_force(list(reversed(self.game.get_draw_sequence())))
+
+
+class GameEngineTests(SimpleTestCase):
+    """Cubetas de celdas restantes del motor en vivo"""
+
+    CODES = ('horizontal_line', 'full_card', 'four_corners')
+
+    def setUp(self):
+        rng = random.Random(3)
+        self.patterns = [
+            SimpleNamespace(code=code, name=code, compiled=compile_pattern(code, None)) for code in self.CODES
+        ]
+        self.candidates = [
+            {
+                'numbers': BingoCard.generate_75_ball_card(rng), 'card_id': f'card-{index}', 'card_number': index,
+                'player': SimpleNamespace(id=f'player-{index % 3}', username=f'player{index % 3}'),
+            }
+            for index in range(30)
+        ]
+        self.sequence = rng.sample(range(1, 76), 75)
+
+    def brute_force(self, drawn):
+        """Celdas restantes por (cartón, patrón), como lo calcularía una pasada completa"""
+        expected = {}
+        for candidate in self.candidates:
+            marked, numbered, shape = card_bitmaps(candidate['numbers'], drawn)
+            for pattern in self.patterns:
+                remaining = [
+                    (mask & numbered & ~marked).bit_count()
+                    for mask in pattern.compiled.masks_for(*shape) if mask & numbered
+                ]
+                if remaining:
+                    expected[(candidate['card_id'], pattern.code)] = min(remaining)
+        return expected
+
+    def test_buckets_match_a_full_recount(self):
+        engine = GameEngine('game', self.patterns, self.candidates)
+
+        for ball_index in (0, 10, 25, 40):
+            self.assertTrue(engine.sync(self.sequence[:ball_index]))
+            expected = self.brute_force(self.sequence[:ball_index])
+            ranked = engine.closest(k=len(expected))
+            self.assertEqual(
+                {(item['card_id'], item['pattern_code']): item['remaining'] for item in ranked}, expected
+            )
+            self.assertEqual([item['remaining'] for item in ranked], sorted(expected.values()))
+            counts = {entry['pattern_code']: entry['buckets'] for entry in engine.bucket_counts()}
+            for code in self.CODES:
+                values = [remaining for (_, pattern_code), remaining in expected.items() if pattern_code == code]
+                self.assertEqual(counts[code], {value: values.count(value) for value in set(values)})
+
+    def test_closest_filters(self):
+        engine = GameEngine('game', self.patterns, self.candidates)
+        engine.sync(self.sequence[:20])
+
+        mine = engine.closest(k=5, pattern_code='full_card', player_id='player-1')
+
+        self.assertEqual(len(mine), 5)
+        self.assertEqual({item['pattern_code'] for item in mine}, {'full_card'})
+        self.assertEqual({item['player_id'] for item in mine}, {'player-1'})
+        self.assertEqual(engine.closest(k=3, pattern_code='no_such_pattern'), [])
+
+    def test_sync_rejects_a_different_history(self):
+        engine = GameEngine('game', self.patterns, self.candidates)
+        engine.sync(self.sequence[:5])
+
+        self.assertFalse(engine.sync(self.sequence[1:6]))
+        self.assertEqual(engine.drawn, self.sequence[:5])
+
+
+class GameEngineRegistryTests(TestCase):
+    """Reconstrucción del motor cuando cambian los cartones de la partida"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_tenant(players=3, pack_cards=12, legacy_cards=0, drawn_balls=5)
+
+    def test_swapping_a_card_rebuilds_the_engine(self):
+        game = BingoGameExtended.objects.get(pk=self.data['game'].pk)
+        engine = get_game_engine(game)
+        self.assertIs(get_game_engine(game), engine)
+
+        # Un cartón sale y otro entra: el conteo de cartones no cambia
+        session_card = SessionCard.objects.filter(session=self.data['session']).earliest('joined_at')
+        spare = self.data['pack'].cards.filter(owners__isnull=True).first()
+        session_card.delete()
+        SessionCard.objects.create(
+            session=self.data['session'], card=spare, player=session_card.player, status='active'
+        )
+
+        rebuilt = get_game_engine(game)
+        self.assertIsNot(rebuilt, engine)
+        self.assertIn(str(spare.pk), {card['card_id'] for card in rebuilt.cards})
+        self.assertEqual(rebuilt.drawn, DrawnBall.get_drawn_sequence(game.id))
+
+
+class CompletionIndexTests(SimpleTestCase):
+    """Bola de completitud precalculada por cartón y patrón"""
+
+    CODES = ('horizontal_line', 'two_lines', 'full_card', 'four_corners')
+
+    def setUp(self):
+        rng = random.Random(5)
+        self.patterns = [SimpleNamespace(code=code, compiled=compile_pattern(code, None)) for code in self.CODES]
+        # Cartones de 75 (5x5 con centro libre) y de 90 bolas (3x9 con huecos) mezclados
+        self.candidates = [
+            {
+                'numbers': (BingoCard.generate_75_ball_card if index % 2 else BingoCard.generate_90_ball_card)(rng),
+                'source': 'legacy' if index % 3 else 'session_card',
+                'instance': SimpleNamespace(pk=f'card-{index}'),
+            }
+            for index in range(40)
+        ]
+        # Bombo de 90: cubre los números de ambos tipos de cartón
+        self.sequence = rng.sample(range(1, 91), 90)
+        self.index = CompletionIndex('game', self.patterns, self.candidates, self.sequence)
+
+    def winners(self, code, ball_index):
+        compiled = compile_pattern(code, None)
+        drawn = self.sequence[:ball_index]
+        return {
+            candidate['instance'].pk for candidate in self.candidates if compiled.matches(drawn, candidate['numbers'])
+        }
+
+    def test_winners_match_evaluating_every_card(self):
+        for code in self.CODES:
+            for ball_index in range(0, 91, 5):
+                with self.subTest(code=code, ball_index=ball_index):
+                    found = self.index.winners_at(ball_index, code)
+                    expected = self.winners(code, ball_index)
+                    self.assertEqual(set(found['session_card']) | set(found['legacy']), expected)
+                    self.assertEqual(self.index.count_completed(code, ball_index), len(expected))
+
+    def test_winners_are_grouped_by_source(self):
+        found = self.index.winners_at(90, 'horizontal_line')
+        sources = {candidate['instance'].pk: candidate['source'] for candidate in self.candidates}
+
+        self.assertTrue(found['session_card'] and found['legacy'])
+        for source, pks in found.items():
+            self.assertEqual({sources[pk] for pk in pks}, {source})
+
+    def test_first_completion(self):
+        for code in self.CODES:
+            first = self.index.first_completion(code)
+            if first is None:
+                self.assertEqual(self.winners(code, 90), set())
+                continue
+            self.assertTrue(self.winners(code, first))
+            self.assertFalse(self.winners(code, first - 1))
+        self.assertIsNone(self.index.first_completion('no_such_pattern'))
+        self.assertEqual(self.index.winners_at(90, 'no_such_pattern'), {'session_card': [], 'legacy': []})
+
+
+class DrawManyTests(TestCase):
+    """Extracción de varias bolas en una transacción"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_tenant(players=4, pack_cards=16, legacy_cards=8, drawn_balls=0)
+
+    def setUp(self):
+        self.game = BingoGameExtended.objects.get(pk=self.data['game'].pk)
+
+    def completed(self, drawn):
+        """Pares (cartón, patrón) completos con esas bolas, evaluando cada cartón"""
+        cards = [
+            (str(session_card.card_id), session_card.card.numbers)
+            for session_card in SessionCard.objects.filter(session=self.game.session, status='active').select_related('card')
+        ] + [
+            (str(card.pk), card.numbers)
+            for card in BingoCardExtended.objects.filter(session=self.game.session, status='sold')
+        ]
+        return {
+            (card_id, pattern.code)
+            for pattern in self.game.get_winning_patterns()
+            for card_id, numbers in cards
+            if pattern.compiled.matches(drawn, numbers)
+        }
+
+    def test_draws_follow_the_committed_sequence(self):
+        result = self.game.draw_many(10)
+
+        self.assertEqual(result['drawn'], self.game.get_draw_sequence()[:10])
+        self.assertEqual(result['first_index'], 1)
+        self.assertEqual(
+            list(DrawnBall.objects.filter(game=self.game).order_by('sequence').values_list('sequence', 'number')),
+            list(enumerate(result['drawn'], start=1))
+        )
+        result = self.game.draw_many(5)
+        self.assertEqual(result['first_index'], 11)
+        self.assertEqual(result['drawn'], self.game.get_draw_sequence()[10:15])
+
+    def test_winners_are_the_new_completions(self):
+        sequence = self.game.get_draw_sequence()
+        self.game.draw_many(20)
+
+        result = self.game.draw_many(30)
+
+        self.assertEqual(
+            {(winner['card_id'], winner['pattern_code']) for winner in result['winners']},
+            self.completed(sequence[:50]) - self.completed(sequence[:20])
+        )
+
+    def test_stop_at_first_winner(self):
+        sequence = self.game.get_draw_sequence()
+
+        result = self.game.draw_many(75, stop_at_first_winner=True)
+
+        first = result['first_winner_at']
+        self.assertTrue(result['stopped_at_winner'])
+        self.assertEqual(result['total_drawn'], first)
+        self.assertTrue(self.completed(sequence[:first]))
+        self.assertFalse(self.completed(sequence[:first - 1]))
+
+    def test_max_balls_ends_the_game(self):
+        self.game.max_balls = 12
+        self.game.save(update_fields=['max_balls'])
+        self.game.draw_many(5)
+
+        result = self.game.draw_many(50)
+
+        self.assertEqual(len(result['drawn']), 7)
+        self.assertEqual(result['remaining_balls'], 0)
+        self.assertEqual(result['game_status'], 'finished')
+        self.assertEqual(self.game.draw_many(1)['drawn'], [])
+
+    def test_endpoint_validation(self):
+        access = _access_token(self.client, self.data)
+        path = f'/api/multi-tenant/games/{self.game.id}/draw-many/'
+
+        def post(payload):
+            return self.client.post(path, payload, content_type='application/json',
+                                    HTTP_AUTHORIZATION=f'Bearer {access}')
+
+        self.assertEqual(post({'count': 0}).status_code, 400)
+        self.assertEqual(post({'count': 'x'}).status_code, 400)
+        response = post({'count': 3})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['total_drawn'], 3)
+        BingoGameExtended.objects.filter(pk=self.game.pk).update(is_active=False)
+        self.assertEqual(post({'count': 3}).status_code, 400)
+        self.assertEqual(DrawnBall.objects.filter(game=self.game).count(), 3)
+
+    def test_stages_end_the_game(self):
+        game = BingoGameExtended.objects.create(
+            operator=self.data['operator'], session=self.game.session, game_type='75', name='Por etapas'
+        )
+        game.configure_stages(['horizontal_line', 'full_card'])
+
+        result = game.draw_many(75)
+
+        self.assertEqual([stage['stage'] for stage in result['stages_won']], [1, 2])
+        self.assertEqual(result['total_drawn'], result['stages_won'][-1]['won_at_ball'])
+        self.assertEqual(result['game_status'], 'finished')
+
+
+class IdempotencyTests(TestCase):
+    """Cabecera Idempotency-Key en vistas que modifican estado"""
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.calls = []
+        self.caller = SimpleNamespace(pk='cliente-1', is_authenticated=True)
+
+        @api_view(['POST'])
+        @authentication_classes([])
+        @permission_classes([AllowAny])
+        @idempotent
+        def create_operator(request):
+            self.calls.append(request.data)
+            if getattr(self, 'during_view', None):
+                self.during_view()
+            operator = Operator.objects.create(name=request.data['name'], code=request.data['name'])
+            if request.data.get('fail'):
+                raise RuntimeError('fallo en la vista')
+            return Response({'id': str(operator.id)}, status=201)
+
+        self.view = create_operator
+
+    def post(self, data, key='key-1', user=True):
+        request = self.factory.post('/operators/', data, format='json', HTTP_IDEMPOTENCY_KEY=key)
+        if user:
+            force_authenticate(request, user=self.caller if user is True else user)
+        return self.view(request)
+
+    def test_retry_replays_the_first_response(self):
+        first = self.post({'name': 'uno'})
+        retry = self.post({'name': 'uno'})
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry[REPLAY_HEADER], 'true')
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(self.post({'name': 'dos'}).status_code, 422)
+
+    def test_recent_in_progress_claim_conflicts(self):
+        IdempotencyRecord.objects.create(
+            scope_hash=self.scope_hash('key-1'), request_hash=self.request_hash({'name': 'uno'}),
+            expires_at=timezone.now() + timedelta(hours=1),
+        )
+
+        self.assertEqual(self.post({'name': 'uno'}).status_code, 409)
+        self.assertEqual(self.calls, [])
+
+    def test_stale_in_progress_claim_is_taken_over(self):
+        record = IdempotencyRecord.objects.create(
+            scope_hash=self.scope_hash('key-1'), request_hash=self.request_hash({'name': 'uno'}),
+            expires_at=timezone.now() + timedelta(hours=1),
+        )
+        IdempotencyRecord.objects.filter(pk=record.pk).update(created_at=timezone.now() - timedelta(minutes=5))
+
+        response = self.post({'name': 'uno'})
+
+        self.assertEqual(response.status_code, 201)
+        record.refresh_from_db()
+        self.assertEqual((record.status, record.response_body), ('completed', response.data))
+
+    def test_view_losing_its_claim_is_rolled_back(self):
+        def take_over():
+            IdempotencyRecord.objects.update(created_at=timezone.now() + timedelta(seconds=1))
+
+        self.during_view = take_over
+        response = self.post({'name': 'uno'})
+
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Operator.objects.filter(code='uno').exists())
+        self.assertEqual(IdempotencyRecord.objects.get().status, 'in_progress')
+
+    def test_anonymous_callers_do_not_share_responses(self):
+        first = self.post({'name': 'uno'}, user=False)
+        second = self.post({'name': 'dos'}, user=False)
+
+        self.assertEqual((first.status_code, second.status_code), (201, 201))
+        self.assertNotEqual(first.data, second.data)
+        self.assertNotIn(REPLAY_HEADER, second)
+        self.assertEqual(len(self.calls), 2)
+        self.assertFalse(IdempotencyRecord.objects.exists())
+
+    def test_keys_are_scoped_per_client(self):
+        first = self.post({'name': 'uno'})
+        other = self.post({'name': 'dos'}, user=SimpleNamespace(pk='cliente-2', is_authenticated=True))
+
+        self.assertEqual((first.status_code, other.status_code), (201, 201))
+        self.assertEqual(len(self.calls), 2)
+
+    def test_exception_rolls_back_and_frees_the_key(self):
+        with self.assertRaises(RuntimeError):
+            self.post({'name': 'uno', 'fail': True})
+
+        self.assertFalse(Operator.objects.exists())
+        self.assertFalse(IdempotencyRecord.objects.exists())
+
+    def scope_hash(self, key):
+        request = self.factory.post('/operators/')
+        request.user = self.caller
+        return _scope_hash(request, key)
+
+    def request_hash(self, data):
+        request = SimpleNamespace(data=data, query_params=QueryDict())
+        return _request_hash(request)
+
+
+class ConnectionModeTests(SimpleTestCase):
+    """DATABASES según DB_CONNECTION_MODE"""
+
+    POSTGRES_URL = 'postgresql://bingo:clave@db:5432/bingo'
+
+    def test_per_request_keeps_the_django_defaults(self):
+        config = with_connection_mode(database_from_url(self.POSTGRES_URL), 'per-request', {})
+
+        self.assertEqual(config, {
+            'ENGINE': 'django.db.backends.postgresql', 'NAME': 'bingo', 'USER': 'bingo',
+            'PASSWORD': 'clave', 'HOST': 'db', 'PORT': '5432',
+        })
+
+    def test_persistent_reuses_connections_with_health_checks(self):
+        config = with_connection_mode(database_from_url(self.POSTGRES_URL), 'persistent', {})
+        self.assertEqual((config['CONN_MAX_AGE'], config['CONN_HEALTH_CHECKS']), (60, True))
+        self.assertNotIn('OPTIONS', config)
+
+        config = with_connection_mode(database_from_url(self.POSTGRES_URL), 'persistent', {'DB_CONN_MAX_AGE': '5'})
+        self.assertEqual(config['CONN_MAX_AGE'], 5)
+
+    def test_pool_configures_psycopg_pool(self):
+        config = with_connection_mode(
+            database_from_url(self.POSTGRES_URL), 'pool', {'DB_POOL_MAX_SIZE': '4', 'DB_POOL_TIMEOUT': '2.5'}
+        )
+
+        self.assertEqual((config['CONN_MAX_AGE'], config['CONN_HEALTH_CHECKS']), (0, True))
+        self.assertEqual(config['OPTIONS']['pool'], {
+            'min_size': 2, 'max_size': 4, 'timeout': 2.5, 'max_idle': 300.0, 'max_lifetime': 3600.0,
+        })
+
+    def test_pool_is_ignored_outside_postgresql(self):
+        config = with_connection_mode(database_from_url('sqlite:////tmp/bingo.sqlite3'), 'pool', {})
+
+        self.assertEqual(config, {'ENGINE': 'django.db.backends.sqlite3', 'NAME': '/tmp/bingo.sqlite3'})
+
+    def test_unknown_mode_is_rejected(self):
+        with self.assertRaises(ValueError):
+            with_connection_mode(database_from_url(self.POSTGRES_URL), 'pooled', {})
+
+
+class ConnectionBenchmarkTests(TestCase):
+    """El operador de prueba del benchmark de conexiones no sobrevive a la medición"""
+
+    def test_failed_mode_still_deletes_the_operator(self):
+        operators = Operator.objects.count()
+        failed = SimpleNamespace(returncode=1, stdout='', stderr='boom')
+
+        with mock.patch.dict(connection.settings_dict, {'NAME': '/tmp/compartida.sqlite3'}), \
+                mock.patch('bingo.connection_benchmark.subprocess.run', return_value=failed):
+            with self.assertRaises(ConnectionBenchmarkError):
+                run_connection_benchmark(modes=('per-request',), requests=1)
+
+        self.assertEqual(Operator.objects.count(), operators)
+        self.assertFalse(Operator.objects.filter(code__startswith='conn-bench-').exists())
+
+
+class FakeHttpClient:
+    """HttpClient sin red: responde como el servidor a las acciones del generador de carga"""
+
+    def __init__(self, base_url, timeout=30.0):
+        self.lock = threading.Lock()
+        self.balls = 0
+
+    def request(self, method, path, body=None, token=None):
+        if path == '/api/token/':
+            return 200, {'access': 'acceso', 'refresh': 'refresco'}, 1.0
+        if path.endswith('/draw-ball/'):
+            with self.lock:
+                self.balls += 1
+                return 201, {'ball_number': self.balls, 'game_status': 'in_progress'}, 2.0
+        if path.endswith('/join-with-cards/'):
+            return 201, {'cards': []}, 3.0
+        return 200, {'drawn_balls': []}, 1.0
+
+
+class LoadTestTests(SimpleTestCase):
+    """Escenarios, percentiles y reporte del generador de carga"""
+
+    PHASE = {
+        'name': 'pico', 'duration_seconds': 10, 'concurrency': 4,
+        'mix': {'poll_drawn_balls': 3, 'join_session': 1}, 'ticks': [{'action': 'draw_ball', 'interval_seconds': 1}],
+    }
+
+    def load(self, scenario):
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as handle:
+            if isinstance(scenario, str):
+                handle.write(scenario)
+            else:
+                json.dump(scenario, handle)
+        self.addCleanup(os.remove, handle.name)
+        return load_scenario(handle.name)
+
+    def test_valid_scenario_gets_defaults(self):
+        scenario = self.load({'phases': [{'duration_seconds': 5, 'concurrency': 0}]})
+
+        self.assertEqual(scenario['name'], 'escenario')
+        self.assertEqual(scenario['dataset'], {})
+        self.assertEqual(scenario['phases'][0], {
+            'name': 'fase_1', 'duration_seconds': 5, 'concurrency': 0, 'mix': {}, 'ticks': [], 'think_time_ms': [0, 0],
+        })
+
+    def test_invalid_scenarios_are_rejected(self):
+        def phase(**changes):
+            return {'phases': [dict(self.PHASE, **changes)]}
+
+        cases = {
+            'no se puede leer': '{no es json',
+            'sin fases': {'phases': []},
+            'fases no es lista': {'phases': {'pico': self.PHASE}},
+            'duración cero': phase(duration_seconds=0),
+            'concurrencia negativa': phase(concurrency=-1),
+            'acción desconocida': phase(mix={'bailar': 1}),
+            'mix sin peso': phase(mix={'poll_drawn_balls': 0}),
+            'tick desconocido': phase(ticks=[{'action': 'bailar', 'interval_seconds': 1}]),
+            'intervalo cero': phase(ticks=[{'action': 'draw_ball', 'interval_seconds': 0}]),
+            'think time invertido': phase(think_time_ms=[500, 100]),
+            'think time incompleto': phase(think_time_ms=[100]),
+        }
+        for name, scenario in cases.items():
+            with self.subTest(name), self.assertRaises(LoadTestError):
+                self.load(scenario)
+
+        with self.assertRaises(LoadTestError):
+            load_scenario('/no/existe.json')
+
+    def test_scale_scenario(self):
+        scenario = {'phases': [dict(self.PHASE), dict(self.PHASE, duration_seconds=4, concurrency=1)]}
+
+        scale_scenario(scenario, duration_scale=0.1, concurrency_scale=0.5)
+
+        self.assertEqual([phase['duration_seconds'] for phase in scenario['phases']], [1, 1])
+        self.assertEqual([phase['concurrency'] for phase in scenario['phases']], [2, 0])
+
+    def test_percentiles_use_nearest_rank(self):
+        values = [float(value) for value in range(1, 101)]
+
+        self.assertEqual(
+            [percentile(values, fraction) for fraction in (0.5, 0.95, 0.99, 1.0)], [50.0, 95.0, 99.0, 100.0]
+        )
+        self.assertEqual(percentile([7.0], 0.99), 7.0)
+        self.assertEqual(percentile([], 0.5), 0.0)
+
+    def test_summarize(self):
+        samples = [float(value) for value in range(20, 0, -1)]
+        statuses = {'200': 17, '404': 1, '500': 1, 'ConnectionResetError': 1}
+
+        summary = summarize(samples, statuses, seconds=4)
+
+        self.assertEqual(summary, {
+            'requests': 20, 'errors': 3, 'statuses': dict(sorted(statuses.items())), 'throughput_rps': 5.0,
+            'mean_ms': 10.5, 'min_ms': 1.0, 'p50_ms': 10.0, 'p95_ms': 19.0, 'p99_ms': 20.0, 'max_ms': 20.0,
+        })
+        self.assertEqual(summarize([], {}, 0)['p50_ms'], 0.0)
+
+    def test_run_scenario_report(self):
+        scenario = {'name': 'humo', 'phases': [
+            dict(self.PHASE, duration_seconds=0.3, concurrency=2, think_time_ms=[5, 10],
+                 ticks=[{'action': 'draw_ball', 'interval_seconds': 0.1}]),
+        ]}
+        target = {
+            'api_key': 'k', 'api_secret': 's', 'operator_id': 'o', 'bingo_type': '75', 'session_id': 'sesion',
+            'game_id': 'partida', 'players': [{'id': str(index), 'card_ids': []} for index in range(3)],
+        }
+
+        with mock.patch('bingo.loadtest.HttpClient', FakeHttpClient):
+            report = run_scenario(scenario, target, 'http://servidor', seed=1)
+
+        self.assertEqual(report['scenario'], 'humo')
+        self.assertEqual(report['games_played'], 1)
+        self.assertLessEqual(report['players_joined'], 3)
+        [phase] = report['phases']
+        self.assertEqual(phase['name'], 'pico')
+        draws = phase['endpoints']['POST /api/multi-tenant/games/{id}/draw-ball/']
+        self.assertGreaterEqual(draws['requests'], 3)
+        self.assertEqual((draws['errors'], draws['p50_ms']), (0, 2.0))
+        self.assertIn('GET /api/multi-tenant/games/{id}/drawn-balls/', report['endpoints'])
+        for stats in report['endpoints'].values():
+            self.assertEqual(set(stats), {
+                'requests', 'errors', 'statuses', 'throughput_rps', 'mean_ms', 'min_ms',
+                'p50_ms', 'p95_ms', 'p99_ms', 'max_ms',
+            })
+        json.dumps(report)
+
+
+class LoadTestTargetTests(TestCase):
+    """Los datos que siembra el generador de carga se borran al terminar"""
+
+    DATASET = {'players': 3, 'pack_cards': 12, 'cards_per_player': 2}
+
+    def test_seeded_operator_is_deleted(self):
+        target = prepare_target(self.DATASET, seed=7)
+        self.assertTrue(APIKey.objects.filter(key=target['api_key'], is_active=True).exists())
+
+        cleanup_target(target)
+
+        self.assertFalse(Operator.objects.filter(pk=target['operator_id']).exists())
+        self.assertFalse(APIKey.objects.filter(key=target['api_key']).exists())
+
+    def test_existing_operator_keeps_its_data(self):
+        data = seed_tenant(players=3, pack_cards=12, cards_per_player=2, legacy_cards=0, drawn_balls=0, seed=8)
+        target = prepare_target({}, operator_code=data['operator'].code)
+
+        cleanup_target(target)
+
+        self.assertTrue(Operator.objects.filter(pk=data['operator'].pk).exists())
+        self.assertTrue(APIKey.objects.filter(pk=data['api_key'].pk).exists())
+        self.assertFalse(APIKey.objects.filter(key=target['api_key']).exists())
+        self.assertFalse(BingoSession.objects.filter(pk=target['session_id']).exists())
+        self.assertFalse(BingoGameExtended.objects.filter(pk=target['game_id']).exists())
+        self.assertEqual(PlayerCard.objects.filter(player__operator=data['operator']).count(), 6)
+
+
+def _benchmark_results(**min_us):
+    return {'meta': {}, 'results': {name: {'min_us': value} for name, value in min_us.items()}}
+
+
+class BenchmarkCompareTests(SimpleTestCase):
+    """Compuerta de regresiones de python manage.py benchmark"""
+
+    def statuses(self, baseline, current, threshold=0.15):
+        return {row['name']: row['status'] for row in compare_results(baseline, current, threshold)}
+
+    def test_statuses_at_the_threshold(self):
+        baseline = _benchmark_results(igual=100, limite_peor=100, peor=100, limite_mejor=100, mejor=100, quitado=5)
+        current = _benchmark_results(igual=100, limite_peor=115, peor=115.1, limite_mejor=85, mejor=84.9, nuevo=7)
+
+        self.assertEqual(self.statuses(baseline, current), {
+            'igual': 'ok', 'limite_peor': 'ok', 'peor': 'regression', 'limite_mejor': 'ok', 'mejor': 'improved',
+            'nuevo': 'new', 'quitado': 'missing',
+        })
+
+    def test_rows_carry_the_change(self):
+        rows = compare_results(_benchmark_results(a=200), _benchmark_results(a=250, b=1))
+
+        self.assertEqual(rows, [
+            {'name': 'a', 'baseline_us': 200, 'current_us': 250, 'change': 0.25, 'status': 'regression'},
+            {'name': 'b', 'baseline_us': None, 'current_us': 1, 'change': None, 'status': 'new'},
+        ])
+
+    def test_zero_baseline_is_never_a_regression(self):
+        rows = compare_results(_benchmark_results(a=0), _benchmark_results(a=50))
+
+        self.assertEqual((rows[0]['change'], rows[0]['status']), (0.0, 'ok'))
+
+    def test_confirm_regressions_keeps_the_best_remeasurement(self):
+        baseline = _benchmark_results(ruidoso=100, lento=100, estable=100)
+        current = _benchmark_results(ruidoso=150, lento=150, estable=101)
+        rerun = mock.Mock(side_effect=[
+            _benchmark_results(ruidoso=102, lento=160),
+            _benchmark_results(lento=140),
+        ])
+
+        with mock.patch('bingo.benchmarks.run_benchmarks', rerun):
+            confirmed = confirm_regressions(baseline, current)
+
+        self.assertEqual([call.args[0] for call in rerun.call_args_list], [['ruidoso', 'lento'], ['lento']])
+        self.assertEqual(self.statuses(baseline, confirmed), {'ruidoso': 'ok', 'lento': 'regression', 'estable': 'ok'})
+        self.assertEqual(confirmed['results']['lento']['min_us'], 140)
+
+    def compare_command(self, baseline, measured):
+        def fake_run(names, **options):
+            return _benchmark_results(**{name: measured[name] for name in names})
+
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as handle:
+            json.dump(baseline, handle)
+        self.addCleanup(os.remove, handle.name)
+        output = io.StringIO()
+        with mock.patch('bingo.management.commands.benchmark.run_benchmarks', side_effect=fake_run), \
+                mock.patch('bingo.benchmarks.run_benchmarks', side_effect=fake_run):
+            call_command('benchmark', '--compare', handle.name, '--filter', 'card.generate_', stdout=output)
+        return output.getvalue()
+
+    def test_command_fails_on_regression(self):
+        baseline = _benchmark_results(**{'card.generate_75': 10, 'card.generate_85': 10, 'card.generate_90': 10})
+        measured = {'card.generate_75': 10, 'card.generate_85': 20, 'card.generate_90': 9}
+
+        with self.assertRaisesMessage(CommandError, 'card.generate_85'):
+            self.compare_command(baseline, measured)
+
+    def test_command_passes_without_regression(self):
+        # Benchmarks fuera del filtro no cuentan como 'missing' ni como regresión
+        baseline = _benchmark_results(**{
+            'card.generate_75': 10, 'card.generate_85': 10, 'card.generate_90': 10, 'pattern.lento': 1,
+        })
+        measured = {'card.generate_75': 11, 'card.generate_85': 8, 'card.generate_90': 10}
+
+        output = self.compare_command(baseline, measured)
+
+        self.assertIn('Sin regresiones', output)
+        self.assertNotIn('pattern.lento', output)
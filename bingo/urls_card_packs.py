@@ -22,6 +22,7 @@ urlpatterns = [
     path('sessions/<uuid:session_id>/join-with-cards/', views_card_packs.join_session_with_cards, name='session-join-with-cards'),
     path('sessions/<uuid:session_id>/cards/', views_card_packs.get_session_cards, name='session-cards'),
     path('sessions/<uuid:session_id>/players/<uuid:player_id>/cards/', views_card_packs.get_player_session_cards, name='session-player-cards'),
+    path('sessions/<uuid:session_id>/finalize/', views_card_packs.finalize_session, name='session-finalize'),
     path('mark-number/', views_card_packs.mark_number_on_card, name='mark-number'),
 ]
 
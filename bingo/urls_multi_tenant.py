@@ -38,6 +38,7 @@ urlpatterns = [
     path('cards/confirm-purchase/', views_multi_tenant.confirm_card_purchase, name='confirm-card-purchase'),
     path('cards/confirm-multiple-purchase/', views_multi_tenant.confirm_multiple_cards_purchase, name='confirm-multiple-purchase'),
     path('cards/release/', views_multi_tenant.release_card, name='release-card'),
+    path('cards/release-multiple/', views_multi_tenant.release_multiple_cards, name='release-multiple-cards'),
     path('cards/reuse/', views_multi_tenant.reuse_cards_in_session, name='reuse-cards'),
     path('sessions/<uuid:session_id>/available-cards/', views_multi_tenant.get_available_cards, name='available-cards'),
     path('sessions/<uuid:session_id>/player/<uuid:player_id>/cards/', views_multi_tenant.get_player_cards, name='player-cards'),
@@ -48,6 +49,9 @@ urlpatterns = [
     path('sessions/<uuid:session_id>/game/', views_multi_tenant.get_session_game, name='session-game'),
     path('games/draw-ball/', views_multi_tenant.draw_ball, name='draw-ball'),
     path('games/<uuid:game_id>/draw-ball/', views_multi_tenant.draw_ball_by_id, name='draw-ball-by-id'),
+    path('games/<uuid:game_id>/draw-many/', views_multi_tenant.draw_many, name='draw-many'),
+    path('games/<uuid:game_id>/commit-sequence/', views_multi_tenant.commit_draw_sequence, name='commit-draw-sequence'),
+    path('games/<uuid:game_id>/verify/', views_multi_tenant.verify_draw_sequence, name='verify-draw-sequence'),
     path('games/<uuid:game_id>/drawn-balls/', views_multi_tenant.get_drawn_balls, name='drawn-balls'),
     path('games/check-winner/', views_multi_tenant.check_winner, name='check-winner'),
 ]
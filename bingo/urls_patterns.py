@@ -18,6 +18,9 @@ urlpatterns = [
     # Patrones por tipo de bingo
     path('available/<str:bingo_type>/', views_patterns.get_available_patterns_for_bingo_type, name='patterns-by-type'),
     
+    # Simulación de probabilidades
+    path('simulate/', views_patterns.simulate_patterns, name='simulate-patterns'),
+    
     # Configuración de sesiones
     path('sessions/<uuid:session_id>/configure/', views_patterns.configure_session_patterns, name='session-configure-patterns'),
     path('sessions/<uuid:session_id>/patterns/', views_patterns.get_session_patterns, name='session-patterns'),
@@ -25,5 +28,10 @@ urlpatterns = [
     # Verificación de ganadores
     path('check-winner/', views_patterns.check_winner_with_patterns, name='check-winner'),
     path('games/<uuid:game_id>/check-all-cards/', views_patterns.check_all_cards_in_game, name='check-all-cards'),
+    
+    # Etapas de partida (90 bolas: línea → dos líneas → bingo)
+    path('games/<uuid:game_id>/stages/', views_patterns.get_game_stages, name='game-stages'),
+    path('games/<uuid:game_id>/stages/configure/', views_patterns.configure_game_stages, name='game-stages-configure'),
+    path('games/<uuid:game_id>/closest/', views_patterns.get_closest_cards, name='game-closest-cards'),
 ]
 
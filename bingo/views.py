@@ -2,6 +2,7 @@ from rest_framework import generics, status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from django.db.models import Count
 from django.shortcuts import get_object_or_404
 from .models import BingoCard, BingoGame, DrawnBall
 from .serializers import (
@@ -155,7 +156,7 @@ class BingoCardWinnerView(APIView):
 
 class BingoGameListView(generics.ListCreateAPIView):
     """Lista y crea partidas de bingo"""
-    queryset = BingoGame.objects.all()
+    queryset = BingoGame.objects.annotate(drawn_balls_total=Count('drawn_balls')).order_by('-created_at')
     serializer_class = BingoGameSerializer
     
     def get_serializer_class(self):
@@ -168,6 +169,7 @@ class BingoGameDetailView(generics.RetrieveUpdateDestroyAPIView):
     """Obtiene, actualiza o elimina una partida específica"""
     queryset = BingoGame.objects.all()
     serializer_class = BingoGameSerializer
+    lookup_field = 'id'
 
 
 class DrawBallView(APIView):
@@ -178,34 +180,28 @@ class DrawBallView(APIView):
         
         if serializer.is_valid():
             game_id = serializer.validated_data['game_id']
-            game = get_object_or_404(BingoGame, id=game_id)
-            
-            # Extraer bola
-            drawn_number = game.draw_ball()
+            game = get_object_or_404(BingoGame.objects.select_related('bingogameextended'), id=game_id)
+            # Las partidas multi-tenant respetan su max_balls y su secuencia guardada
+            game = getattr(game, 'bingogameextended', game)
             
-            # Verificar si ya fue extraída
-            existing_ball = DrawnBall.objects.filter(game=game, number=drawn_number).first()
-            if existing_ball:
-                # Si ya fue extraída, intentar con otro número
-                attempts = 0
-                while existing_ball and attempts < 50:  # Máximo 50 intentos
-                    drawn_number = game.draw_ball()
-                    existing_ball = DrawnBall.objects.filter(game=game, number=drawn_number).first()
-                    attempts += 1
-                
-                if existing_ball:
-                    return Response(
-                        {'error': 'No se pueden extraer más bolas únicas'}, 
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
+            if game.is_finished():
+                return Response(
+                    {'error': 'La partida ya finalizó'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
             
-            # Crear la bola extraída
-            drawn_ball = DrawnBall.objects.create(game=game, number=drawn_number)
+            # Bajo el lock de la partida: peticiones concurrentes esperan en cola
+            drawn_ball, total_drawn, _ = game.draw_next_ball()
+            if drawn_ball is None:
+                return Response(
+                    {'error': 'No se pueden extraer más bolas únicas'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
             
             return Response({
                 'game_id': game_id,
                 'drawn_ball': DrawnBallSerializer(drawn_ball).data,
-                'total_drawn': game.drawn_balls.count()
+                'total_drawn': total_drawn
             }, status=status.HTTP_201_CREATED)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -217,7 +213,7 @@ class DrawnBallsListView(generics.ListAPIView):
     
     def get_queryset(self):
         game_id = self.kwargs['game_id']
-        return DrawnBall.objects.filter(game_id=game_id)
+        return DrawnBall.objects.filter(game_id=game_id).select_related('game')
 
 
 @api_view(['POST'])
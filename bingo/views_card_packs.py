@@ -6,8 +6,10 @@ from rest_framework import generics, status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
-from django.db.models import Q
+from django.db.models import Q, Exists, OuterRef
 
+from .db_router import read_replica
+from .idempotency import idempotent
 from .models import CardPack, PlayerCard, SessionCard, BingoCardExtended, Player, BingoSession, Operator
 from .serializers_card_packs import (
     CardPackSerializer, PlayerCardSerializer, SessionCardSerializer,
@@ -60,6 +62,7 @@ class CardPackDetailView(generics.RetrieveUpdateDestroyAPIView):
 
 
 @api_view(['POST'])
+@idempotent
 def generate_cards_for_pack(request, pack_id):
     """Genera las cartas para un pack específico"""
     pack = get_object_or_404(CardPack, id=pack_id)
@@ -83,6 +86,7 @@ def generate_cards_for_pack(request, pack_id):
 
 
 @api_view(['GET'])
+@read_replica
 def get_pack_cards(request, pack_id):
     """Lista las cartas de un pack"""
     pack = get_object_or_404(CardPack, id=pack_id)
@@ -124,6 +128,7 @@ def get_pack_cards(request, pack_id):
 # ============================================================================
 
 @api_view(['POST'])
+@idempotent
 def acquire_cards(request, player_id):
     """Permite a un jugador adquirir cartas de un pack"""
     player = get_object_or_404(Player, id=player_id)
@@ -138,7 +143,7 @@ def acquire_cards(request, player_id):
     pack = get_object_or_404(CardPack, id=pack_id)
     
     # Verificar que el pack pertenece al mismo operador
-    if pack.operator != player.operator:
+    if pack.operator_id != player.operator_id:
         return Response({
             'success': False,
             'message': 'El pack no pertenece al operador del jugador'
@@ -151,30 +156,18 @@ def acquire_cards(request, player_id):
             'message': 'El pack no está activo'
         }, status=status.HTTP_400_BAD_REQUEST)
     
-    # Obtener cartas disponibles
-    available_cards = pack.get_available_cards()[:quantity]
+    # Asignar cartas avanzando el cursor del pack (atómico, sin doble asignación)
+    success, message, player_cards = pack.allocate_cards(player, quantity, acquisition_type)
     
-    if len(available_cards) < quantity:
+    if not success:
         return Response({
             'success': False,
-            'message': f'Solo hay {len(available_cards)} cartas disponibles, solicitaste {quantity}'
+            'message': message
         }, status=status.HTTP_400_BAD_REQUEST)
     
-    # Crear PlayerCard para cada carta
-    player_cards = []
-    for card in available_cards:
-        player_card = PlayerCard.objects.create(
-            player=player,
-            card=card,
-            pack=pack,
-            acquisition_type=acquisition_type,
-            purchase_price=pack.price_per_card if acquisition_type == 'purchase' else 0
-        )
-        player_cards.append(player_card)
-    
     return Response({
         'success': True,
-        'message': f'{len(player_cards)} cartas adquiridas exitosamente',
+        'message': message,
         'cards': PlayerCardSerializer(player_cards, many=True).data
     }, status=status.HTTP_201_CREATED)
 
@@ -182,14 +175,14 @@ def acquire_cards(request, player_id):
 @api_view(['GET'])
 def get_player_cards(request, player_id):
     """Lista las cartas de un jugador"""
-    player = get_object_or_404(Player, id=player_id)
+    player = get_object_or_404(Player.objects.select_related('operator'), id=player_id)
     
     # Filtros opcionales
     is_favorite = request.query_params.get('is_favorite', None)
     pack_id = request.query_params.get('pack', None)
     bingo_type = request.query_params.get('bingo_type', None)
     
-    queryset = player.owned_cards.all()
+    queryset = player.owned_cards.select_related('player', 'card', 'pack')
     
     if is_favorite is not None:
         queryset = queryset.filter(is_favorite=is_favorite.lower() == 'true')
@@ -214,6 +207,7 @@ def get_player_cards(request, player_id):
 
 
 @api_view(['PATCH'])
+@idempotent
 def set_card_favorite(request, player_id, player_card_id):
     """Marca/desmarca una carta como favorita"""
     player = get_object_or_404(Player, id=player_id)
@@ -233,6 +227,7 @@ def set_card_favorite(request, player_id, player_card_id):
 
 
 @api_view(['PATCH'])
+@idempotent
 def set_card_nickname(request, player_id, player_card_id):
     """Establece un apodo a una carta"""
     player = get_object_or_404(Player, id=player_id)
@@ -256,6 +251,7 @@ def set_card_nickname(request, player_id, player_card_id):
 # ============================================================================
 
 @api_view(['POST'])
+@idempotent
 def join_session_with_cards(request, session_id):
     """Permite a un jugador unirse a una sesión con sus cartas"""
     session = get_object_or_404(BingoSession, id=session_id)
@@ -270,7 +266,7 @@ def join_session_with_cards(request, session_id):
     player = get_object_or_404(Player, id=player_id)
     
     # Verificar que el jugador pertenece al mismo operador
-    if player.operator != session.operator:
+    if player.operator_id != session.operator_id:
         return Response({
             'success': False,
             'message': 'El jugador no pertenece al operador de la sesión'
@@ -283,63 +279,65 @@ def join_session_with_cards(request, session_id):
             'message': f'No puedes unirte a una sesión en estado: {session.get_status_display()}'
         }, status=status.HTTP_400_BAD_REQUEST)
     
-    session_cards = []
+    cards_to_join = []
     
     # Opción 1: Jugador usa sus propias cartas
     if card_ids:
+        # Una sola consulta: propiedad, tipo y pertenencia previa a la sesión
+        owned_cards = BingoCardExtended.objects.filter(
+            id__in=card_ids,
+            owners__player=player
+        ).annotate(
+            already_in_session=Exists(
+                SessionCard.objects.filter(
+                    session=session,
+                    player=player,
+                    card=OuterRef('pk')
+                )
+            )
+        )
+        cards_by_id = {card.id: card for card in owned_cards}
+        
+        seen_ids = set()
         for card_id in card_ids:
-            # Verificar que el jugador posee la carta
-            player_card = PlayerCard.objects.filter(
-                player=player,
-                card_id=card_id
-            ).first()
+            card = cards_by_id.get(card_id)
             
-            if not player_card:
+            # Verificar que el jugador posee la carta
+            if card is None:
                 return Response({
                     'success': False,
                     'message': f'El jugador no posee la carta {card_id}'
                 }, status=status.HTTP_400_BAD_REQUEST)
             
             # Verificar que la carta es del tipo correcto
-            if player_card.card.bingo_type != session.bingo_type:
+            if card.bingo_type != session.bingo_type:
                 return Response({
                     'success': False,
-                    'message': f'La carta {card_id} es de tipo {player_card.card.bingo_type}, pero la sesión requiere {session.bingo_type}'
+                    'message': f'La carta {card_id} es de tipo {card.bingo_type}, pero la sesión requiere {session.bingo_type}'
                 }, status=status.HTTP_400_BAD_REQUEST)
             
-            # Verificar que la carta no está ya en esta sesión
-            existing = SessionCard.objects.filter(
-                session=session,
-                card=player_card.card,
-                player=player
-            ).exists()
+            # Saltar cartas duplicadas (ya en la sesión o repetidas en la petición)
+            if card.already_in_session or card_id in seen_ids:
+                continue
             
-            if existing:
-                continue  # Saltar cartas duplicadas
-            
-            # Crear SessionCard
-            session_card = SessionCard.objects.create(
-                session=session,
-                card=player_card.card,
-                player=player,
-                status='active'
-            )
-            session_cards.append(session_card)
+            seen_ids.add(card_id)
+            cards_to_join.append(card)
     
     # Opción 2: Asignar cartas del pack de la sesión
     elif cards_from_pack:
-        if not session.card_pack:
+        if not session.card_pack_id:
             return Response({
                 'success': False,
                 'message': 'La sesión no tiene un pack de cartas asignado'
             }, status=status.HTTP_400_BAD_REQUEST)
         
         # Obtener cartas disponibles del pack
-        available_cards = session.card_pack.cards.filter(
+        available_cards = list(BingoCardExtended.objects.filter(
+            pack_id=session.card_pack_id,
             bingo_type=session.bingo_type
         ).exclude(
             session_instances__session=session
-        )[:cards_from_pack]
+        )[:cards_from_pack])
         
         if len(available_cards) < cards_from_pack:
             return Response({
@@ -347,26 +345,10 @@ def join_session_with_cards(request, session_id):
                 'message': f'Solo hay {len(available_cards)} cartas disponibles en el pack'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        for card in available_cards:
-            session_card = SessionCard.objects.create(
-                session=session,
-                card=card,
-                player=player,
-                status='active'
-            )
-            session_cards.append(session_card)
-    
-    # Actualizar o crear PlayerSession
-    from .models import PlayerSession
-    player_session, created = PlayerSession.objects.get_or_create(
-        session=session,
-        player=player,
-        defaults={'cards_count': len(session_cards)}
-    )
+        cards_to_join = available_cards
     
-    if not created:
-        player_session.cards_count += len(session_cards)
-        player_session.save()
+    # Crear SessionCards y actualizar PlayerSession en una transacción
+    session_cards = SessionCard.bulk_join(session, player, cards_to_join)
     
     return Response({
         'success': True,
@@ -381,6 +363,7 @@ def join_session_with_cards(request, session_id):
 
 
 @api_view(['GET'])
+@read_replica
 def get_session_cards(request, session_id):
     """Lista las cartas activas en una sesión"""
     session = get_object_or_404(BingoSession, id=session_id)
@@ -390,7 +373,7 @@ def get_session_cards(request, session_id):
     status_filter = request.query_params.get('status', None)
     is_winner = request.query_params.get('is_winner', None)
     
-    queryset = session.session_cards.all()
+    queryset = session.session_cards.select_related('session', 'player', 'card')
     
     if player_id:
         queryset = queryset.filter(player_id=player_id)
@@ -416,6 +399,41 @@ def get_session_cards(request, session_id):
 
 
 @api_view(['POST'])
+@idempotent
+def finalize_session(request, session_id):
+    """Finaliza una sesión cerrando todas sus cartas y actualizando estadísticas"""
+    session = get_object_or_404(BingoSession, id=session_id)
+    
+    # Una sesión 'finished' sin finalized_at aún no se liquidó: se finaliza igual
+    if session.status == 'cancelled' or session.finalized_at is not None:
+        return Response({
+            'success': False,
+            'message': f'La sesión ya está en estado: {session.get_status_display()}'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    summary = session.finalize_session()
+    if summary is None:
+        # Otra petición la finalizó entre la lectura y el cierre
+        return Response({
+            'success': False,
+            'message': f'La sesión ya está en estado: {session.get_status_display()}'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    return Response({
+        'success': True,
+        'message': f'Sesión finalizada: {summary["cards_finished"]} cartas cerradas',
+        'session': {
+            'id': session.id,
+            'name': session.name,
+            'status': session.status,
+            'actual_end': session.actual_end
+        },
+        'summary': summary
+    })
+
+
+@api_view(['POST'])
+@idempotent
 def mark_number_on_card(request):
     """Marca un número en una carta de sesión"""
     serializer = MarkNumberSerializer(data=request.data)
@@ -464,7 +482,7 @@ def get_player_session_cards(request, session_id, player_id):
     session_cards = SessionCard.objects.filter(
         session=session,
         player=player
-    )
+    ).select_related('session', 'player', 'card')
     
     serializer = SessionCardSerializer(session_cards, many=True)
     
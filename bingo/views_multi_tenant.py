@@ -2,21 +2,28 @@
 Vistas para el sistema multi-tenant
 """
 
+import uuid
+
 from rest_framework import generics, status
 from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny
 from django.shortcuts import get_object_or_404
-from django.db.models import Q, Count
+from django.core.exceptions import ValidationError
+from django.db.models import Q, Count, F
+from django.db.models.functions import Greatest
 from django.utils import timezone
 
 from .authentication import APIKeyAuthentication, OptionalAPIKeyAuthentication
+from .db_router import read_replica
 from .permissions import IsAuthenticated, HasWritePermission
+from .engine import record_ball
+from .idempotency import idempotent
 
 from .models import (
     Operator, Player, BingoSession, PlayerSession, 
-    BingoCardExtended, BingoGameExtended
+    BingoCardExtended, BingoGameExtended, SessionCard
 )
 from .serializers_multi_tenant import (
     OperatorSerializer, PlayerSerializer, BingoSessionSerializer,
@@ -58,7 +65,7 @@ class PlayerListView(generics.ListCreateAPIView):
     
     def get_queryset(self):
         """Filtrar jugadores por operador"""
-        queryset = Player.objects.all()
+        queryset = Player.objects.select_related('operator')
         operator_id = self.request.query_params.get('operator', None)
         
         if operator_id:
@@ -75,7 +82,7 @@ class PlayerListView(generics.ListCreateAPIView):
 
 class PlayerDetailView(generics.RetrieveUpdateDestroyAPIView):
     """Detalle, actualización y eliminación de jugadores"""
-    queryset = Player.objects.all()
+    queryset = Player.objects.select_related('operator')
     serializer_class = PlayerSerializer
 
 
@@ -87,7 +94,9 @@ class BingoSessionListView(generics.ListCreateAPIView):
     
     def get_queryset(self):
         """Filtrar sesiones por operador y estado"""
-        queryset = BingoSession.objects.all()
+        queryset = BingoSession.annotate_counts(
+            BingoSession.objects.select_related('operator', 'card_pack')
+        )
         
         operator_id = self.request.query_params.get('operator', None)
         status_filter = self.request.query_params.get('status', None)
@@ -117,7 +126,7 @@ class BingoSessionListView(generics.ListCreateAPIView):
 
 class BingoSessionDetailView(generics.RetrieveUpdateDestroyAPIView):
     """Detalle, actualización y eliminación de sesiones"""
-    queryset = BingoSession.objects.all()
+    queryset = BingoSession.annotate_counts(BingoSession.objects.select_related('operator', 'card_pack'))
     serializer_class = BingoSessionSerializer
 
 
@@ -129,7 +138,7 @@ class PlayerSessionListView(generics.ListAPIView):
     
     def get_queryset(self):
         """Filtrar participaciones por sesión o jugador"""
-        queryset = PlayerSession.objects.all()
+        queryset = PlayerSession.objects.select_related('player', 'session')
         
         session_id = self.request.query_params.get('session', None)
         player_id = self.request.query_params.get('player', None)
@@ -144,6 +153,7 @@ class PlayerSessionListView(generics.ListAPIView):
 
 
 @api_view(['POST'])
+@idempotent
 def join_session(request):
     """Permite a un jugador unirse a una sesión"""
     serializer = JoinSessionSerializer(data=request.data)
@@ -181,6 +191,7 @@ def join_session(request):
 
 
 @api_view(['POST'])
+@idempotent
 def leave_session(request):
     """Permite a un jugador salir de una sesión"""
     session_id = request.data.get('session_id')
@@ -218,7 +229,7 @@ class BingoCardExtendedListView(generics.ListCreateAPIView):
     
     def get_queryset(self):
         """Filtrar cartones por operador, sesión o jugador"""
-        queryset = BingoCardExtended.objects.all()
+        queryset = BingoCardExtended.objects.select_related('player__operator', 'session')
         
         operator_id = self.request.query_params.get('operator', None)
         session_id = self.request.query_params.get('session', None)
@@ -238,11 +249,12 @@ class BingoCardExtendedListView(generics.ListCreateAPIView):
 
 class BingoCardExtendedDetailView(generics.RetrieveUpdateDestroyAPIView):
     """Detalle, actualización y eliminación de cartones extendidos"""
-    queryset = BingoCardExtended.objects.all()
+    queryset = BingoCardExtended.objects.select_related('player__operator', 'session')
     serializer_class = BingoCardExtendedSerializer
 
 
 @api_view(['POST'])
+@idempotent
 def generate_cards_for_session(request):
     """Genera cartones cuando se crea una sesión y devuelve todos los cartones en un array"""
     serializer = GenerateCardsForSessionSerializer(data=request.data)
@@ -275,6 +287,7 @@ def generate_cards_for_session(request):
 
 
 @api_view(['POST'])
+@idempotent
 def select_card(request):
     """Permite a un jugador seleccionar un cartón disponible"""
     from .serializers_multi_tenant import SelectCardSerializer
@@ -305,6 +318,7 @@ def select_card(request):
 
 
 @api_view(['POST'])
+@idempotent
 def select_multiple_cards(request):
     """Permite a un jugador seleccionar múltiples cartones a la vez"""
     from .serializers_multi_tenant import SelectMultipleCardsSerializer
@@ -373,15 +387,19 @@ def get_player_cards(request, session_id, player_id):
         player = Player.objects.get(id=player_id)
         
         # Obtener cartones del jugador
-        cards = BingoCardExtended.objects.filter(
+        cards = list(BingoCardExtended.objects.filter(
             session=session,
             player=player
-        ).order_by('card_number')
+        ).order_by('card_number'))
         
-        # Agrupar por estado
-        available = cards.filter(status='available').count()
-        reserved = cards.filter(status='reserved').count()
-        sold = cards.filter(status='sold').count()
+        # Agrupar por estado (sin una consulta por estado; el serializer usa la
+        # sesión y el jugador ya cargados)
+        for card in cards:
+            card.session = session
+            card.player = player
+        available = sum(1 for card in cards if card.status == 'available')
+        reserved = sum(1 for card in cards if card.status == 'reserved')
+        sold = sum(1 for card in cards if card.status == 'sold')
         
         return Response({
             'session': {
@@ -393,7 +411,7 @@ def get_player_cards(request, session_id, player_id):
                 'username': player.username
             },
             'summary': {
-                'total': cards.count(),
+                'total': len(cards),
                 'available': available,
                 'reserved': reserved,
                 'sold': sold
@@ -412,6 +430,7 @@ def get_player_cards(request, session_id, player_id):
 
 
 @api_view(['POST'])
+@idempotent
 def confirm_card_purchase(request):
     """Confirma la compra de un cartón reservado"""
     card_id = request.data.get('card_id')
@@ -444,10 +463,17 @@ def confirm_card_purchase(request):
 
 
 @api_view(['POST'])
+@idempotent
 def confirm_multiple_cards_purchase(request):
-    """Confirma la compra de múltiples cartones reservados"""
+    """
+    Confirma la compra de múltiples cartones reservados
+    
+    Transición masiva reserved → sold con un UPDATE condicional por lote.
+    Si se envía 'card_ids' solo se confirman esos cartones.
+    """
     player_id = request.data.get('player_id')
     session_id = request.data.get('session_id')
+    card_ids = request.data.get('card_ids')
     
     if not all([player_id, session_id]):
         return Response({
@@ -458,46 +484,90 @@ def confirm_multiple_cards_purchase(request):
         player = Player.objects.get(id=player_id)
         session = BingoSession.objects.get(id=session_id)
         
-        # Obtener todos los cartones reservados del jugador
-        reserved_cards = BingoCardExtended.objects.filter(
-            session=session,
-            player=player,
-            status='reserved'
-        )
+        # Confirmar todos los cartones reservados en una sola transición
+        confirmed = BingoCardExtended.bulk_mark_as_sold(session, player, card_ids)
         
-        if not reserved_cards.exists():
+        if not confirmed and not card_ids:
             return Response({
                 'error': 'No hay cartones reservados para este jugador'
             }, status=status.HTTP_404_NOT_FOUND)
         
-        # Confirmar todos los cartones
-        confirmed_cards = []
-        failed_cards = []
+        total_cost = sum(card['purchase_price'] for card in confirmed)
         
-        for card in reserved_cards:
-            success, message = card.mark_as_sold()
-            if success:
-                confirmed_cards.append(card)
-            else:
-                failed_cards.append({
-                    'card_number': card.card_number,
-                    'error': message
-                })
+        response_data = {
+            'message': f'{len(confirmed)} cartones confirmados exitosamente',
+            'confirmed_cards': _serialize_transitioned_cards(confirmed),
+            'total_cost': float(total_cost),
+            'total_cards': len(confirmed)
+        }
+        
+        failed_cards = _failed_transitions(card_ids, confirmed, 'El cartón debe estar reservado primero')
+        if failed_cards:
+            response_data['failed_cards'] = failed_cards
+        
+        return Response(response_data, status=status.HTTP_200_OK)
+    
+    except (ValidationError, TypeError):
+        return Response({
+            'error': 'card_ids debe ser una lista de UUIDs válidos'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    except Player.DoesNotExist:
+        return Response({
+            'error': 'Jugador no encontrado'
+        }, status=status.HTTP_404_NOT_FOUND)
+    except BingoSession.DoesNotExist:
+        return Response({
+            'error': 'Sesión no encontrada'
+        }, status=status.HTTP_404_NOT_FOUND)
+
+
+@api_view(['POST'])
+@idempotent
+def release_multiple_cards(request):
+    """
+    Libera múltiples cartones reservados de un jugador
+    
+    Transición masiva reserved → available con un UPDATE condicional por lote.
+    Si se envía 'card_ids' solo se liberan esos cartones.
+    """
+    player_id = request.data.get('player_id')
+    session_id = request.data.get('session_id')
+    card_ids = request.data.get('card_ids')
+    
+    if not all([player_id, session_id]):
+        return Response({
+            'error': 'player_id y session_id son requeridos'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        player = Player.objects.get(id=player_id)
+        session = BingoSession.objects.get(id=session_id)
         
-        total_cost = sum(card.purchase_price for card in confirmed_cards)
+        released = BingoCardExtended.bulk_release(session, player, card_ids)
+        
+        if released:
+            PlayerSession.objects.filter(session=session, player=player).update(
+                cards_count=Greatest(F('cards_count') - len(released), 0)
+            )
         
         response_data = {
-            'message': f'{len(confirmed_cards)} cartones confirmados exitosamente',
-            'confirmed_cards': BingoCardExtendedSerializer(confirmed_cards, many=True).data,
-            'total_cost': float(total_cost),
-            'total_cards': len(confirmed_cards)
+            'message': f'{len(released)} cartones liberados exitosamente',
+            'released_cards': [
+                {'id': card['id'], 'card_number': card['card_number']} for card in released
+            ],
+            'total_cards': len(released)
         }
         
+        failed_cards = _failed_transitions(card_ids, released, 'El cartón no está reservado por este jugador')
         if failed_cards:
             response_data['failed_cards'] = failed_cards
         
         return Response(response_data, status=status.HTTP_200_OK)
     
+    except (ValidationError, TypeError):
+        return Response({
+            'error': 'card_ids debe ser una lista de UUIDs válidos'
+        }, status=status.HTTP_400_BAD_REQUEST)
     except Player.DoesNotExist:
         return Response({
             'error': 'Jugador no encontrado'
@@ -508,7 +578,32 @@ def confirm_multiple_cards_purchase(request):
         }, status=status.HTTP_404_NOT_FOUND)
 
 
+def _serialize_transitioned_cards(transitioned):
+    """Serializa los cartones de una transición masiva con una sola consulta"""
+    cards = BingoCardExtended.objects.filter(
+        pk__in=[card['id'] for card in transitioned]
+    ).select_related('player__operator', 'session').order_by('card_number')
+    return BingoCardExtendedSerializer(cards, many=True).data
+
+
+def _failed_transitions(card_ids, transitioned, error):
+    """
+    Retorna los card_ids solicitados que no cambiaron de estado
+
+    Se comparan como UUID: el cliente puede enviarlos en mayúsculas o sin
+    guiones y seguir siendo el mismo cartón.
+    """
+    if not card_ids:
+        return []
+    done = {uuid.UUID(str(card['id'])) for card in transitioned}
+    return [
+        {'card_id': str(card_id), 'error': error}
+        for card_id in card_ids if uuid.UUID(str(card_id)) not in done
+    ]
+
+
 @api_view(['POST'])
+@idempotent
 def release_card(request):
     """Libera un cartón reservado para que esté disponible nuevamente"""
     card_id = request.data.get('card_id')
@@ -568,6 +663,7 @@ def get_available_cards(request, session_id):
 
 
 @api_view(['POST'])
+@idempotent
 def reuse_cards_in_session(request):
     """Reutiliza cartones de una sesión anterior en una nueva sesión"""
     from .serializers_multi_tenant import ReuseCardsSerializer
@@ -581,27 +677,14 @@ def reuse_cards_in_session(request):
         new_session = BingoSession.objects.get(id=new_session_id)
         old_session = BingoSession.objects.get(id=old_session_id)
         
-        # Obtener cartones de la sesión anterior
-        old_cards = old_session.cards.all()
-        
-        # Clonar cartones para la nueva sesión
-        cards_reused = []
-        for old_card in old_cards:
-            new_card = BingoCardExtended.objects.create(
-                session=new_session,
-                bingo_type=old_card.bingo_type,
-                numbers=old_card.numbers,
-                user_id=old_card.user_id,
-                status='available',
-                card_number=old_card.card_number
-            )
-            cards_reused.append(new_card)
-        
-        new_session.cards_generated = True
-        new_session.save()
+        # Adjuntar los cartones vendidos de la sesión anterior a sus dueños,
+        # sin clonarlos. No llena el pool de venta de la nueva sesión, así que
+        # cards_generated no cambia y aún se pueden generar sus cartones
+        cards_reused = SessionCard.attach_legacy_session_cards(old_session, new_session)
         
         return Response({
-            'message': f'{len(cards_reused)} cartones reutilizados exitosamente',
+            'message': f'{cards_reused} cartones reutilizados exitosamente',
+            'cards_reused': cards_reused,
             'session': BingoSessionSerializer(new_session).data
         }, status=status.HTTP_201_CREATED)
     
@@ -614,9 +697,17 @@ class BingoGameExtendedListView(generics.ListCreateAPIView):
     """Lista y crea partidas extendidas"""
     serializer_class = BingoGameExtendedSerializer
     
+    def perform_create(self, serializer):
+        """90 bolas: la partida nace con sus etapas (línea → dos líneas → bingo)"""
+        game = serializer.save()
+        game.configure_default_stages()
+    
     def get_queryset(self):
         """Filtrar partidas por operador o sesión"""
-        queryset = BingoGameExtended.objects.all()
+        # Con GROUP BY Django no aplica Meta.ordering: se ordena explícitamente
+        queryset = BingoGameExtended.objects.select_related('operator', 'session').annotate(
+            drawn_balls_total=Count('drawn_balls')
+        ).order_by('-created_at')
         
         operator_id = self.request.query_params.get('operator', None)
         session_id = self.request.query_params.get('session', None)
@@ -632,7 +723,7 @@ class BingoGameExtendedListView(generics.ListCreateAPIView):
 
 class BingoGameExtendedDetailView(generics.RetrieveUpdateDestroyAPIView):
     """Detalle, actualización y eliminación de partidas extendidas"""
-    queryset = BingoGameExtended.objects.all()
+    queryset = BingoGameExtended.objects.select_related('operator', 'session')
     serializer_class = BingoGameExtendedSerializer
 
 
@@ -681,7 +772,80 @@ def get_session_game(request, session_id):
         }, status=status.HTTP_404_NOT_FOUND)
 
 
+def _advance_game_stages(game):
+    """Evalúa la etapa actual tras una extracción; None si la partida no usa etapas"""
+    from .models import DrawnBall
+    
+    if game.get_current_stage() is None:
+        return None
+    
+    drawn_numbers = DrawnBall.get_drawn_sequence(game.id)
+    won_stages = game.advance_stages(drawn_numbers)
+    current_stage = game.get_current_stage()
+    
+    return {
+        'stages_won': won_stages,
+        'current_stage': current_stage.to_result() if current_stage else None
+    }
+
+
+def _draw_ball_response(game):
+    """Extrae la siguiente bola de la partida y arma la respuesta común de extracción"""
+    if game.is_finished():
+        return Response({
+            'error': 'La partida ya finalizó'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    max_balls = game.get_ball_limit()
+    drawn_ball, total_drawn, lock_wait = game.draw_next_ball()
+    
+    # Verificar si ya se extrajeron todas las bolas
+    if drawn_ball is None:
+        if game.is_finished():
+            # Otra petición terminó la partida mientras esta esperaba el lock
+            return Response({
+                'error': 'La partida ya finalizó'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if game.is_active:
+            game.is_active = False
+            game.save(update_fields=['is_active'])
+        
+        return Response({
+            'message': 'Juego completado - Todas las bolas han sido extraídas',
+            'status': 'finished',
+            'total_drawn': total_drawn,
+            'max_balls': max_balls,
+            'game': BingoGameExtendedSerializer(game).data
+        }, status=status.HTTP_200_OK)
+    
+    ball_number = drawn_ball.number
+    record_ball(game.id, ball_number, total_drawn)
+    
+    # Verificar si se completó el juego
+    game_status = 'active'
+    if total_drawn >= max_balls:
+        game.is_active = False
+        game.save(update_fields=['is_active'])
+        game_status = 'finished'
+    
+    return Response({
+        'message': f'Bola {drawn_ball.get_display_name()} extraída',
+        'ball_number': ball_number,
+        'letter': drawn_ball.get_letter(),
+        'display_name': drawn_ball.get_display_name(),
+        'color': drawn_ball.get_color(),
+        'total_drawn': total_drawn,
+        'remaining_balls': max_balls - total_drawn,
+        'game_status': game_status,
+        'progress_percentage': round((total_drawn / max_balls) * 100, 2),
+        'lock_wait_ms': round(lock_wait * 1000, 3),
+        'stages': _advance_game_stages(game),
+        'game': BingoGameExtendedSerializer(game).data
+    }, status=status.HTTP_201_CREATED)
+
+
 @api_view(['POST'])
+@idempotent
 def draw_ball(request):
     """Extrae una bola en una partida, evitando duplicados automáticamente"""
     game_id = request.data.get('game_id')
@@ -692,210 +856,135 @@ def draw_ball(request):
         }, status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        from .models import DrawnBall
         game = BingoGameExtended.objects.get(id=game_id)
-        
-        # Obtener bolas ya extraídas
-        drawn_balls = DrawnBall.objects.filter(game=game).values_list('number', flat=True)
-        drawn_set = set(drawn_balls)
-        
-        # Determinar el máximo de bolas según el tipo de juego
-        max_balls = {
-            '75': 75,
-            '85': 85,
-            '90': 90
-        }.get(game.game_type, 90)
-        
-        # Verificar si ya se extrajeron todas las bolas
-        if len(drawn_set) >= max_balls:
-            # Marcar partida como finalizada
-            if game.is_active:
-                game.is_active = False
-                game.save()
-            
-            return Response({
-                'message': 'Juego completado - Todas las bolas han sido extraídas',
-                'status': 'finished',
-                'total_drawn': len(drawn_set),
-                'max_balls': max_balls,
-                'game': BingoGameExtendedSerializer(game).data
-            }, status=status.HTTP_200_OK)
-        
-        # Intentar extraer una bola no repetida (máximo 10 intentos)
-        max_attempts = 10
-        ball_number = None
-        
-        for attempt in range(max_attempts):
-            candidate = game.draw_ball()
-            
-            if candidate not in drawn_set:
-                ball_number = candidate
-                break
-        
-        # Si después de 10 intentos no se encontró, buscar una bola disponible
-        if ball_number is None:
-            available_balls = set(range(1, max_balls + 1)) - drawn_set
-            
-            if not available_balls:
-                # No hay bolas disponibles
-                if game.is_active:
-                    game.is_active = False
-                    game.save()
-                
-                return Response({
-                    'message': 'Juego completado - Todas las bolas han sido extraídas',
-                    'status': 'finished',
-                    'total_drawn': len(drawn_set),
-                    'max_balls': max_balls,
-                    'game': BingoGameExtendedSerializer(game).data
-                }, status=status.HTTP_200_OK)
-            
-            # Seleccionar una bola disponible aleatoriamente
-            import random
-            ball_number = random.choice(list(available_balls))
-        
-        # Guardar bola extraída
-        drawn_ball = DrawnBall.objects.create(
-            game=game,
-            number=ball_number
-        )
-        
-        # Obtener información de visualización
-        letter = drawn_ball.get_letter()
-        display_name = drawn_ball.get_display_name()
-        color = drawn_ball.get_color()
-        
-        # Obtener estadísticas actualizadas
-        total_drawn = game.drawn_balls.count()
-        remaining = max_balls - total_drawn
-        
-        # Verificar si se completó el juego
-        game_status = 'active'
-        if total_drawn >= max_balls:
-            game.is_active = False
-            game.save()
-            game_status = 'finished'
-        
-        return Response({
-            'message': f'Bola {display_name} extraída',
-            'ball_number': ball_number,
-            'letter': letter,
-            'display_name': display_name,
-            'color': color,
-            'total_drawn': total_drawn,
-            'remaining_balls': remaining,
-            'game_status': game_status,
-            'progress_percentage': round((total_drawn / max_balls) * 100, 2),
-            'game': BingoGameExtendedSerializer(game).data
-        }, status=status.HTTP_201_CREATED)
-    
-    except BingoGameExtended.DoesNotExist:
+    except (BingoGameExtended.DoesNotExist, ValidationError):
         return Response({
             'error': 'Partida no encontrada'
         }, status=status.HTTP_404_NOT_FOUND)
+    
+    return _draw_ball_response(game)
 
 
 @api_view(['POST', 'GET'])
+@idempotent
 def draw_ball_by_id(request, game_id):
     """Extrae una bola usando el game_id en la URL (más REST-ful)"""
     try:
-        from .models import DrawnBall
         game = BingoGameExtended.objects.get(id=game_id)
-        
-        # Obtener bolas ya extraídas
-        drawn_balls = DrawnBall.objects.filter(game=game).values_list('number', flat=True)
-        drawn_set = set(drawn_balls)
-        
-        # Determinar el máximo de bolas según el tipo de juego
-        max_balls = {
-            '75': 75,
-            '85': 85,
-            '90': 90
-        }.get(game.game_type, 90)
-        
-        # Verificar si ya se extrajeron todas las bolas
-        if len(drawn_set) >= max_balls:
-            if game.is_active:
-                game.is_active = False
-                game.save()
-            
-            return Response({
-                'message': 'Juego completado - Todas las bolas han sido extraídas',
-                'status': 'finished',
-                'total_drawn': len(drawn_set),
-                'max_balls': max_balls,
-                'game': BingoGameExtendedSerializer(game).data
-            }, status=status.HTTP_200_OK)
-        
-        # Intentar extraer una bola no repetida
-        max_attempts = 10
-        ball_number = None
-        
-        for attempt in range(max_attempts):
-            candidate = game.draw_ball()
-            if candidate not in drawn_set:
-                ball_number = candidate
-                break
-        
-        # Si no se encontró, seleccionar de las disponibles
-        if ball_number is None:
-            available_balls = set(range(1, max_balls + 1)) - drawn_set
-            
-            if not available_balls:
-                if game.is_active:
-                    game.is_active = False
-                    game.save()
-                
-                return Response({
-                    'message': 'Juego completado - Todas las bolas han sido extraídas',
-                    'status': 'finished',
-                    'total_drawn': len(drawn_set),
-                    'max_balls': max_balls,
-                    'game': BingoGameExtendedSerializer(game).data
-                }, status=status.HTTP_200_OK)
-            
-            import random
-            ball_number = random.choice(list(available_balls))
-        
-        # Guardar bola extraída
-        drawn_ball = DrawnBall.objects.create(
-            game=game,
-            number=ball_number
-        )
-        
-        # Obtener información de visualización
-        letter = drawn_ball.get_letter()
-        display_name = drawn_ball.get_display_name()
-        color = drawn_ball.get_color()
-        
-        # Obtener estadísticas actualizadas
-        total_drawn = game.drawn_balls.count()
-        remaining = max_balls - total_drawn
-        
-        # Verificar si se completó el juego
-        game_status = 'active'
-        if total_drawn >= max_balls:
-            game.is_active = False
-            game.save()
-            game_status = 'finished'
-        
-        return Response({
-            'message': f'Bola {display_name} extraída',
-            'ball_number': ball_number,
-            'letter': letter,
-            'display_name': display_name,
-            'color': color,
-            'total_drawn': total_drawn,
-            'remaining_balls': remaining,
-            'game_status': game_status,
-            'progress_percentage': round((total_drawn / max_balls) * 100, 2),
-            'game': BingoGameExtendedSerializer(game).data
-        }, status=status.HTTP_201_CREATED)
-    
     except BingoGameExtended.DoesNotExist:
         return Response({
             'error': 'Partida no encontrada'
         }, status=status.HTTP_404_NOT_FOUND)
+    
+    return _draw_ball_response(game)
+
+
+@api_view(['POST'])
+@idempotent
+def draw_many(request, game_id):
+    """
+    Extrae varias bolas en una sola petición (avance rápido, bots, pruebas de carga)
+    
+    POST /api/multi-tenant/games/{game_id}/draw-many/
+    {
+        "count": 20,
+        "stop_at_first_winner": false
+    }
+    """
+    game = get_object_or_404(BingoGameExtended.objects.select_related('session'), id=game_id)
+    
+    try:
+        count = int(request.data.get('count', 1))
+    except (TypeError, ValueError):
+        count = 0
+    if count < 1:
+        return Response({
+            'error': 'count debe ser un entero mayor que cero'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    stop_at_first_winner = str(request.data.get('stop_at_first_winner', False)).lower() in ['true', '1']
+    
+    if game.is_finished():
+        return Response({
+            'error': 'La partida ya finalizó'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    result = game.draw_many(count, stop_at_first_winner=stop_at_first_winner)
+    
+    return Response(dict(
+        result,
+        game_id=str(game.id),
+        message=f"{len(result['drawn'])} bolas extraídas"
+    ), status=status.HTTP_201_CREATED)
+
+
+@api_view(['POST'])
+@idempotent
+def commit_draw_sequence(request, game_id):
+    """
+    Fija el orden completo de extracción antes de la primera bola
+    
+    POST /api/multi-tenant/games/{game_id}/commit-sequence/
+    
+    Precalcula la tabla de completitud de todos los cartones de la sesión,
+    de modo que los ganadores de cada bola salen de una búsqueda binaria.
+    """
+    import time
+    from .engine import get_completion_index
+    
+    game = get_object_or_404(BingoGameExtended, id=game_id)
+    
+    success, message = game.commit_draw_sequence()
+    if not success:
+        return Response({
+            'error': message
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    started = time.perf_counter()
+    index = get_completion_index(game)
+    
+    return Response({
+        'message': message,
+        'game_id': str(game.id),
+        'total_balls': game.get_total_balls(),
+        'seed_hash': game.seed_hash or None,
+        'cards_indexed': len(index.pks),
+        'patterns_indexed': list(index.patterns),
+        'build_ms': round((time.perf_counter() - started) * 1000, 2)
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+def verify_draw_sequence(request, game_id):
+    """
+    Verifica una partida terminada contra su semilla comprometida
+    
+    GET /api/multi-tenant/games/{game_id}/verify/
+    
+    Recalcula la secuencia completa desde la semilla revelada (ver
+    bingo/fairness.py) y la compara con las bolas extraídas en orden.
+    """
+    import time
+    
+    game = get_object_or_404(BingoGameExtended, id=game_id)
+    
+    started = time.perf_counter()
+    success, message, result = game.verify_draws()
+    if not success:
+        return Response({
+            'error': message,
+            'seed_hash': game.seed_hash or None
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    return Response({
+        'message': message,
+        'game_id': str(game.id),
+        'seed_hash': game.seed_hash,
+        'server_seed': game.server_seed,
+        'seed_revealed_at': game.seed_revealed_at,
+        **result,
+        'verify_ms': round((time.perf_counter() - started) * 1000, 2)
+    }, status=status.HTTP_200_OK)
 
 
 @api_view(['GET'])
@@ -907,7 +996,10 @@ def get_drawn_balls(request, game_id):
         
         game = BingoGameExtended.objects.get(id=game_id)
         
-        drawn_balls = DrawnBall.objects.filter(game=game).order_by('drawn_at')
+        # La partida ya está cargada: get_letter() no vuelve a consultarla por bola
+        drawn_balls = list(DrawnBall.objects.filter(game=game).order_by('drawn_at', 'sequence'))
+        for ball in drawn_balls:
+            ball.game = game
         
         balls_list = [ball.number for ball in drawn_balls]
         
@@ -918,7 +1010,7 @@ def get_drawn_balls(request, game_id):
                 'game_type': game.game_type,
                 'is_active': game.is_active
             },
-            'total_drawn': drawn_balls.count(),
+            'total_drawn': len(drawn_balls),
             'balls': balls_list,
             'balls_with_letters': [{
                 'number': ball.number,
@@ -936,6 +1028,7 @@ def get_drawn_balls(request, game_id):
 
 
 @api_view(['POST'])
+@idempotent
 def check_winner(request):
     """Verifica si un cartón es ganador en una partida"""
     game_id = request.data.get('game_id')
@@ -982,6 +1075,7 @@ def check_winner(request):
 # === VISTAS PARA ESTADÍSTICAS ===
 
 @api_view(['GET'])
+@read_replica
 def operator_statistics(request, operator_id):
     """Estadísticas específicas de un operador"""
     operator = get_object_or_404(Operator, id=operator_id)
@@ -1033,6 +1127,7 @@ def operator_statistics(request, operator_id):
 
 
 @api_view(['GET'])
+@read_replica
 def session_statistics(request, session_id):
     """Estadísticas específicas de una sesión"""
     session = get_object_or_404(BingoSession, id=session_id)
@@ -1074,6 +1169,7 @@ def session_statistics(request, session_id):
 # === VISTAS PARA INTEGRACIÓN CON WHATSAPP/TELEGRAM ===
 
 @api_view(['POST'])
+@idempotent
 def register_player_by_phone(request):
     """Registra un jugador usando número de teléfono (para WhatsApp/Telegram)"""
     operator_code = request.data.get('operator_code')
@@ -1128,6 +1224,7 @@ def register_player_by_phone(request):
 
 
 @api_view(['POST'])
+@idempotent
 def link_social_account(request):
     """Vincula una cuenta de WhatsApp o Telegram a un jugador"""
     player_id = request.data.get('player_id')
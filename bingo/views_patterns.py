@@ -5,24 +5,33 @@ Vistas para el sistema de patrones de victoria
 from rest_framework import generics, status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
+from django.http import Http404
 from django.shortcuts import get_object_or_404
+from django.utils.decorators import method_decorator
 
+from . import pattern_registry
+from .db_router import read_replica
 from .models import WinningPattern, BingoSession, BingoCardExtended, BingoGameExtended, DrawnBall
+from .engine import get_game_engine, get_completion_index
+from .metrics import PATTERN_CHECK_SECONDS, WINNER_CHECK_SECONDS, WINNERS_FOUND, request_operator_label, timed_view
 from .serializers_patterns import (
     WinningPatternSerializer, WinningPatternCreateSerializer,
     SessionPatternConfigSerializer, CheckWinnerWithPatternsSerializer,
-    WinnerResultSerializer
+    WinnerResultSerializer, GameStageSerializer, GameStageConfigSerializer,
+    PatternSimulationSerializer
 )
 
 
 # === CRUD de Patrones ===
 
+@method_decorator(read_replica, name='get')
 class WinningPatternListView(generics.ListAPIView):
     """Lista todos los patrones de victoria disponibles"""
     serializer_class = WinningPatternSerializer
     
     def get_queryset(self):
-        queryset = WinningPattern.objects.filter(is_active=True)
+        # Catálogo en memoria: lista ya ordenada como el modelo
+        patterns = pattern_registry.active_patterns()
         
         # Filtros opcionales
         category = self.request.query_params.get('category')
@@ -30,22 +39,30 @@ class WinningPatternListView(generics.ListAPIView):
         is_system = self.request.query_params.get('is_system')
         
         if category:
-            queryset = queryset.filter(category=category)
+            patterns = [pattern for pattern in patterns if pattern.category == category]
         
         if compatible_with:
-            queryset = queryset.filter(compatible_with__in=['all', compatible_with])
+            patterns = [pattern for pattern in patterns if pattern.compatible_with in ('all', compatible_with)]
         
         if is_system is not None:
             is_system_bool = is_system.lower() == 'true'
-            queryset = queryset.filter(is_system=is_system_bool)
+            patterns = [pattern for pattern in patterns if pattern.is_system == is_system_bool]
         
-        return queryset
+        return patterns
 
 
+@method_decorator(read_replica, name='get')
 class WinningPatternDetailView(generics.RetrieveAPIView):
     """Detalle de un patrón de victoria"""
     queryset = WinningPattern.objects.all()
     serializer_class = WinningPatternSerializer
+    
+    def get_object(self):
+        pattern = pattern_registry.get_pattern(self.kwargs['pk'])
+        if pattern is None:
+            raise Http404('Patrón no encontrado')
+        self.check_object_permissions(self.request, pattern)
+        return pattern
 
 
 class WinningPatternCreateView(generics.CreateAPIView):
@@ -96,9 +113,10 @@ def configure_session_patterns(request, session_id):
         # Actualizar la sesión
         session.winning_patterns = pattern_codes
         session.save()
+        pattern_registry.bump_version()
         
         # Obtener los patrones configurados
-        patterns = WinningPattern.objects.filter(code__in=pattern_codes)
+        patterns = session.get_winning_patterns()
         
         return Response({
             'message': 'Patrones configurados exitosamente',
@@ -113,6 +131,7 @@ def configure_session_patterns(request, session_id):
 
 
 @api_view(['GET'])
+@read_replica
 def get_session_patterns(request, session_id):
     """
     Obtiene los patrones configurados para una sesión
@@ -130,7 +149,7 @@ def get_session_patterns(request, session_id):
             'bingo_type': session.bingo_type
         },
         'patterns': WinningPatternSerializer(patterns, many=True).data,
-        'total_patterns': patterns.count()
+        'total_patterns': len(patterns)
     }, status=status.HTTP_200_OK)
 
 
@@ -173,24 +192,26 @@ def check_winner_with_patterns(request):
     total_multiplier = 0
     jackpot_won = False
     
-    for pattern in patterns:
-        result = pattern.check_pattern(
-            marked_numbers=drawn_numbers,
-            card_numbers=card.numbers,
-            bingo_type=card.bingo_type,
-            balls_drawn=len(drawn_numbers)
-        )
-        
-        if result['is_winner']:
-            winning_patterns.append(result)
-            total_multiplier += result['prize_multiplier']
-            
-            if result.get('is_jackpot'):
-                jackpot_won = True
+    # Una observación por cartón (todos sus patrones), no por patrón
+    with PATTERN_CHECK_SECONDS.time(source='card'):
+        for pattern in patterns:
+            result = pattern.check_pattern(
+                marked_numbers=drawn_numbers,
+                card_numbers=card.numbers,
+                bingo_type=card.bingo_type,
+                balls_drawn=len(drawn_numbers)
+            )
             
-            # Si no se solicita verificar todos, salir al primer ganador
-            if not check_all:
-                break
+            if result['is_winner']:
+                winning_patterns.append(result)
+                total_multiplier += result['prize_multiplier']
+                
+                if result.get('is_jackpot'):
+                    jackpot_won = True
+                
+                # Si no se solicita verificar todos, salir al primer ganador
+                if not check_all:
+                    break
     
     is_winner = len(winning_patterns) > 0
     
@@ -215,6 +236,7 @@ def check_winner_with_patterns(request):
 
 
 @api_view(['POST'])
+@timed_view(WINNER_CHECK_SECONDS)
 def check_all_cards_in_game(request, game_id):
     """
     Verifica todos los cartones de una partida después de extraer una bola
@@ -237,6 +259,22 @@ def check_all_cards_in_game(request, game_id):
             'message': 'No hay bolas extraídas aún'
         }, status=status.HTTP_200_OK)
     
+    # Partidas por etapas: solo se evalúa el patrón de la etapa actual
+    if game.stages.exists():
+        drawn_numbers = DrawnBall.get_drawn_sequence(game.id)
+        won_stages = game.advance_stages(drawn_numbers)
+        current_stage = game.get_current_stage()
+        winners_found = sum(len(stage['winners']) for stage in won_stages)
+        WINNERS_FOUND.inc(winners_found, operator=request_operator_label(request))
+        
+        return Response({
+            'game_id': str(game.id),
+            'balls_drawn': len(drawn_numbers),
+            'stages_won': won_stages,
+            'winners_found': winners_found,
+            'current_stage': current_stage.to_result() if current_stage else None
+        }, status=status.HTTP_200_OK)
+    
     # Obtener todos los cartones de la sesión que están vendidos
     cards = BingoCardExtended.objects.filter(
         session=game.session,
@@ -247,6 +285,15 @@ def check_all_cards_in_game(request, game_id):
     # Patrones de la sesión
     patterns = game.session.get_winning_patterns()
     
+    # Con secuencia comprometida solo se verifican los cartones que la tabla
+    # de completitud marca como completos a esta bola
+    completion_index = get_completion_index(game, DrawnBall.get_drawn_sequence(game.id))
+    if completion_index is not None:
+        candidate_ids = set()
+        for pattern in patterns:
+            candidate_ids.update(completion_index.winners_at(len(drawn_numbers), pattern.code)['legacy'])
+        cards = cards.filter(id__in=candidate_ids)
+    
     winners = []
     
     for card in cards:
@@ -276,6 +323,7 @@ def check_all_cards_in_game(request, game_id):
                     'pattern': result
                 })
     
+    WINNERS_FOUND.inc(len(winners), operator=request_operator_label(request))
     return Response({
         'game_id': str(game.id),
         'balls_drawn': len(drawn_numbers),
@@ -284,7 +332,153 @@ def check_all_cards_in_game(request, game_id):
     }, status=status.HTTP_200_OK)
 
 
+# === Etapas de Partida ===
+
+@api_view(['POST'])
+def configure_game_stages(request, game_id):
+    """
+    Configura las etapas ordenadas de una partida
+    
+    POST /api/patterns/games/{game_id}/stages/configure/
+    {
+        "pattern_codes": ["horizontal_line", "two_lines", "full_card"]
+    }
+    """
+    game = get_object_or_404(BingoGameExtended, id=game_id)
+    
+    serializer = GameStageConfigSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    success, message, stages = game.configure_stages(serializer.validated_data.get('pattern_codes'))
+    
+    if not success:
+        return Response({
+            'error': message
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    return Response({
+        'message': message,
+        'game_id': str(game.id),
+        'stages': GameStageSerializer(game.stages.select_related('pattern'), many=True).data
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+def get_game_stages(request, game_id):
+    """
+    Obtiene las etapas de una partida y la etapa en juego
+    
+    GET /api/patterns/games/{game_id}/stages/
+    """
+    game = get_object_or_404(BingoGameExtended, id=game_id)
+    
+    stages = game.stages.select_related('pattern')
+    current_stage = next((stage for stage in stages if stage.status == 'active'), None)
+    
+    return Response({
+        'game_id': str(game.id),
+        'stages': GameStageSerializer(stages, many=True).data,
+        'current_stage': current_stage.order if current_stage else None
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+def get_closest_cards(request, game_id):
+    """
+    Cartones más cercanos a ganar ("a 1 bola", "a 2 bolas"...)
+    
+    GET /api/patterns/games/{game_id}/closest/?k=10&pattern=full_card&player_id=uuid
+    
+    Con player_id devuelve la mejor carta de ese jugador.
+    """
+    game = get_object_or_404(BingoGameExtended.objects.select_related('session'), id=game_id)
+    
+    try:
+        k = min(max(int(request.query_params.get('k', 10)), 1), 100)
+    except ValueError:
+        return Response({
+            'error': 'k debe ser un número entero'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    engine = get_game_engine(game)
+    
+    return Response({
+        'game_id': str(game.id),
+        'balls_drawn': len(engine.drawn),
+        'total_cards': len(engine.cards),
+        'closest': engine.closest(
+            k=k,
+            pattern_code=request.query_params.get('pattern'),
+            player_id=request.query_params.get('player_id')
+        ),
+        'patterns': engine.bucket_counts()
+    }, status=status.HTTP_200_OK)
+
+
+# === Simulación ===
+
+@api_view(['POST'])
+def simulate_patterns(request):
+    """
+    Simula partidas para estimar probabilidades de patrones y calibrar jackpots
+    
+    POST /api/patterns/simulate/
+    {
+        "bingo_type": "75",
+        "cards_count": 100,
+        "games": 5000,
+        "pattern_codes": ["full_card", "blackout_jackpot"]
+    }
+    
+    Corre en el hilo de la petición, así que cartones x partidas x patrones
+    no puede pasar de PatternSimulationSerializer.MAX_EVALUATIONS; para
+    millones de partidas usar `python manage.py simulate_patterns --workers N`.
+    """
+    from .simulation import simulate
+    
+    serializer = PatternSimulationSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    data = serializer.validated_data
+    patterns = WinningPattern.objects.filter(
+        is_active=True,
+        compatible_with__in=['all', data['bingo_type']]
+    )
+    if data.get('pattern_codes'):
+        patterns = patterns.filter(code__in=data['pattern_codes'])
+        missing = set(data['pattern_codes']) - set(patterns.values_list('code', flat=True))
+        if missing:
+            return Response({
+                'error': f"Patrones no encontrados o incompatibles: {', '.join(sorted(missing))}"
+            }, status=status.HTTP_400_BAD_REQUEST)
+    
+    patterns = list(patterns)
+    evaluations = data['cards_count'] * data['games'] * max(len(patterns), 1)
+    if evaluations > PatternSimulationSerializer.MAX_EVALUATIONS:
+        return Response({
+            'error': (
+                f"Simulación demasiado grande ({evaluations} cartones x partidas x patrones, "
+                f"máximo {PatternSimulationSerializer.MAX_EVALUATIONS}); "
+                "usar python manage.py simulate_patterns"
+            )
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    result = simulate(
+        bingo_type=data['bingo_type'],
+        cards_count=data['cards_count'],
+        games=data['games'],
+        patterns=patterns,
+        seed=data.get('seed'),
+        jackpot_balls=data.get('jackpot_balls')
+    )
+    
+    return Response(result, status=status.HTTP_200_OK)
+
+
 @api_view(['GET'])
+@read_replica
 def get_available_patterns_for_bingo_type(request, bingo_type):
     """
     Obtiene los patrones compatibles con un tipo de bingo
@@ -296,14 +490,11 @@ def get_available_patterns_for_bingo_type(request, bingo_type):
             'error': 'Tipo de bingo inválido. Debe ser 75, 85 o 90'
         }, status=status.HTTP_400_BAD_REQUEST)
     
-    patterns = WinningPattern.objects.filter(
-        is_active=True,
-        compatible_with__in=['all', bingo_type]
-    )
+    patterns = pattern_registry.patterns_for_bingo_type(bingo_type)
     
     return Response({
         'bingo_type': bingo_type,
         'patterns': WinningPatternSerializer(patterns, many=True).data,
-        'total': patterns.count()
+        'total': len(patterns)
     }, status=status.HTTP_200_OK)
 
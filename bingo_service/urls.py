@@ -16,7 +16,7 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from bingo import jwt_auth
+from bingo import jwt_auth, metrics, profiling
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -25,6 +25,13 @@ urlpatterns = [
     path('api/token/', jwt_auth.obtain_token, name='token_obtain'),
     path('api/token/refresh/', jwt_auth.refresh_token, name='token_refresh'),
     
+    # Métricas Prometheus
+    path('metrics', metrics.metrics_view, name='metrics'),
+    
+    # Perfiles de peticiones con X-Profile: 1
+    path('api/profiles/', profiling.profile_list, name='profile-list'),
+    path('api/profiles/<str:filename>', profiling.profile_download, name='profile-download'),
+    
     # APIs
     path('api/bingo/', include('bingo.urls')),
     path('api/multi-tenant/', include('bingo.urls_multi_tenant')),